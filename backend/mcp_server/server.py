@@ -13,12 +13,14 @@ the same Qdrant + Vertex embedding search the in-process tool uses.
 from __future__ import annotations
 
 import logging
+from collections import OrderedDict
 
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
 from fastmcp.server.auth.providers.debug import DebugTokenVerifier
 
 from src.config import settings
-from src.services.rag_service import async_search, format_as_xml_sources
+from src.services.rag_service import async_search
+from src.services.retrieval_context import RetrievalContext, search_in_run
 
 logger = logging.getLogger(__name__)
 
@@ -37,17 +39,33 @@ def _build_auth() -> DebugTokenVerifier | None:
 
 mcp: FastMCP = FastMCP("clinical-guidelines", auth=_build_auth())
 
+# One RetrievalContext per MCP session — each agent run is one CLI process
+# and one session. Least recently used sessions are dropped past the cap.
+MAX_RETRIEVAL_SESSIONS = 256
+_retrieval_sessions: OrderedDict[str, RetrievalContext] = OrderedDict()
+
+
+def _retrieval_for(session_id: str) -> RetrievalContext:
+    context = _retrieval_sessions.pop(session_id, None) or RetrievalContext()
+    _retrieval_sessions[session_id] = context
+    while len(_retrieval_sessions) > MAX_RETRIEVAL_SESSIONS:
+        _retrieval_sessions.popitem(last=False)
+    return context
+
 
 @mcp.tool
 async def search_clinical_guidelines(
     query: str,
     specialty: str = "",
     max_results: int = 5,
+    ctx: Context | None = None,
 ) -> str:
     """Search clinical guidelines, drug interactions, and protocols.
 
     Returns relevant passages with source citations. Use this tool to find
     evidence-based recommendations for patient conditions and medications.
+    Source ids are stable for the whole task; a passage you already received
+    comes back as an empty previously_returned source with the same id.
     """
     # Query text can embed patient-derived clinical details — never log it.
     logger.info(
@@ -57,13 +75,15 @@ async def search_clinical_guidelines(
     )
     if not 1 <= max_results <= 20:
         raise ValueError("max_results must be between 1 and 20")
-    results = await async_search(
+    results, formatted = await search_in_run(
+        async_search,
+        _retrieval_for(ctx.session_id) if ctx is not None else None,
         query=query,
         specialty=specialty or None,
         limit=max_results,
     )
     logger.info("MCP tool result: %d chunks returned", len(results))
-    return format_as_xml_sources(results)
+    return formatted
 
 
 def main() -> None:
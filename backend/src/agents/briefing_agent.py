@@ -7,6 +7,7 @@ import json
 import logging
 
 from collections.abc import AsyncIterator
+from contextlib import aclosing
 from typing import Any
 
 from claude_agent_sdk import (
@@ -27,11 +28,20 @@ from claude_agent_sdk import (
     query,
 )
 
+from src.agents.briefing_events import BriefingEventSink, BriefingEventTranslator
+from src.agents.client_pool import AgentClientPool
 from src.agents.tools import search_clinical_guidelines
 from src.config import settings
 from src.models.orm import Patient
 from src.models.schemas import BriefingResponse, PatientBriefing
-from src.services.briefing_service import BriefingGenerationError, _serialize_patient
+from src.services.briefing_service import (
+    BriefingGenerationError,
+    briefing_prompt,
+    with_rule_flags,
+)
+from src.services.patient_context import patient_context
+from src.services.pre_analysis import analyze_patient
+from src.services.retrieval_context import retrieval_run
 
 logger = logging.getLogger(__name__)
 
@@ -56,8 +66,19 @@ WORKFLOW:
 4. Generate a briefing grounded in the retrieved evidence
 5. Cite sources using [source_id] for every clinical claim
 
-INPUT: Patient record in JSON format with demographics, conditions, \
-medications, lab results (with reference ranges), allergies, and visits.
+INPUT: A compact patient record — demographics, conditions, allergies, then \
+pipe-separated tables of medications, labs (latest result per analyte with \
+its reference range and trend) and recent visits — followed by a \
+PRE-ANALYSIS section.
+
+PRE-ANALYSIS: Out-of-range labs (with severity), lab trends, screening gaps \
+and medication checks computed deterministically from the record. They are \
+correct and are added to the briefing automatically:
+- Do NOT repeat them as flags and do not recompute reference ranges.
+- Spend your searches on grounding them: cite guidelines for them in the \
+summary and suggested actions.
+- Flag only what the rules cannot see: guideline-specific targets, drug \
+interactions, and clinical patterns across the data.
 
 OUTPUT: Structured briefing with flags, summary, and suggested actions.
 
@@ -68,12 +89,12 @@ SEARCH TOOL USAGE:
 not vague ones (e.g., "diabetes")
 
 FLAG GUIDELINES:
-- category "labs": Flag lab values outside reference ranges. Cite the \
-guideline that defines the target range.
-- category "medications": Flag medication concerns. Cite drug interaction \
-or dosing guidelines.
-- category "screenings": Flag overdue preventive screenings based on \
-age/gender/conditions.
+- category "labs": Guideline targets stricter than the lab's reference \
+range, or lab concerns the PRE-ANALYSIS does not list. Cite the guideline.
+- category "medications": Medication concerns not in the PRE-ANALYSIS. \
+Cite drug interaction or dosing guidelines.
+- category "screenings": Screening gaps not in the PRE-ANALYSIS (e.g. \
+condition-specific ones it has no rule for).
 - category "ai_insight": Flag clinical patterns across the data, grounded \
 in retrieved evidence.
 - severity "critical": Immediate clinical concern.
@@ -227,6 +248,10 @@ def _build_options(mcp_servers: dict[str, Any]) -> ClaudeAgentOptions:
         max_turns=4,
         permission_mode="bypassPermissions",
         env=_proxy_env(),
+        # Token-level stream events, so the streaming endpoint can surface
+        # flags while the structured output is still being written. Callers
+        # that only want the result ignore them.
+        include_partial_messages=True,
     )
 
 
@@ -244,10 +269,22 @@ def _http_mcp_servers() -> dict[str, Any]:
     return {"briefing": config}
 
 
-async def generate_briefing(patient: Patient) -> BriefingResponse:
-    """Generate a RAG-augmented briefing using in-process SDK MCP tools."""
+async def generate_briefing(
+    patient: Patient, events: BriefingEventSink | None = None
+) -> BriefingResponse:
+    """Generate a RAG-augmented briefing using in-process SDK MCP tools.
+
+    With `events`, progress (tool calls, retrieved sources, each validated
+    flag/action) is put on the queue as the agent works; see briefing_events.py.
+    """
     options = _build_options({"briefing": briefing_tools})
-    return await _run_briefing(patient, options, label="RAG agent (in-process MCP)")
+    return await _run_briefing(
+        patient,
+        options,
+        label="RAG agent (in-process MCP)",
+        pool=briefing_clients,
+        events=events,
+    )
 
 
 async def generate_briefing_via_http_mcp(patient: Patient) -> BriefingResponse:
@@ -261,91 +298,111 @@ async def generate_briefing_via_http_mcp(patient: Patient) -> BriefingResponse:
 
 
 async def _run_query_to_result(
-    prompt: AsyncIterator[dict[str, Any]],
+    prompt: str,
     options: ClaudeAgentOptions,
     *,
     label: str,
+    pool: AgentClientPool | None = None,
+    events: BriefingEventSink | None = None,
 ) -> ResultMessage:
-    """Drive the SDK query() loop to completion and return the ResultMessage.
+    """Drive the agent loop to completion and return the ResultMessage.
 
-    Encapsulates the per-turn logging and the CLI/shutdown error handling shared
-    by briefing generation and follow-up answers. Raises BriefingGenerationError
-    on any agent/CLI failure.
+    Runs on a warm client from `pool` when it is started (see client_pool.py),
+    otherwise on a one-shot query() with `options`. Encapsulates the per-turn
+    logging and the CLI/shutdown error handling shared by briefing generation
+    and follow-up answers. Progress events go to `events` when given.
+    Raises BriefingGenerationError on any agent/CLI failure.
     """
     result: ResultMessage | None = None
     turn = 0
-    try:
-        async for message in query(prompt=prompt, options=options):
-            if isinstance(message, AssistantMessage):
-                turn += 1
-                _log_assistant_message(message, turn)
-            elif isinstance(message, UserMessage):
-                # UserMessage in multi-turn = tool results fed back to agent
-                logger.info(
-                    "[turn %d] UserMessage (tool result fed back to agent)", turn
+    translator = BriefingEventTranslator()
+    # One retrieval context per run: repeated searches are memoized and
+    # source ids stay stable across tool calls (see retrieval_context.py).
+    # Pooled runs get theirs on the worker.
+    with retrieval_run():
+        try:
+            if pool is not None and pool.started:
+                messages = pool.run(prompt)
+            else:
+                messages = query(prompt=_as_stream(prompt), options=options)
+            async with aclosing(messages):
+                async for message in messages:
+                    if events is not None:
+                        for event in translator.translate(message):
+                            await events.put(event)
+                    if isinstance(message, AssistantMessage):
+                        turn += 1
+                        _log_assistant_message(message, turn)
+                    elif isinstance(message, UserMessage):
+                        # UserMessage in multi-turn = tool results fed back to agent
+                        logger.info(
+                            "[turn %d] UserMessage (tool result fed back to agent)",
+                            turn,
+                        )
+                        if message.tool_use_result:
+                            logger.debug(
+                                "[turn %d]   tool_use_result: %s",
+                                turn,
+                                str(message.tool_use_result)[:300],
+                            )
+                    elif isinstance(message, SystemMessage):
+                        logger.debug(
+                            "SystemMessage: subtype=%s data=%s",
+                            message.subtype,
+                            str(message.data)[:200],
+                        )
+                    elif isinstance(message, ResultMessage):
+                        _log_result_message(message)
+                        if message.is_error:
+                            raise BriefingGenerationError(
+                                code="AGENT_ERROR",
+                                message=message.result or "Agent returned an error",
+                            )
+                        result = message
+        except BriefingGenerationError:
+            raise
+        except CLINotFoundError:
+            raise BriefingGenerationError(
+                code="CLI_NOT_FOUND",
+                message="Claude Code CLI not found. Ensure it is installed.",
+            )
+        except CLIConnectionError as e:
+            if result is not None:
+                logger.warning(
+                    "CLIConnectionError after result received (ignoring): %s", e
                 )
-                if message.tool_use_result:
-                    logger.debug(
-                        "[turn %d]   tool_use_result: %s",
-                        turn,
-                        str(message.tool_use_result)[:300],
-                    )
-            elif isinstance(message, SystemMessage):
-                logger.debug(
-                    "SystemMessage: subtype=%s data=%s",
-                    message.subtype,
-                    str(message.data)[:200],
+            else:
+                raise BriefingGenerationError(
+                    code="CLI_CONNECTION_ERROR",
+                    message=f"Failed to connect to Claude CLI: {e}",
                 )
-            elif isinstance(message, ResultMessage):
-                _log_result_message(message)
-                if message.is_error:
-                    raise BriefingGenerationError(
-                        code="AGENT_ERROR",
-                        message=message.result or "Agent returned an error",
-                    )
-                result = message
-    except BriefingGenerationError:
-        raise
-    except CLINotFoundError:
-        raise BriefingGenerationError(
-            code="CLI_NOT_FOUND",
-            message="Claude Code CLI not found. Ensure it is installed.",
-        )
-    except CLIConnectionError as e:
-        if result is not None:
-            logger.warning("CLIConnectionError after result received (ignoring): %s", e)
-        else:
+        except BaseExceptionGroup as eg:
+            # SDK task group wraps CLIConnectionError in ExceptionGroup during
+            # query.close() — a race between transport shutdown and in-flight
+            # control request handlers. Safe to ignore if we already have a result.
+            cli_errors = eg.subgroup(CLIConnectionError)
+            if cli_errors and result is not None:
+                logger.warning(
+                    "CLIConnectionError in task group after result (ignoring): %s",
+                    cli_errors.exceptions[0],
+                )
+            elif cli_errors:
+                raise BriefingGenerationError(
+                    code="CLI_CONNECTION_ERROR",
+                    message=f"Failed to connect to Claude CLI: {cli_errors.exceptions[0]}",
+                )
+            else:
+                raise
+        except ProcessError as e:
             raise BriefingGenerationError(
-                code="CLI_CONNECTION_ERROR",
-                message=f"Failed to connect to Claude CLI: {e}",
-            )
-    except BaseExceptionGroup as eg:
-        # SDK task group wraps CLIConnectionError in ExceptionGroup during
-        # query.close() — a race between transport shutdown and in-flight
-        # control request handlers. Safe to ignore if we already have a result.
-        cli_errors = eg.subgroup(CLIConnectionError)
-        if cli_errors and result is not None:
-            logger.warning(
-                "CLIConnectionError in task group after result (ignoring): %s",
-                cli_errors.exceptions[0],
+                code="PROCESS_ERROR",
+                message=f"Agent process failed: {e}",
             )
-        elif cli_errors:
+        except CLIJSONDecodeError as e:
             raise BriefingGenerationError(
-                code="CLI_CONNECTION_ERROR",
-                message=f"Failed to connect to Claude CLI: {cli_errors.exceptions[0]}",
+                code="JSON_DECODE_ERROR",
+                message=f"Failed to parse agent response: {e}",
             )
-        else:
-            raise
-    except ProcessError as e:
-        raise BriefingGenerationError(
-            code="PROCESS_ERROR",
-            message=f"Agent process failed: {e}",
-        )
-    except CLIJSONDecodeError as e:
-        raise BriefingGenerationError(
-            code="JSON_DECODE_ERROR",
-            message=f"Failed to parse agent response: {e}",
-        )
 
     if result is None:
         raise BriefingGenerationError(
@@ -360,9 +417,12 @@ async def _run_briefing(
     options: ClaudeAgentOptions,
     *,
     label: str,
+    pool: AgentClientPool | None = None,
+    events: BriefingEventSink | None = None,
 ) -> BriefingResponse:
     """Run the multi-turn agent loop for the given options and return the briefing."""
-    patient_json = _serialize_patient(patient)
+    analysis = analyze_patient(patient)
+    prompt = briefing_prompt(patient, analysis)
 
     logger.info(
         "Starting %s: model=%s routing=%s max_turns=%s tools=%s",
@@ -377,9 +437,12 @@ async def _run_briefing(
     logger.info(
         "Patient id=%s, condition_count=%d", patient.id, len(patient.conditions)
     )
-    logger.debug("Patient JSON prompt length: %d chars", len(patient_json))
+    logger.info("Pre-analysis: %d rule flags", len(analysis.flags))
+    logger.debug("Patient prompt length: %d chars", len(prompt))
 
-    message = await _run_query_to_result(_as_stream(patient_json), options, label=label)
+    message = await _run_query_to_result(
+        prompt, options, label=label, pool=pool, events=events
+    )
     if message.structured_output is None:
         raise BriefingGenerationError(
             code="NO_RESULT",
@@ -392,9 +455,12 @@ async def _run_briefing(
         len(briefing.flags),
         len(briefing.suggested_actions),
     )
-    return BriefingResponse(
-        **briefing.model_dump(),
-        generated_at=datetime.datetime.now(datetime.UTC),
+    return with_rule_flags(
+        BriefingResponse(
+            **briefing.model_dump(),
+            generated_at=datetime.datetime.now(datetime.UTC),
+        ),
+        analysis,
     )
 
 
@@ -411,7 +477,9 @@ say so explicitly rather than guessing.
 """
 
 
-def _build_followup_options(mcp_servers: dict[str, Any]) -> ClaudeAgentOptions:
+def _build_followup_options(
+    mcp_servers: dict[str, Any], resume: str | None = None
+) -> ClaudeAgentOptions:
     """Options for a follow-up turn: same tool access, free-text (no schema)."""
     return ClaudeAgentOptions(
         system_prompt=FOLLOWUP_SYSTEM_PROMPT,
@@ -421,45 +489,112 @@ def _build_followup_options(mcp_servers: dict[str, Any]) -> ClaudeAgentOptions:
         max_turns=4,
         permission_mode="bypassPermissions",
         env=_proxy_env(),
+        resume=resume,
     )
 
 
-async def answer_followup_question(
+def _followup_replay_prompt(
     patient: Patient,
     briefing_content: dict[str, Any],
     history: list[tuple[str, str]],
     question: str,
 ) -> str:
-    """Answer a clinician's follow-up question about an existing briefing.
+    """Self-contained prompt for a follow-up that starts a new session.
 
-    Free-text answer (no structured output). The RAG tool stays available so the
-    agent can look up guidelines. Reuses the in-process MCP tool server and the
-    same proxy routing as briefing generation. `history` is the prior turns as
-    (role, content) pairs.
+    Prior Q&A is windowed to the last `followup_replay_pairs` exchanges so a
+    long conversation can't grow the prompt without bound.
     """
-    patient_json = _serialize_patient(patient)
     sections = [
-        f"PATIENT RECORD (JSON):\n{patient_json}",
+        f"PATIENT RECORD:\n{patient_context(patient)}",
         "PRE-CONSULTATION BRIEFING (already generated for this patient):\n"
         + json.dumps(briefing_content, default=str, indent=2),
     ]
-    if history:
+    window = history[-2 * settings.followup_replay_pairs :] if history else []
+    if window:
         transcript = "\n\n".join(
             f"{'Physician' if role == 'user' else 'Assistant'}: {text}"
-            for role, text in history
+            for role, text in window
         )
-        sections.append("PRIOR FOLLOW-UP Q&A IN THIS CONVERSATION:\n" + transcript)
+        heading = "PRIOR FOLLOW-UP Q&A IN THIS CONVERSATION"
+        if len(window) < len(history):
+            heading += f" (most recent {len(window) // 2} exchanges)"
+        sections.append(f"{heading}:\n{transcript}")
     sections.append("PHYSICIAN'S NEW QUESTION:\n" + question)
-    prompt = "\n\n".join(sections)
+    return "\n\n".join(sections)
 
+
+async def answer_followup_question(
+    patient: Patient,
+    briefing_content: dict[str, Any],
+    history: list[tuple[str, str]],
+    question: str,
+    session_id: str | None = None,
+) -> tuple[str, str | None]:
+    """Answer a clinician's follow-up question about an existing briefing.
+
+    Free-text answer (no structured output). The RAG tool stays available so the
+    agent can look up guidelines. Reuses the in-process MCP tool server and the
+    same proxy routing as briefing generation. `history` is the prior turns as
+    (role, content) pairs.
+
+    With a `session_id` from an earlier follow-up the turn resumes that SDK
+    session and sends only the question, so cost stays flat as the
+    conversation grows. Without one, or if the session can't be resumed
+    (transcript gone after a redeploy, another host), the turn falls back to
+    a windowed replay in a new session. Returns (answer, session_id) — the
+    session to resume next time.
+    """
     logger.info(
-        "Starting follow-up: model=%s routing=%s prior_turns=%d",
+        "Starting follow-up: model=%s routing=%s prior_turns=%d resume=%s",
         settings.ai_model,
         settings.anthropic_base_url or "direct (Anthropic)",
         len(history),
+        session_id,
     )
+    if session_id is not None:
+        # Resumed turns skip the warm pool: `resume` is fixed when a client
+        # connects.
+        options = _build_followup_options({"briefing": briefing_tools}, session_id)
+        try:
+            message = await _run_query_to_result(
+                question, options, label="follow-up agent (resumed)"
+            )
+            return message.result or "", message.session_id or session_id
+        except BriefingGenerationError as exc:
+            if exc.code == "CLI_NOT_FOUND":
+                raise
+            logger.warning(
+                "Could not resume follow-up session %s (%s); replaying history",
+                session_id,
+                exc.code,
+            )
+
+    prompt = _followup_replay_prompt(patient, briefing_content, history, question)
     options = _build_followup_options({"briefing": briefing_tools})
     message = await _run_query_to_result(
-        _as_stream(prompt), options, label="follow-up agent"
+        prompt, options, label="follow-up agent", pool=followup_clients
     )
-    return message.result or ""
+    return message.result or "", message.session_id
+
+
+# --- Warm client pools (in-process MCP paths) ---
+
+# One pool per options set: the system prompt and output schema are fixed when
+# a client connects. The HTTP-MCP path stays on query(); it exists to exercise
+# the external server, not for throughput.
+briefing_clients = AgentClientPool(
+    "briefing", lambda: _build_options({"briefing": briefing_tools})
+)
+followup_clients = AgentClientPool(
+    "follow-up", lambda: _build_followup_options({"briefing": briefing_tools})
+)
+
+
+async def start_client_pools() -> None:
+    for pool in (briefing_clients, followup_clients):
+        await pool.start(settings.agent_pool_size, settings.agent_pool_max_uses)
+
+
+async def stop_client_pools() -> None:
+    for pool in (briefing_clients, followup_clients):
+        await pool.stop()
@@ -0,0 +1,223 @@
+"""Progress events for a streamed briefing run.
+
+The briefing agent's structured output is delivered as the input of the
+CLI's synthetic StructuredOutput tool, and with `include_partial_messages`
+that input arrives as `input_json_delta` chunks while the model writes it.
+`PartialJSONObject` scans those chunks and surfaces each flag and suggested
+action the moment its closing brace arrives, instead of after the final
+ResultMessage. Everything surfaced early is validated against the same
+pydantic models as the full briefing; the final `briefing` event remains the
+authoritative whole.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from typing import Any, Protocol
+
+from claude_agent_sdk import (
+    AssistantMessage,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+
+# Not re-exported at the top level by every supported SDK release.
+from claude_agent_sdk.types import StreamEvent
+from pydantic import BaseModel, ValidationError
+
+from src.models.schemas import Flag, SuggestedAction, Summary
+
+logger = logging.getLogger(__name__)
+
+# One SSE frame: (event kind, JSON-serializable payload).
+BriefingEvent = tuple[str, dict[str, Any]]
+
+
+class BriefingEventSink(Protocol):
+    """Where a run's events go: an asyncio.Queue, or the bounded
+    services.event_channel EventChannel of a streamed briefing."""
+
+    async def put(self, item: BriefingEvent) -> None: ...
+
+
+# Tool the CLI adds for `output_format={"type": "json_schema", ...}`.
+STRUCTURED_OUTPUT_TOOL = "StructuredOutput"
+
+# Top-level briefing member -> (event kind, payload key, model).
+_MEMBERS: dict[str, tuple[str, str, type[BaseModel]]] = {
+    "flags": ("flag", "flag", Flag),
+    "suggested_actions": ("suggested_action", "action", SuggestedAction),
+    "summary": ("summary", "summary", Summary),
+}
+
+_SOURCE_RE = re.compile(
+    r'<source id="(\d+)" document="([^"]*)" section="([^"]*)" score="([^"]*)"'
+)
+
+
+class PartialJSONObject:
+    """Incremental scanner over a JSON object that arrives in chunks.
+
+    `feed()` returns each completed element of a top-level array member as
+    (member, index, value), and each completed top-level object member as
+    (member, None, value). Scalars are not surfaced.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = ""
+        self._member: str | None = None
+        self._container = ""
+        self._value_start = 0
+        self._item_start = -1
+        self._item_index = 0
+
+    def feed(self, chunk: str) -> list[tuple[str, int | None, Any]]:
+        self._buf += chunk
+        completed: list[tuple[str, int | None, Any]] = []
+        while self._pos < len(self._buf):
+            i = self._pos
+            ch = self._buf[i]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = self._buf[self._string_start : i + 1]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1:
+                self._member = json.loads(self._last_string)
+            elif ch in "[{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._container = ch
+                    self._value_start = i
+                    self._item_index = 0
+                elif self._depth == 3 and self._container == "[":
+                    self._item_start = i
+            elif ch in "]}":
+                self._depth -= 1
+                if self._member is None:
+                    continue
+                if self._depth == 2 and self._container == "[":
+                    value = self._decode(self._item_start, i)
+                    if value is not None:
+                        completed.append((self._member, self._item_index, value))
+                    self._item_index += 1
+                    self._item_start = -1
+                elif self._depth == 1 and self._container == "{":
+                    value = self._decode(self._value_start, i)
+                    if value is not None:
+                        completed.append((self._member, None, value))
+        return completed
+
+    def _decode(self, start: int, end: int) -> Any:
+        try:
+            return json.loads(self._buf[start : end + 1])
+        except json.JSONDecodeError:
+            logger.debug("Skipping undecodable partial member %r", self._member)
+            return None
+
+
+def _sources(block: ToolResultBlock) -> list[dict[str, Any]]:
+    """Source attributes from a search_clinical_guidelines XML result."""
+    if isinstance(block.content, str):
+        text = block.content
+    else:
+        text = "".join(part.get("text", "") for part in block.content or [])
+    return [
+        {
+            "source_id": int(source_id),
+            "document": document,
+            "section": section,
+            "score": float(score),
+        }
+        for source_id, document, section, score in _SOURCE_RE.findall(text)
+    ]
+
+
+class BriefingEventTranslator:
+    """Turns SDK messages from one briefing run into progress events.
+
+    Event vocabulary: tool_use, sources, flag, summary, suggested_action.
+    """
+
+    def __init__(self) -> None:
+        # Content-block index -> scanner, for StructuredOutput blocks in the
+        # message currently streaming.
+        self._outputs: dict[int, PartialJSONObject] = {}
+
+    def translate(self, message: Any) -> list[BriefingEvent]:
+        if isinstance(message, StreamEvent):
+            return self._stream_event(message.event)
+        if isinstance(message, AssistantMessage):
+            return [
+                (
+                    "tool_use",
+                    {"tool": block.name.split("__")[-1], "input": block.input},
+                )
+                for block in message.content
+                if isinstance(block, ToolUseBlock)
+                and block.name != STRUCTURED_OUTPUT_TOOL
+            ]
+        if isinstance(message, UserMessage) and isinstance(message.content, list):
+            return [
+                ("sources", {"tool_use_id": block.tool_use_id, "sources": sources})
+                for block in message.content
+                if isinstance(block, ToolResultBlock) and (sources := _sources(block))
+            ]
+        return []
+
+    def _stream_event(self, event: dict[str, Any]) -> list[BriefingEvent]:
+        kind = event.get("type")
+        index = event.get("index", 0)
+        if kind == "content_block_start":
+            block = event.get("content_block", {})
+            if (
+                block.get("type") == "tool_use"
+                and block.get("name") == STRUCTURED_OUTPUT_TOOL
+            ):
+                self._outputs[index] = PartialJSONObject()
+            return []
+        if kind == "content_block_stop":
+            self._outputs.pop(index, None)
+            return []
+        delta = event.get("delta", {})
+        if (
+            kind != "content_block_delta"
+            or delta.get("type") != "input_json_delta"
+            or index not in self._outputs
+        ):
+            return []
+
+        events: list[BriefingEvent] = []
+        for member, position, value in self._outputs[index].feed(
+            delta.get("partial_json", "")
+        ):
+            if member not in _MEMBERS:
+                continue
+            event_kind, key, model = _MEMBERS[member]
+            try:
+                item = model.model_validate(value).model_dump(mode="json")
+            except ValidationError:
+                logger.debug("Partial %s failed validation; skipped", member)
+                continue
+            payload: dict[str, Any] = {key: item}
+            if position is not None:
+                payload["index"] = position
+            events.append((event_kind, payload))
+        return events
@@ -23,6 +23,10 @@ This module demonstrates the SDK patterns the briefing paths don't:
   schema IS `PatientBriefing.model_json_schema()`, so the SDK validates the
   agent's briefing against our Pydantic contract at the tool boundary. That is
   how a free-flowing chat can still emit schema-guaranteed artifacts.
+- **Partial messages** — with `include_partial_messages` the SDK also yields
+  the raw API stream events, so text and thinking reach the browser token by
+  token (`text_delta` / `thinking_delta`) instead of a block at a time. The
+  complete blocks still arrive afterwards and build the persisted trace.
 """
 
 from __future__ import annotations
@@ -31,9 +35,8 @@ import json
 import logging
 import re
 
-from asyncio import Queue
 from pathlib import Path
-from typing import Any
+from typing import Any, Protocol
 
 from claude_agent_sdk import (
     AssistantMessage,
@@ -53,9 +56,16 @@ from claude_agent_sdk import (
     create_sdk_mcp_server,
     tool,
 )
+
+# Not re-exported at the top level by every supported SDK release.
+from claude_agent_sdk.types import StreamEvent
 from pydantic import ValidationError
 
-from src.agents.briefing_agent import _http_mcp_servers, _proxy_env
+from src.agents.briefing_agent import (
+    _http_mcp_servers,
+    _proxy_env,
+    _run_query_to_result,
+)
 from src.config import settings
 from src.models.schemas import BriefingResponse, PatientBriefing
 from src.services.briefing_service import BriefingGenerationError
@@ -69,10 +79,18 @@ AGENT_HOME = Path(__file__).resolve().parents[2] / "agent_home"
 # One SSE frame: (event kind, JSON-serializable payload).
 ChatEvent = tuple[str, dict[str, Any]]
 
+
+class ChatEventSink(Protocol):
+    """Where a turn's events go: an asyncio.Queue, or a services.chat_turns
+    ChatTurn, which numbers and buffers them for resumable streams."""
+
+    async def put(self, item: ChatEvent) -> None: ...
+
+
 CHAT_SYSTEM_PROMPT = """\
 You are a clinical decision support assistant helping a physician prepare for
-and reason about a single patient's consultation. The patient's full record is
-provided at the start of the conversation.
+and reason about a single patient's consultation. The patient's record, in a
+compact tabular form, is provided at the start of the conversation.
 
 - Answer concisely; physicians need quick, scannable information.
 - Ground clinical claims in evidence: use the search_clinical_guidelines tool
@@ -88,7 +106,7 @@ provided at the start of the conversation.
 """
 
 
-def make_publish_tool(queue: Queue[ChatEvent], patient_id: int):
+def make_publish_tool(queue: ChatEventSink, patient_id: int):
     """Build the publish_briefing tool bound to this request's queue + patient.
 
     A factory (rather than a module-level tool) because the handler must close
@@ -149,10 +167,10 @@ def make_publish_tool(queue: Queue[ChatEvent], patient_id: int):
 
 
 def build_chat_options(
-    queue: Queue[ChatEvent],
+    queue: ChatEventSink,
     patient_id: int,
     resume_session_id: str | None,
-    patient_json: str,
+    patient_record: str,
 ) -> ClaudeAgentOptions:
     """Options for one chat turn.
 
@@ -191,7 +209,7 @@ def build_chat_options(
         # granting anything new.
         allowed_tools.append("Bash")
     return ClaudeAgentOptions(
-        system_prompt=f"{CHAT_SYSTEM_PROMPT}\nPATIENT RECORD (JSON):\n{patient_json}",
+        system_prompt=f"{CHAT_SYSTEM_PROMPT}\nPATIENT RECORD:\n{patient_record}",
         model=settings.ai_model,
         mcp_servers={
             "guidelines": _http_mcp_servers()["briefing"],
@@ -214,6 +232,7 @@ def build_chat_options(
         cwd=str(AGENT_HOME),
         setting_sources=["project"],
         resume=resume_session_id,
+        include_partial_messages=settings.chat_stream_deltas,
     )
 
 
@@ -239,6 +258,52 @@ def _mask_key_material(text: str) -> str:
     return _FC_KEY_RE.sub("fc-<redacted>", text)
 
 
+# Whitespace followed by a run without any: where a streamed fragment may be
+# cut without splitting a key.
+_LAST_WORD_RE = re.compile(r"\s\S*\Z")
+
+
+class _TextDeltas:
+    """Masks streamed text. Key material can span several deltas, so text is
+    released only up to the last whitespace; the rest waits for more text or
+    the end of the block."""
+
+    def __init__(self) -> None:
+        self._held = ""
+
+    def feed(self, fragment: str) -> str:
+        text = self._held + fragment
+        match = _LAST_WORD_RE.search(text)
+        cut = match.start() + 1 if match else 0
+        self._held = text[cut:]
+        return _mask_key_material(text[:cut])
+
+    def flush(self) -> str:
+        text, self._held = self._held, ""
+        return _mask_key_material(text)
+
+
+def _stream_delta(message: StreamEvent, text: _TextDeltas) -> ChatEvent | None:
+    """The text_delta / thinking_delta event for one raw API stream event.
+
+    Only the main agent's own output: events of subagents (tool use inside a
+    Task) carry a parent_tool_use_id and are skipped.
+    """
+    if message.parent_tool_use_id is not None:
+        return None
+    event = message.event
+    fragment = ""
+    if event.get("type") == "content_block_delta":
+        delta = event.get("delta") or {}
+        if delta.get("type") == "thinking_delta":
+            return ("thinking_delta", {"text": delta.get("thinking", "")})
+        if delta.get("type") == "text_delta":
+            fragment = text.feed(delta.get("text", ""))
+    elif event.get("type") == "content_block_stop":
+        fragment = text.flush()
+    return ("text_delta", {"text": fragment}) if fragment else None
+
+
 def _masked_payload(payload: dict[str, Any]) -> dict[str, Any]:
     """Scrub key material from a tool input dict (JSON round-trip)."""
     return json.loads(_mask_key_material(json.dumps(payload, default=str)))
@@ -269,7 +334,7 @@ def _result_preview(content: Any) -> str:
 async def drive_chat_turn(
     prompt: str,
     options: ClaudeAgentOptions,
-    queue: Queue[ChatEvent],
+    queue: ChatEventSink,
 ) -> tuple[str | None, str, list[dict[str, Any]]]:
     """Run one chat turn, translating SDK messages into SSE events on the queue.
 
@@ -277,6 +342,10 @@ async def drive_chat_turn(
     of parts the agent produced — thinking, tool calls (with inputs and result
     previews), and text — persisted so the UI can replay the agent's work
     after a refresh. The caller owns the terminal done/error event.
+
+    With partial messages enabled, `text_delta` / `thinking_delta` events
+    stream each block as it is generated; the block's `text` / `thinking`
+    event follows once it is complete and supersedes its deltas.
     Raises BriefingGenerationError on agent/CLI failure (same error taxonomy
     as the briefing paths, so the router maps them identically).
     """
@@ -287,11 +356,16 @@ async def drive_chat_turn(
     # come back (as UserMessage tool-result blocks) a few messages later.
     pending_tools: dict[str, dict[str, Any]] = {}
     result: ResultMessage | None = None
+    text_deltas = _TextDeltas()
     try:
         async with ClaudeSDKClient(options) as client:
             await client.query(prompt)
             async for message in client.receive_response():
-                if isinstance(message, SystemMessage):
+                if isinstance(message, StreamEvent):
+                    delta = _stream_delta(message, text_deltas)
+                    if delta is not None:
+                        await queue.put(delta)
+                elif isinstance(message, SystemMessage):
                     if message.subtype == "init":
                         session_id = message.data.get("session_id")
                 elif isinstance(message, AssistantMessage):
@@ -413,3 +487,75 @@ async def drive_chat_turn(
         result.total_cost_usd or 0,
     )
     return session_id, "".join(text_parts), trace
+
+
+# --- Transcript compaction ---
+
+COMPACT_PROMPT = """\
+Summarize this consultation chat so far for a fresh session that will
+continue it. Keep every clinical fact, finding, decision, open question and
+cited guideline source the physician may refer back to; drop pleasantries,
+tool mechanics and anything already superseded. Plain prose or terse
+bullets, no preamble."""
+
+
+def _compaction_options(**overrides: Any) -> ClaudeAgentOptions:
+    """Tool-less single-turn options in the chat's working directory."""
+    return ClaudeAgentOptions(
+        model=settings.ai_model,
+        allowed_tools=[],
+        max_turns=1,
+        permission_mode="bypassPermissions",
+        env=_proxy_env(),
+        cwd=str(AGENT_HOME),
+        **overrides,
+    )
+
+
+def _seed_prompt(summary: str, recent: list[tuple[str, str]]) -> str:
+    sections = [f"SUMMARY OF THE CONVERSATION SO FAR:\n{summary}"]
+    if recent:
+        sections.append(
+            "MOST RECENT EXCHANGES (verbatim):\n"
+            + "\n\n".join(
+                f"{'Physician' if role == 'user' else 'Assistant'}: {text}"
+                for role, text in recent
+            )
+        )
+    sections.append(
+        "This conversation continues from the above. Reply only with: Ready."
+    )
+    return "\n\n".join(sections)
+
+
+async def compact_session(
+    session_id: str, patient_record: str, recent: list[tuple[str, str]]
+) -> str:
+    """Summarize a chat session into a new one; returns the new session id.
+
+    Two one-shot runs: the first forks `session_id` (fork_session, so the
+    original transcript is left as it was) and asks for a summary; the second
+    starts a session with the chat's system prompt, seeded with that summary
+    and the `recent` (role, text) exchanges verbatim. Resuming the new
+    session then loads a few thousand tokens instead of the whole history.
+    Raises BriefingGenerationError like any agent run.
+    """
+    summary = await _run_query_to_result(
+        COMPACT_PROMPT,
+        _compaction_options(resume=session_id, fork_session=True),
+        label="chat compaction (summary)",
+    )
+    seeded = await _run_query_to_result(
+        _seed_prompt(summary.result or "", recent),
+        _compaction_options(
+            system_prompt=f"{CHAT_SYSTEM_PROMPT}\nPATIENT RECORD:\n{patient_record}",
+            setting_sources=["project"],
+        ),
+        label="chat compaction (seed)",
+    )
+    if not seeded.session_id:
+        raise BriefingGenerationError(
+            code="NO_RESULT", message="Compaction did not start a new session"
+        )
+    logger.info("Compacted chat session %s into %s", session_id, seeded.session_id)
+    return seeded.session_id
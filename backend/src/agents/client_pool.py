@@ -0,0 +1,259 @@
+"""Warm pool of connected ClaudeSDKClient workers.
+
+`query()` spawns a Claude Code CLI subprocess per call, and process startup
+(node boot, MCP handshake, init) dominates latency for short runs. A pool
+keeps `size` clients connected with fixed options (system prompt, MCP
+servers, output schema), so a request only pays for the model turns.
+
+Each client lives in its own worker task: the SDK binds a client to the task
+group it connected in, so connect, every query, and disconnect must happen
+on the same task. Callers therefore never touch a client directly — `run()`
+hands the prompt to the next idle worker and streams its messages back.
+
+Between requests a worker sends `/clear` so the next request starts from an
+empty conversation. A worker is recycled (disconnected and reconnected) after
+`max_uses` requests, when a request raises or ends in an error result, when
+the reset fails, or when the pre-request health check (an MCP status round
+trip) fails. A consumer that stops reading mid-run (cancelled, or closed the
+stream) abandons the request: the worker stops streaming at once and
+recycles the client, since the CLI may still be mid-turn.
+
+Each worker binds a retrieval slot before connecting and serves every
+request inside `retrieval_run()`, so tool calls in one request share memoized
+searches and source ids with each other but not with other requests (see
+services/retrieval_context.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from claude_agent_sdk import ClaudeAgentOptions, ClaudeSDKClient, ResultMessage
+
+from src.services.retrieval_context import bind_retrieval_slot, retrieval_run
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_TIMEOUT_SECONDS = 5.0
+RESET_TIMEOUT_SECONDS = 15.0
+
+_DONE = object()
+
+
+@dataclass
+class _Request:
+    prompt: str
+    messages: asyncio.Queue[Any] = field(default_factory=asyncio.Queue)
+    gone: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def abandoned(self) -> bool:
+        return self.gone.is_set()
+
+    def fail(self, error: BaseException) -> None:
+        self.messages.put_nowait(error)
+
+
+class AgentClientPool:
+    """`size` pre-connected clients sharing one options factory."""
+
+    def __init__(
+        self,
+        name: str,
+        options_factory: Callable[[], ClaudeAgentOptions],
+        client_factory: Callable[[ClaudeAgentOptions], Any] = ClaudeSDKClient,
+    ) -> None:
+        self.name = name
+        self._options_factory = options_factory
+        self._client_factory = client_factory
+        self._requests: asyncio.Queue[_Request] | None = None
+        self._workers: list[asyncio.Task[None]] = []
+        self._max_uses = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self, size: int, max_uses: int) -> None:
+        """Start `size` workers; each connects its client in the background."""
+        if size <= 0 or self.started:
+            return
+        self._requests = asyncio.Queue()
+        self._max_uses = max_uses
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"{self.name}-client-{i}")
+            for i in range(size)
+        ]
+        logger.info(
+            "Agent client pool '%s' started: %d clients, recycled every %d uses",
+            self.name,
+            size,
+            max_uses,
+        )
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._requests = None
+
+    async def run(self, prompt: str) -> AsyncIterator[Any]:
+        """Run `prompt` on an idle client, yielding messages up to the result.
+
+        Errors raised by the client (connect, query, transport) are re-raised
+        here, so callers handle them exactly as they would from `query()`.
+        """
+        if self._requests is None:
+            raise RuntimeError(f"Agent client pool '{self.name}' is not started")
+        request = _Request(prompt)
+        self._requests.put_nowait(request)
+        try:
+            while True:
+                item = await request.messages.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            request.gone.set()
+
+    async def _work(self) -> None:
+        assert self._requests is not None
+        bind_retrieval_slot()
+        client: Any | None = None
+        uses = 0
+        try:
+            while True:
+                if client is None:
+                    client = await self._try_connect()
+                    uses = 0
+                request = await self._requests.get()
+                if request.abandoned:
+                    continue
+                if client is not None and not await self._healthy(client):
+                    await self._close(client)
+                    client = None
+                if client is None:
+                    try:
+                        client = await self._connect()
+                        uses = 0
+                    except Exception as e:  # noqa: BLE001
+                        # Not swallowed: the requester re-raises it.
+                        request.fail(e)
+                        continue
+
+                with retrieval_run():
+                    ok = await self._serve(client, request)
+                uses += 1
+                if ok and uses < self._max_uses:
+                    ok = await self._reset(client)
+                if not ok or uses >= self._max_uses:
+                    logger.info(
+                        "Recycling '%s' client after %d uses (%s)",
+                        self.name,
+                        uses,
+                        "limit" if ok else "error",
+                    )
+                    await self._close(client)
+                    client = None
+        finally:
+            if client is not None:
+                await self._close(client)
+
+    async def _connect(self) -> Any:
+        client = self._client_factory(self._options_factory())
+        try:
+            await client.connect()
+        except BaseException:
+            await self._close(client)
+            raise
+        return client
+
+    async def _try_connect(self) -> Any | None:
+        """Connect ahead of demand; a failure is retried on the next request."""
+        try:
+            return await self._connect()
+        except Exception:
+            logger.warning(
+                "Could not pre-connect '%s' client", self.name, exc_info=True
+            )
+            return None
+
+    async def _healthy(self, client: Any) -> bool:
+        """The CLI answers a control request and every MCP server is connected."""
+        try:
+            status = await asyncio.wait_for(
+                client.get_mcp_status(), HEALTH_CHECK_TIMEOUT_SECONDS
+            )
+        except Exception:  # noqa: BLE001
+            # The SDK raises bare Exception for control request errors and
+            # timeouts; whatever the cause, the client is replaced.
+            logger.warning("'%s' client failed its health check", self.name)
+            return False
+        down = [
+            server["name"]
+            for server in status.get("mcpServers", [])
+            if server.get("status") != "connected"
+        ]
+        if down:
+            logger.warning("'%s' client MCP servers not connected: %s", self.name, down)
+        return not down
+
+    async def _serve(self, client: Any, request: _Request) -> bool:
+        """Stream one response to the requester; False if the client must go.
+
+        Streaming runs in a child task so an abandoned request stops it
+        without waiting for the CLI's next message. The requester is told the
+        outcome only from this task, so by the time it sees the end of the
+        stream the worker has already moved on to resetting or closing.
+        """
+        stream = asyncio.create_task(self._stream(client, request))
+        gone = asyncio.create_task(request.gone.wait())
+        try:
+            await asyncio.wait({stream, gone}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            gone.cancel()
+            if not stream.done():
+                stream.cancel()
+            await asyncio.gather(stream, gone, return_exceptions=True)
+        if stream.cancelled():
+            return False
+        error = stream.exception()
+        if error is not None:
+            request.fail(error)
+            return False
+        request.messages.put_nowait(_DONE)
+        return stream.result()
+
+    async def _stream(self, client: Any, request: _Request) -> bool:
+        """Forward messages up to the result; False on an error result."""
+        await client.query(request.prompt)
+        async for message in client.receive_response():
+            request.messages.put_nowait(message)
+            if isinstance(message, ResultMessage) and message.is_error:
+                return False
+        return True
+
+    async def _reset(self, client: Any) -> bool:
+        """Clear the conversation so the next request starts empty."""
+        try:
+            async with asyncio.timeout(RESET_TIMEOUT_SECONDS):
+                await client.query("/clear")
+                async for _ in client.receive_response():
+                    pass
+        except Exception:
+            logger.warning("'%s' client failed to reset", self.name, exc_info=True)
+            return False
+        return True
+
+    async def _close(self, client: Any) -> None:
+        try:
+            await client.disconnect()
+        except Exception:
+            logger.debug("Error disconnecting '%s' client", self.name, exc_info=True)
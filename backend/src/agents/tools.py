@@ -6,7 +6,8 @@ import logging
 
 from claude_agent_sdk import tool
 
-from src.services.rag_service import async_search, format_as_xml_sources
+from src.services.rag_service import async_search
+from src.services.retrieval_context import current_retrieval, search_in_run
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +16,9 @@ logger = logging.getLogger(__name__)
     "search_clinical_guidelines",
     "Search clinical guidelines, drug interactions, and protocols. "
     "Returns relevant passages with source citations. Use this tool to find "
-    "evidence-based recommendations for patient conditions and medications.",
+    "evidence-based recommendations for patient conditions and medications. "
+    "Source ids are stable for the whole task; a passage you already received "
+    "comes back as an empty previously_returned source with the same id.",
     {
         "query": str,
         "specialty": str,
@@ -36,7 +39,9 @@ async def search_clinical_guidelines(args: dict) -> dict:
     )
 
     try:
-        results = await async_search(
+        results, formatted = await search_in_run(
+            async_search,
+            current_retrieval(),
             query=query_text,
             specialty=specialty if specialty else None,
             limit=max_results,
@@ -59,6 +64,5 @@ async def search_clinical_guidelines(args: dict) -> dict:
             r.chunk.text[:100] + ("..." if len(r.chunk.text) > 100 else ""),
         )
 
-    formatted = format_as_xml_sources(results)
     logger.debug("Tool XML response (%d chars):\n%s", len(formatted), formatted)
     return {"content": [{"type": "text", "text": formatted}]}
@@ -0,0 +1,109 @@
+"""Where the chat agent's SDK session transcripts live, and how big they are.
+
+The CLI writes one JSONL transcript per session under
+`<config dir>/projects/<project key>/<session id>.jsonl`, where the config
+dir is CLAUDE_CONFIG_DIR (default ~/.claude) and the project key is derived
+from the working directory — AGENT_HOME for chat turns. `resume` reloads the
+whole file, so its size is what a long conversation costs on every turn.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.agents.chat_agent import AGENT_HOME
+
+# Usage lives on the last assistant entry; scanning this much of the file's
+# tail finds it without reading a long transcript whole.
+_TAIL_BYTES = 256 * 1024
+
+# The CLI's project directory naming (not exposed by every supported SDK
+# release): non-alphanumerics become "-", and names past the length cap are
+# cut and suffixed with a hash of the full path.
+_UNSAFE_RE = re.compile(r"[^a-zA-Z0-9]")
+_MAX_KEY_LENGTH = 200
+
+
+@dataclass(frozen=True)
+class TranscriptStats:
+    size_bytes: int
+    # Input tokens of the session's latest model call (fresh + cached): the
+    # context a resumed turn starts from. None when no usage was found.
+    context_tokens: int | None
+
+
+def _path_hash(name: str) -> str:
+    """The CLI's 32-bit string hash (JS semantics), in base 36."""
+    h = 0
+    for char in name:
+        h = ((h << 5) - h + ord(char)) & 0xFFFFFFFF
+    if h >= 0x80000000:
+        h -= 0x100000000
+    h = abs(h)
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while h:
+        h, digit = divmod(h, 36)
+        out = digits[digit] + out
+    return out or "0"
+
+
+def project_key(directory: str | Path) -> str:
+    """Name of the CLI's project directory for sessions run in `directory`."""
+    name = unicodedata.normalize("NFC", os.path.realpath(directory))
+    key = _UNSAFE_RE.sub("-", name)
+    if len(key) <= _MAX_KEY_LENGTH:
+        return key
+    return f"{key[:_MAX_KEY_LENGTH]}-{_path_hash(name)}"
+
+
+def transcript_dir() -> Path:
+    config_dir = os.environ.get("CLAUDE_CONFIG_DIR") or Path.home() / ".claude"
+    return Path(config_dir) / "projects" / project_key(AGENT_HOME)
+
+
+def transcript_path(session_id: str) -> Path:
+    return transcript_dir() / f"{session_id}.jsonl"
+
+
+def _last_context_tokens(tail: bytes) -> int | None:
+    for line in reversed(tail.splitlines()):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # the first line of the tail is usually cut
+        if not isinstance(entry, dict) or entry.get("type") != "assistant":
+            continue
+        message = entry.get("message")
+        usage = message.get("usage") if isinstance(message, dict) else None
+        if isinstance(usage, dict):
+            return sum(
+                usage.get(key) or 0
+                for key in (
+                    "input_tokens",
+                    "cache_read_input_tokens",
+                    "cache_creation_input_tokens",
+                )
+            )
+    return None
+
+
+def transcript_stats(session_id: str) -> TranscriptStats | None:
+    """Size and context tokens of a session's transcript; None if absent.
+
+    Blocking file IO: call through asyncio.to_thread from the event loop.
+    """
+    path = transcript_path(session_id)
+    try:
+        with path.open("rb") as transcript:
+            size = transcript.seek(0, os.SEEK_END)
+            transcript.seek(max(0, size - _TAIL_BYTES))
+            tail = transcript.read()
+    except FileNotFoundError:
+        return None
+    return TranscriptStats(size_bytes=size, context_tokens=_last_context_tokens(tail))
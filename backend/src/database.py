@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+from typing import Annotated
+
+from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from src.config import settings
@@ -14,3 +17,7 @@ async def get_session() -> AsyncSession:
     """Dependency for FastAPI routes to get a database session."""
     async with async_session() as session:
         yield session
+
+
+# Route parameter for a request-scoped session.
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
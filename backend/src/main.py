@@ -10,11 +10,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from rich.logging import RichHandler
 
+from src.agents.briefing_agent import start_client_pools, stop_client_pools
 from src.config import settings
-from src.database import engine
+from src.database import async_session, engine
+from src.routers.briefing_batches import router as briefing_batches_router
 from src.routers.briefings import router as briefings_router
 from src.routers.chat import router as chat_router
 from src.routers.patients import router as patients_router
+from src.services.briefing_jobs import briefing_pool
+from src.services.chat_broadcast import chat_broadcaster
+from src.services.trace_store import trace_archiver
+from src.services.transcript_gc import transcript_gc
 
 logging.basicConfig(
     level=logging.INFO,
@@ -50,7 +56,34 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
             "or the proxy will receive a model it doesn't know.",
             settings.ai_model,
         )
+    await briefing_pool.start(
+        async_session,
+        concurrency=settings.briefing_worker_concurrency,
+        max_queued=settings.briefing_max_queued_jobs,
+        lease_seconds=settings.briefing_job_lease_seconds,
+    )
+    await start_client_pools()
+    await chat_broadcaster.start(engine, settings.chat_broadcast_backend)
+    if settings.chat_trace_archive_days:
+        trace_archiver.start(
+            async_session,
+            older_than_days=settings.chat_trace_archive_days,
+            interval=settings.chat_trace_archive_interval_seconds,
+            batch=settings.chat_trace_archive_batch,
+        )
+    if settings.chat_transcript_gc_interval_seconds:
+        transcript_gc.start(
+            async_session,
+            interval=settings.chat_transcript_gc_interval_seconds,
+            min_age=settings.chat_transcript_gc_min_age_seconds,
+            quota_bytes=settings.chat_transcript_quota_bytes,
+        )
     yield
+    await transcript_gc.stop()
+    await trace_archiver.stop()
+    await chat_broadcaster.stop()
+    await briefing_pool.stop()
+    await stop_client_pools()
     await engine.dispose()
 
 
@@ -71,6 +104,7 @@ app.add_middleware(
 
 app.include_router(patients_router)
 app.include_router(briefings_router)
+app.include_router(briefing_batches_router)
 app.include_router(chat_router)
 
 
@@ -4,7 +4,16 @@ from __future__ import annotations
 
 import datetime
 
-from sqlalchemy import JSON, ForeignKey, String, Text, UniqueConstraint, func
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    ForeignKey,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -64,7 +73,64 @@ class Briefing(Base):
         ForeignKey("patients.id", ondelete="CASCADE"), index=True
     )
     content: Mapped[dict] = mapped_column(JSON)
+    # Hash of everything the briefing was generated from (patient record,
+    # model, prompt version, guideline collection version). A new request with
+    # the same fingerprint reuses this row instead of re-running the agent.
+    fingerprint: Mapped[str | None] = mapped_column(
+        String(64), nullable=True, index=True
+    )
+    # SDK session holding the follow-up conversation about this briefing, as
+    # Conversation.session_id does for chat: each follow-up resumes it and
+    # sends only the new question. NULL until the first follow-up completes.
+    followup_session_id: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=func.now())
+
+
+class BriefingBatch(Base):
+    """A group of briefing jobs submitted together (e.g. a day's clinic)."""
+
+    __tablename__ = "briefing_batches"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=func.now())
+
+
+class BriefingJob(Base):
+    """A queued/running/finished briefing generation (async job API).
+
+    Persisted so job state survives a restart: on startup the worker pool
+    re-queues anything still "queued", and "running" jobs whose worker has
+    stopped renewing its lease (heartbeat_at).
+    """
+
+    __tablename__ = "briefing_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    patient_id: Mapped[int] = mapped_column(
+        ForeignKey("patients.id", ondelete="CASCADE"), index=True
+    )
+    # "queued" | "running" | "succeeded" | "failed"
+    status: Mapped[str] = mapped_column(String(16), default="queued", index=True)
+    priority: Mapped[int] = mapped_column(default=5)  # 1 = most urgent
+    force: Mapped[bool] = mapped_column(Boolean, default=False)
+    batch_id: Mapped[int | None] = mapped_column(
+        ForeignKey("briefing_batches.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    # Visit the briefing is for (batch jobs built from the schedule).
+    appointment_at: Mapped[datetime.datetime | None] = mapped_column(nullable=True)
+    # True when a fingerprint-matched stored briefing was reused.
+    cached: Mapped[bool] = mapped_column(Boolean, default=False)
+    briefing_id: Mapped[int | None] = mapped_column(
+        ForeignKey("briefings.id", ondelete="SET NULL"), nullable=True
+    )
+    error_code: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=func.now())
+    started_at: Mapped[datetime.datetime | None] = mapped_column(nullable=True)
+    # Lease of the worker process running the job, renewed while it runs.
+    worker_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    heartbeat_at: Mapped[datetime.datetime | None] = mapped_column(nullable=True)
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(nullable=True)
 
 
 class BriefingMessage(Base):
@@ -120,5 +186,27 @@ class ConversationMessage(Base):
     # Ordered agent trace for assistant turns: thinking blocks, tool calls
     # (with inputs + result previews), and text — exactly as they interleaved
     # during the turn, so the UI can replay the agent's work after a refresh.
+    # Only messages from before ConversationTrace keep it inline here, until
+    # the retention job moves it over; new traces go to the side table.
     trace: Mapped[list | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=func.now())
+
+
+class ConversationTrace(Base):
+    """The agent trace of one assistant message, compressed, off the hot table.
+
+    Kept out of conversation_messages so history queries (and the pages of
+    that table) don't carry trace JSON. `codec` says how `data` was
+    compressed; see services/trace_store.py.
+    """
+
+    __tablename__ = "conversation_traces"
+
+    message_id: Mapped[int] = mapped_column(
+        ForeignKey("conversation_messages.id", ondelete="CASCADE"), primary_key=True
+    )
+    codec: Mapped[str] = mapped_column(String(8))  # "zstd" | "zlib"
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=func.now())
+    # Set when the retention job recompressed the blob at the archive level.
+    archived_at: Mapped[datetime.datetime | None] = mapped_column(nullable=True)
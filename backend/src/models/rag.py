@@ -1,4 +1,4 @@
-"""Pydantic models for RAG: document chunks and retrieval results."""
+"""Pydantic models for RAG: document chunks, retrieval results, embedding specs."""
 
 from __future__ import annotations
 
@@ -7,6 +7,22 @@ from datetime import date
 from pydantic import BaseModel
 
 
+class EmbeddingSpec(BaseModel, frozen=True):
+    """Embedding model + output dimensionality a collection was built with."""
+
+    model: str
+    dimensions: int
+
+
+class ChunkReference(BaseModel):
+    """Another document location holding a near-duplicate of a chunk."""
+
+    document_id: str
+    document_title: str
+    section_path: str
+    chunk_index: int
+
+
 class DocumentChunk(BaseModel):
     """A chunk of a clinical guideline document with metadata for vector storage."""
 
@@ -21,6 +37,9 @@ class DocumentChunk(BaseModel):
     publication_date: date
     chunk_index: int
     total_chunks: int
+    # Near-duplicates of this passage in other documents, collapsed into this
+    # point at ingest (see src/services/dedup.py).
+    references: list[ChunkReference] = []
 
 
 class RetrievalResult(BaseModel):
@@ -29,3 +48,13 @@ class RetrievalResult(BaseModel):
     chunk: DocumentChunk
     score: float
     source_id: int
+
+
+class IndexResult(BaseModel):
+    """Outcome of (re)indexing one document."""
+
+    upserted: int
+    collapsed: int
+    # Documents whose collapsed chunks lost their canonical point and must be
+    # re-ingested to be searchable again.
+    orphaned: list[str]
@@ -5,7 +5,7 @@ from __future__ import annotations
 import datetime
 from typing import Literal
 
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 
 # --- Patient API schemas ---
@@ -35,7 +35,8 @@ class Flag(BaseModel):
     severity: Literal["critical", "warning", "info"]
     title: str
     description: str
-    source: Literal["ai"]
+    # "ai" for agent findings, "rules" for the deterministic pre-analysis.
+    source: Literal["ai", "rules"]
     suggested_action: str | None = None
 
 
@@ -65,6 +66,109 @@ class BriefingResponse(PatientBriefing):
     # briefing was not stored (e.g. endpoints that don't persist).
     id: int | None = None
     generated_at: datetime.datetime
+    # True for the rules-only fallback served when the agent missed the
+    # latency SLO. Stored without a fingerprint, so it is never a cache hit.
+    degraded: bool = False
+
+
+# --- Deterministic pre-analysis (no LLM) ---
+
+
+class LabTrend(BaseModel):
+    name: str
+    unit: str
+    first_date: datetime.date
+    first_value: float
+    last_date: datetime.date
+    last_value: float
+    direction: Literal["rising", "falling", "stable"]
+    # Relative to the reference range: moving away from it, back toward it,
+    # or neither.
+    status: Literal["worsening", "improving", "stable"]
+
+
+class PreAnalysis(BaseModel):
+    flags: list[Flag]
+    trends: list[LabTrend]
+
+
+class FastBriefingResponse(BriefingResponse):
+    """A briefing built only from the pre-analysis rules, instantly."""
+
+    trends: list[LabTrend]
+
+
+# --- Async briefing jobs ---
+
+
+class BriefingJobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    patient_id: int
+    status: Literal["queued", "running", "succeeded", "failed"]
+    priority: int
+    briefing_id: int | None = None
+    error_code: str | None = None
+    error_message: str | None = None
+    created_at: datetime.datetime
+    started_at: datetime.datetime | None = None
+    finished_at: datetime.datetime | None = None
+    # Filled in once the job has succeeded.
+    briefing: BriefingResponse | None = None
+
+
+class BriefingBatchRequest(BaseModel):
+    """Either explicit patient ids, or every patient with a visit in a date range."""
+
+    patient_ids: list[int] | None = None
+    date_from: datetime.date | None = None
+    date_to: datetime.date | None = None
+    force: bool = False
+    # Below the interactive default (5), so a morning batch doesn't starve
+    # briefings a clinician is waiting on.
+    priority: int = Field(7, ge=1, le=10)
+
+    @model_validator(mode="after")
+    def one_selection_mode(self) -> BriefingBatchRequest:
+        if (self.patient_ids is None) == (self.date_from is None):
+            raise ValueError("provide either patient_ids or date_from (not both)")
+        if self.patient_ids is not None and not self.patient_ids:
+            raise ValueError("patient_ids must not be empty")
+        if self.date_to is not None and self.date_from is None:
+            raise ValueError("date_to requires date_from")
+        if self.date_from and self.date_to and self.date_to < self.date_from:
+            raise ValueError("date_to must not be before date_from")
+        return self
+
+
+class BriefingBatchItem(BaseModel):
+    job_id: int
+    patient_id: int
+    patient_name: str
+    appointment_at: datetime.datetime | None
+    status: Literal["queued", "running", "succeeded", "failed"]
+    cached: bool
+    briefing_id: int | None
+    error_code: str | None
+
+
+class BriefingBatchProgress(BaseModel):
+    total: int
+    queued: int
+    running: int
+    succeeded: int
+    failed: int
+    # Succeeded by reusing a still-valid stored briefing (no agent run).
+    cached: int
+    done: bool
+
+
+class BriefingBatchResponse(BaseModel):
+    id: int
+    created_at: datetime.datetime
+    progress: BriefingBatchProgress
+    items: list[BriefingBatchItem]
 
 
 # --- Follow-up chat (conversational) ---
@@ -112,22 +216,36 @@ class ChatRequest(BaseModel):
 class ChatMessageOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
+    id: int
     role: str
     content: str
     # Agent trace for assistant turns: ordered thinking / tool_use / text
-    # parts, exactly as they streamed. None for user messages.
+    # parts, exactly as they streamed. Only included on request
+    # (include_traces); otherwise has_trace says whether
+    # GET .../chat/messages/{id}/trace has one to load.
     trace: list[dict] | None = None
+    has_trace: bool = False
     created_at: datetime.datetime
 
 
 class ChatHistoryResponse(BaseModel):
-    """Everything the UI needs to rehydrate a patient's chat after a refresh."""
+    """Everything the UI needs to rehydrate a patient's chat after a refresh.
+
+    One page of messages, oldest first. `next_cursor`, when set, is the
+    `before` value that fetches the page of older messages.
+    """
 
     conversation_id: int | None
     messages: list[ChatMessageOut]
+    next_cursor: int | None = None
     latest_briefing: BriefingResponse | None
 
 
+class ChatTraceResponse(BaseModel):
+    message_id: int
+    trace: list[dict] | None
+
+
 # --- Error schema ---
 
 
@@ -0,0 +1,67 @@
+"""Bulk briefing endpoints: pre-generate briefings for a clinic schedule."""
+
+from __future__ import annotations
+
+import logging
+
+from fastapi import APIRouter, HTTPException, Response
+
+from src.database import SessionDep
+from src.models.orm import BriefingBatch
+from src.models.schemas import (
+    BriefingBatchRequest,
+    BriefingBatchResponse,
+    ErrorDetail,
+)
+from src.services.briefing_batches import (
+    UnknownPatientsError,
+    batch_report,
+    create_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1/briefing-batches", tags=["briefings"])
+
+
+@router.post("", response_model=BriefingBatchResponse, status_code=202)
+async def create_briefing_batch(
+    body: BriefingBatchRequest,
+    response: Response,
+    session: SessionDep,
+) -> BriefingBatchResponse:
+    """Queue briefings for a list of patients or a date range of visits.
+
+    Returns immediately; follow progress via GET /api/v1/briefing-batches/{id}.
+    Patients with a still-valid stored briefing are marked cached, not rerun.
+    """
+    try:
+        batch = await create_batch(session, body)
+    except UnknownPatientsError as e:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="PATIENT_NOT_FOUND",
+                message=str(e),
+                details={"missing": e.missing},
+            ).model_dump(),
+        ) from e
+    response.headers["Location"] = f"/api/v1/briefing-batches/{batch.id}"
+    return await batch_report(session, batch)
+
+
+@router.get("/{batch_id}", response_model=BriefingBatchResponse)
+async def get_briefing_batch(
+    batch_id: int,
+    session: SessionDep,
+) -> BriefingBatchResponse:
+    batch = await session.get(BriefingBatch, batch_id)
+    if batch is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="BRIEFING_BATCH_NOT_FOUND",
+                message=f"Briefing batch {batch_id} not found",
+            ).model_dump(),
+        )
+    return await batch_report(session, batch)
@@ -2,27 +2,49 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from collections.abc import AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import settings
-from src.database import get_session
+from src.database import SessionDep
+from src.models.orm import Briefing, BriefingJob
 from src.models.schemas import (
     BriefingChatRequest,
     BriefingChatResponse,
+    BriefingJobResponse,
     BriefingResponse,
     ErrorDetail,
+    FastBriefingResponse,
 )
 from src.services.managed_briefing_service import (
     generate_managed_briefing,
     reset_managed_session,
 )
 from src.agents.briefing_agent import generate_briefing_via_http_mcp
-from src.services.briefing_chat_service import answer_followup, store_briefing
-from src.services.briefing_service import BriefingGenerationError, generate_briefing
+from src.services.briefing_jobs import (
+    TERMINAL_STATUSES,
+    BriefingQueueFullError,
+    briefing_pool,
+)
+from src.services.briefing_chat_service import (
+    answer_followup,
+    find_cached_briefing,
+    store_briefing,
+)
+from src.services.briefing_service import (
+    BriefingGenerationError,
+    briefing_fingerprint,
+    generate_briefing,
+)
+from src.services.briefing_stream import stream_briefing
+from src.services.chat_service import _sse_frame
 from src.services.patient_service import get_patient_by_id
+from src.services.pre_analysis import fast_briefing
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +54,17 @@ router = APIRouter(prefix="/api/v1/patients", tags=["briefings"])
 @router.post("/{patient_id}/briefing", response_model=BriefingResponse)
 async def create_briefing(
     patient_id: int,
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    session: SessionDep,
+    force: bool = False,
 ) -> BriefingResponse:
+    """Generate (or reuse) a briefing for the patient.
+
+    A stored briefing generated from identical inputs — same patient record,
+    model, prompt version and guideline collection — is returned as-is
+    without running the agent. `?force=true` always regenerates. The
+    X-Briefing-Cache header reports "hit" or "miss".
+    """
     patient = await get_patient_by_id(session, patient_id)
     if patient is None:
         raise HTTPException(
@@ -44,9 +75,23 @@ async def create_briefing(
             ).model_dump(),
         )
 
+    fingerprint = await briefing_fingerprint(patient)
+    if not force:
+        cached = await find_cached_briefing(session, patient_id, fingerprint)
+        if cached is not None:
+            logger.info("Briefing cache hit for patient %d (%d)", patient_id, cached.id)
+            response.headers["X-Briefing-Cache"] = "hit"
+            briefing = BriefingResponse.model_validate(cached.content)
+            briefing.id = cached.id
+            return briefing
+    response.headers["X-Briefing-Cache"] = "miss"
+
     logger.info("Generating briefing for patient %d", patient_id)
     try:
-        response = await generate_briefing(patient)
+        # Shares the worker pool's slots, so synchronous callers can't spawn
+        # more concurrent CLI subprocesses than the job API allows.
+        async with briefing_pool.limit():
+            briefing = await generate_briefing(patient)
     except BriefingGenerationError as e:
         logger.exception("Briefing generation failed for patient %d", patient_id)
         raise HTTPException(
@@ -58,11 +103,202 @@ async def create_briefing(
         )
     # Persist so follow-up chat (POST /{id}/briefing/{briefing_id}/chat) can
     # reference it without regenerating.
-    stored = await store_briefing(session, patient_id, response.model_dump(mode="json"))
-    response.id = stored.id
+    stored = await store_briefing(
+        session, patient_id, briefing.model_dump(mode="json"), fingerprint
+    )
+    briefing.id = stored.id
+    return briefing
+
+
+@router.get("/{patient_id}/briefing/fast", response_model=FastBriefingResponse)
+async def get_fast_briefing(
+    patient_id: int,
+    session: SessionDep,
+) -> FastBriefingResponse:
+    """An instant briefing from the deterministic pre-analysis only.
+
+    No agent, retrieval or storage: lab flags with severity bands, lab
+    trends, screening gaps and medication checks, plus a templated summary.
+    """
+    patient = await get_patient_by_id(session, patient_id)
+    if patient is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="PATIENT_NOT_FOUND",
+                message=f"Patient with ID {patient_id} not found",
+            ).model_dump(),
+        )
+    return fast_briefing(patient)
+
+
+@router.post("/{patient_id}/briefing/stream")
+async def create_briefing_stream(
+    patient_id: int,
+    session: SessionDep,
+    force: bool = False,
+) -> StreamingResponse:
+    """Generate (or reuse) a briefing, streaming progress as Server-Sent Events.
+
+    Event vocabulary: pre_analysis, tool_use, sources, flag, summary,
+    suggested_action, briefing, done, error. `pre_analysis` (rule flags and
+    lab trends) comes first, before the agent starts. `flag` /
+    `suggested_action` carry an `index` into the final lists and arrive as
+    soon as each item validates; the closing `briefing` event is the stored
+    briefing (agent flags followed by the rule flags) and supersedes them. A
+    cache hit (same rules as POST .../briefing) streams just `briefing` and
+    `done`.
+    """
+    patient = await get_patient_by_id(session, patient_id)
+    if patient is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="PATIENT_NOT_FOUND",
+                message=f"Patient with ID {patient_id} not found",
+            ).model_dump(),
+        )
+    return StreamingResponse(
+        stream_briefing(session, patient, force),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --- Async job API ---
+
+# How often an idle job event stream re-reads the job (and sends a keepalive).
+_JOB_EVENTS_HEARTBEAT_SECONDS = 15.0
+
+
+async def _job_response(session: AsyncSession, job: BriefingJob) -> BriefingJobResponse:
+    response = BriefingJobResponse.model_validate(job)
+    if job.briefing_id is not None:
+        stored = await session.get(Briefing, job.briefing_id)
+        if stored is not None:
+            response.briefing = BriefingResponse.model_validate(stored.content)
+            response.briefing.id = stored.id
     return response
 
 
+async def _require_job(
+    session: AsyncSession, patient_id: int, job_id: int
+) -> BriefingJob:
+    job = await session.get(BriefingJob, job_id)
+    if job is None or job.patient_id != patient_id:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="BRIEFING_JOB_NOT_FOUND",
+                message=f"Briefing job {job_id} for patient {patient_id} not found",
+            ).model_dump(),
+        )
+    return job
+
+
+@router.post(
+    "/{patient_id}/briefing/jobs",
+    response_model=BriefingJobResponse,
+    status_code=202,
+)
+async def create_briefing_job(
+    patient_id: int,
+    response: Response,
+    session: SessionDep,
+    force: bool = False,
+    priority: int = Query(5, ge=1, le=10),
+) -> BriefingJobResponse:
+    """Queue a briefing generation and return immediately (202 + job).
+
+    Follow it via GET .../briefing/jobs/{job_id} (poll) or
+    GET .../briefing/jobs/{job_id}/events (SSE). Priority 1 runs first.
+    """
+    patient = await get_patient_by_id(session, patient_id)
+    if patient is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="PATIENT_NOT_FOUND",
+                message=f"Patient with ID {patient_id} not found",
+            ).model_dump(),
+        )
+
+    job = BriefingJob(patient_id=patient_id, priority=priority, force=force)
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    try:
+        briefing_pool.submit(job.id, priority)
+    except BriefingQueueFullError as e:
+        job.status = "failed"
+        job.error_code = "BRIEFING_QUEUE_FULL"
+        job.error_message = str(e)
+        await session.commit()
+        raise HTTPException(
+            status_code=503,
+            detail=ErrorDetail(code="BRIEFING_QUEUE_FULL", message=str(e)).model_dump(),
+            headers={"Retry-After": "30"},
+        ) from e
+    logger.info("Queued briefing job %d for patient %d", job.id, patient_id)
+    response.headers["Location"] = (
+        f"/api/v1/patients/{patient_id}/briefing/jobs/{job.id}"
+    )
+    return BriefingJobResponse.model_validate(job)
+
+
+@router.get("/{patient_id}/briefing/jobs/{job_id}", response_model=BriefingJobResponse)
+async def get_briefing_job(
+    patient_id: int,
+    job_id: int,
+    session: SessionDep,
+) -> BriefingJobResponse:
+    job = await _require_job(session, patient_id, job_id)
+    return await _job_response(session, job)
+
+
+@router.get("/{patient_id}/briefing/jobs/{job_id}/events")
+async def stream_briefing_job(
+    patient_id: int,
+    job_id: int,
+    session: SessionDep,
+) -> StreamingResponse:
+    """SSE: a `status` event per state change, ending on succeeded/failed.
+
+    The final event carries the briefing (or the error). GET, so the browser
+    can use a plain EventSource.
+    """
+    await _require_job(session, patient_id, job_id)
+
+    async def events() -> AsyncIterator[bytes]:
+        last_status = None
+        while True:
+            changed = briefing_pool.change_event(job_id)
+            # Fresh session per read: the request session would keep serving
+            # its identity-map copy of the job.
+            async with briefing_pool.session() as read_session:
+                job = await read_session.get(BriefingJob, job_id)
+                if job is None:
+                    return
+                if job.status != last_status:
+                    last_status = job.status
+                    payload = await _job_response(read_session, job)
+                    yield _sse_frame("status", payload.model_dump(mode="json"))
+                if job.status in TERMINAL_STATUSES:
+                    return
+            try:
+                await asyncio.wait_for(
+                    changed.wait(), timeout=_JOB_EVENTS_HEARTBEAT_SECONDS
+                )
+            except TimeoutError:
+                yield b": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post(
     "/{patient_id}/briefing/{briefing_id}/chat",
     response_model=BriefingChatResponse,
@@ -71,7 +307,7 @@ async def chat_about_briefing(
     patient_id: int,
     briefing_id: int,
     body: BriefingChatRequest,
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> BriefingChatResponse:
     """Ask a follow-up question about a previously generated briefing.
 
@@ -105,7 +341,7 @@ async def chat_about_briefing(
 @router.post("/{patient_id}/briefing/external-mcp", response_model=BriefingResponse)
 async def create_external_mcp_briefing(
     patient_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> BriefingResponse:
     """Generate a briefing where the search tool is served by an external HTTP MCP server.
 
@@ -138,7 +374,7 @@ async def create_external_mcp_briefing(
 @router.post("/{patient_id}/briefing/managed", response_model=BriefingResponse)
 async def create_managed_briefing(
     patient_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> BriefingResponse:
     patient = await get_patient_by_id(session, patient_id)
     if patient is None:
@@ -188,7 +424,7 @@ async def create_managed_briefing(
 @router.delete("/{patient_id}/briefing/managed/session", status_code=204)
 async def delete_managed_briefing_session(
     patient_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> None:
     patient = await get_patient_by_id(session, patient_id)
     if patient is None:
@@ -11,22 +11,40 @@ from __future__ import annotations
 
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_session
+from src.config import settings
+from src.database import SessionDep
 from src.models.orm import Patient
-from src.models.schemas import ChatHistoryResponse, ChatRequest, ErrorDetail
+from src.models.schemas import (
+    ChatHistoryResponse,
+    ChatRequest,
+    ChatTraceResponse,
+    ErrorDetail,
+)
 from src.services.chat_service import (
+    chat_queue_full,
+    follow_chat_turn,
     get_history,
+    get_message_trace,
+    history_etag,
     reset_conversation,
     stream_chat_turn,
+    watch_chat,
 )
+from src.services.chat_turns import current_turn
 from src.services.patient_service import get_patient_by_id
 
 logger = logging.getLogger(__name__)
 
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Tell proxies (nginx & co.) not to buffer — SSE must flush live.
+    "X-Accel-Buffering": "no",
+}
+
 router = APIRouter(prefix="/api/v1/patients", tags=["chat"])
 
 
@@ -47,39 +65,149 @@ async def _require_patient(session: AsyncSession, patient_id: int) -> Patient:
 async def chat(
     patient_id: int,
     request: ChatRequest,
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> StreamingResponse:
     """Run one chat turn, streaming SSE events as the agent works.
 
-    Event vocabulary (the contract with the frontend): text, tool_use,
-    tool_result, briefing_published, done, error.
+    Event vocabulary (the contract with the frontend): text_delta and
+    thinking_delta (incremental), text and thinking (each complete block,
+    superseding its deltas), tool_use, tool_result, briefing_published, done,
+    error. Every frame carries an
+    `id:`; after a dropped connection, GET .../chat/stream with that id as
+    Last-Event-ID resumes the same turn instead of sending the message again.
+
+    While another turn for the patient runs, the stream first sends `queued`
+    events ({"position": n}, 1 = next) until this one starts. With
+    chat_queue_depth turns already waiting: 429 CHAT_QUEUE_FULL.
     """
     patient = await _require_patient(session, patient_id)
+    if chat_queue_full(patient_id):
+        raise HTTPException(
+            status_code=429,
+            detail=ErrorDetail(
+                code="CHAT_QUEUE_FULL",
+                message=f"Too many chat turns queued for patient {patient_id}",
+            ).model_dump(),
+            headers={"Retry-After": "30"},
+        )
     logger.info("Chat turn for patient %d", patient_id)
     return StreamingResponse(
         stream_chat_turn(session, patient, request.message),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            # Tell proxies (nginx & co.) not to buffer — SSE must flush live.
-            "X-Accel-Buffering": "no",
-        },
+        headers=_SSE_HEADERS,
+    )
+
+
+@router.get("/{patient_id}/chat/stream")
+async def resume_chat(
+    patient_id: int,
+    session: SessionDep,
+    last_event_id: str | None = Header(default=None),
+) -> StreamingResponse:
+    """Resume the patient's current chat turn after `Last-Event-ID`.
+
+    Same events as POST .../chat, plus `replay_gap` ({"missed": n}) when the
+    requested position has already left the replay buffer — the client
+    should then reload GET .../chat. 404 CHAT_TURN_NOT_FOUND when there is no
+    turn to resume (it finished and expired, or never started).
+    """
+    await _require_patient(session, patient_id)
+    turn = current_turn(patient_id)
+    if turn is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="CHAT_TURN_NOT_FOUND",
+                message=f"No chat turn to resume for patient {patient_id}",
+            ).model_dump(),
+        )
+    logger.info("Resuming chat turn %s after %s", turn.id, last_event_id)
+    return StreamingResponse(
+        follow_chat_turn(turn, last_event_id),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS,
+    )
+
+
+@router.get("/{patient_id}/chat/watch")
+async def watch_patient_chat(
+    patient_id: int,
+    session: SessionDep,
+) -> StreamingResponse:
+    """Watch the patient's chat turns live, whoever sends the messages.
+
+    For other clinicians with the patient open: instead of polling GET
+    .../chat, they receive every turn's events as the sender does, each
+    turn opened by `turn_started` ({"message": ...}). A turn already running
+    is caught up first. `replay_gap` means events were skipped — reload
+    GET .../chat after the turn's `done`. The stream stays open between turns.
+    """
+    await _require_patient(session, patient_id)
+    logger.info("Watching chat for patient %d", patient_id)
+    return StreamingResponse(
+        watch_chat(patient_id),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS,
     )
 
 
 @router.get("/{patient_id}/chat", response_model=ChatHistoryResponse)
 async def chat_history(
     patient_id: int,
-    session: AsyncSession = Depends(get_session),
-) -> ChatHistoryResponse:
+    response: Response,
+    session: SessionDep,
+    before: int | None = Query(None, ge=1),
+    limit: int | None = Query(None, ge=1, le=200),
+    include_traces: bool = False,
+    if_none_match: str | None = Header(default=None),
+) -> ChatHistoryResponse | Response:
+    """One page of history, newest messages first by page (see get_history).
+
+    Sends an ETag; a matching If-None-Match is answered 304 without loading
+    any messages.
+    """
+    await _require_patient(session, patient_id)
+    limit = limit or settings.chat_history_page_size
+    etag = await history_etag(session, patient_id, before, limit, include_traces)
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return await get_history(session, patient_id, before, limit, include_traces)
+
+
+@router.get(
+    "/{patient_id}/chat/messages/{message_id}/trace",
+    response_model=ChatTraceResponse,
+)
+async def chat_message_trace(
+    patient_id: int,
+    message_id: int,
+    response: Response,
+    session: SessionDep,
+) -> ChatTraceResponse:
+    """The agent trace of one assistant message, loaded on demand."""
     await _require_patient(session, patient_id)
-    return await get_history(session, patient_id)
+    trace = await get_message_trace(session, patient_id, message_id)
+    if trace is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorDetail(
+                code="MESSAGE_NOT_FOUND",
+                message=f"Message {message_id} not found for patient {patient_id}",
+            ).model_dump(),
+        )
+    # A stored message never changes, so neither does its trace.
+    response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    return trace
 
 
 @router.delete("/{patient_id}/chat", status_code=204)
 async def reset_chat(
     patient_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> None:
     """Start over: drop the conversation so the next turn opens a new session."""
     await _require_patient(session, patient_id)
@@ -2,10 +2,9 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException
 
-from src.database import get_session
+from src.database import SessionDep
 from src.models.schemas import ErrorDetail, PatientResponse
 from src.services.patient_service import get_all_patients, get_patient_by_id
 
@@ -14,7 +13,7 @@ router = APIRouter(prefix="/api/v1/patients", tags=["patients"])
 
 @router.get("", response_model=list[PatientResponse])
 async def list_patients(
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> list[PatientResponse]:
     patients = await get_all_patients(session)
     return [PatientResponse.model_validate(p) for p in patients]
@@ -23,7 +22,7 @@ async def list_patients(
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: SessionDep,
 ) -> PatientResponse:
     patient = await get_patient_by_id(session, patient_id)
     if patient is None:
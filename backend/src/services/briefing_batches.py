@@ -0,0 +1,188 @@
+"""Bulk pre-visit briefings for a clinic schedule.
+
+A batch is a set of BriefingJobs (see briefing_jobs.py) created together:
+either for explicit patient ids, or for every patient with a visit in a date
+range. Jobs are queued in appointment order at one priority, so the pool's
+FIFO-within-priority runs the earliest appointments first, with parallelism
+bounded by the pool's concurrency. Patients whose stored briefing still
+matches their fingerprint are recorded as cached successes up front and
+never reach the queue.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+from collections.abc import Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.orm import BriefingBatch, BriefingJob, Patient
+from src.models.schemas import (
+    BriefingBatchItem,
+    BriefingBatchProgress,
+    BriefingBatchRequest,
+    BriefingBatchResponse,
+)
+from src.services.briefing_chat_service import find_cached_briefing
+from src.services.briefing_jobs import BriefingQueueFullError, briefing_pool
+from src.services.briefing_service import briefing_fingerprint
+from src.services.patient_service import get_all_patients, get_patient_by_id
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownPatientsError(Exception):
+    """Raised when a batch names patient ids that don't exist."""
+
+    def __init__(self, missing: list[int]) -> None:
+        self.missing = missing
+        super().__init__(f"Unknown patient ids: {missing}")
+
+
+def visit_datetime(visit: dict) -> datetime.datetime:
+    """Appointment time of a visit record ("date", optional "time" HH:MM)."""
+    day = datetime.date.fromisoformat(visit["date"])
+    time = datetime.time.fromisoformat(visit.get("time") or "00:00")
+    return datetime.datetime.combine(day, time)
+
+
+def schedule_from_visits(
+    patients: Sequence[Patient],
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> list[tuple[datetime.datetime, Patient]]:
+    """(appointment, patient) for each patient's first visit in the range,
+    ordered by appointment time."""
+    schedule = []
+    for patient in patients:
+        times = [
+            visit_datetime(v)
+            for v in patient.visits
+            if date_from <= datetime.date.fromisoformat(v["date"]) <= date_to
+        ]
+        if times:
+            schedule.append((min(times), patient))
+    schedule.sort(key=lambda item: (item[0], item[1].id))
+    return schedule
+
+
+async def _select_patients(
+    session: AsyncSession, request: BriefingBatchRequest
+) -> list[tuple[datetime.datetime | None, Patient]]:
+    if request.patient_ids is None:
+        assert request.date_from is not None
+        return schedule_from_visits(
+            await get_all_patients(session),
+            request.date_from,
+            request.date_to or request.date_from,
+        )
+    # Explicit ids keep the caller's order (their schedule).
+    selected: list[tuple[datetime.datetime | None, Patient]] = []
+    missing = []
+    for patient_id in dict.fromkeys(request.patient_ids):
+        patient = await get_patient_by_id(session, patient_id)
+        if patient is None:
+            missing.append(patient_id)
+        else:
+            selected.append((None, patient))
+    if missing:
+        raise UnknownPatientsError(missing)
+    return selected
+
+
+async def create_batch(
+    session: AsyncSession, request: BriefingBatchRequest
+) -> BriefingBatch:
+    """Create the batch and its jobs; queue the ones that need generating."""
+    from src.services.rag_service import async_collection_version
+
+    selected = await _select_patients(session, request)
+    batch = BriefingBatch()
+    session.add(batch)
+    await session.flush()
+
+    collection_version = await async_collection_version()
+    to_queue: list[BriefingJob] = []
+    for appointment_at, patient in selected:
+        job = BriefingJob(
+            patient_id=patient.id,
+            priority=request.priority,
+            force=request.force,
+            batch_id=batch.id,
+            appointment_at=appointment_at,
+        )
+        if not request.force:
+            fingerprint = await briefing_fingerprint(patient, collection_version)
+            cached = await find_cached_briefing(session, patient.id, fingerprint)
+            if cached is not None:
+                job.status = "succeeded"
+                job.cached = True
+                job.briefing_id = cached.id
+                job.finished_at = datetime.datetime.now(datetime.UTC).replace(
+                    tzinfo=None
+                )
+        session.add(job)
+        if job.status != "succeeded":
+            to_queue.append(job)
+    await session.commit()
+
+    for position, job in enumerate(to_queue):
+        try:
+            briefing_pool.submit(job.id, job.priority)
+        except BriefingQueueFullError as e:
+            for rejected in to_queue[position:]:
+                rejected.status = "failed"
+                rejected.error_code = "BRIEFING_QUEUE_FULL"
+                rejected.error_message = str(e)
+            await session.commit()
+            break
+    logger.info(
+        "Briefing batch %d: %d patients, %d queued",
+        batch.id,
+        len(selected),
+        len(to_queue),
+    )
+    await session.refresh(batch)
+    return batch
+
+
+async def batch_report(
+    session: AsyncSession, batch: BriefingBatch
+) -> BriefingBatchResponse:
+    """Per-patient status plus aggregate progress for a batch."""
+    rows = (
+        await session.execute(
+            select(BriefingJob, Patient.name)
+            .join(Patient, Patient.id == BriefingJob.patient_id)
+            .where(BriefingJob.batch_id == batch.id)
+            .order_by(BriefingJob.id)
+        )
+    ).all()
+    items = [
+        BriefingBatchItem(
+            job_id=job.id,
+            patient_id=job.patient_id,
+            patient_name=name,
+            appointment_at=job.appointment_at,
+            status=job.status,
+            cached=job.cached,
+            briefing_id=job.briefing_id,
+            error_code=job.error_code,
+        )
+        for job, name in rows
+    ]
+    counts = {
+        status: sum(item.status == status for item in items)
+        for status in ("queued", "running", "succeeded", "failed")
+    }
+    progress = BriefingBatchProgress(
+        total=len(items),
+        cached=sum(item.cached for item in items),
+        done=counts["queued"] == counts["running"] == 0,
+        **counts,
+    )
+    return BriefingBatchResponse(
+        id=batch.id, created_at=batch.created_at, progress=progress, items=items
+    )
@@ -16,10 +16,20 @@ logger = logging.getLogger(__name__)
 
 
 async def store_briefing(
-    session: AsyncSession, patient_id: int, content: dict
+    session: AsyncSession,
+    patient_id: int,
+    content: dict,
+    fingerprint: str | None = None,
 ) -> Briefing:
-    """Persist a generated briefing so follow-up questions can reference it."""
-    briefing = Briefing(patient_id=patient_id, content=content)
+    """Persist a generated briefing so follow-up questions can reference it.
+
+    A degraded briefing (the rules-only SLO fallback) is stored without its
+    fingerprint, so the next request runs the agent again instead of hitting
+    the cache.
+    """
+    if content.get("degraded"):
+        fingerprint = None
+    briefing = Briefing(patient_id=patient_id, content=content, fingerprint=fingerprint)
     session.add(briefing)
     await session.commit()
     await session.refresh(briefing)
@@ -27,6 +37,18 @@ async def store_briefing(
     return briefing
 
 
+async def find_cached_briefing(
+    session: AsyncSession, patient_id: int, fingerprint: str
+) -> Briefing | None:
+    """Most recent stored briefing generated from identical inputs, if any."""
+    return await session.scalar(
+        select(Briefing)
+        .where(Briefing.patient_id == patient_id, Briefing.fingerprint == fingerprint)
+        .order_by(Briefing.id.desc())
+        .limit(1)
+    )
+
+
 async def answer_followup(
     session: AsyncSession,
     patient: Patient,
@@ -36,7 +58,8 @@ async def answer_followup(
     """Answer a clinician's follow-up about an existing briefing.
 
     Loads the stored briefing + prior Q&A, asks the agent (free-text, with the
-    RAG tool available), then persists the new question/answer pair.
+    RAG tool available) on the briefing's follow-up session, then persists the
+    new question/answer pair and the session to resume next time.
     """
     briefing = await session.get(Briefing, briefing_id)
     if briefing is None or briefing.patient_id != patient.id:
@@ -58,12 +81,17 @@ async def answer_followup(
     history = [(m.role, m.content) for m in prior_msgs]
 
     try:
-        answer = await answer_followup_question(
-            patient, briefing.content, history, question
+        answer, session_id = await answer_followup_question(
+            patient,
+            briefing.content,
+            history,
+            question,
+            session_id=briefing.followup_session_id,
         )
     except BriefingGenerationError:
         raise
 
+    briefing.followup_session_id = session_id
     session.add(BriefingMessage(briefing_id=briefing_id, role="user", content=question))
     session.add(
         BriefingMessage(briefing_id=briefing_id, role="assistant", content=answer)
@@ -0,0 +1,313 @@
+"""Asynchronous briefing jobs on a bounded worker pool.
+
+A briefing run holds a Claude CLI subprocess for up to a minute or more. The
+job API (POST .../briefing/jobs -> 202) persists a BriefingJob row and hands
+its id to this pool; a fixed number of workers drain a priority queue, so a
+burst of requests waits in line instead of spawning one subprocess each.
+The synchronous POST .../briefing endpoint shares the same slots via
+`limit()`.
+
+Clients follow a job by polling GET .../briefing/jobs/{id} or by streaming
+GET .../briefing/jobs/{id}/events (SSE); `change_event()` wakes the stream as
+soon as a job changes state instead of waiting for the next poll.
+
+Several processes may share the jobs table (multiple uvicorn workers, a
+rolling restart). A worker claims a job with a conditional "queued" ->
+"running" update, so a job queued in two processes runs once, and renews a
+lease (heartbeat_at) while it runs. Only running jobs whose lease has
+expired are re-queued; a job another live process is running is left alone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import itertools
+import logging
+import os
+import socket
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database import async_session
+from src.models.orm import BriefingJob
+from src.services.briefing_chat_service import find_cached_briefing, store_briefing
+from src.services.briefing_service import (
+    BriefingGenerationError,
+    briefing_fingerprint,
+    generate_briefing,
+)
+from src.services.patient_service import get_patient_by_id
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class BriefingQueueFullError(Exception):
+    """Raised when the job queue is at `briefing_max_queued_jobs`."""
+
+
+def _utcnow() -> datetime.datetime:
+    # Job timestamps are naive UTC columns.
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+class BriefingWorkerPool:
+    """Priority queue of briefing job ids drained by `concurrency` workers."""
+
+    def __init__(self) -> None:
+        self._queue: asyncio.PriorityQueue[tuple[int, int, int]] | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._workers: list[asyncio.Task[None]] = []
+        self._session_factory: async_sessionmaker[AsyncSession] | None = None
+        self._max_queued = 0
+        self._seq = itertools.count()
+        self._changed: dict[int, asyncio.Event] = {}
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lease_seconds = 60.0
+        self._heartbeat: asyncio.Task[None] | None = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    def session(self) -> AsyncSession:
+        """A new session from the pool's factory (the app's outside tests)."""
+        return (self._session_factory or async_session)()
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        concurrency: int,
+        max_queued: int,
+        lease_seconds: float = 60.0,
+    ) -> None:
+        """Start workers and re-queue jobs left unfinished by a previous run."""
+        self._session_factory = session_factory
+        self._queue = asyncio.PriorityQueue()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._max_queued = max_queued
+        self._lease_seconds = lease_seconds
+        recovered = await self._recover(include_queued=True)
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"briefing-worker-{i}")
+            for i in range(concurrency)
+        ]
+        self._heartbeat = asyncio.create_task(
+            self._renew_leases(), name="briefing-heartbeat"
+        )
+        logger.info(
+            "Briefing worker pool %s started: %d workers, %d recovered jobs",
+            self._worker_id,
+            concurrency,
+            recovered,
+        )
+
+    async def _recover(self, *, include_queued: bool) -> int:
+        """Re-queue running jobs whose lease expired (and, with
+        `include_queued`, jobs still queued from a previous run)."""
+        assert self._session_factory is not None and self._queue is not None
+        expired = _utcnow() - datetime.timedelta(seconds=self._lease_seconds)
+        orphaned = and_(
+            BriefingJob.status == "running",
+            or_(
+                BriefingJob.heartbeat_at.is_(None),
+                BriefingJob.heartbeat_at < expired,
+            ),
+        )
+        if include_queued:
+            orphaned = or_(BriefingJob.status == "queued", orphaned)
+        recovered = []
+        async with self._session_factory() as session:
+            pending = (
+                await session.execute(
+                    select(BriefingJob.id, BriefingJob.priority)
+                    .where(orphaned)
+                    .order_by(BriefingJob.priority, BriefingJob.id)
+                )
+            ).all()
+            for job_id, priority in pending:
+                # Conditional, so a job another process has just claimed
+                # again is not reset under it.
+                reset = await session.execute(
+                    update(BriefingJob)
+                    .where(BriefingJob.id == job_id, orphaned)
+                    .values(
+                        status="queued",
+                        started_at=None,
+                        worker_id=None,
+                        heartbeat_at=None,
+                    )
+                )
+                if reset.rowcount:
+                    recovered.append((priority, job_id))
+            await session.commit()
+        for priority, job_id in recovered:
+            self._queue.put_nowait((priority, next(self._seq), job_id))
+        return len(recovered)
+
+    async def _renew_leases(self) -> None:
+        """Renew this process's leases and pick up jobs whose owner died."""
+        assert self._session_factory is not None
+        while True:
+            await asyncio.sleep(self._lease_seconds / 3)
+            try:
+                async with self._session_factory() as session:
+                    await session.execute(
+                        update(BriefingJob)
+                        .where(
+                            BriefingJob.status == "running",
+                            BriefingJob.worker_id == self._worker_id,
+                        )
+                        .values(heartbeat_at=_utcnow())
+                    )
+                    await session.commit()
+                await self._recover(include_queued=False)
+            except Exception:
+                logger.exception("Renewing briefing job leases failed")
+
+    async def drain(self) -> None:
+        """Wait until every queued job has finished."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        tasks = [*self._workers, *([self._heartbeat] if self._heartbeat else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        self._queue = None
+        self._slots = None
+
+    def submit(self, job_id: int, priority: int) -> None:
+        """Queue a persisted job. Jobs stay "queued" in the DB until started."""
+        if self._queue is None:
+            logger.warning("Briefing pool not started; job %d stays queued", job_id)
+            return
+        if self._queue.qsize() >= self._max_queued:
+            raise BriefingQueueFullError(
+                f"{self._queue.qsize()} briefing jobs already queued"
+            )
+        self._queue.put_nowait((priority, next(self._seq), job_id))
+
+    @asynccontextmanager
+    async def limit(self) -> AsyncIterator[None]:
+        """Hold one generation slot (no-op when the pool is not running)."""
+        if self._slots is None:
+            yield
+            return
+        async with self._slots:
+            yield
+
+    @asynccontextmanager
+    async def spare(self) -> AsyncIterator[bool]:
+        """Hold a generation slot if one is free now, without waiting; yields
+        whether one was taken (always True when the pool is not running)."""
+        if self._slots is None:
+            yield True
+            return
+        if self._slots.locked():
+            yield False
+            return
+        async with self._slots:
+            yield True
+
+    def change_event(self, job_id: int) -> asyncio.Event:
+        """An event set the next time job `job_id` changes state.
+
+        Take it BEFORE reading the job, so a change between the read and the
+        wait is not missed.
+        """
+        return self._changed.setdefault(job_id, asyncio.Event())
+
+    def _notify(self, job_id: int) -> None:
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _work(self) -> None:
+        assert self._queue is not None
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                async with self.limit():
+                    await self._run(job_id)
+            except Exception:
+                logger.exception("Briefing job %d crashed the worker loop", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int) -> None:
+        assert self._session_factory is not None
+        async with self._session_factory() as session:
+            now = _utcnow()
+            claimed = await session.execute(
+                update(BriefingJob)
+                .where(BriefingJob.id == job_id, BriefingJob.status == "queued")
+                .values(
+                    status="running",
+                    started_at=now,
+                    worker_id=self._worker_id,
+                    heartbeat_at=now,
+                )
+            )
+            await session.commit()
+            if not claimed.rowcount:
+                # Finished, gone, or claimed by another process.
+                return
+            job = await session.get(BriefingJob, job_id)
+            assert job is not None
+            self._notify(job_id)
+            logger.info("Briefing job %d running (patient %d)", job_id, job.patient_id)
+
+            try:
+                job.briefing_id = await _produce_briefing(session, job)
+                job.status = "succeeded"
+            except BriefingGenerationError as e:
+                logger.warning("Briefing job %d failed: %s", job_id, e.code)
+                job.status = "failed"
+                job.error_code = e.code
+                job.error_message = e.message
+            except Exception as e:
+                logger.exception("Briefing job %d failed unexpectedly", job_id)
+                job.status = "failed"
+                job.error_code = "INTERNAL_ERROR"
+                job.error_message = str(e)
+            job.finished_at = _utcnow()
+            await session.commit()
+            self._notify(job_id)
+
+
+async def _produce_briefing(session: AsyncSession, job: BriefingJob) -> int:
+    """Generate (or reuse a fingerprint-matched) briefing; return its id."""
+    patient = await get_patient_by_id(session, job.patient_id)
+    if patient is None:
+        raise BriefingGenerationError(
+            code="PATIENT_NOT_FOUND",
+            message=f"Patient with ID {job.patient_id} not found",
+        )
+    fingerprint = await briefing_fingerprint(patient)
+    if not job.force:
+        cached = await find_cached_briefing(session, patient.id, fingerprint)
+        if cached is not None:
+            logger.info("Briefing job %d: cache hit (%d)", job.id, cached.id)
+            job.cached = True
+            return cached.id
+    briefing = await generate_briefing(patient)
+    stored = await store_briefing(
+        session, patient.id, briefing.model_dump(mode="json"), fingerprint
+    )
+    return stored.id
+
+
+briefing_pool = BriefingWorkerPool()
@@ -2,10 +2,16 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
+import hashlib
 import json
 import logging
 
+from collections.abc import Awaitable, Callable, Coroutine
+from contextlib import aclosing
+from typing import Any
+
 from claude_agent_sdk import (
     AssistantMessage,
     CLIConnectionError,
@@ -17,9 +23,17 @@ from claude_agent_sdk import (
     query,
 )
 
+from src.agents.briefing_events import BriefingEventSink
 from src.config import settings
 from src.models.orm import Patient
-from src.models.schemas import BriefingResponse, PatientBriefing
+from src.models.schemas import BriefingResponse, PatientBriefing, PreAnalysis
+from src.services.patient_context import patient_context
+from src.services.pre_analysis import (
+    RULES_VERSION,
+    analyze_patient,
+    fast_briefing,
+    format_for_prompt,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,15 +43,22 @@ You are a clinical decision support assistant preparing pre-consultation \
 briefings for physicians. Your role is to analyze a patient record and \
 produce a structured briefing that helps the doctor prepare for the visit.
 
-INPUT: You will receive a patient record in JSON format containing demographics, \
-conditions, medications, lab results (with reference ranges), allergies, and visits.
+INPUT: You will receive a compact patient record: demographics, conditions, \
+allergies, then pipe-separated tables of medications, labs (latest result per \
+analyte with its reference range and trend) and recent visits, followed by a \
+PRE-ANALYSIS section.
+
+PRE-ANALYSIS: Out-of-range labs, lab trends, screening gaps and medication checks \
+computed deterministically from the record. They are correct and are added to the \
+briefing automatically: do NOT repeat them as flags. Use them in the summary and \
+suggested actions, and flag only what the rules cannot see.
 
 OUTPUT: Produce a structured briefing with flags, summary, and suggested actions.
 
 FLAG GUIDELINES:
-- category "labs": Flag lab values outside reference ranges.
-- category "medications": Flag medication concerns (high doses, combinations, adherence).
-- category "screenings": Flag overdue preventive screenings based on age/gender/conditions.
+- category "labs": Only lab concerns the PRE-ANALYSIS does not already list.
+- category "medications": Medication concerns not already in the PRE-ANALYSIS.
+- category "screenings": Screening gaps not already in the PRE-ANALYSIS.
 - category "ai_insight": Flag clinical patterns you notice across the data.
 - severity "critical": Immediate clinical concern (e.g., dangerously abnormal lab, \
   dangerous drug interaction, acute risk).
@@ -104,8 +125,64 @@ def _serialize_patient(patient: Patient) -> str:
     return json.dumps(data, indent=2)
 
 
-async def generate_briefing(patient: Patient) -> BriefingResponse:
-    """Generate a patient briefing. Uses RAG agent if Qdrant is available, otherwise V1."""
+def prompt_version() -> str:
+    """Digest of the briefing system prompts, so prompt edits miss the cache."""
+    from src.agents.briefing_agent import SYSTEM_PROMPT
+
+    digest = hashlib.sha256(f"{SYSTEM_PROMPT}\0{V1_SYSTEM_PROMPT}".encode())
+    return digest.hexdigest()[:16]
+
+
+def briefing_prompt(patient: Patient, analysis: PreAnalysis) -> str:
+    """The agent input: the compiled record followed by the rules' findings."""
+    return f"{patient_context(patient)}\n\n{format_for_prompt(analysis)}"
+
+
+def with_rule_flags(
+    briefing: BriefingResponse, analysis: PreAnalysis
+) -> BriefingResponse:
+    """Append the pre-analysis flags after the agent's own.
+
+    Agent flags come first so their positions match the indexes announced
+    while streaming.
+    """
+    briefing.flags = briefing.flags + analysis.flags
+    return briefing
+
+
+async def briefing_fingerprint(
+    patient: Patient,
+    collection_version: str | None = None,
+    as_of: datetime.date | None = None,
+) -> str:
+    """Stable hash of every input that determines a briefing's content.
+
+    Pass `collection_version` when fingerprinting many patients at once to
+    look the guideline collection up only once. The analysis date is an
+    input too: screening-overdue flags and the patient's age depend on it.
+    """
+    from src.services.rag_service import async_collection_version
+
+    inputs = {
+        "patient": _serialize_patient(patient),
+        "as_of": (as_of or datetime.date.today()).isoformat(),
+        "model": settings.ai_model,
+        "prompt_version": prompt_version(),
+        "rules_version": RULES_VERSION,
+        "guidelines": collection_version or await async_collection_version(),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+async def generate_briefing(
+    patient: Patient, events: BriefingEventSink | None = None
+) -> BriefingResponse:
+    """Generate a patient briefing. Uses RAG agent if Qdrant is available, otherwise V1.
+
+    `events` receives the RAG agent's progress events; the single-turn V1
+    path has none and only produces the final briefing. Runs under the
+    latency SLO in `_hedged`.
+    """
     logger.info(
         "=== Briefing request: patient=%s conditions=%s ===",
         patient.name,
@@ -115,15 +192,118 @@ async def generate_briefing(patient: Patient) -> BriefingResponse:
         logger.info("Routing -> RAG agent (multi-turn, max_turns=4)")
         from src.agents.briefing_agent import generate_briefing as rag_generate
 
-        return await rag_generate(patient)
+        hedge = (
+            _pooled_v1_hedge if settings.briefing_hedge_path == "v1" else _fast_briefing
+        )
+        return await _hedged(patient, rag_generate(patient, events=events), hedge)
 
     logger.info("Routing -> V1 agent (single-turn, no tools)")
-    return await _generate_briefing_v1(patient)
+    hedge = _fast_briefing if settings.briefing_hedge_path == "fast" else None
+    return await _hedged(patient, _generate_briefing_v1(patient), hedge)
+
+
+async def _pooled_v1_hedge(patient: Patient) -> BriefingResponse:
+    """The V1 hedge on a briefing pool slot of its own, so hedging never
+    pushes model concurrency past the worker cap; skipped when none is free."""
+    from src.services.briefing_jobs import briefing_pool
+
+    async with briefing_pool.spare() as taken:
+        if not taken:
+            logger.info("Briefing hedge skipped: no free briefing slot")
+            raise BriefingGenerationError(
+                code="HEDGE_SKIPPED", message="No free briefing slot for the hedge"
+            )
+        return await _generate_briefing_v1(patient)
+
+
+async def _fast_briefing(patient: Patient) -> BriefingResponse:
+    return _degraded_briefing(patient)
+
+
+def _degraded_briefing(patient: Patient) -> BriefingResponse:
+    """The rules-only briefing, standing in for an agent that ran out of time."""
+    briefing = fast_briefing(patient)
+    briefing.degraded = True
+    return briefing
+
+
+async def _hedged(
+    patient: Patient,
+    primary: Coroutine[Any, Any, BriefingResponse],
+    hedge: Callable[[Patient], Awaitable[BriefingResponse]] | None,
+) -> BriefingResponse:
+    """Run `primary` under the briefing latency SLO.
+
+    After `briefing_hedge_seconds` — or as soon as the primary fails — the
+    hedge path starts alongside it and the first valid briefing wins. At
+    `briefing_deadline_seconds` nothing has won: every run is cancelled and
+    the rules-only fast briefing is returned. A rules-only result, from the
+    "fast" hedge or the deadline, is marked `degraded`. Paths that lose are cancelled
+    and awaited, which closes their query() and with it the CLI subprocess
+    (a pooled client is recycled). The V1 hedge runs only on a free briefing
+    pool slot (`_pooled_v1_hedge`).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    hedge_at = settings.briefing_hedge_seconds or None
+    deadline = settings.briefing_deadline_seconds or None
+    runs = {asyncio.create_task(primary): "primary"}
+    errors: dict[str, BriefingGenerationError] = {}
+
+    def start_hedge() -> None:
+        nonlocal hedge
+        if hedge is not None:
+            logger.info(
+                "Briefing hedge: starting %s path", settings.briefing_hedge_path
+            )
+            runs[asyncio.create_task(hedge(patient))] = "hedge"
+            hedge = None
+
+    try:
+        while runs:
+            timers = [t for t in (deadline, hedge and hedge_at) if t]
+            timeout = (
+                max(0.0, min(timers) - (loop.time() - started)) if timers else None
+            )
+            done, _ = await asyncio.wait(
+                runs, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for run in done:
+                label = runs.pop(run)
+                try:
+                    briefing = run.result()
+                except BriefingGenerationError as exc:
+                    logger.warning("Briefing %s path failed: %s", label, exc.code)
+                    errors[label] = exc
+                    continue
+                logger.info(
+                    "Briefing won by %s path in %.1fs",
+                    label,
+                    loop.time() - started,
+                )
+                return briefing
+            elapsed = loop.time() - started
+            if deadline and elapsed >= deadline:
+                logger.warning(
+                    "Briefing deadline (%.0fs) passed; returning rules-only briefing",
+                    deadline,
+                )
+                return _degraded_briefing(patient)
+            if errors or (hedge_at and elapsed >= hedge_at):
+                start_hedge()
+    finally:
+        for run in runs:
+            run.cancel()
+        await asyncio.gather(*runs, return_exceptions=True)
+    # The primary's failure is the meaningful one (a hedge may merely have
+    # been skipped).
+    raise errors.get("primary") or errors["hedge"]
 
 
 async def _generate_briefing_v1(patient: Patient) -> BriefingResponse:
     """V1 fallback: single-turn agent without tools."""
-    patient_json = _serialize_patient(patient)
+    analysis = analyze_patient(patient)
+    prompt = briefing_prompt(patient, analysis)
 
     options = ClaudeAgentOptions(
         system_prompt=V1_SYSTEM_PROMPT,
@@ -143,33 +323,39 @@ async def _generate_briefing_v1(patient: Patient) -> BriefingResponse:
     )
     result = None
     try:
-        async for message in query(prompt=patient_json, options=options):
-            if isinstance(message, AssistantMessage):
-                logger.info("V1 AssistantMessage received (model=%s)", message.model)
-            elif isinstance(message, ResultMessage):
-                logger.info(
-                    "V1 ResultMessage: num_turns=%d duration=%dms cost=$%.4f is_error=%s",
-                    message.num_turns,
-                    message.duration_ms,
-                    message.total_cost_usd or 0,
-                    message.is_error,
-                )
-                if not message.is_error and message.structured_output is not None:
-                    briefing = PatientBriefing.model_validate(message.structured_output)
-                    result = BriefingResponse(
-                        **briefing.model_dump(),
-                        generated_at=datetime.datetime.now(datetime.UTC),
-                    )
+        messages = query(prompt=prompt, options=options)
+        async with aclosing(messages):
+            async for message in messages:
+                if isinstance(message, AssistantMessage):
                     logger.info(
-                        "V1 briefing: %d flags, %d actions",
-                        len(result.flags),
-                        len(result.suggested_actions),
+                        "V1 AssistantMessage received (model=%s)", message.model
                     )
-                if message.is_error:
-                    raise BriefingGenerationError(
-                        code="AGENT_ERROR",
-                        message=message.result or "Agent returned an error",
+                elif isinstance(message, ResultMessage):
+                    logger.info(
+                        "V1 ResultMessage: num_turns=%d duration=%dms cost=$%.4f is_error=%s",
+                        message.num_turns,
+                        message.duration_ms,
+                        message.total_cost_usd or 0,
+                        message.is_error,
                     )
+                    if not message.is_error and message.structured_output is not None:
+                        briefing = PatientBriefing.model_validate(
+                            message.structured_output
+                        )
+                        result = BriefingResponse(
+                            **briefing.model_dump(),
+                            generated_at=datetime.datetime.now(datetime.UTC),
+                        )
+                        logger.info(
+                            "V1 briefing: %d flags, %d actions",
+                            len(result.flags),
+                            len(result.suggested_actions),
+                        )
+                    if message.is_error:
+                        raise BriefingGenerationError(
+                            code="AGENT_ERROR",
+                            message=message.result or "Agent returned an error",
+                        )
     except BriefingGenerationError:
         raise
     except CLINotFoundError:
@@ -195,7 +381,7 @@ async def _generate_briefing_v1(patient: Patient) -> BriefingResponse:
 
     if result is not None:
         logger.info("V1 briefing generated successfully")
-        return result
+        return with_rule_flags(result, analysis)
 
     raise BriefingGenerationError(
         code="NO_RESULT",
@@ -204,8 +390,6 @@ async def _generate_briefing_v1(patient: Patient) -> BriefingResponse:
 
 
 if __name__ == "__main__":
-    import asyncio
-
     # Rich patient record — copied from seed.py (Maria Garcia)
     # No database needed, runs the full agent pipeline standalone.
     patient = Patient(
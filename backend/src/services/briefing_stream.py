@@ -0,0 +1,113 @@
+"""Streamed briefing generation: agent progress and partial results over SSE.
+
+The stream opens with the deterministic `pre_analysis` (see pre_analysis.py),
+which needs no model. Then, in the same fan-in shape as chat_service, the
+generation runs as a background task putting events on a bounded
+EventChannel (tool calls, retrieved sources, then each flag, the summary and
+each suggested action as soon as it validates — see
+agents/briefing_events.py), and the consumer frames each one with
+`_sse_frame`. The stream ends with the stored `briefing` followed by `done`,
+or with `error`.
+
+Unlike a chat turn, a briefing is worth finishing when the client goes away:
+the run continues on its own session, is stored, and the next request for
+the same inputs is a cache hit. With no follower left the channel no longer
+holds the run back, and keeps only its last events.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.orm import Patient
+from src.models.schemas import BriefingResponse
+from src.services.briefing_chat_service import find_cached_briefing, store_briefing
+from src.services.briefing_jobs import briefing_pool
+from src.services.briefing_service import (
+    BriefingGenerationError,
+    briefing_fingerprint,
+    generate_briefing,
+)
+from src.services.chat_service import _sse_frame
+from src.services.event_channel import HEARTBEAT, EventChannel
+from src.services.pre_analysis import analyze_patient
+
+logger = logging.getLogger(__name__)
+
+# Runs that outlived their client; referenced here so they aren't collected.
+_detached: set[asyncio.Task[None]] = set()
+
+
+async def stream_briefing(
+    session: AsyncSession, patient: Patient, force: bool = False
+) -> AsyncIterator[bytes]:
+    """Yield SSE frames for one briefing, from cache or a live agent run."""
+    fingerprint = await briefing_fingerprint(patient)
+    if not force:
+        cached = await find_cached_briefing(session, patient.id, fingerprint)
+        if cached is not None:
+            logger.info("Briefing cache hit for patient %d (%d)", patient.id, cached.id)
+            briefing = BriefingResponse.model_validate(cached.content)
+            briefing.id = cached.id
+            yield _sse_frame("briefing", briefing.model_dump(mode="json"))
+            yield _sse_frame("done", {"briefing_id": cached.id, "cached": True})
+            return
+
+    yield _sse_frame("pre_analysis", analyze_patient(patient).model_dump(mode="json"))
+
+    # Same limits as a chat turn's channel; nothing resumes a briefing
+    # stream, so the replay buffer needn't outgrow the follower's window.
+    channel = EventChannel(
+        capacity=settings.chat_event_queue_size,
+        replay=settings.chat_event_queue_size,
+        flush_window=settings.chat_flush_window_seconds,
+        heartbeat=settings.chat_heartbeat_seconds,
+    )
+    patient_id = patient.id
+
+    async def run() -> None:
+        """Producer: generate, store on a session of its own, then signal."""
+        try:
+            async with briefing_pool.limit():
+                briefing = await generate_briefing(patient, events=channel)
+            async with briefing_pool.session() as own_session:
+                stored = await store_briefing(
+                    own_session,
+                    patient_id,
+                    briefing.model_dump(mode="json"),
+                    fingerprint,
+                )
+            briefing.id = stored.id
+            await channel.put(("briefing", briefing.model_dump(mode="json")))
+            await channel.put(("done", {"briefing_id": stored.id, "cached": False}))
+        except BriefingGenerationError as exc:
+            logger.exception("Streamed briefing failed for patient %d", patient_id)
+            await channel.put(("error", {"code": exc.code, "message": exc.message}))
+        except Exception:
+            logger.exception("Unexpected streamed briefing error (%d)", patient_id)
+            await channel.put(
+                ("error", {"code": "INTERNAL_ERROR", "message": "Unexpected error"})
+            )
+
+    logger.info("Streaming briefing for patient %d", patient_id)
+    task = asyncio.create_task(run())
+    try:
+        async for event in channel.follow():
+            if event is HEARTBEAT:
+                yield b": heartbeat\n\n"
+                continue
+            _, kind, data = event
+            yield _sse_frame(kind, data)
+    finally:
+        if not task.done():
+            logger.info(
+                "Briefing stream for patient %d closed early; finishing in background",
+                patient_id,
+            )
+            _detached.add(task)
+            task.add_done_callback(_detached.discard)
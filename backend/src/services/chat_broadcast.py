@@ -0,0 +1,268 @@
+"""Fan-out of live chat turn events to any number of viewers.
+
+Only the client that sent a message follows its ChatTurn; other clinicians
+with the same patient open watch through GET .../chat/watch instead. Each
+turn has one relay (see chat_service) that publishes its events here,
+keyed by patient, and every viewer holds a `Subscription`: a bounded inbox
+that never blocks the relay. A viewer that falls `capacity` events behind
+loses the newest ones and is told how many with a `replay_gap` event.
+
+Delivery is in-process by default. With `chat_broadcast_backend=postgres`
+events travel over LISTEN/NOTIFY (`PostgresNotify`), so a viewer on one
+uvicorn worker sees a turn running on another: every worker listens on one
+channel and delivers to its own subscribers. A batch of events goes out
+in one round trip on a dedicated connection, packed into as few NOTIFY
+payloads as fit; payloads are capped at 8000 bytes, and a larger event
+reaches remote viewers as a `replay_gap`, after which the client reloads
+history. If that connection drops, the worker reconnects and LISTENs again,
+delivering to its own viewers only in the meantime.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager, suppress
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# (event id or None, kind, data) — what viewers receive.
+Published = tuple[str | None, str, dict[str, Any]]
+
+# Postgres rejects NOTIFY payloads from 8000 bytes; leave room for framing.
+_MAX_NOTIFY_BYTES = 7900
+
+
+class Subscription:
+    """One viewer's inbox of published events."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.missed = 0
+        self._events: deque[Published] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, event: Published) -> None:
+        if len(self._events) >= self.capacity:
+            self.missed += 1
+        else:
+            self._events.append(event)
+        self._ready.set()
+
+    async def next(self, timeout: float | None = None) -> Published | None:
+        """The next event, oldest first; None after `timeout` idle seconds.
+
+        Events dropped while the inbox was full come last, as one
+        `replay_gap` event carrying how many were missed.
+        """
+        if not self._events and not self.missed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except TimeoutError:
+                return None
+        if self._events:
+            return self._events.popleft()
+        missed, self.missed = self.missed, 0
+        return None, "replay_gap", {"missed": missed}
+
+
+class PostgresNotify:
+    """Carries published events between workers over LISTEN/NOTIFY."""
+
+    channel = "chat_turn_events"
+
+    def __init__(
+        self, bind: AsyncEngine, deliver: Callable[[int, Published], None]
+    ) -> None:
+        self._bind = bind
+        self._deliver = deliver
+        self._conn: AsyncConnection | None = None
+        self._reconnect: asyncio.Task[None] | None = None
+        # asyncpg runs one query at a time per connection.
+        self._sending = asyncio.Lock()
+
+    async def start(self) -> None:
+        await self._connect()
+
+    async def stop(self) -> None:
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+            await asyncio.gather(self._reconnect, return_exceptions=True)
+            self._reconnect = None
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            raw = (await conn.get_raw_connection()).driver_connection
+            raw.remove_termination_listener(self._on_terminated)
+            await raw.remove_listener(self.channel, self._on_notify)
+            await conn.close()
+
+    async def send(self, patient_id: int, events: Sequence[Published]) -> None:
+        """NOTIFY `events` in as few payloads as fit, in one round trip.
+
+        While the connection is down (see `_on_terminated`) events are
+        delivered to this worker's viewers only.
+        """
+        conn = self._conn
+        if conn is None:
+            self._deliver_locally(patient_id, events)
+            return
+        try:
+            async with self._sending:
+                await conn.execute(
+                    text(
+                        "SELECT pg_notify(:channel, payload)"
+                        " FROM unnest(CAST(:payloads AS text[])) AS payload"
+                    ),
+                    {
+                        "channel": self.channel,
+                        "payloads": _notify_payloads(patient_id, events),
+                    },
+                )
+        except Exception:
+            logger.warning(
+                "Chat broadcast NOTIFY failed; delivering locally", exc_info=True
+            )
+            self._deliver_locally(patient_id, events)
+
+    async def _connect(self) -> None:
+        # A dedicated connection for the process lifetime: LISTEN is per
+        # server session. Autocommit, so each NOTIFY goes out immediately.
+        conn = await self._bind.connect()
+        try:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            raw = (await conn.get_raw_connection()).driver_connection
+            await raw.add_listener(self.channel, self._on_notify)
+            raw.add_termination_listener(self._on_terminated)
+        except BaseException:
+            await conn.invalidate()
+            await conn.close()
+            raise
+        self._conn = conn
+
+    def _on_terminated(self, _raw: Any) -> None:
+        # The server session, and LISTEN with it, is gone: reconnect.
+        if self._conn is not None and self._reconnect is None:
+            dead, self._conn = self._conn, None
+            self._reconnect = asyncio.create_task(
+                self._reconnect_loop(dead), name="chat-broadcast-reconnect"
+            )
+
+    async def _reconnect_loop(self, dead: AsyncConnection) -> None:
+        with suppress(Exception):
+            await dead.invalidate()
+        delay = 1.0
+        while True:
+            try:
+                await self._connect()
+            except Exception:
+                logger.warning(
+                    "Chat broadcast LISTEN reconnect failed; retrying in %.0fs",
+                    delay,
+                    exc_info=True,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            else:
+                logger.info("Chat broadcast LISTEN connection restored")
+                break
+        self._reconnect = None
+
+    def _deliver_locally(self, patient_id: int, events: Sequence[Published]) -> None:
+        for event in events:
+            self._deliver(patient_id, event)
+
+    def _on_notify(self, _conn: Any, _pid: int, _channel: str, payload: str) -> None:
+        message = json.loads(payload)
+        for event_id, kind, data in message["events"]:
+            self._deliver(message["patient_id"], (event_id, kind, data))
+
+
+def _notify_payloads(patient_id: int, events: Sequence[Published]) -> list[str]:
+    """`events` packed into NOTIFY payloads under the size limit, in order.
+
+    An event too large for a payload of its own is replaced by a
+    `replay_gap`.
+    """
+    envelope = len(json.dumps({"patient_id": patient_id, "events": []}))
+    payloads: list[str] = []
+    batch: list[str] = []
+    size = envelope
+    for event_id, kind, data in events:
+        item = json.dumps([event_id, kind, data])
+        if envelope + len(item.encode()) > _MAX_NOTIFY_BYTES:
+            item = json.dumps([event_id, "replay_gap", {"missed": 1}])
+        if batch and size + 1 + len(item.encode()) > _MAX_NOTIFY_BYTES:
+            payloads.append(_payload(patient_id, batch))
+            batch, size = [], envelope
+        batch.append(item)
+        size += 1 + len(item.encode())
+    if batch:
+        payloads.append(_payload(patient_id, batch))
+    return payloads
+
+
+def _payload(patient_id: int, items: list[str]) -> str:
+    return f'{{"patient_id": {patient_id}, "events": [{",".join(items)}]}}'
+
+
+class ChatBroadcaster:
+    """Pub/sub of chat turn events by patient; in-process unless started
+    with a Postgres transport."""
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._transport: PostgresNotify | None = None
+
+    async def start(self, bind: AsyncEngine, backend: str) -> None:
+        if backend == "postgres":
+            self._transport = PostgresNotify(bind, self._deliver)
+            await self._transport.start()
+        logger.info("Chat broadcast backend: %s", backend)
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            await self._transport.stop()
+            self._transport = None
+
+    def subscribers(self, patient_id: int) -> int:
+        return len(self._subscriptions.get(patient_id, ()))
+
+    def watched(self, patient_id: int) -> bool:
+        """Whether publishing for the patient may reach anyone: a viewer in
+        this worker or, with Postgres, possibly one in another."""
+        return self._transport is not None or patient_id in self._subscriptions
+
+    async def publish(self, patient_id: int, *events: Published) -> None:
+        if self._transport is not None:
+            # Delivered locally too, when the notification comes back.
+            await self._transport.send(patient_id, events)
+        else:
+            for event in events:
+                self._deliver(patient_id, event)
+
+    @contextmanager
+    def subscribe(self, patient_id: int, capacity: int) -> Iterator[Subscription]:
+        subscription = Subscription(capacity)
+        self._subscriptions.setdefault(patient_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscriptions = self._subscriptions[patient_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[patient_id]
+
+    def _deliver(self, patient_id: int, event: Published) -> None:
+        for subscription in self._subscriptions.get(patient_id, ()):
+            subscription.push(event)
+
+
+chat_broadcaster = ChatBroadcaster()
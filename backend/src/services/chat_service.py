@@ -1,64 +1,176 @@
 """Unified patient chat: persistence + SSE orchestration around the chat agent.
 
 The streaming shape here is a fan-in: the agent turn runs as a background task
-and *two* producers write to one asyncio.Queue — drive_chat_turn (text and tool
+and *two* producers write to one ChatTurn — drive_chat_turn (text and tool
 activity, in message order) and the publish_briefing tool handler (the
-briefing artifact, mid-turn). The single consumer below drains the queue and
-frames each item as one Server-Sent Event, so the HTTP response is a live
-merged view of everything the agent is doing.
+briefing artifact, mid-turn). The turn numbers and buffers the events (see
+chat_turns), and each follower frames them as Server-Sent Events, so the
+HTTP response is a live merged view of everything the agent is doing — and
+one that can be resumed with Last-Event-ID after a dropped connection.
 """
 
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
 
 from collections.abc import AsyncIterator
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from claude_agent_sdk import ClaudeAgentOptions
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import defer
 
-from src.agents.chat_agent import ChatEvent, build_chat_options, drive_chat_turn
-from src.models.orm import Briefing, Conversation, ConversationMessage, Patient
+from src.agents.chat_agent import (
+    build_chat_options,
+    compact_session,
+    drive_chat_turn,
+)
+from src.agents.transcripts import TranscriptStats, transcript_stats
+from src.config import settings
+from src.models.orm import (
+    Briefing,
+    Conversation,
+    ConversationMessage,
+    ConversationTrace,
+    Patient,
+)
 from src.models.schemas import (
     BriefingResponse,
     ChatHistoryResponse,
     ChatMessageOut,
+    ChatTraceResponse,
+)
+from src.services.briefing_service import BriefingGenerationError
+from src.services.chat_broadcast import chat_broadcaster
+from src.services.chat_turns import ChatTurn, current_turn, start_turn
+from src.services.event_channel import HEARTBEAT
+from src.services.patient_locks import (
+    HeldPatientLock,
+    PatientQueueFullError,
+    chat_locks,
 )
-from src.services.briefing_service import BriefingGenerationError, _serialize_patient
+from src.services.patient_context import patient_context
+from src.services.trace_store import INLINE_TRACE, decompress_trace, trace_row
 
 logger = logging.getLogger(__name__)
 
-# One in-flight turn per patient: the SDK session transcript is a single
-# linear history, so concurrent turns would race on resume.
-_locks: dict[int, asyncio.Lock] = {}
+# Viewer relays of live turns (see _relay_turn), referenced until done.
+_relays: set[asyncio.Task[None]] = set()
+
+
+def _sse_frame(kind: str, data: dict, event_id: str | None = None) -> bytes:
+    """Frame one event in SSE wire format (event + data lines, blank-line end).
+
+    With `event_id` the frame carries an `id:` line, which the client echoes
+    back as Last-Event-ID when it reconnects.
+    """
+    frame = f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+    if event_id is not None:
+        frame = f"id: {event_id}\n{frame}"
+    return frame.encode()
+
+
+# Whether a message has a trace, without loading it: in the side table, or
+# still inline. Queries outer-join ConversationTrace for it.
+_HAS_TRACE = or_(ConversationTrace.message_id.is_not(None), INLINE_TRACE)
+_TRACE_JOIN = ConversationTrace.message_id == ConversationMessage.id
 
 
-def _lock_for(patient_id: int) -> asyncio.Lock:
-    return _locks.setdefault(patient_id, asyncio.Lock())
+def _stored_trace(
+    inline: list[dict] | None, codec: str | None, data: bytes | None
+) -> list[dict] | None:
+    if data is not None:
+        return decompress_trace(codec, data)
+    return inline
 
 
-def _sse_frame(kind: str, data: dict) -> bytes:
-    """Frame one event in SSE wire format (event + data lines, blank-line end)."""
-    return f"event: {kind}\ndata: {json.dumps(data)}\n\n".encode()
+async def history_etag(
+    session: AsyncSession,
+    patient_id: int,
+    before: int | None,
+    limit: int,
+    include_traces: bool,
+) -> str:
+    """A validator for one history page, from a few aggregate lookups.
+
+    Messages are append-only and a reset starts a new conversation, so the
+    conversation id, its newest message id and message count, and the newest
+    briefing id change whenever any page's content could.
+    """
+    conversation_id = await session.scalar(
+        select(Conversation.id).where(Conversation.patient_id == patient_id)
+    )
+    newest, count = (
+        await session.execute(
+            select(func.max(ConversationMessage.id), func.count()).where(
+                ConversationMessage.conversation_id == conversation_id
+            )
+        )
+    ).one()
+    briefing_id = await session.scalar(
+        select(func.max(Briefing.id)).where(Briefing.patient_id == patient_id)
+    )
+    key = ":".join(
+        str(part)
+        for part in (conversation_id, newest, count, briefing_id)
+        + (before, limit, include_traces)
+    )
+    return f'W/"{hashlib.sha256(key.encode()).hexdigest()[:16]}"'
 
 
-async def get_history(session: AsyncSession, patient_id: int) -> ChatHistoryResponse:
-    """Return the stored conversation, messages, and latest briefing for the UI."""
+async def get_history(
+    session: AsyncSession,
+    patient_id: int,
+    before: int | None = None,
+    limit: int | None = None,
+    include_traces: bool = False,
+) -> ChatHistoryResponse:
+    """Return one page of the stored conversation and the latest briefing.
+
+    The page is the `limit` newest messages older than message id `before`
+    (the newest overall without it), keyset-paginated on the primary key so
+    every page costs the same however long the conversation. Traces stay in
+    the database unless `include_traces`, and are decompressed only then.
+    """
+    limit = limit or settings.chat_history_page_size
     conversation = await session.scalar(
         select(Conversation).where(Conversation.patient_id == patient_id)
     )
     messages: list[ChatMessageOut] = []
+    next_cursor: int | None = None
     if conversation is not None:
-        rows = (
-            await session.scalars(
-                select(ConversationMessage)
-                .where(ConversationMessage.conversation_id == conversation.id)
-                .order_by(ConversationMessage.id)
+        columns = [ConversationMessage, _HAS_TRACE]
+        if include_traces:
+            columns += [ConversationTrace.codec, ConversationTrace.data]
+        query = (
+            select(*columns)
+            .outerjoin(ConversationTrace, _TRACE_JOIN)
+            .where(ConversationMessage.conversation_id == conversation.id)
+            .order_by(ConversationMessage.id.desc())
+            .limit(limit + 1)
+        )
+        if before is not None:
+            query = query.where(ConversationMessage.id < before)
+        if not include_traces:
+            query = query.options(defer(ConversationMessage.trace))
+        rows = (await session.execute(query)).all()
+        page = rows[:limit][::-1]
+        if len(rows) > limit:
+            next_cursor = page[0][0].id
+        messages = [
+            ChatMessageOut(
+                id=message.id,
+                role=message.role,
+                content=message.content,
+                trace=_stored_trace(message.trace, *blob) if include_traces else None,
+                has_trace=bool(has_trace),
+                created_at=message.created_at,
             )
-        ).all()
-        messages = [ChatMessageOut.model_validate(m) for m in rows]
+            for message, has_trace, *blob in page
+        ]
 
     latest = await session.scalar(
         select(Briefing)
@@ -81,19 +193,45 @@ async def get_history(session: AsyncSession, patient_id: int) -> ChatHistoryResp
     return ChatHistoryResponse(
         conversation_id=conversation.id if conversation else None,
         messages=messages,
+        next_cursor=next_cursor,
         latest_briefing=latest_briefing,
     )
 
 
+async def get_message_trace(
+    session: AsyncSession, patient_id: int, message_id: int
+) -> ChatTraceResponse | None:
+    """The trace of one of the patient's messages; None if no such message."""
+    row = (
+        await session.execute(
+            select(
+                ConversationMessage.trace,
+                ConversationTrace.codec,
+                ConversationTrace.data,
+            )
+            .join(Conversation)
+            .outerjoin(ConversationTrace, _TRACE_JOIN)
+            .where(
+                ConversationMessage.id == message_id,
+                Conversation.patient_id == patient_id,
+            )
+        )
+    ).one_or_none()
+    if row is None:
+        return None
+    return ChatTraceResponse(message_id=message_id, trace=_stored_trace(*row))
+
+
 async def reset_conversation(session: AsyncSession, patient_id: int) -> None:
     """Drop the conversation (messages cascade); the next turn starts fresh.
 
     The SDK-side transcript file is left behind — harmless, since nothing
-    resumes it once the session_id row is gone.
+    resumes it once the session_id row is gone — for the transcript GC
+    (services/transcript_gc.py) to delete.
     """
     # Same per-patient lock as stream_chat_turn: a reset must not delete the
     # conversation while an in-flight turn is still writing to it.
-    async with _lock_for(patient_id):
+    async with chat_locks.hold(patient_id, session.bind):
         conversation = await session.scalar(
             select(Conversation).where(Conversation.patient_id == patient_id)
         )
@@ -103,11 +241,183 @@ async def reset_conversation(session: AsyncSession, patient_id: int) -> None:
             logger.info("Reset conversation for patient %d", patient_id)
 
 
+def _needs_compaction(stats: TranscriptStats) -> bool:
+    by_size = settings.chat_compact_transcript_bytes
+    by_tokens = settings.chat_compact_context_tokens
+    return bool(
+        (by_size and stats.size_bytes >= by_size)
+        or (
+            by_tokens
+            and stats.context_tokens is not None
+            and stats.context_tokens >= by_tokens
+        )
+    )
+
+
+async def _maybe_compact(
+    bind: AsyncEngine, conversation_id: int, session_id: str, patient_record: str
+) -> None:
+    """Move a conversation whose transcript outgrew the thresholds onto a
+    compacted session (see chat_agent.compact_session).
+
+    Only Conversation.session_id changes; the stored messages the UI renders
+    are untouched. A failed compaction is logged and the old session keeps
+    being resumed.
+    """
+    stats = await asyncio.to_thread(transcript_stats, session_id)
+    if stats is None or not _needs_compaction(stats):
+        return
+    logger.info(
+        "Compacting chat session %s (%d bytes, %s context tokens)",
+        session_id,
+        stats.size_bytes,
+        stats.context_tokens,
+    )
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        rows = (
+            await session.execute(
+                select(ConversationMessage.role, ConversationMessage.content)
+                .where(ConversationMessage.conversation_id == conversation_id)
+                .order_by(ConversationMessage.id.desc())
+                .limit(2 * settings.chat_compact_keep_turns)
+            )
+        ).all()
+    recent = [(role, content) for role, content in reversed(rows)]
+    try:
+        new_session_id = await compact_session(session_id, patient_record, recent)
+    except BriefingGenerationError:
+        logger.exception("Compaction of chat session %s failed", session_id)
+        return
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        conversation = await session.get(Conversation, conversation_id)
+        if conversation is not None and conversation.session_id == session_id:
+            conversation.session_id = new_session_id
+            await session.commit()
+
+
+async def _run_turn(
+    turn: ChatTurn,
+    lock: HeldPatientLock,
+    bind: AsyncEngine,
+    conversation_id: int,
+    message: str,
+    options: ClaudeAgentOptions,
+    patient_record: str,
+) -> None:
+    """Producer: drive the agent, then persist and signal completion.
+
+    Runs detached from the request, so it persists on a session of its own
+    and releases the patient lock the stream acquired for it — after
+    compacting the transcript when it has grown too large, so the next turn
+    never races the switch to the new session.
+    """
+    try:
+        session_id, assistant_text, trace = await drive_chat_turn(
+            message, options, turn
+        )
+        async with AsyncSession(bind, expire_on_commit=False) as session:
+            conversation = await session.get(Conversation, conversation_id)
+            if conversation is not None and session_id:
+                conversation.session_id = session_id
+            if assistant_text or trace:
+                reply = ConversationMessage(
+                    conversation_id=conversation_id,
+                    role="assistant",
+                    content=assistant_text,
+                )
+                session.add(reply)
+                if trace:
+                    # Full ordered trace (thinking, tool calls with results,
+                    # text) so the UI can replay the agent's work after a
+                    # refresh — compressed, in the side table.
+                    await session.flush()
+                    session.add(trace_row(reply.id, trace))
+            await session.commit()
+        await turn.put(("done", {"session_id": session_id}))
+        if session_id:
+            await _maybe_compact(bind, conversation_id, session_id, patient_record)
+    except BriefingGenerationError as exc:
+        logger.exception("Chat turn failed for patient %d", turn.patient_id)
+        await turn.put(("error", {"code": exc.code, "message": exc.message}))
+    except asyncio.CancelledError:
+        await turn.put(
+            ("error", {"code": "TURN_CANCELLED", "message": "Chat turn was cancelled"})
+        )
+        raise
+    except Exception:
+        logger.exception("Unexpected chat error for patient %d", turn.patient_id)
+        await turn.put(
+            ("error", {"code": "INTERNAL_ERROR", "message": "Unexpected error"})
+        )
+    finally:
+        logger.info(
+            "Chat turn %s events: %s", turn.id, turn.channel.metrics().model_dump()
+        )
+        # Only released once the SDK has shut down, so the next turn can't
+        # race with it on the session transcript.
+        await lock.release()
+
+
+def chat_queue_full(patient_id: int) -> bool:
+    """Whether a new turn for the patient would be refused right now."""
+    return (
+        chat_locks.locked(patient_id)
+        and chat_locks.waiting(patient_id) >= settings.chat_queue_depth
+    )
+
+
+async def _abandon(acquiring: asyncio.Task[HeldPatientLock]) -> None:
+    acquiring.cancel()
+    (held,) = await asyncio.gather(acquiring, return_exceptions=True)
+    if isinstance(held, HeldPatientLock):
+        await held.release()
+
+
 async def stream_chat_turn(
     session: AsyncSession, patient: Patient, message: str
 ) -> AsyncIterator[bytes]:
-    """Run one chat turn and yield SSE frames as the agent works."""
-    async with _lock_for(patient.id):
+    """Start one chat turn and yield its SSE frames as the agent works.
+
+    The turn itself is detached (see chat_turns): if this stream is closed
+    mid-turn the agent keeps running, and `follow_chat_turn` resumes it.
+    Until the turn can start, the stream sends `queued` events with its
+    position; closed while still queued, the turn never runs.
+    """
+    # One in-flight turn per patient: the SDK session transcript is a single
+    # linear history, so concurrent turns would race on resume. chat_locks
+    # holds across uvicorn workers (a Postgres advisory lock behind an
+    # in-process one). A turn arriving while another runs waits in the
+    # patient's queue and is told its position; past chat_queue_depth it is
+    # refused (the router answers 429 before getting here when it can).
+    positions: asyncio.Queue[int] = asyncio.Queue()
+    acquiring = asyncio.create_task(
+        chat_locks.acquire(
+            patient.id,
+            session.bind,
+            max_waiting=settings.chat_queue_depth,
+            on_position=positions.put_nowait,
+        )
+    )
+    try:
+        while not acquiring.done():
+            moved = asyncio.create_task(positions.get())
+            await asyncio.wait((acquiring, moved), return_when=asyncio.FIRST_COMPLETED)
+            if not moved.done():
+                moved.cancel()
+            elif not acquiring.done():
+                yield _sse_frame("queued", {"position": moved.result()})
+    except BaseException:
+        # The client went away while queued: give up the place (or the lock,
+        # if it was granted meanwhile) instead of running an unwatched turn.
+        moved.cancel()
+        await _abandon(acquiring)
+        raise
+    try:
+        lock = acquiring.result()
+    except PatientQueueFullError as exc:
+        yield _sse_frame("error", {"code": "CHAT_QUEUE_FULL", "message": str(exc)})
+        return
+    try:
         conversation = await session.scalar(
             select(Conversation).where(Conversation.patient_id == patient.id)
         )
@@ -126,56 +436,100 @@ async def stream_chat_turn(
         )
         await session.commit()
 
-        queue: asyncio.Queue[ChatEvent] = asyncio.Queue()
-        options = build_chat_options(
-            queue, patient.id, conversation.session_id, _serialize_patient(patient)
+        turn = ChatTurn(patient.id, message)
+        record = patient_context(patient)
+        options = build_chat_options(turn, patient.id, conversation.session_id, record)
+        start_turn(
+            patient.id,
+            _run_turn(
+                turn, lock, session.bind, conversation.id, message, options, record
+            ),
+            turn,
         )
+    except BaseException:
+        await lock.release()
+        raise
+    relay = asyncio.create_task(_relay_turn(turn))
+    _relays.add(relay)
+    relay.add_done_callback(_relays.discard)
 
-        async def run_turn() -> None:
-            """Producer: drive the agent, then persist and signal completion."""
-            try:
-                session_id, assistant_text, trace = await drive_chat_turn(
-                    message, options, queue
-                )
-                if session_id:
-                    conversation.session_id = session_id
-                if assistant_text or trace:
-                    session.add(
-                        ConversationMessage(
-                            conversation_id=conversation.id,
-                            role="assistant",
-                            content=assistant_text,
-                            # Full ordered trace (thinking, tool calls with
-                            # results, text) so the UI can replay the agent's
-                            # work after a refresh.
-                            trace=trace or None,
-                        )
-                    )
-                await session.commit()
-                await queue.put(("done", {"session_id": session_id}))
-            except BriefingGenerationError as exc:
-                logger.exception("Chat turn failed for patient %d", patient.id)
-                await queue.put(("error", {"code": exc.code, "message": exc.message}))
-            except Exception:
-                logger.exception("Unexpected chat error for patient %d", patient.id)
-                await queue.put(
-                    ("error", {"code": "INTERNAL_ERROR", "message": "Unexpected error"})
+    async for frame in follow_chat_turn(turn):
+        yield frame
+
+
+async def _relay_turn(turn: ChatTurn) -> None:
+    """Publish the turn's events to its patient's viewers (chat_broadcast).
+
+    Tails the channel rather than following the turn: viewers are passive,
+    so the relay must neither keep an abandoned turn alive nor hold back the
+    agent (a relay that falls behind sends viewers a `replay_gap`). Events
+    go out a batch at a time, and not at all while nobody watches; a viewer
+    who arrives mid-turn catches up from the replay buffer.
+    """
+    started = False
+    try:
+        async for batch in turn.channel.tail():
+            if not chat_broadcaster.watched(turn.patient_id):
+                continue
+            events = [
+                (turn.event_id(seq) if seq else None, kind, data)
+                for seq, kind, data in batch
+            ]
+            if not started:
+                started = True
+                events.insert(
+                    0, (turn.event_id(0), "turn_started", {"message": turn.message})
                 )
+            await chat_broadcaster.publish(turn.patient_id, *events)
+    except Exception:
+        logger.exception("Relaying chat turn %s to viewers failed", turn.id)
+
+
+async def watch_chat(patient_id: int) -> AsyncIterator[bytes]:
+    """SSE frames of the patient's chat turns, for viewers, until closed.
+
+    A turn already running in this worker is caught up from its replay
+    buffer first; the same events arriving again through the broadcaster
+    are skipped by their id. Every turn opens with `turn_started`
+    ({"message": ...}) and ends with `done` or `error`.
+    """
+    with chat_broadcaster.subscribe(
+        patient_id, settings.chat_viewer_queue_size
+    ) as subscription:
+        seen: tuple[str, int] | None = None
+        turn = current_turn(patient_id)
+        if turn is not None and not turn.finished:
+            yield _sse_frame(
+                "turn_started", {"message": turn.message}, turn.event_id(0)
+            )
+            last = 0
+            for seq, kind, data in turn.channel.buffered():
+                if seq > last + 1:
+                    yield _sse_frame("replay_gap", {"missed": seq - last - 1})
+                yield _sse_frame(kind, data, turn.event_id(seq))
+                last = seq
+            seen = (turn.id, last)
+        while True:
+            event = await subscription.next(settings.chat_heartbeat_seconds or None)
+            if event is None:
+                yield b": heartbeat\n\n"
+                continue
+            event_id, kind, data = event
+            if seen is not None and event_id is not None:
+                turn_id, _, seq = event_id.rpartition(":")
+                if turn_id == seen[0] and int(seq) <= seen[1]:
+                    continue
+            yield _sse_frame(kind, data, event_id)
 
-        task = asyncio.create_task(run_turn())
-        try:
-            while True:
-                kind, data = await queue.get()
-                yield _sse_frame(kind, data)
-                if kind in ("done", "error"):
-                    break
-        finally:
-            # Client disconnected mid-turn (or we're done): stop the agent and
-            # wait for its cleanup before releasing the patient lock, so the
-            # next turn can't race with SDK shutdown.
-            if not task.done():
-                task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+
+async def follow_chat_turn(
+    turn: ChatTurn, last_event_id: str | None = None
+) -> AsyncIterator[bytes]:
+    """SSE frames of `turn` after `last_event_id` (from its start if None)."""
+    async for event in turn.follow(turn.position(last_event_id)):
+        if event is HEARTBEAT:
+            # An SSE comment: keeps proxies from timing out, ignored by clients.
+            yield b": heartbeat\n\n"
+            continue
+        seq, kind, data = event
+        yield _sse_frame(kind, data, turn.event_id(seq) if seq else None)
@@ -0,0 +1,131 @@
+"""Chat turns that outlive the HTTP connection, with numbered, replayable events.
+
+A chat turn is the most expensive thing the app does, and a browser tab
+losing its connection mid-turn used to cancel it outright. Now the agent run
+is a detached `ChatTurn`: the producers (drive_chat_turn, publish_briefing)
+put events on the turn itself, whose EventChannel numbers them and keeps the
+last `chat_replay_buffer_events` (see event_channel for coalescing and
+backpressure). Any number of followers read the buffer from a position of
+their choosing, so a client that reconnects with `Last-Event-ID` picks up
+exactly where its stream broke.
+
+Event ids are "<turn id>:<seq>". The turn id makes an id from an earlier
+turn recognizable: following from it starts at the beginning of the current
+turn instead of somewhere in its middle.
+
+Lifetime: while at least one follower is attached the turn runs to the end.
+When the last one leaves, a `chat_resume_grace_seconds` timer starts; if no
+one reattaches before it fires, an unfinished turn is cancelled. A finished
+turn stays in the registry for the same grace period so a reconnect can
+still read its tail, then is dropped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections.abc import AsyncIterator, Coroutine
+from typing import Any
+
+from src.agents.chat_agent import ChatEvent
+from src.config import settings
+from src.services.event_channel import BufferedEvent, EventChannel
+
+logger = logging.getLogger(__name__)
+
+# The live (or recently finished) turn per patient.
+_turns: dict[int, ChatTurn] = {}
+
+
+class ChatTurn:
+    """One detached chat turn: its agent task and the channel it writes to."""
+
+    def __init__(self, patient_id: int, message: str = "") -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.patient_id = patient_id
+        # The physician's message that started the turn, for viewers.
+        self.message = message
+        self.task: asyncio.Task[None] | None = None
+        self.channel = EventChannel(
+            capacity=settings.chat_event_queue_size,
+            replay=settings.chat_replay_buffer_events,
+            flush_window=settings.chat_flush_window_seconds,
+            heartbeat=settings.chat_heartbeat_seconds,
+        )
+        self._followers = 0
+        self._expiry: asyncio.TimerHandle | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.channel.finished
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.id}:{seq}"
+
+    def position(self, last_event_id: str | None) -> int:
+        """The seq to follow after, given a client's Last-Event-ID."""
+        turn_id, _, seq = (last_event_id or "").rpartition(":")
+        if turn_id != self.id or not seq.isdigit():
+            return 0
+        return int(seq)
+
+    async def put(self, item: ChatEvent) -> None:
+        """The ChatEventSink interface: hand the event to the channel."""
+        await self.channel.put(item)
+
+    async def follow(self, after: int = 0) -> AsyncIterator[BufferedEvent]:
+        """The channel's events after `after` (see EventChannel.follow),
+        counted as a follower for the turn's lifetime."""
+        self._attach()
+        try:
+            async for event in self.channel.follow(after):
+                yield event
+        finally:
+            self._detach()
+
+    def _attach(self) -> None:
+        self._followers += 1
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+    def _detach(self) -> None:
+        self._followers -= 1
+        if self._followers == 0:
+            self._arm_expiry()
+
+    def _arm_expiry(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._expiry = loop.call_later(settings.chat_resume_grace_seconds, self._expire)
+
+    def _expire(self) -> None:
+        self._expiry = None
+        # A finished turn may still be compacting its transcript; leave it.
+        if self.task is not None and not self.finished:
+            logger.info(
+                "Chat turn %s for patient %d unfollowed for %ss; cancelling",
+                self.id,
+                self.patient_id,
+                settings.chat_resume_grace_seconds,
+            )
+            self.task.cancel()
+        if _turns.get(self.patient_id) is self:
+            del _turns[self.patient_id]
+
+
+def start_turn(
+    patient_id: int, run: Coroutine[Any, Any, None], turn: ChatTurn
+) -> ChatTurn:
+    """Register `turn` as the patient's current turn and run `run` detached."""
+    _turns[patient_id] = turn
+    turn.task = asyncio.create_task(run)
+    # Armed until the first follower attaches, so a turn whose client never
+    # read a byte is not kept forever.
+    turn._arm_expiry()
+    return turn
+
+
+def current_turn(patient_id: int) -> ChatTurn | None:
+    """The patient's live turn, or its last one while still resumable."""
+    return _turns.get(patient_id)
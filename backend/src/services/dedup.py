@@ -0,0 +1,113 @@
+"""Near-duplicate detection for guideline chunks (MinHash + LSH).
+
+The same dosing paragraph often appears in several guidelines (metformin renal
+dosing lives in both the diabetes and CKD documents). Indexing every copy
+fills the top-k with one passage and spends prompt tokens on repeats, so at
+ingest time each chunk is compared against what is already indexed and a
+near-duplicate is collapsed into the existing point as an extra document
+reference instead of becoming a point of its own.
+
+Similarity is Jaccard over word 5-gram shingles of the chunk body, estimated
+with a 64-permutation MinHash. The signature is split into 8 bands of 8 rows
+for locality-sensitive hashing: two chunks become candidates when any band
+matches, which happens with high probability above ~0.77 Jaccard and rarely
+below it; candidates are then confirmed against DUPLICATE_THRESHOLD using the
+full signatures. Band keys are stored in the Qdrant payload, so candidate
+lookup is a keyword-filter query rather than a scan.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures are persisted in the index, so the permutations must
+# be identical across processes and releases.
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+_SECTION_PREFIX_RE = re.compile(r"^\[[^\]]*\]\s*")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def _words(text: str) -> list[str]:
+    """Normalized body words: the "[Section > Path]" prefix is dropped so the
+    same paragraph under different headings still matches."""
+    return _WORD_RE.findall(_SECTION_PREFIX_RE.sub("", text).lower())
+
+
+def _shingle_hashes(text: str) -> set[int]:
+    words = _words(text)
+    if len(words) < SHINGLE_WORDS:
+        grams = [" ".join(words)]
+    else:
+        grams = [
+            " ".join(words[i : i + SHINGLE_WORDS])
+            for i in range(len(words) - SHINGLE_WORDS + 1)
+        ]
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest())
+        for g in grams
+    }
+
+
+def minhash(text: str) -> list[int]:
+    """64-slot MinHash signature of the chunk body."""
+    shingles = _shingle_hashes(text)
+    return [
+        min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingles)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def lsh_bands(signature: list[int]) -> list[str]:
+    """One keyword per band; equal keys in any band => candidate pair."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def estimate_jaccard(a: list[int], b: list[int]) -> float:
+    """Fraction of agreeing signature slots (unbiased Jaccard estimate)."""
+    return sum(x == y for x, y in zip(a, b, strict=True)) / NUM_PERM
+
+
+def is_near_duplicate(a: list[int], b: list[int]) -> bool:
+    return estimate_jaccard(a, b) >= DUPLICATE_THRESHOLD
+
+
+def find_batch_duplicates(signatures: list[list[int]]) -> dict[int, int]:
+    """Map each duplicate's index to the earliest near-identical index.
+
+    Used within one document (a paragraph repeated under two headings), where
+    the batch is not in the index yet. Earliest-wins keeps the canonical chunk
+    stable across re-ingests of an unchanged document.
+    """
+    buckets: dict[str, list[int]] = {}
+    duplicate_of: dict[int, int] = {}
+    for idx, signature in enumerate(signatures):
+        candidates: set[int] = set()
+        for key in lsh_bands(signature):
+            candidates.update(buckets.setdefault(key, []))
+            buckets[key].append(idx)
+        for other in sorted(candidates):
+            if other not in duplicate_of and is_near_duplicate(
+                signature, signatures[other]
+            ):
+                duplicate_of[idx] = other
+                break
+    return duplicate_of
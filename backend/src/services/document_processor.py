@@ -8,6 +8,7 @@ from datetime import date
 from pathlib import Path
 
 from src.models.rag import DocumentChunk
+from src.services.lexicon import tag_text
 
 
 class Section:
@@ -92,6 +93,10 @@ def chunk_sections(
 
     Each chunk's text is prefixed with its section path for embedding context.
     Chunks that exceed max_tokens are split at paragraph boundaries.
+
+    `conditions` / `drugs` left as None are tagged per chunk from the chunk's
+    own text (section path included) via the lexicon matcher; an explicit
+    list is applied to every chunk as-is.
     """
     if not document_id:
         document_id = str(uuid.uuid4())[:8]
@@ -131,22 +136,25 @@ def chunk_sections(
                 raw_chunks.append((section_path, prefix + "\n\n".join(current_parts)))
 
     total = len(raw_chunks)
-    return [
-        DocumentChunk(
-            text=text,
-            document_id=document_id,
-            document_title=document_title,
-            section_path=section_path,
-            specialty=specialty,
-            document_type=document_type,
-            conditions=conditions or [],
-            drugs=drugs or [],
-            publication_date=publication_date,
-            chunk_index=idx,
-            total_chunks=total,
+    chunks: list[DocumentChunk] = []
+    for idx, (section_path, text) in enumerate(raw_chunks):
+        tagged_conditions, tagged_drugs = tag_text(text)
+        chunks.append(
+            DocumentChunk(
+                text=text,
+                document_id=document_id,
+                document_title=document_title,
+                section_path=section_path,
+                specialty=specialty,
+                document_type=document_type,
+                conditions=tagged_conditions if conditions is None else conditions,
+                drugs=tagged_drugs if drugs is None else drugs,
+                publication_date=publication_date,
+                chunk_index=idx,
+                total_chunks=total,
+            )
         )
-        for idx, (section_path, text) in enumerate(raw_chunks)
-    ]
+    return chunks
 
 
 def parse_and_chunk_file(
@@ -0,0 +1,284 @@
+"""Re-embed the guideline index for a new embedding model without downtime.
+
+Changing `embedding_model` / `embedding_dimensions` invalidates every stored
+vector. Instead of re-parsing the markdown, the migration reads each point's
+stored chunk text from the live collection, re-embeds it with the new model in
+throttled batches, and writes it (same point id, same payload) into a new
+physical collection named for the new model (`rag_service.collection_for_spec`).
+
+The live collection keeps serving — queries are embedded with the model it was
+built with (`rag_service.serving_spec`) — until the copy is complete. Catch-up
+passes then pick up whatever ingestion changed meanwhile, and the logical
+collection name (a Qdrant alias) is flipped to the new collection in one
+atomic alias update. Writes that resolved the old collection just before the
+flip land in it after the last catch-up pass, so a final pass runs after the
+cut-over too; it goes by each point's `indexed_at` write time, so it never
+overwrites or deletes what ingestion has written to the new collection
+since. The old collection is kept for rollback unless `drop_source` is set.
+
+The copy is resumable: points already present in the target with an identical
+payload are skipped, so re-running an interrupted migration only embeds what
+is missing.
+
+A collection created before the first migration is a plain collection under
+the logical name, not an alias. Qdrant cannot alias over an existing
+collection, so that one cut-over deletes it and creates the alias straight
+after — a sub-second gap with no rollback target.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+
+from pydantic import BaseModel
+from qdrant_client.models import (
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    FieldCondition,
+    Filter,
+    PointStruct,
+    Range,
+)
+
+from src.config import settings
+from src.models.rag import EmbeddingSpec
+from src.services import rag_service
+
+logger = logging.getLogger(__name__)
+
+
+class MigrationProgress(BaseModel):
+    """Counters for one migration run."""
+
+    source: str
+    target: str
+    scanned: int = 0
+    embedded: int = 0
+    payload_updated: int = 0
+    deleted: int = 0
+    embed_requests: int = 0
+    cut_over: bool = False
+
+
+class _Throttle:
+    """Space calls at least 1 / max_per_second apart (0 disables)."""
+
+    def __init__(self, max_per_second: float) -> None:
+        self._interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._next = 0.0
+
+    def wait(self) -> None:
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self._interval
+
+
+def _serving_collection() -> str:
+    """Physical collection currently behind the logical name."""
+    client = rag_service.get_qdrant_client()
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == settings.qdrant_collection:
+            return alias.collection_name
+    return settings.qdrant_collection
+
+
+def copy_points(
+    source: str,
+    target: str,
+    spec: EmbeddingSpec,
+    progress: MigrationProgress,
+    *,
+    batch_size: int = 64,
+    max_requests_per_second: float = 5.0,
+    embed: Callable[[list[str], EmbeddingSpec], list[list[float]]] | None = None,
+    since: float | None = None,
+    cut_at: float | None = None,
+) -> None:
+    """Bring `target` up to date with `source`, re-embedding changed text.
+
+    A point is re-embedded when it is missing from the target or its text
+    differs; a payload-only change (e.g. near-duplicate references) is copied
+    without an embedding call. Points gone from the source are deleted.
+
+    `since` and `cut_at` make this the final pass after a cut-over at
+    `cut_at`, when ingestion already writes to the target: only source points
+    written since `since` are copied, and only over older target points;
+    deletions are replayed only for target points written before `cut_at`.
+    """
+    embed = embed or rag_service.embed_batch
+    client = rag_service.get_qdrant_client()
+    throttle = _Throttle(max_requests_per_second)
+    scroll_filter = None
+    if since is not None:
+        scroll_filter = Filter(
+            must=[FieldCondition(key="indexed_at", range=Range(gte=since))]
+        )
+    offset = None
+    while True:
+        page, offset = client.scroll(
+            collection_name=source,
+            scroll_filter=scroll_filter,
+            with_payload=True,
+            with_vectors=False,
+            limit=batch_size,
+            offset=offset,
+        )
+        existing = {
+            record.id: record.payload
+            for record in client.retrieve(
+                collection_name=target,
+                ids=[record.id for record in page],
+                with_payload=True,
+            )
+        }
+        to_embed = []
+        for record in page:
+            current = existing.get(record.id)
+            if (
+                since is not None
+                and current is not None
+                and current.get("indexed_at", 0) >= record.payload["indexed_at"]
+            ):
+                continue
+            if current is None or current.get("text") != record.payload["text"]:
+                to_embed.append(record)
+            elif current != record.payload:
+                client.overwrite_payload(
+                    collection_name=target, payload=record.payload, points=[record.id]
+                )
+                progress.payload_updated += 1
+        if to_embed:
+            throttle.wait()
+            vectors = embed([record.payload["text"] for record in to_embed], spec)
+            progress.embed_requests += 1
+            client.upsert(
+                collection_name=target,
+                points=[
+                    PointStruct(id=record.id, vector=vector, payload=record.payload)
+                    for record, vector in zip(to_embed, vectors, strict=True)
+                ],
+            )
+            progress.embedded += len(to_embed)
+        progress.scanned += len(page)
+        if offset is None:
+            break
+    _delete_missing(source, target, progress, batch_size, before=cut_at)
+    logger.info("Migration pass %s -> %s: %s", source, target, progress)
+
+
+def _delete_missing(
+    source: str,
+    target: str,
+    progress: MigrationProgress,
+    batch_size: int,
+    before: float | None = None,
+) -> None:
+    """Delete target points gone from the source (written before `before`)."""
+    client = rag_service.get_qdrant_client()
+    offset = None
+    while True:
+        page, offset = client.scroll(
+            collection_name=target,
+            with_payload=["indexed_at"] if before is not None else False,
+            limit=batch_size,
+            offset=offset,
+        )
+        ids = [
+            record.id
+            for record in page
+            if before is None or record.payload.get("indexed_at", 0) < before
+        ]
+        present = {
+            record.id
+            for record in client.retrieve(
+                collection_name=source, ids=ids, with_payload=False
+            )
+        }
+        gone = [point_id for point_id in ids if point_id not in present]
+        if gone:
+            client.delete(collection_name=target, points_selector=gone)
+            progress.deleted += len(gone)
+        if offset is None:
+            return
+
+
+def cut_over(target: str) -> None:
+    """Point the logical collection name at `target` (atomic for aliases)."""
+    client = rag_service.get_qdrant_client()
+    logical = settings.qdrant_collection
+    aliased = any(a.alias_name == logical for a in client.get_aliases().aliases)
+    create = CreateAliasOperation(
+        create_alias=CreateAlias(collection_name=target, alias_name=logical)
+    )
+    if aliased:
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=logical)),
+                create,
+            ]
+        )
+    else:
+        logger.warning(
+            "Replacing pre-alias collection '%s'; it cannot be kept for rollback",
+            logical,
+        )
+        client.delete_collection(logical)
+        client.update_collection_aliases(change_aliases_operations=[create])
+    rag_service.invalidate_serving_spec()
+    logger.info("Collection '%s' now serves '%s'", logical, target)
+
+
+def migrate(
+    spec: EmbeddingSpec,
+    *,
+    batch_size: int = 64,
+    max_requests_per_second: float = 5.0,
+    catch_up_passes: int = 2,
+    drop_source: bool = False,
+    embed: Callable[[list[str], EmbeddingSpec], list[list[float]]] | None = None,
+) -> MigrationProgress:
+    """Re-embed the served collection with `spec` and cut over when done."""
+    client = rag_service.get_qdrant_client()
+    source = _serving_collection()
+    target = rag_service.collection_for_spec(spec)
+    if source == target:
+        raise ValueError(f"Collection '{source}' is already built with {spec}")
+    if not client.collection_exists(target):
+        rag_service.create_collection(target, spec.dimensions)
+
+    progress = MigrationProgress(source=source, target=target)
+    kwargs = {
+        "batch_size": batch_size,
+        "max_requests_per_second": max_requests_per_second,
+        "embed": embed,
+    }
+    since = time.time()
+    copy_points(source, target, spec, progress, **kwargs)
+    # Ingestion kept writing to the source during the bulk pass; each catch-up
+    # pass only embeds what changed, so they shrink quickly.
+    for _ in range(catch_up_passes):
+        embedded_before = progress.embedded
+        since = time.time()
+        copy_points(source, target, spec, progress, **kwargs)
+        if progress.embedded == embedded_before:
+            break
+
+    cut_at = time.time()
+    cut_over(target)
+    progress.cut_over = True
+    # A pre-alias source was deleted by the cut-over, and its name now
+    # resolves to the target.
+    if source != settings.qdrant_collection:
+        copy_points(
+            source, target, spec, progress, since=since, cut_at=cut_at, **kwargs
+        )
+    if drop_source and source != settings.qdrant_collection:
+        client.delete_collection(source)
+        logger.info("Dropped previous collection '%s'", source)
+    return progress
@@ -0,0 +1,200 @@
+"""Numbered, bounded, coalescing event channel between a turn and its followers.
+
+The chat agent emits an event per text or thinking block (and, with partial
+streaming, per fragment); framing and flushing each one separately makes
+frame overhead dominate for chatty models. And a follower that reads slower
+than the agent writes must not make memory grow without bound. The channel:
+
+- numbers every event and keeps the last `replay` of them, so followers can
+  start from any position still in the buffer (Last-Event-ID resume);
+- coalesces adjacent text-like fragments of one kind: a fragment is staged
+  and flushed as one event when another kind arrives, or `flush_window`
+  after the first fragment — whichever is first. Kinds and their joiners
+  are listed in `COALESCED`;
+- applies backpressure: while followers are attached, `put` waits whenever
+  the slowest of them is `capacity` events behind (passive `tail` readers
+  don't count, and skip ahead instead);
+- sends a heartbeat to an idle follower every `heartbeat` seconds (0 never)
+  so proxies don't time the connection out;
+- reports its depth, coalescing and backpressure in `metrics()`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+from collections import deque
+from collections.abc import AsyncIterator
+from typing import Any
+
+from pydantic import BaseModel
+
+TERMINAL_EVENTS = ("done", "error")
+
+# Kinds whose adjacent fragments merge into one event, and their joiner.
+COALESCED = {
+    "text": "\n\n",
+    "thinking": "\n\n",
+    "text_delta": "",
+    "thinking_delta": "",
+}
+
+# One (seq, kind, data) entry of the buffer.
+BufferedEvent = tuple[int, str, dict[str, Any]]
+
+# Yielded by `follow` when nothing happened for `heartbeat` seconds.
+HEARTBEAT: BufferedEvent = (0, "heartbeat", {})
+
+
+class ChannelMetrics(BaseModel):
+    """Point-in-time view of a channel, for logs."""
+
+    events: int
+    depth: int
+    max_depth: int
+    followers: int
+    fragments_coalesced: int
+    producer_waits: int
+
+
+class EventChannel:
+    """Events in, numbered and coalesced; any number of followers out."""
+
+    def __init__(
+        self, *, capacity: int, replay: int, flush_window: float, heartbeat: float
+    ) -> None:
+        self.capacity = capacity
+        self.flush_window = flush_window
+        self.heartbeat = heartbeat
+        self._events: deque[BufferedEvent] = deque(maxlen=max(replay, capacity))
+        self._seq = 0
+        self._finished = False
+        # Replaced on every append; followers wait on the one they last saw.
+        self._changed = asyncio.Event()
+        # Text-like fragments not yet appended: (kind, parts).
+        self._staged: tuple[str, list[str]] | None = None
+        self._flush: asyncio.TimerHandle | None = None
+        # Follower token -> last seq it has taken.
+        self._cursors: dict[int, int] = {}
+        self._tokens = itertools.count()
+        self._room = asyncio.Event()
+        self._max_depth = 0
+        self._coalesced = 0
+        self._waits = 0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    @property
+    def depth(self) -> int:
+        """Events appended but not yet taken by the slowest follower."""
+        if not self._cursors:
+            return 0
+        return self._seq - min(self._cursors.values())
+
+    async def put(self, item: tuple[str, dict[str, Any]]) -> None:
+        """Add one event; waits while the slowest follower is at capacity."""
+        if self._finished:
+            return
+        kind, data = item
+        # Terminal events skip the wait: nothing follows them to hold back.
+        while kind not in TERMINAL_EVENTS and self.depth >= self.capacity:
+            self._waits += 1
+            self._room.clear()
+            await self._room.wait()
+        if kind in COALESCED and data.keys() == {"text"}:
+            if self._staged is not None and self._staged[0] == kind:
+                self._staged[1].append(data["text"])
+                self._coalesced += 1
+                return
+            self.flush()
+            self._staged = (kind, [data["text"]])
+            loop = asyncio.get_running_loop()
+            self._flush = loop.call_later(self.flush_window, self.flush)
+            return
+        self.flush()
+        self._append(kind, data)
+
+    def flush(self) -> None:
+        """Append the staged fragments now, as one event."""
+        if self._flush is not None:
+            self._flush.cancel()
+            self._flush = None
+        if self._staged is not None:
+            kind, parts = self._staged
+            self._staged = None
+            self._append(kind, {"text": COALESCED[kind].join(parts)})
+
+    def _append(self, kind: str, data: dict[str, Any]) -> None:
+        self._seq += 1
+        self._events.append((self._seq, kind, data))
+        self._finished = kind in TERMINAL_EVENTS
+        self._max_depth = max(self._max_depth, self.depth)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def buffered(self) -> list[BufferedEvent]:
+        """The events still in the replay buffer, oldest first."""
+        return list(self._events)
+
+    async def follow(self, after: int = 0) -> AsyncIterator[BufferedEvent]:
+        """Yield events with seq > `after`, then live ones, until the terminal
+        event; `HEARTBEAT` while idle. If `after` has already rotated out of
+        the buffer the first item is a `replay_gap` event (seq 0) carrying
+        the number of events missed."""
+        token = next(self._tokens)
+        self._cursors[token] = after
+        try:
+            if self._events and self._events[0][0] > after + 1:
+                missed = self._events[0][0] - after - 1
+                yield 0, "replay_gap", {"missed": missed}
+            while True:
+                changed, finished = self._changed, self._finished
+                pending = [event for event in self._events if event[0] > after]
+                for event in pending:
+                    yield event
+                    after = self._cursors[token] = event[0]
+                    if self.depth < self.capacity:
+                        self._room.set()
+                if finished:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), self.heartbeat or None)
+                except TimeoutError:
+                    yield HEARTBEAT
+        finally:
+            del self._cursors[token]
+            self._room.set()
+
+    async def tail(self, after: int = 0) -> AsyncIterator[list[BufferedEvent]]:
+        """Batches of the events with seq > `after` until the terminal event:
+        each batch is everything appended since the previous one.
+
+        Unlike `follow`, a tail is passive: it never holds back `put`, so one
+        that falls behind the buffer loses events, reported by a `replay_gap`
+        event (seq 0) opening its next batch.
+        """
+        while True:
+            changed, finished = self._changed, self._finished
+            batch: list[BufferedEvent] = []
+            if self._events and self._events[0][0] > after + 1:
+                missed = self._events[0][0] - after - 1
+                batch.append((0, "replay_gap", {"missed": missed}))
+            batch.extend(event for event in self._events if event[0] > after)
+            if batch:
+                after = batch[-1][0]
+                yield batch
+            if finished:
+                return
+            await changed.wait()
+
+    def metrics(self) -> ChannelMetrics:
+        return ChannelMetrics(
+            events=self._seq,
+            depth=self.depth,
+            max_depth=self._max_depth,
+            followers=len(self._cursors),
+            fragments_coalesced=self._coalesced,
+            producer_waits=self._waits,
+        )
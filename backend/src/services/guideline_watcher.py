@@ -0,0 +1,243 @@
+"""Watch the guideline directory and reindex changed documents incrementally.
+
+The ingest daemon (`scripts/watch_guidelines.py`) wraps this watcher around
+the same per-file ingest the CLI uses, so editing one markdown file re-embeds
+only that document instead of rebuilding the whole collection.
+
+Change detection uses Linux inotify (via ctypes — no extra dependency) and
+falls back to polling directory snapshots wherever inotify is unavailable
+(macOS, some container filesystems). Either way, events only mark a path as
+pending; a path is reindexed once it has been quiet for `debounce_seconds`,
+so an editor's save burst (truncate, write, rename) costs one reindex.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants — only the events that mean "file content changed or
+# the file came/went". IN_MODIFY is deliberately left out: it fires per
+# write() call, while IN_CLOSE_WRITE fires once when the writer is done.
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_DELETE = 0x00000200
+_IN_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class WatcherMetrics(BaseModel):
+    """Point-in-time view of the watcher, for logs and the metrics endpoint."""
+
+    backend: str
+    queue_depth: int
+    oldest_pending_seconds: float
+    last_reindex_lag_seconds: float | None
+    documents_reindexed: int
+    documents_removed: int
+    errors: int
+
+
+def parse_inotify_events(buffer: bytes) -> list[tuple[int, str]]:
+    """Decode a raw inotify read() buffer into (mask, filename) pairs."""
+    events: list[tuple[int, str]] = []
+    offset = 0
+    while offset + _EVENT_HEADER.size <= len(buffer):
+        _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+        offset += _EVENT_HEADER.size
+        raw_name = buffer[offset : offset + length]
+        offset += length
+        events.append((mask, raw_name.rstrip(b"\0").decode(errors="replace")))
+    return events
+
+
+def _open_inotify(directory: Path) -> int | None:
+    """Return an inotify fd watching `directory`, or None if unsupported."""
+    libc_name = ctypes.util.find_library("c")
+    if libc_name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        init = libc.inotify_init1
+        add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:
+        return None
+    if add_watch(fd, os.fsencode(directory), _IN_WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class GuidelineWatcher:
+    """Debounced change feed over a directory of markdown guidelines.
+
+    `reindex(path)` is called for created/modified files and `remove(path)`
+    for deleted ones. Both are blocking (embedding and Qdrant calls are sync),
+    so they run in a worker thread, one document at a time — ingest order
+    stays deterministic and the embedding API never sees parallel bursts.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        reindex: Callable[[Path], int],
+        remove: Callable[[Path], None],
+        debounce_seconds: float = 2.0,
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+        pattern: str = "*.md",
+    ) -> None:
+        self.directory = directory
+        self._reindex = reindex
+        self._remove = remove
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        self.pattern = pattern
+        self._inotify_fd = _open_inotify(directory) if use_inotify else None
+        self.backend = "inotify" if self._inotify_fd is not None else "polling"
+        # path -> (first_seen, last_seen) monotonic timestamps. first_seen
+        # drives the lag metric; last_seen drives the debounce.
+        self._pending: dict[Path, tuple[float, float]] = {}
+        self._snapshot: dict[Path, tuple[int, int]] = self._scan()
+        self._last_lag: float | None = None
+        self._reindexed = 0
+        self._removed = 0
+        self._errors = 0
+
+    # --- Change detection ---
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        """(mtime_ns, size) per matching file — the polling backend's state."""
+        snapshot: dict[Path, tuple[int, int]] = {}
+        for path in self.directory.glob(self.pattern):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _mark(self, path: Path) -> None:
+        now = time.monotonic()
+        first_seen, _ = self._pending.get(path, (now, now))
+        self._pending[path] = (first_seen, now)
+
+    def mark_all(self) -> None:
+        """Queue every current file, e.g. to reconcile after daemon downtime."""
+        for path in sorted(self._scan()):
+            self._mark(path)
+
+    def _poll_changes(self) -> None:
+        snapshot = self._scan()
+        for path in snapshot.keys() | self._snapshot.keys():
+            if snapshot.get(path) != self._snapshot.get(path):
+                self._mark(path)
+        self._snapshot = snapshot
+
+    def _drain_inotify(self) -> None:
+        assert self._inotify_fd is not None
+        try:
+            buffer = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        for _mask, name in parse_inotify_events(buffer):
+            path = self.directory / name
+            if name and path.match(self.pattern):
+                self._mark(path)
+
+    # --- Processing ---
+
+    def _due(self) -> list[Path]:
+        cutoff = time.monotonic() - self.debounce_seconds
+        return sorted(p for p, (_, last) in self._pending.items() if last <= cutoff)
+
+    async def _process(self, path: Path) -> None:
+        first_seen, _ = self._pending.pop(path)
+        try:
+            if path.exists():
+                chunks = await asyncio.to_thread(self._reindex, path)
+                self._reindexed += 1
+                logger.info("Reindexed %s (%d chunks)", path.name, chunks)
+            else:
+                await asyncio.to_thread(self._remove, path)
+                self._removed += 1
+                logger.info("Removed %s from the index", path.name)
+        except Exception:
+            self._errors += 1
+            logger.exception("Reindex failed for %s", path.name)
+            return
+        self._last_lag = time.monotonic() - first_seen
+
+    async def process_due(self) -> int:
+        """Reindex every pending path that has been quiet long enough."""
+        due = self._due()
+        for path in due:
+            await self._process(path)
+        return len(due)
+
+    async def run(self, stop: asyncio.Event | None = None) -> None:
+        """Watch until `stop` is set (or forever)."""
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        if self._inotify_fd is not None:
+            loop.add_reader(self._inotify_fd, self._drain_inotify)
+        logger.info(
+            "Watching %s (%s, debounce=%.1fs)",
+            self.directory,
+            self.backend,
+            self.debounce_seconds,
+        )
+        tick = min(self.poll_interval, max(self.debounce_seconds / 2, 0.05))
+        next_poll = 0.0
+        try:
+            while not stop.is_set():
+                if self._inotify_fd is None and time.monotonic() >= next_poll:
+                    self._poll_changes()
+                    next_poll = time.monotonic() + self.poll_interval
+                await self.process_due()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=tick)
+                except TimeoutError:
+                    pass
+        finally:
+            if self._inotify_fd is not None:
+                loop.remove_reader(self._inotify_fd)
+
+    def close(self) -> None:
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def metrics(self) -> WatcherMetrics:
+        now = time.monotonic()
+        oldest = min((first for first, _ in self._pending.values()), default=now)
+        return WatcherMetrics(
+            backend=self.backend,
+            queue_depth=len(self._pending),
+            oldest_pending_seconds=round(now - oldest, 3),
+            last_reindex_lag_seconds=(
+                round(self._last_lag, 3) if self._last_lag is not None else None
+            ),
+            documents_reindexed=self._reindexed,
+            documents_removed=self._removed,
+            errors=self._errors,
+        )
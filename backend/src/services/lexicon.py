@@ -0,0 +1,169 @@
+"""Drug and condition lexicons with a compiled multi-pattern matcher.
+
+Chunks are tagged with the drugs and conditions their own text mentions, so
+Qdrant payload filters on `drugs` / `conditions` can actually narrow a search
+(a document-level tag list claims every drug for every chunk).
+
+The matcher is an Aho-Corasick automaton: all surface forms are compiled once
+into one trie with failure links, and each chunk is scanned in a single pass —
+linear in the text length regardless of how many terms the lexicon holds.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+
+# Canonical id -> extra surface forms. The canonical id itself (underscores
+# read as spaces) is always matched, so plain generics need no aliases.
+DRUG_LEXICON: dict[str, list[str]] = {
+    # Diabetes
+    "metformin": ["glucophage"],
+    "insulin": ["insulin glargine", "glargine", "basal insulin"],
+    "glipizide": [],
+    "glyburide": [],
+    "empagliflozin": ["jardiance"],
+    "dapagliflozin": ["farxiga"],
+    "semaglutide": ["ozempic"],
+    # ACE inhibitors / ARBs / ARNI
+    "lisinopril": ["zestril"],
+    "enalapril": [],
+    "ramipril": [],
+    "losartan": ["cozaar"],
+    "valsartan": [],
+    "olmesartan": [],
+    "sacubitril_valsartan": ["sacubitril/valsartan", "sacubitril", "entresto"],
+    # Other antihypertensives and diuretics
+    "amlodipine": ["norvasc"],
+    "nifedipine": [],
+    "verapamil": [],
+    "hydrochlorothiazide": ["hctz"],
+    "chlorthalidone": [],
+    "furosemide": ["lasix"],
+    "torsemide": [],
+    "bumetanide": [],
+    "spironolactone": [],
+    "eplerenone": [],
+    "amiloride": [],
+    "triamterene": [],
+    # Beta blockers and rhythm control
+    "metoprolol": ["metoprolol succinate", "toprol"],
+    "carvedilol": [],
+    "bisoprolol": [],
+    "digoxin": [],
+    "amiodarone": [],
+    # Anticoagulants and antiplatelets
+    "apixaban": ["eliquis"],
+    "rivaroxaban": ["xarelto"],
+    "dabigatran": [],
+    "edoxaban": [],
+    "warfarin": ["coumadin"],
+    "aspirin": [],
+    # Statins
+    "atorvastatin": ["lipitor"],
+    "simvastatin": ["zocor"],
+    "rosuvastatin": ["crestor"],
+    "pravastatin": [],
+    # Interacting agents named in the guidelines
+    "nsaids": ["nsaid", "ibuprofen", "naproxen"],
+    "clarithromycin": [],
+    "itraconazole": [],
+    "ritonavir": [],
+    "gentamicin": [],
+    "sulfamethoxazole": [],
+}
+
+CONDITION_LEXICON: dict[str, list[str]] = {
+    # No bare "diabetes" alias: it would tag type 1 and gestational passages
+    # as type 2.
+    "type_1_diabetes": ["type 1 diabetes mellitus", "type i diabetes", "t1dm"],
+    "type_2_diabetes": ["type 2 diabetes mellitus", "type ii diabetes", "t2dm"],
+    "gestational_diabetes": ["gestational diabetes mellitus", "gdm"],
+    "hypertension": ["htn", "high blood pressure"],
+    "chronic_kidney_disease": ["ckd", "kidney disease"],
+    "acute_kidney_injury": ["aki"],
+    "heart_failure": ["hfref", "hfpef", "chf", "congestive heart failure"],
+    "atrial_fibrillation": ["afib", "a-fib"],
+    "hyperkalemia": [],
+    "hypoglycemia": [],
+    "lactic_acidosis": [],
+    "albuminuria": ["microalbuminuria", "proteinuria"],
+    "hyperlipidemia": ["dyslipidemia", "high cholesterol"],
+    "myopathy": ["rhabdomyolysis"],
+}
+
+
+class LexiconMatcher:
+    """Aho-Corasick automaton mapping surface forms to canonical ids.
+
+    Matching is case-insensitive and whole-word: a hit must not be flanked by
+    letters or digits, so "statin" inside "atorvastatin" does not fire.
+    """
+
+    def __init__(self, lexicon: dict[str, Iterable[str]]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Per state: (term length, canonical id) for every term ending here,
+        # including those inherited along the failure chain.
+        self._out: list[list[tuple[int, str]]] = [[]]
+        for label, aliases in lexicon.items():
+            for term in {label.replace("_", " "), *aliases}:
+                self._add(term.lower(), label)
+        self._link()
+
+    def _add(self, term: str, label: str) -> None:
+        state = 0
+        for char in term:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(term), label))
+
+    def _link(self) -> None:
+        """Breadth-first pass computing failure links and merged outputs."""
+        queue: deque[int] = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> list[tuple[int, int, str]]:
+        """All whole-word matches as (start, end, canonical id), in text order."""
+        lowered = text.lower()
+        matches: list[tuple[int, int, str]] = []
+        state = 0
+        for idx, char in enumerate(lowered):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, label in self._out[state]:
+                start, end = idx - length + 1, idx + 1
+                if start > 0 and lowered[start - 1].isalnum():
+                    continue
+                if end < len(lowered) and lowered[end].isalnum():
+                    continue
+                matches.append((start, end, label))
+        return matches
+
+    def labels(self, text: str) -> list[str]:
+        """Sorted canonical ids mentioned in `text` (deterministic payloads)."""
+        return sorted({label for _, _, label in self.find(text)})
+
+
+DRUG_MATCHER = LexiconMatcher(DRUG_LEXICON)
+CONDITION_MATCHER = LexiconMatcher(CONDITION_LEXICON)
+
+
+def tag_text(text: str) -> tuple[list[str], list[str]]:
+    """Return (conditions, drugs) mentioned in `text`."""
+    return CONDITION_MATCHER.labels(text), DRUG_MATCHER.labels(text)
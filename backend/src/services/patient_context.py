@@ -0,0 +1,172 @@
+"""Compact, deterministic patient encoding for agent prompts.
+
+`_serialize_patient` (pretty-printed JSON) is what the briefing fingerprint
+hashes, but as prompt text it is mostly whitespace and repeated keys: every
+lab object restates name/value/unit/date/reference_range, and every visit
+ever recorded is included. The compiled context instead renders
+
+- demographics, conditions and allergies on one line each;
+- medications as a pipe-separated table;
+- labs as one row per analyte — the latest result, its reference range and
+  a trend across all dated results (via pre_analysis.lab_trends);
+- visits within `prompt_visit_window_days` of the most recent one, capped at
+  `prompt_max_visits`, with a count of what was left out.
+
+The same record always compiles to the same text, so prompts stay stable
+between runs. Sizes are estimated with the chunker's ~4 chars/token rule and
+logged on every compile.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from src.config import settings
+from src.models.orm import Patient
+from src.services.document_processor import _estimate_tokens
+from src.services.pre_analysis import _fmt, _normalize, _parse_labs, _series, lab_trends
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PatientContext:
+    text: str
+    # Estimated tokens of the pretty JSON record vs. the compiled text.
+    tokens_before: int
+    tokens_after: int
+
+
+def _cell(value: Any) -> str:
+    if value is None or value == "":
+        return "-"
+    if isinstance(value, float):
+        return _fmt(value)
+    if isinstance(value, dict | list):
+        value = json.dumps(value, separators=(",", ":"), default=str)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _table(heading: str, rows: list[dict[str, Any]]) -> list[str]:
+    """Heading with the column names, then one pipe-separated line per row.
+
+    Columns are the union of the rows' keys in first-seen order, so fields
+    outside the usual shape are kept rather than dropped.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    lines = [f"{heading} ({'|'.join(columns)}):"]
+    lines += ["|".join(_cell(row.get(col)) for col in columns) for row in rows]
+    return lines
+
+
+def _reference(lab: dict[str, Any]) -> str:
+    ref = lab.get("reference_range")
+    if not isinstance(ref, dict):
+        return _cell(ref)
+    low, high = ref.get("min"), ref.get("max")
+    if isinstance(high, int | float) and high >= 999:
+        return f">= {_cell(low)}"
+    return f"{_cell(low)} to {_cell(high)}"
+
+
+def _lab_lines(labs: list[dict[str, Any]]) -> list[str]:
+    by_analyte: dict[str, list[dict[str, Any]]] = {}
+    for lab in labs:
+        by_analyte.setdefault(_normalize(str(lab.get("name", ""))), []).append(lab)
+    trends = {
+        _normalize(trend.name): trend
+        for trend in lab_trends(_series(_parse_labs(labs)))
+    }
+
+    lines = ["LABS (latest per analyte; analyte|value|unit|reference|date|trend):"]
+    for key, results in by_analyte.items():
+        latest = max(results, key=lambda lab: str(lab.get("date", "")))
+        trend = trends.get(key)
+        trend_text = "-"
+        if trend is not None:
+            trend_text = (
+                f"{trend.direction} from {_fmt(trend.first_value)} "
+                f"({trend.first_date.isoformat()}), {trend.status}, "
+                f"{len(results)} results"
+            )
+        extra = {
+            k: v
+            for k, v in latest.items()
+            if k not in ("name", "value", "unit", "date", "reference_range")
+        }
+        cells = [
+            latest.get("name"),
+            latest.get("value"),
+            latest.get("unit"),
+            _reference(latest),
+            latest.get("date"),
+            trend_text,
+        ]
+        line = "|".join(_cell(cell) for cell in cells)
+        if extra:
+            line += f"|{_cell(extra)}"
+        lines.append(line)
+    return lines
+
+
+def _visit_lines(visits: list[dict[str, Any]]) -> list[str]:
+    ordered = sorted(visits, key=lambda v: str(v.get("date", "")), reverse=True)
+    try:
+        newest = datetime.date.fromisoformat(str(ordered[0]["date"]))
+        cutoff = (
+            newest - datetime.timedelta(days=settings.prompt_visit_window_days)
+        ).isoformat()
+        kept = [v for v in ordered if str(v.get("date", "")) >= cutoff]
+    except (KeyError, ValueError):
+        kept = ordered
+    kept = kept[: settings.prompt_max_visits] or ordered[:1]
+    heading = "VISITS"
+    if len(kept) < len(ordered):
+        heading += f" ({len(ordered) - len(kept)} older omitted)"
+    return _table(heading, kept)
+
+
+def compile_patient_context(patient: Patient) -> PatientContext:
+    """Compile the record for a prompt and estimate the tokens saved."""
+    lines = [
+        (
+            f"PATIENT: {patient.name} | {patient.gender} | "
+            f"born {patient.date_of_birth.isoformat()}"
+        ),
+        f"CONDITIONS: {'; '.join(patient.conditions) or 'none recorded'}",
+        f"ALLERGIES: {'; '.join(patient.allergies) or 'none recorded'}",
+    ]
+    if patient.medications:
+        lines += _table("MEDICATIONS", patient.medications)
+    else:
+        lines.append("MEDICATIONS: none recorded")
+    lines += _lab_lines(patient.labs) if patient.labs else ["LABS: none recorded"]
+    if patient.visits:
+        lines += _visit_lines(patient.visits)
+    else:
+        lines.append("VISITS: none recorded")
+    text = "\n".join(lines)
+    # Local import: briefing_service builds its prompts from this module.
+    from src.services.briefing_service import _serialize_patient
+
+    return PatientContext(
+        text=text,
+        tokens_before=_estimate_tokens(_serialize_patient(patient)),
+        tokens_after=_estimate_tokens(text),
+    )
+
+
+def patient_context(patient: Patient) -> str:
+    """The compiled record as prompt text; logs the before/after estimate."""
+    context = compile_patient_context(patient)
+    logger.info(
+        "Patient context for %s: ~%d -> ~%d tokens",
+        patient.id,
+        context.tokens_before,
+        context.tokens_after,
+    )
+    return context.text
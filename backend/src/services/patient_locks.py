@@ -0,0 +1,212 @@
+"""Per-patient mutual exclusion that holds across uvicorn workers.
+
+A chat turn resumes the patient's single SDK session transcript, so two
+turns for one patient must never overlap — and with several workers, an
+asyncio.Lock only covers the turns of its own process. `PatientLocks` takes
+two locks, in order:
+
+1. an in-process asyncio.Lock (the fast path): turns in the same worker
+   queue here without touching the database, so at most one connection per
+   patient per worker ever waits on Postgres;
+2. on Postgres, a session-level advisory lock keyed (namespace, patient id),
+   held on a dedicated autocommit connection until release. Other
+   databases (SQLite in tests and local runs) are single-process and skip
+   this step.
+
+In-process lock objects are reference counted by holders and waiters and
+dropped when the count reaches zero, so the table no longer grows with
+every patient ever chatted with.
+
+Waiters form an explicit FIFO queue per patient (asyncio.Lock wakes them in
+arrival order): `acquire` can refuse to queue past `max_waiting` and reports
+the caller's position through `on_position` whenever it changes. The queue
+is per process; across workers the advisory lock still serializes turns,
+just without positions.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+class PatientQueueFullError(Exception):
+    """Raised by `acquire` when `max_waiting` acquirers are already queued."""
+
+    def __init__(self, patient_id: int, waiting: int) -> None:
+        super().__init__(f"{waiting} turns already queued for patient {patient_id}")
+        self.patient_id = patient_id
+        self.waiting = waiting
+
+
+@dataclass
+class _Entry:
+    lock: asyncio.Lock
+    # Holders plus waiters; the entry is evicted when this reaches zero.
+    users: int = 0
+    # One position callback per acquirer still waiting, in arrival order.
+    queue: list[Callable[[int], None]] = field(default_factory=list)
+
+    def leave(self, notify: Callable[[int], None]) -> None:
+        if notify in self.queue:
+            self.queue.remove(notify)
+            for position, waiter in enumerate(self.queue, start=1):
+                waiter(position)
+
+
+class HeldPatientLock:
+    """A patient lock acquired by `PatientLocks.acquire`; release exactly once.
+
+    May be released from a different task than the one that acquired it
+    (a chat turn is acquired by the request and released by the turn).
+    """
+
+    def __init__(
+        self,
+        owner: PatientLocks,
+        patient_id: int,
+        entry: _Entry,
+        conn: AsyncConnection | None,
+    ) -> None:
+        self.patient_id = patient_id
+        self._owner = owner
+        self._entry = entry
+        self._conn = conn
+        self._released = False
+
+    async def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        try:
+            if self._conn is not None:
+                await self._owner._unlock(self._conn, self.patient_id)
+        finally:
+            self._entry.lock.release()
+            self._owner._unref(self.patient_id, self._entry)
+
+
+class PatientLocks:
+    """Per-patient locks: in-process first, then a Postgres advisory lock."""
+
+    def __init__(self, namespace: int) -> None:
+        # First key of the two-int advisory lock form, so lock families
+        # (chat, ...) keyed by the same patient id don't collide.
+        self.namespace = namespace
+        self._entries: dict[int, _Entry] = {}
+
+    def locked(self, patient_id: int) -> bool:
+        """Whether this process holds (or is acquiring) the patient's lock."""
+        return patient_id in self._entries
+
+    def waiting(self, patient_id: int) -> int:
+        """Acquirers in this process queued behind the patient's holder."""
+        entry = self._entries.get(patient_id)
+        return len(entry.queue) if entry is not None else 0
+
+    async def acquire(
+        self,
+        patient_id: int,
+        bind: AsyncEngine | None,
+        *,
+        max_waiting: int | None = None,
+        on_position: Callable[[int], None] | None = None,
+    ) -> HeldPatientLock:
+        """Wait for the patient's lock; `bind` decides the cross-worker step.
+
+        If the lock is taken, the caller joins the patient's queue — or,
+        with `max_waiting` acquirers already in it, gets PatientQueueFullError
+        instead. `on_position` is called with the caller's 1-based place in
+        the queue on joining and each time someone ahead leaves.
+        """
+        entry = self._entries.get(patient_id)
+        if entry is None:
+            entry = self._entries[patient_id] = _Entry(asyncio.Lock())
+        must_wait = entry.lock.locked() or bool(entry.queue)
+        if must_wait and max_waiting is not None and len(entry.queue) >= max_waiting:
+            raise PatientQueueFullError(patient_id, len(entry.queue))
+
+        def notify(position: int) -> None:
+            if on_position is not None:
+                on_position(position)
+
+        entry.users += 1
+        if must_wait:
+            entry.queue.append(notify)
+            notify(len(entry.queue))
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            self._unref(patient_id, entry)
+            raise
+        finally:
+            entry.leave(notify)
+        try:
+            conn = None
+            if bind is not None and bind.dialect.name == "postgresql":
+                conn = await self._advisory_lock(bind, patient_id)
+        except BaseException:
+            entry.lock.release()
+            self._unref(patient_id, entry)
+            raise
+        return HeldPatientLock(self, patient_id, entry, conn)
+
+    @asynccontextmanager
+    async def hold(
+        self, patient_id: int, bind: AsyncEngine | None
+    ) -> AsyncIterator[None]:
+        held = await self.acquire(patient_id, bind)
+        try:
+            yield
+        finally:
+            await held.release()
+
+    def _unref(self, patient_id: int, entry: _Entry) -> None:
+        entry.users -= 1
+        if entry.users == 0 and self._entries.get(patient_id) is entry:
+            del self._entries[patient_id]
+
+    async def _advisory_lock(
+        self, bind: AsyncEngine, patient_id: int
+    ) -> AsyncConnection:
+        conn = await bind.connect()
+        try:
+            # Autocommit: the lock is session-level, and without it the
+            # connection would sit idle in transaction for the whole turn.
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(
+                text("SELECT pg_advisory_lock(:namespace, :key)"),
+                {"namespace": self.namespace, "key": patient_id},
+            )
+        except BaseException:
+            # Cancelled mid-wait, the lock may have been granted anyway;
+            # dropping the server session is the only way to be sure it isn't.
+            await conn.invalidate()
+            await conn.close()
+            raise
+        logger.debug("Advisory lock (%d, %d) acquired", self.namespace, patient_id)
+        return conn
+
+    async def _unlock(self, conn: AsyncConnection, patient_id: int) -> None:
+        try:
+            await conn.execute(
+                text("SELECT pg_advisory_unlock(:namespace, :key)"),
+                {"namespace": self.namespace, "key": patient_id},
+            )
+        except BaseException:
+            await conn.invalidate()
+            raise
+        finally:
+            await conn.close()
+
+
+# Chat turns and conversation resets ("CHAT" as an int32).
+chat_locks = PatientLocks(namespace=0x43484154)
@@ -0,0 +1,704 @@
+"""Deterministic pre-analysis of a patient record — no LLM involved.
+
+Everything here is arithmetic or a table lookup the agent used to spend
+turns on: each lab carries its reference range, so out-of-range flags (and
+how far out), trends across dated results, age/gender screening gaps and a
+handful of well-known medication checks can be computed before the agent
+runs. The result is
+
+- rendered into the agent prompt (`format_for_prompt`), so the model starts
+  from verified findings and spends its turns on guideline evidence;
+- merged into the final briefing as flags with source "rules";
+- served on its own as an instant, LLM-free fast briefing (`fast_briefing`).
+
+Bump RULES_VERSION when a rule changes: it is part of the briefing
+fingerprint, so stored briefings built on the old rules stop matching.
+"""
+
+from __future__ import annotations
+
+import datetime
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from src.models.orm import Patient
+from src.models.schemas import (
+    FastBriefingResponse,
+    Flag,
+    LabTrend,
+    PreAnalysis,
+    SuggestedAction,
+    Summary,
+)
+
+RULES_VERSION = "1"
+
+# Distance outside the reference range, as a multiple of the range scale
+# (see _deviation), at which a lab flag becomes a warning / critical.
+WARNING_DEVIATION = 0.25
+CRITICAL_DEVIATION = 2.0
+# A trend moving less than this fraction of the range scale is "stable".
+TREND_STABLE_FRACTION = 0.05
+
+# Panic values that are critical regardless of the banding above:
+# normalized lab name -> (critical at or below, critical at or above).
+_CRITICAL_LIMITS: dict[str, tuple[float | None, float | None]] = {
+    "potassium": (3.0, 6.0),
+    "sodium": (125.0, 155.0),
+    "egfr": (30.0, None),
+    "inr": (None, 4.5),
+    "hemoglobin": (8.0, None),
+    "spo2": (88.0, None),
+}
+
+_SEVERITY_ORDER = {"critical": 0, "warning": 1, "info": 2}
+
+
+# --- Labs ---
+
+
+@dataclass(frozen=True)
+class _Lab:
+    name: str
+    value: float
+    unit: str
+    date: datetime.date
+    low: float
+    high: float
+
+    @property
+    def key(self) -> str:
+        return _normalize(self.name)
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"\s+", " ", name.strip().lower())
+
+
+def _parse_labs(labs: Iterable[dict]) -> list[_Lab]:
+    """Numeric, dated labs with a reference range; anything else is skipped."""
+    parsed = []
+    for lab in labs:
+        ref = lab.get("reference_range") or {}
+        try:
+            parsed.append(
+                _Lab(
+                    name=lab["name"],
+                    value=float(lab["value"]),
+                    unit=lab.get("unit", ""),
+                    date=datetime.date.fromisoformat(lab["date"]),
+                    low=float(ref["min"]),
+                    high=float(ref["max"]),
+                )
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+    return parsed
+
+
+def _series(labs: list[_Lab]) -> dict[str, list[_Lab]]:
+    """Results per lab, oldest first."""
+    series: dict[str, list[_Lab]] = {}
+    for lab in sorted(labs, key=lambda lab: lab.date):
+        series.setdefault(lab.key, []).append(lab)
+    return series
+
+
+def _scale(lab: _Lab, limit: float) -> float:
+    """What "one range" means for this lab. The width, except for open-ended
+    ranges (e.g. a T-score with max 999) where the limit itself is closer."""
+    width = lab.high - lab.low
+    candidates = [v for v in (width, abs(limit)) if v > 0]
+    return min(candidates) if candidates else 1.0
+
+
+def _deviation(lab: _Lab, value: float | None = None) -> float:
+    """Signed distance outside the range in range-scale units (0 inside)."""
+    value = lab.value if value is None else value
+    if value > lab.high:
+        return (value - lab.high) / _scale(lab, lab.high)
+    if value < lab.low:
+        return -(lab.low - value) / _scale(lab, lab.low)
+    return 0.0
+
+
+def _lab_severity(lab: _Lab) -> str:
+    low, high = _CRITICAL_LIMITS.get(lab.key, (None, None))
+    if (low is not None and lab.value <= low) or (
+        high is not None and lab.value >= high
+    ):
+        return "critical"
+    deviation = abs(_deviation(lab))
+    if deviation >= CRITICAL_DEVIATION:
+        return "critical"
+    if deviation >= WARNING_DEVIATION:
+        return "warning"
+    return "info"
+
+
+def _fmt(value: float) -> str:
+    return f"{value:g}"
+
+
+def _range_text(lab: _Lab) -> str:
+    # Open-ended ranges are stored with a sentinel bound (e.g. max 999).
+    if lab.high >= 999:
+        return f">= {_fmt(lab.low)}"
+    return f"{_fmt(lab.low)} to {_fmt(lab.high)}"
+
+
+def lab_flags(latest: Iterable[_Lab]) -> list[Flag]:
+    """One flag per lab whose most recent result is outside its range."""
+    flags = []
+    for lab in latest:
+        deviation = _deviation(lab)
+        if deviation == 0:
+            continue
+        flags.append(
+            Flag(
+                category="labs",
+                severity=_lab_severity(lab),
+                title=f"{lab.name} {'above' if deviation > 0 else 'below'} range",
+                description=(
+                    f"{lab.name} {_fmt(lab.value)} {lab.unit} on "
+                    f"{lab.date.isoformat()} (reference {_range_text(lab)})."
+                ),
+                source="rules",
+            )
+        )
+    return flags
+
+
+def lab_trends(series: dict[str, list[_Lab]]) -> list[LabTrend]:
+    """Direction of each lab with two or more dated results, first to last."""
+    trends = []
+    for results in series.values():
+        if len(results) < 2:
+            continue
+        first, last = results[0], results[-1]
+        change = last.value - first.value
+        if abs(change) < TREND_STABLE_FRACTION * _scale(last, last.high):
+            direction, status = "stable", "stable"
+        else:
+            direction = "rising" if change > 0 else "falling"
+            before = abs(_deviation(last, first.value))
+            after = abs(_deviation(last))
+            if after > before:
+                status = "worsening"
+            elif after < before:
+                status = "improving"
+            else:
+                status = "stable"
+        trends.append(
+            LabTrend(
+                name=last.name,
+                unit=last.unit,
+                first_date=first.date,
+                first_value=first.value,
+                last_date=last.date,
+                last_value=last.value,
+                direction=direction,
+                status=status,
+            )
+        )
+    return trends
+
+
+def trend_flags(trends: Iterable[LabTrend], latest: dict[str, _Lab]) -> list[Flag]:
+    """Worsening trends: a warning once out of range, info while inside it."""
+    flags = []
+    for trend in trends:
+        if trend.status != "worsening":
+            continue
+        lab = latest[_normalize(trend.name)]
+        flags.append(
+            Flag(
+                category="labs",
+                severity="warning" if _deviation(lab) else "info",
+                title=f"{trend.name} {trend.direction}",
+                description=(
+                    f"{trend.name} {trend.direction} from {_fmt(trend.first_value)} "
+                    f"({trend.first_date.isoformat()}) to {_fmt(trend.last_value)} "
+                    f"{trend.unit} ({trend.last_date.isoformat()}), moving away "
+                    f"from the reference range."
+                ),
+                source="rules",
+            )
+        )
+    return flags
+
+
+# --- Screenings ---
+
+
+@dataclass(frozen=True)
+class _Screening:
+    name: str
+    # Matched against lab names and visit reasons to find the last one done.
+    keywords: tuple[str, ...]
+    interval_days: int
+    min_age: int = 0
+    max_age: int = 200
+    gender: str | None = None
+    # Only for patients with a condition containing this text.
+    condition: str | None = None
+    # Population screenings are skipped when this condition is present
+    # (screening for something already diagnosed).
+    unless_condition: str | None = None
+    severity: str = "info"
+
+
+_SCREENINGS = (
+    _Screening(
+        "Colorectal cancer screening",
+        ("colonoscopy", "colorectal", "fit test", "cologuard", "sigmoidoscopy"),
+        interval_days=10 * 365,
+        min_age=45,
+        max_age=75,
+    ),
+    _Screening(
+        "Breast cancer screening (mammogram)",
+        ("mammogram", "mammography"),
+        interval_days=2 * 365,
+        min_age=40,
+        max_age=74,
+        gender="F",
+    ),
+    _Screening(
+        "Cervical cancer screening",
+        ("pap", "cervical", "hpv"),
+        interval_days=3 * 365,
+        min_age=21,
+        max_age=65,
+        gender="F",
+    ),
+    _Screening(
+        "Lipid panel",
+        ("cholesterol", "ldl", "lipid"),
+        interval_days=5 * 365,
+        min_age=40,
+        max_age=75,
+    ),
+    _Screening(
+        "Diabetes screening (HbA1c or fasting glucose)",
+        ("hba1c", "a1c", "glucose"),
+        interval_days=3 * 365,
+        min_age=35,
+        max_age=70,
+        unless_condition="diabetes",
+    ),
+    _Screening(
+        "Osteoporosis screening (DEXA)",
+        ("dexa", "bone density"),
+        interval_days=2 * 365,
+        min_age=65,
+        gender="F",
+    ),
+    _Screening(
+        "HbA1c monitoring",
+        ("hba1c", "a1c"),
+        interval_days=182,
+        condition="diabetes",
+        severity="warning",
+    ),
+    _Screening(
+        "Diabetic eye exam",
+        ("eye exam", "retina", "retinal", "ophthalm"),
+        interval_days=365,
+        condition="diabetes",
+        severity="warning",
+    ),
+    _Screening(
+        "Urine albumin-to-creatinine ratio",
+        ("albumin", "uacr", "microalbumin"),
+        interval_days=365,
+        condition="diabetes",
+        severity="warning",
+    ),
+    _Screening(
+        "Urine albumin-to-creatinine ratio",
+        ("albumin", "uacr", "microalbumin"),
+        interval_days=365,
+        condition="ckd",
+        severity="warning",
+    ),
+)
+
+
+def _age(date_of_birth: datetime.date, as_of: datetime.date) -> int:
+    return (
+        as_of.year
+        - date_of_birth.year
+        - ((as_of.month, as_of.day) < (date_of_birth.month, date_of_birth.day))
+    )
+
+
+def _last_done(patient: Patient, keywords: tuple[str, ...]) -> datetime.date | None:
+    """Latest lab or visit matching `keywords`; malformed records are skipped."""
+    records = [(lab, "name") for lab in patient.labs] + [
+        (visit, "reason") for visit in patient.visits
+    ]
+    dates = []
+    for record, field in records:
+        try:
+            if not any(k in _normalize(record[field]) for k in keywords):
+                continue
+            dates.append(datetime.date.fromisoformat(record["date"]))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return max(dates, default=None)
+
+
+def screening_flags(patient: Patient, as_of: datetime.date) -> list[Flag]:
+    """Screenings due by age/gender/condition with no record inside the interval."""
+    age = _age(patient.date_of_birth, as_of)
+    conditions = [_normalize(c) for c in patient.conditions]
+    flags = []
+    seen = set()
+    for rule in _SCREENINGS:
+        if rule.name in seen or not rule.min_age <= age <= rule.max_age:
+            continue
+        if rule.gender and patient.gender.upper() != rule.gender:
+            continue
+        if rule.condition and not any(rule.condition in c for c in conditions):
+            continue
+        if rule.unless_condition and any(
+            rule.unless_condition in c for c in conditions
+        ):
+            continue
+        last = _last_done(patient, rule.keywords)
+        if last is not None and (as_of - last).days <= rule.interval_days:
+            continue
+        seen.add(rule.name)
+        when = (
+            f"last on record {last.isoformat()}"
+            if last is not None
+            else "none on record"
+        )
+        flags.append(
+            Flag(
+                category="screenings",
+                severity=rule.severity,
+                title=f"{rule.name} due",
+                description=(
+                    f"{rule.name} is due for this {age}-year-old patient "
+                    f"({when}; recommended every "
+                    f"{_interval_text(rule.interval_days)})."
+                ),
+                source="rules",
+                suggested_action=f"Confirm or schedule {rule.name[0].lower()}{rule.name[1:]}",
+            )
+        )
+    return flags
+
+
+def _interval_text(days: int) -> str:
+    if days < 365:
+        return f"{round(days / 30.4)} months"
+    if days < 730:
+        return "year"
+    return f"{days // 365} years"
+
+
+# --- Medications ---
+
+_DRUG_CLASSES: dict[str, tuple[str, ...]] = {
+    "ace_inhibitor": (
+        "lisinopril",
+        "enalapril",
+        "ramipril",
+        "benazepril",
+        "captopril",
+        "quinapril",
+        "perindopril",
+    ),
+    "arb": (
+        "losartan",
+        "valsartan",
+        "irbesartan",
+        "olmesartan",
+        "candesartan",
+        "telmisartan",
+    ),
+    "potassium_sparing": ("spironolactone", "eplerenone", "amiloride", "triamterene"),
+    "nsaid": (
+        "ibuprofen",
+        "naproxen",
+        "diclofenac",
+        "celecoxib",
+        "meloxicam",
+        "indomethacin",
+        "ketorolac",
+    ),
+    "anticoagulant": ("warfarin", "apixaban", "rivaroxaban", "dabigatran", "edoxaban"),
+    "antiplatelet": ("aspirin", "clopidogrel", "ticagrelor", "prasugrel"),
+    "bisphosphonate": ("alendronate", "risedronate", "ibandronate"),
+}
+
+# Allergy (normalized, "drugs"/"drug" suffix dropped) -> medications it covers.
+_ALLERGY_CLASSES: dict[str, tuple[str, ...]] = {
+    "penicillin": (
+        "penicillin",
+        "amoxicillin",
+        "ampicillin",
+        "piperacillin",
+        "nafcillin",
+        "dicloxacillin",
+    ),
+    "sulfa": ("sulfamethoxazole", "sulfasalazine", "sulfadiazine"),
+    "aspirin": ("aspirin",) + _DRUG_CLASSES["nsaid"],
+    "nsaid": _DRUG_CLASSES["nsaid"],
+}
+
+_DOSE_MG_RE = re.compile(r"(\d+(?:\.\d+)?)\s*mg", re.IGNORECASE)
+_TIMES_PER_DAY = {
+    "once daily": 1,
+    "twice daily": 2,
+    "three times daily": 3,
+    "four times daily": 4,
+}
+
+
+def _daily_mg(medication: dict) -> float | None:
+    match = _DOSE_MG_RE.search(medication.get("dosage") or "")
+    times = _TIMES_PER_DAY.get(_normalize(medication.get("frequency") or ""))
+    if match is None or times is None:
+        return None
+    return float(match.group(1)) * times
+
+
+def _med_flag(severity: str, title: str, description: str, action: str) -> Flag:
+    return Flag(
+        category="medications",
+        severity=severity,
+        title=title,
+        description=description,
+        source="rules",
+        suggested_action=action,
+    )
+
+
+def medication_flags(patient: Patient, latest: dict[str, _Lab]) -> list[Flag]:
+    """Dose, monitoring, combination and allergy checks from fixed tables."""
+    meds = {_normalize(m.get("name", "")): m for m in patient.medications}
+
+    def taking(drug_class: str) -> list[str]:
+        return [
+            name
+            for name in meds
+            if any(drug in name for drug in _DRUG_CLASSES[drug_class])
+        ]
+
+    conditions = [_normalize(c) for c in patient.conditions]
+    egfr = latest.get("egfr")
+    potassium = latest.get("potassium")
+    flags = []
+
+    metformin = next((m for name, m in meds.items() if "metformin" in name), None)
+    if metformin is not None and egfr is not None and egfr.value <= 45:
+        daily = _daily_mg(metformin)
+        if egfr.value < 30:
+            flags.append(
+                _med_flag(
+                    "critical",
+                    "Metformin contraindicated at current eGFR",
+                    f"Metformin with eGFR {_fmt(egfr.value)} (<30).",
+                    "Stop metformin and review glucose-lowering therapy",
+                )
+            )
+        elif daily is None:
+            flags.append(
+                _med_flag(
+                    "info",
+                    "Verify metformin dose",
+                    f'Metformin dose "{metformin.get("dosage", "")} '
+                    f'{metformin.get("frequency", "")}" could not be read; with '
+                    f"eGFR {_fmt(egfr.value)} the maximum is 1000 mg/day.",
+                    "Confirm metformin is at most 1000 mg/day",
+                )
+            )
+        elif daily > 1000:
+            flags.append(
+                _med_flag(
+                    "warning",
+                    "Metformin dose above renal limit",
+                    f"Metformin {metformin.get('dosage', '')} "
+                    f"{metformin.get('frequency', '')} ({_fmt(daily)} mg/day) "
+                    f"with eGFR {_fmt(egfr.value)}; maximum 1000 mg/day at "
+                    "eGFR 30-45.",
+                    "Reduce metformin to at most 1000 mg/day",
+                )
+            )
+
+    raas = taking("ace_inhibitor") + taking("arb") + taking("potassium_sparing")
+    if raas and potassium is not None and potassium.value > potassium.high:
+        flags.append(
+            _med_flag(
+                "warning",
+                "Hyperkalemia on potassium-raising therapy",
+                f"Potassium {_fmt(potassium.value)} {potassium.unit} while taking "
+                f"{', '.join(raas)}.",
+                "Recheck potassium and review RAAS blockade dosing",
+            )
+        )
+    if taking("ace_inhibitor") and taking("arb"):
+        flags.append(
+            _med_flag(
+                "warning",
+                "Dual RAAS blockade",
+                "ACE inhibitor and ARB prescribed together: "
+                f"{', '.join(taking('ace_inhibitor') + taking('arb'))}.",
+                "Review need for combined ACE inhibitor and ARB",
+            )
+        )
+
+    nsaids = taking("nsaid")
+    ckd = any("ckd" in c or "kidney" in c for c in conditions) or (
+        egfr is not None and egfr.value < 60
+    )
+    if nsaids and ckd:
+        flags.append(
+            _med_flag(
+                "warning",
+                "NSAID with reduced kidney function",
+                f"{', '.join(nsaids)} with CKD or eGFR below 60.",
+                "Consider stopping the NSAID",
+            )
+        )
+    bleeding = taking("anticoagulant") + taking("antiplatelet") + nsaids
+    if taking("anticoagulant") and len(bleeding) > 1:
+        flags.append(
+            _med_flag(
+                "warning",
+                "Combined bleeding risk",
+                f"Anticoagulant combined with other bleeding-risk drugs: "
+                f"{', '.join(bleeding)}.",
+                "Review antithrombotic combination and bleeding risk",
+            )
+        )
+    if any("warfarin" in name for name in meds) and "inr" not in latest:
+        flags.append(
+            _med_flag(
+                "warning",
+                "Warfarin without INR on record",
+                "Patient takes warfarin but no INR result is recorded.",
+                "Order INR",
+            )
+        )
+    bisphosphonates = taking("bisphosphonate")
+    if bisphosphonates and egfr is not None and egfr.value < 35:
+        flags.append(
+            _med_flag(
+                "warning",
+                "Bisphosphonate with eGFR below 35",
+                f"{', '.join(bisphosphonates)} with eGFR {_fmt(egfr.value)}.",
+                "Review bisphosphonate use at this kidney function",
+            )
+        )
+
+    for allergy in patient.allergies:
+        key = re.sub(r"\s+drugs?$", "", _normalize(allergy))
+        if not key:
+            # A blank entry would substring-match every medication.
+            continue
+        covered = _ALLERGY_CLASSES.get(key, (key,))
+        for name, med in meds.items():
+            if any(drug in name for drug in covered):
+                flags.append(
+                    _med_flag(
+                        "critical",
+                        f"{med.get('name', name)} conflicts with allergy",
+                        f"Recorded allergy to {allergy}.",
+                        "Verify the allergy and stop or replace the medication",
+                    )
+                )
+    return flags
+
+
+# --- Entry points ---
+
+
+def analyze_patient(
+    patient: Patient, as_of: datetime.date | None = None
+) -> PreAnalysis:
+    """Run every rule against the record; flags sorted most severe first."""
+    as_of = as_of or datetime.date.today()
+    series = _series(_parse_labs(patient.labs))
+    latest = {key: results[-1] for key, results in series.items()}
+    trends = lab_trends(series)
+    flags = (
+        lab_flags(latest.values())
+        + trend_flags(trends, latest)
+        + medication_flags(patient, latest)
+        + screening_flags(patient, as_of)
+    )
+    flags.sort(key=lambda flag: _SEVERITY_ORDER[flag.severity])
+    return PreAnalysis(flags=flags, trends=trends)
+
+
+def format_for_prompt(analysis: PreAnalysis) -> str:
+    """The pre-analysis as a prompt section for the briefing agent."""
+    lines = ["PRE-ANALYSIS (deterministic rules, already verified):"]
+    if not analysis.flags and not analysis.trends:
+        lines.append(
+            "- No out-of-range labs, trends, screening gaps or medication issues."
+        )
+    for flag in analysis.flags:
+        lines.append(
+            f"- [{flag.category}/{flag.severity}] {flag.title}: {flag.description}"
+        )
+    for trend in analysis.trends:
+        lines.append(
+            f"- [trend/{trend.status}] {trend.name} {trend.direction}: "
+            f"{_fmt(trend.first_value)} ({trend.first_date.isoformat()}) -> "
+            f"{_fmt(trend.last_value)} {trend.unit} ({trend.last_date.isoformat()})"
+        )
+    return "\n".join(lines)
+
+
+def fast_briefing(
+    patient: Patient, as_of: datetime.date | None = None
+) -> FastBriefingResponse:
+    """A complete briefing from the rules alone: no agent, no retrieval."""
+    as_of = as_of or datetime.date.today()
+    analysis = analyze_patient(patient, as_of)
+    age = _age(patient.date_of_birth, as_of)
+    sex = {"F": "female", "M": "male"}.get(patient.gender.upper(), "patient")
+    conditions = ", ".join(patient.conditions) or "no recorded conditions"
+    # Undated visits can't be ordered; a malformed record must not fail the
+    # fallback itself.
+    last_visit = max(
+        (v for v in patient.visits if v.get("date")),
+        key=lambda v: str(v["date"]),
+        default=None,
+    )
+    history = [
+        f"{len(patient.medications)} active medications",
+        f"allergies: {', '.join(patient.allergies) or 'none recorded'}",
+    ]
+    if last_visit is not None:
+        history.append(
+            f"last visit {last_visit['date']} ({last_visit.get('reason', 'no reason')})"
+        )
+    actions = [
+        SuggestedAction(
+            action=flag.suggested_action,
+            reason=flag.title,
+            priority=priority,
+        )
+        for priority, flag in enumerate(
+            (f for f in analysis.flags if f.suggested_action), start=1
+        )
+    ][:5]
+    return FastBriefingResponse(
+        flags=analysis.flags,
+        summary=Summary(
+            one_liner=f"{age}-year-old {sex} with {conditions}",
+            key_conditions=list(patient.conditions),
+            relevant_history="; ".join(history) + ".",
+        ),
+        suggested_actions=actions,
+        trends=analysis.trends,
+        generated_at=datetime.datetime.now(datetime.UTC),
+    )
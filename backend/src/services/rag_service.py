@@ -3,22 +3,44 @@
 from __future__ import annotations
 
 import logging
+import time
 import uuid
+from collections.abc import Callable, Collection
+from typing import Any
 
 import httpx
 from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
 from qdrant_client.models import (
     Distance,
     FieldCondition,
     Filter,
+    FilterSelector,
+    MatchAny,
     MatchValue,
     PayloadSchemaType,
     PointStruct,
+    Range,
+    Record,
     VectorParams,
 )
 
 from src.config import settings
-from src.models.rag import DocumentChunk, RetrievalResult
+from src.models.rag import (
+    ChunkReference,
+    DocumentChunk,
+    EmbeddingSpec,
+    IndexResult,
+    RetrievalResult,
+)
+from src.services.dedup import (
+    DUPLICATE_THRESHOLD,
+    estimate_jaccard,
+    find_batch_duplicates,
+    is_near_duplicate,
+    lsh_bands,
+    minhash,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -52,24 +74,174 @@ def get_async_qdrant_client() -> AsyncQdrantClient:
     return _async_qdrant_client
 
 
+# --- Embedding model of the served index ---
+#
+# settings.qdrant_collection is the logical name every read and write uses.
+# After an embedding-model migration (src/services/embedding_migration.py) it
+# is a Qdrant alias for a physical collection named
+# "<logical>__<model>__<dimensions>", so the model the live index was built
+# with is always recoverable — and query embeddings always use it, whatever
+# Settings currently say. A plain (pre-migration) collection under the
+# logical name is assumed to match Settings.
+
+_SPEC_SEPARATOR = "__"
+_SPEC_TTL_SECONDS = 30.0
+_serving_spec_cache: tuple[float, EmbeddingSpec] | None = None
+
+
+def configured_spec() -> EmbeddingSpec:
+    """The embedding model Settings ask for."""
+    return EmbeddingSpec(
+        model=settings.embedding_model, dimensions=settings.embedding_dimensions
+    )
+
+
+def collection_for_spec(spec: EmbeddingSpec) -> str:
+    """Physical collection name for an index built with `spec`."""
+    return _SPEC_SEPARATOR.join(
+        [settings.qdrant_collection, spec.model, str(spec.dimensions)]
+    )
+
+
+def spec_from_collection_name(name: str) -> EmbeddingSpec | None:
+    parts = name.split(_SPEC_SEPARATOR)
+    if len(parts) != 3 or parts[0] != settings.qdrant_collection:
+        return None
+    if not parts[2].isdigit():
+        return None
+    return EmbeddingSpec(model=parts[1], dimensions=int(parts[2]))
+
+
+def _spec_from_aliases(aliases: list[Any]) -> EmbeddingSpec:
+    for alias in aliases:
+        if alias.alias_name == settings.qdrant_collection:
+            spec = spec_from_collection_name(alias.collection_name)
+            if spec is not None:
+                return spec
+    return configured_spec()
+
+
+# Qdrant unreachable or answering with an error; anything else is a bug and
+# propagates.
+_QDRANT_ERRORS = (UnexpectedResponse, ResponseHandlingException, httpx.HTTPError)
+
+
+def _cached_serving_spec() -> EmbeddingSpec | None:
+    if _serving_spec_cache and time.monotonic() < _serving_spec_cache[0]:
+        return _serving_spec_cache[1]
+    return None
+
+
+def _cache_serving_spec(spec: EmbeddingSpec) -> EmbeddingSpec:
+    global _serving_spec_cache
+    _serving_spec_cache = (time.monotonic() + _SPEC_TTL_SECONDS, spec)
+    if spec != configured_spec():
+        logger.warning(
+            "Collection '%s' is served by %s/%d but Settings request %s/%d; "
+            "queries use the served model until scripts/migrate_embeddings.py "
+            "completes",
+            settings.qdrant_collection,
+            spec.model,
+            spec.dimensions,
+            settings.embedding_model,
+            settings.embedding_dimensions,
+        )
+    return spec
+
+
+def serving_spec(*, fresh: bool = False) -> EmbeddingSpec:
+    """Embedding model of the collection currently behind the logical name.
+
+    Cached briefly so a running server follows a migration's alias flip
+    without a restart; `fresh` skips the cache (ingestion, whose vectors must
+    match the collection they are written to). Falls back to Settings if
+    Qdrant is unreachable.
+    """
+    cached = None if fresh else _cached_serving_spec()
+    if cached is not None:
+        return cached
+    try:
+        aliases = get_qdrant_client().get_aliases().aliases
+    except _QDRANT_ERRORS:
+        logger.warning("Could not read Qdrant aliases; assuming configured model")
+        aliases = []
+    return _cache_serving_spec(_spec_from_aliases(aliases))
+
+
+async def async_serving_spec() -> EmbeddingSpec:
+    """Async variant of serving_spec (for agent tool handlers)."""
+    cached = _cached_serving_spec()
+    if cached is not None:
+        return cached
+    try:
+        aliases = (await get_async_qdrant_client().get_aliases()).aliases
+    except _QDRANT_ERRORS:
+        logger.warning("Could not read Qdrant aliases; assuming configured model")
+        aliases = []
+    return _cache_serving_spec(_spec_from_aliases(aliases))
+
+
+async def async_collection_version() -> str:
+    """Identifies the guideline index state answers were grounded in.
+
+    The served physical collection (changes on embedding migration) plus its
+    point count (changes when ingestion adds or removes chunks). An in-place
+    edit that keeps the count is not detected. "unavailable" when Qdrant
+    cannot be reached, since briefings then fall back to the tool-less agent.
+    """
+    client = get_async_qdrant_client()
+    try:
+        physical = settings.qdrant_collection
+        for alias in (await client.get_aliases()).aliases:
+            if alias.alias_name == settings.qdrant_collection:
+                physical = alias.collection_name
+        info = await client.get_collection(settings.qdrant_collection)
+    except _QDRANT_ERRORS as e:
+        logger.debug("Collection version unavailable: %s", e)
+        return "unavailable"
+    return f"{physical}:{info.points_count}"
+
+
+def invalidate_serving_spec() -> None:
+    global _serving_spec_cache
+    _serving_spec_cache = None
+
+
+def _is_dimension_mismatch(error: Exception) -> bool:
+    """Qdrant rejected a vector sized for another model: the collection was
+    migrated since the spec was read."""
+    return "vector dimension error" in str(error).lower()
+
+
 # --- Embedding ---
 
 _VERTEX_PREDICT_URL = (
-    "https://{location}-aiplatform.googleapis.com/v1/projects/{project}"
+    "{endpoint}/v1/projects/{project}"
     "/locations/{location}/publishers/google/models/{model}:predict"
 )
 
 
-def _vertex_embed_via_api_key(texts: list[str], task_type: str) -> list[list[float]]:
-    """Call Vertex AI embedding endpoint directly using GCP API key."""
-    url = _VERTEX_PREDICT_URL.format(
+def _vertex_predict_url(model: str | None = None) -> str:
+    endpoint = (
+        settings.vertex_api_endpoint.rstrip("/")
+        or f"https://{settings.gcp_location}-aiplatform.googleapis.com"
+    )
+    return _VERTEX_PREDICT_URL.format(
+        endpoint=endpoint,
         location=settings.gcp_location,
         project=settings.gcp_project_id,
-        model=settings.embedding_model,
+        model=model or settings.embedding_model,
     )
+
+
+def _vertex_embed_via_api_key(
+    texts: list[str], task_type: str, spec: EmbeddingSpec
+) -> list[list[float]]:
+    """Call Vertex AI embedding endpoint directly using GCP API key."""
+    url = _vertex_predict_url(spec.model)
     body = {
         "instances": [{"content": t, "task_type": task_type} for t in texts],
-        "parameters": {"outputDimensionality": settings.embedding_dimensions},
+        "parameters": {"outputDimensionality": spec.dimensions},
     }
     resp = httpx.post(
         url, params={"key": settings.google_api_key}, json=body, timeout=30
@@ -79,17 +251,13 @@ def _vertex_embed_via_api_key(texts: list[str], task_type: str) -> list[list[flo
 
 
 async def _async_vertex_embed_via_api_key(
-    texts: list[str], task_type: str
+    texts: list[str], task_type: str, spec: EmbeddingSpec
 ) -> list[list[float]]:
     """Async version: call Vertex AI embedding endpoint using GCP API key."""
-    url = _VERTEX_PREDICT_URL.format(
-        location=settings.gcp_location,
-        project=settings.gcp_project_id,
-        model=settings.embedding_model,
-    )
+    url = _vertex_predict_url(spec.model)
     body = {
         "instances": [{"content": t, "task_type": task_type} for t in texts],
-        "parameters": {"outputDimensionality": settings.embedding_dimensions},
+        "parameters": {"outputDimensionality": spec.dimensions},
     }
     async with httpx.AsyncClient() as client:
         resp = await client.post(
@@ -106,21 +274,29 @@ def embed_text(text: str) -> list[float]:
         len(text),
         text[:100] + ("..." if len(text) > 100 else ""),
     )
-    vectors = _vertex_embed_via_api_key([text], "RETRIEVAL_QUERY")
+    vectors = _vertex_embed_via_api_key([text], "RETRIEVAL_QUERY", serving_spec())
     vector = vectors[0]
     logger.debug("Embedded query -> %d-dim vector %s", len(vector), vector[:4])
     return vector
 
 
-def embed_batch(texts: list[str]) -> list[list[float]]:
-    """Embed a batch of texts for document indexing."""
+def embed_batch(
+    texts: list[str], spec: EmbeddingSpec | None = None
+) -> list[list[float]]:
+    """Embed a batch of texts for document indexing.
+
+    Defaults to the served index's model, read per batch rather than cached,
+    so ingestion during a migration keeps writing vectors the live collection
+    can compare against.
+    """
+    spec = spec or serving_spec(fresh=True)
     logger.info(
         "embed_batch %d texts (model=%s, dims=%d)",
         len(texts),
-        settings.embedding_model,
-        settings.embedding_dimensions,
+        spec.model,
+        spec.dimensions,
     )
-    vectors = _vertex_embed_via_api_key(texts, "RETRIEVAL_DOCUMENT")
+    vectors = _vertex_embed_via_api_key(texts, "RETRIEVAL_DOCUMENT", spec)
     logger.info("Embedded %d texts -> %d vectors", len(texts), len(vectors))
     return vectors
 
@@ -128,77 +304,409 @@ def embed_batch(texts: list[str]) -> list[list[float]]:
 # --- Qdrant Collection Management ---
 
 
+_PAYLOAD_INDEXES = [
+    ("document_id", PayloadSchemaType.KEYWORD),
+    ("specialty", PayloadSchemaType.KEYWORD),
+    ("document_type", PayloadSchemaType.KEYWORD),
+    ("conditions", PayloadSchemaType.KEYWORD),
+    ("drugs", PayloadSchemaType.KEYWORD),
+    # Near-duplicate lookup (LSH band keys) and reference cleanup.
+    ("lsh_bands", PayloadSchemaType.KEYWORD),
+    ("reference_ids", PayloadSchemaType.KEYWORD),
+    # Write time, for the migration's final catch-up pass.
+    ("indexed_at", PayloadSchemaType.FLOAT),
+]
+
+
+def create_collection(name: str, dimensions: int) -> None:
+    """Create a collection with the guideline payload indexes."""
+    client = get_qdrant_client()
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=dimensions, distance=Distance.COSINE),
+    )
+    # Create payload indexes for filtering
+    for field, schema_type in _PAYLOAD_INDEXES:
+        client.create_payload_index(
+            collection_name=name, field_name=field, field_schema=schema_type
+        )
+    logger.info("Created Qdrant collection '%s'", name)
+
+
 def ensure_collection() -> None:
     """Create the Qdrant collection if it doesn't exist."""
     client = get_qdrant_client()
-    collections = [c.name for c in client.get_collections().collections]
-    if settings.qdrant_collection not in collections:
-        client.create_collection(
-            collection_name=settings.qdrant_collection,
-            vectors_config=VectorParams(
-                size=settings.embedding_dimensions,
-                distance=Distance.COSINE,
-            ),
-        )
-        # Create payload indexes for filtering
-        for field, schema_type in [
-            ("document_id", PayloadSchemaType.KEYWORD),
-            ("specialty", PayloadSchemaType.KEYWORD),
-            ("document_type", PayloadSchemaType.KEYWORD),
-            ("conditions", PayloadSchemaType.KEYWORD),
-            ("drugs", PayloadSchemaType.KEYWORD),
-        ]:
-            client.create_payload_index(
-                collection_name=settings.qdrant_collection,
-                field_name=field,
-                field_schema=schema_type,
-            )
-        logger.info("Created Qdrant collection '%s'", settings.qdrant_collection)
+    # collection_exists also resolves aliases (migrated collections).
+    if not client.collection_exists(settings.qdrant_collection):
+        create_collection(settings.qdrant_collection, settings.embedding_dimensions)
     else:
         logger.info("Qdrant collection '%s' already exists", settings.qdrant_collection)
+    invalidate_serving_spec()
+    serving_spec()
 
 
 # --- Upsert ---
 
 
-def upsert_chunks(chunks: list[DocumentChunk], vectors: list[list[float]]) -> None:
-    """Upsert document chunks with their embedding vectors into Qdrant."""
+def _point_id(document_id: str, chunk_index: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{document_id}:{chunk_index}"))
+
+
+def _chunk_payload(chunk: DocumentChunk, signature: list[int]) -> dict[str, Any]:
+    references = [r.model_dump() for r in chunk.references]
+    return {
+        "text": chunk.text,
+        "document_id": chunk.document_id,
+        "document_title": chunk.document_title,
+        "section_path": chunk.section_path,
+        "specialty": chunk.specialty,
+        "document_type": chunk.document_type,
+        "conditions": chunk.conditions,
+        "drugs": chunk.drugs,
+        "publication_date": chunk.publication_date.isoformat(),
+        "chunk_index": chunk.chunk_index,
+        "total_chunks": chunk.total_chunks,
+        "references": references,
+        "reference_ids": sorted({r["document_id"] for r in references}),
+        "minhash": signature,
+        "lsh_bands": lsh_bands(signature),
+        "indexed_at": time.time(),
+    }
+
+
+def upsert_chunks(
+    chunks: list[DocumentChunk],
+    vectors: list[list[float]],
+    signatures: list[list[int]] | None = None,
+) -> None:
+    """Upsert document chunks with their embedding vectors into Qdrant.
+
+    `signatures` are the chunks' MinHash signatures, computed here when the
+    caller has not already done so for duplicate detection.
+    """
+    if signatures is None:
+        signatures = [minhash(chunk.text) for chunk in chunks]
     client = get_qdrant_client()
     points = [
         PointStruct(
-            id=str(
-                uuid.uuid5(
-                    uuid.NAMESPACE_DNS, f"{chunk.document_id}:{chunk.chunk_index}"
-                )
-            ),
+            id=_point_id(chunk.document_id, chunk.chunk_index),
             vector=vector,
-            payload={
-                "text": chunk.text,
-                "document_id": chunk.document_id,
-                "document_title": chunk.document_title,
-                "section_path": chunk.section_path,
-                "specialty": chunk.specialty,
-                "document_type": chunk.document_type,
-                "conditions": chunk.conditions,
-                "drugs": chunk.drugs,
-                "publication_date": chunk.publication_date.isoformat(),
-                "chunk_index": chunk.chunk_index,
-                "total_chunks": chunk.total_chunks,
-            },
+            payload=_chunk_payload(chunk, signature),
         )
-        for chunk, vector in zip(chunks, vectors, strict=True)
+        for chunk, vector, signature in zip(chunks, vectors, signatures, strict=True)
     ]
     client.upsert(collection_name=settings.qdrant_collection, points=points)
     logger.info("Upserted %d chunks into '%s'", len(points), settings.qdrant_collection)
 
 
+def _scroll_all(query_filter: Filter, fields: list[str]) -> list[Record]:
+    """Every point matching the filter (paginated scroll, payload subset)."""
+    client = get_qdrant_client()
+    records: list[Record] = []
+    offset = None
+    while True:
+        page, offset = client.scroll(
+            collection_name=settings.qdrant_collection,
+            scroll_filter=query_filter,
+            with_payload=fields,
+            limit=256,
+            offset=offset,
+        )
+        records.extend(page)
+        if offset is None:
+            return records
+
+
+def _document_filter(
+    document_id: str, from_index: int = 0, indexes: Collection[int] = ()
+) -> Filter:
+    """A document's chunks with chunk_index >= from_index or in `indexes`."""
+    document = FieldCondition(key="document_id", match=MatchValue(value=document_id))
+    selectors = []
+    if from_index > 0:
+        selectors.append(FieldCondition(key="chunk_index", range=Range(gte=from_index)))
+    if indexes:
+        selectors.append(
+            FieldCondition(key="chunk_index", match=MatchAny(any=sorted(indexes)))
+        )
+    if from_index > 0 or indexes:
+        return Filter(must=[document], should=selectors)
+    return Filter(must=[document])
+
+
+def delete_document_chunks(
+    document_id: str, from_index: int = 0, indexes: Collection[int] = ()
+) -> set[str]:
+    """Delete a document's chunks with chunk_index >= from_index (or in `indexes`).
+
+    Reindexing upserts over the same deterministic point ids first, then calls
+    this with from_index=len(new_chunks) to drop the tail left behind when a
+    document shrinks — so searches never see a gap mid-reindex. from_index=0
+    removes the document entirely.
+
+    Returns the ids of OTHER documents whose near-duplicate chunks were
+    collapsed into the deleted points: their passage is no longer indexed, so
+    the caller must re-ingest them.
+    """
+    query_filter = _document_filter(document_id, from_index, indexes)
+    orphaned = {
+        ref_id
+        for record in _scroll_all(query_filter, ["reference_ids"])
+        for ref_id in record.payload.get("reference_ids", [])
+        if ref_id != document_id
+    }
+    client = get_qdrant_client()
+    client.delete(
+        collection_name=settings.qdrant_collection,
+        points_selector=FilterSelector(filter=query_filter),
+    )
+    logger.info(
+        "Deleted chunks of %r from index %d in '%s' (%d orphaned references)",
+        document_id,
+        from_index,
+        settings.qdrant_collection,
+        len(orphaned),
+    )
+    return orphaned
+
+
+def remove_document(document_id: str) -> set[str]:
+    """Remove a document from the index: its chunks, and its references on
+    other documents' points. Returns the orphaned documents, as
+    `delete_document_chunks` does."""
+    drop_references(document_id)
+    return delete_document_chunks(document_id)
+
+
+# --- Near-duplicate collapsing ---
+
+
+def _set_references(point_id: str, references: list[dict[str, Any]]) -> None:
+    get_qdrant_client().set_payload(
+        collection_name=settings.qdrant_collection,
+        payload={
+            "references": references,
+            "reference_ids": sorted({r["document_id"] for r in references}),
+        },
+        points=[point_id],
+    )
+
+
+def drop_references(document_id: str) -> None:
+    """Remove a document's references from every point it was collapsed into."""
+    records = _scroll_all(
+        Filter(
+            must=[
+                FieldCondition(key="reference_ids", match=MatchValue(value=document_id))
+            ]
+        ),
+        ["references"],
+    )
+    for record in records:
+        kept = [
+            r for r in record.payload["references"] if r["document_id"] != document_id
+        ]
+        _set_references(str(record.id), kept)
+
+
+def find_indexed_duplicate(
+    signature: list[int], exclude_document_id: str, specialty: str
+) -> Record | None:
+    """Best already-indexed near-duplicate from another document, if any.
+
+    LSH band keys narrow the candidates via the payload index; the full
+    signatures then confirm similarity above the duplicate threshold. Only
+    points of the same specialty qualify: a collapsed chunk is searchable
+    through its canonical point's payload, so a specialty-filtered search
+    must still find it.
+    """
+    client = get_qdrant_client()
+    candidates, _ = client.scroll(
+        collection_name=settings.qdrant_collection,
+        scroll_filter=Filter(
+            must=[
+                FieldCondition(
+                    key="lsh_bands", match=MatchAny(any=lsh_bands(signature))
+                ),
+                FieldCondition(key="specialty", match=MatchValue(value=specialty)),
+            ],
+            must_not=[
+                FieldCondition(
+                    key="document_id", match=MatchValue(value=exclude_document_id)
+                )
+            ],
+        ),
+        with_payload=["minhash", "references"],
+        limit=16,
+    )
+    scored = [
+        (estimate_jaccard(signature, c.payload["minhash"]), c)
+        for c in candidates
+        if c.payload.get("minhash")
+    ]
+    best = max(scored, key=lambda pair: pair[0], default=None)
+    if best is None or best[0] < DUPLICATE_THRESHOLD:
+        return None
+    return best[1]
+
+
+def _as_reference(chunk: DocumentChunk) -> ChunkReference:
+    return ChunkReference(
+        document_id=chunk.document_id,
+        document_title=chunk.document_title,
+        section_path=chunk.section_path,
+        chunk_index=chunk.chunk_index,
+    )
+
+
+def index_document(
+    chunks: list[DocumentChunk],
+    embed: Callable[[list[str]], list[list[float]]] = embed_batch,
+) -> IndexResult:
+    """(Re)index one document's chunks, collapsing near-duplicates.
+
+    A chunk that near-duplicates an indexed chunk of another document (or an
+    earlier chunk of this one) is not embedded or stored; it is recorded as a
+    reference on the canonical point instead. References other documents hold
+    on this document's points carry over when the chunk is unchanged enough
+    to still match; otherwise those documents are reported as orphaned.
+    """
+    document_id = chunks[0].document_id
+    # This document's own collapses are recomputed from scratch below.
+    drop_references(document_id)
+    previous = {
+        record.payload["chunk_index"]: record.payload
+        for record in _scroll_all(
+            _document_filter(document_id), ["chunk_index", "minhash", "references"]
+        )
+    }
+
+    signatures = [minhash(chunk.text) for chunk in chunks]
+    within = find_batch_duplicates(signatures)
+    # chunk index -> id of the indexed point it was collapsed into
+    collapsed_into: dict[int, str] = {}
+    point_references: dict[str, list[dict[str, Any]]] = {}
+    unique: list[int] = []
+    orphaned: set[str] = set()
+
+    for idx, chunk in enumerate(chunks):
+        canonical = within.get(idx)
+        if canonical is not None and canonical not in collapsed_into:
+            chunks[canonical].references.append(_as_reference(chunk))
+            continue
+        if canonical is not None:
+            point_id = collapsed_into[canonical]
+        else:
+            match = find_indexed_duplicate(
+                signatures[idx], document_id, chunk.specialty
+            )
+            if match is None:
+                old = previous.get(idx)
+                if old and old.get("minhash"):
+                    carried = [
+                        ChunkReference(**r)
+                        for r in old.get("references", [])
+                        if r["document_id"] != document_id
+                    ]
+                    if is_near_duplicate(signatures[idx], old["minhash"]):
+                        chunk.references.extend(carried)
+                    else:
+                        orphaned.update(r.document_id for r in carried)
+                unique.append(idx)
+                continue
+            point_id = str(match.id)
+            point_references.setdefault(point_id, list(match.payload["references"]))
+        collapsed_into[idx] = point_id
+        point_references[point_id].append(_as_reference(chunk).model_dump())
+
+    for point_id, references in point_references.items():
+        _set_references(point_id, references)
+    if unique:
+        texts = [chunks[i].text for i in unique]
+        try:
+            upsert_chunks(
+                [chunks[i] for i in unique],
+                embed(texts),
+                [signatures[i] for i in unique],
+            )
+        except Exception as e:
+            if not _is_dimension_mismatch(e):
+                raise
+            # A migration cut over between embedding and writing.
+            upsert_chunks(
+                [chunks[i] for i in unique],
+                embed(texts),
+                [signatures[i] for i in unique],
+            )
+    stale = {i for i in range(len(chunks)) if i not in unique}
+    orphaned |= delete_document_chunks(
+        document_id, from_index=len(chunks), indexes=stale
+    )
+    collapsed = len(chunks) - len(unique)
+    logger.info(
+        "Indexed %r: %d points, %d near-duplicates collapsed, %d orphaned",
+        document_id,
+        len(unique),
+        collapsed,
+        len(orphaned),
+    )
+    return IndexResult(
+        upserted=len(unique), collapsed=collapsed, orphaned=sorted(orphaned)
+    )
+
+
 # --- Search ---
 
 
+def _chunk_from_payload(payload: dict[str, Any]) -> DocumentChunk:
+    return DocumentChunk(
+        text=payload["text"],
+        document_id=payload["document_id"],
+        document_title=payload["document_title"],
+        section_path=payload["section_path"],
+        specialty=payload["specialty"],
+        document_type=payload["document_type"],
+        conditions=payload["conditions"],
+        drugs=payload["drugs"],
+        publication_date=payload["publication_date"],
+        chunk_index=payload["chunk_index"],
+        total_chunks=payload["total_chunks"],
+        # Points indexed before near-duplicate collapsing have no references.
+        references=payload.get("references", []),
+    )
+
+
+def _build_filter(
+    specialty: str | None,
+    conditions: list[str] | None = None,
+    drugs: list[str] | None = None,
+) -> Filter | None:
+    """Payload filter for a search; None when nothing narrows it.
+
+    conditions/drugs match chunks tagged with ANY of the given canonical ids
+    (see src/services/lexicon.py for the vocabulary).
+    """
+    must_conditions = []
+    if specialty:
+        must_conditions.append(
+            FieldCondition(key="specialty", match=MatchValue(value=specialty))
+        )
+    if conditions:
+        must_conditions.append(
+            FieldCondition(key="conditions", match=MatchAny(any=conditions))
+        )
+    if drugs:
+        must_conditions.append(FieldCondition(key="drugs", match=MatchAny(any=drugs)))
+    return Filter(must=must_conditions) if must_conditions else None
+
+
 def search(
     query: str,
     specialty: str | None = None,
     limit: int = 5,
+    *,
+    conditions: list[str] | None = None,
+    drugs: list[str] | None = None,
 ) -> list[RetrievalResult]:
     """Embed query, search Qdrant, return scored results."""
     logger.info(
@@ -207,15 +715,7 @@ def search(
         specialty,
         limit,
     )
-    query_vector = embed_text(query)
-
-    # Build optional filter
-    must_conditions = []
-    if specialty:
-        must_conditions.append(
-            FieldCondition(key="specialty", match=MatchValue(value=specialty))
-        )
-    query_filter = Filter(must=must_conditions) if must_conditions else None
+    query_filter = _build_filter(specialty, conditions, drugs)
 
     logger.debug(
         "Searching Qdrant collection=%r filter=%s",
@@ -224,14 +724,24 @@ def search(
     )
 
     client = get_qdrant_client()
-    results = client.query_points(
-        collection_name=settings.qdrant_collection,
-        query=query_vector,
-        query_filter=query_filter,
-        score_threshold=0.5,
-        limit=limit,
-        with_payload=True,
-    )
+
+    def query_points() -> Any:
+        return client.query_points(
+            collection_name=settings.qdrant_collection,
+            query=embed_text(query),
+            query_filter=query_filter,
+            score_threshold=0.5,
+            limit=limit,
+            with_payload=True,
+        )
+
+    try:
+        results = query_points()
+    except Exception as e:
+        if not _is_dimension_mismatch(e):
+            raise
+        invalidate_serving_spec()
+        results = query_points()
 
     logger.info(
         "Qdrant returned %d points (threshold=0.5)",
@@ -240,20 +750,7 @@ def search(
 
     retrieval_results = []
     for idx, point in enumerate(results.points):
-        payload = point.payload
-        chunk = DocumentChunk(
-            text=payload["text"],
-            document_id=payload["document_id"],
-            document_title=payload["document_title"],
-            section_path=payload["section_path"],
-            specialty=payload["specialty"],
-            document_type=payload["document_type"],
-            conditions=payload["conditions"],
-            drugs=payload["drugs"],
-            publication_date=payload["publication_date"],
-            chunk_index=payload["chunk_index"],
-            total_chunks=payload["total_chunks"],
-        )
+        chunk = _chunk_from_payload(point.payload)
         retrieval_results.append(
             RetrievalResult(chunk=chunk, score=point.score, source_id=idx + 1)
         )
@@ -280,7 +777,9 @@ async def async_embed_text(text: str) -> list[float]:
         len(text),
         text[:100] + ("..." if len(text) > 100 else ""),
     )
-    vectors = await _async_vertex_embed_via_api_key([text], "RETRIEVAL_QUERY")
+    vectors = await _async_vertex_embed_via_api_key(
+        [text], "RETRIEVAL_QUERY", await async_serving_spec()
+    )
     vector = vectors[0]
     logger.debug("Async embedded query -> %d-dim vector %s", len(vector), vector[:4])
     return vector
@@ -290,6 +789,9 @@ async def async_search(
     query: str,
     specialty: str | None = None,
     limit: int = 5,
+    *,
+    conditions: list[str] | None = None,
+    drugs: list[str] | None = None,
 ) -> list[RetrievalResult]:
     """Embed query and search Qdrant asynchronously (non-blocking)."""
     logger.info(
@@ -298,15 +800,7 @@ async def async_search(
         specialty,
         limit,
     )
-    query_vector = await async_embed_text(query)
-
-    # Build optional filter
-    must_conditions = []
-    if specialty:
-        must_conditions.append(
-            FieldCondition(key="specialty", match=MatchValue(value=specialty))
-        )
-    query_filter = Filter(must=must_conditions) if must_conditions else None
+    query_filter = _build_filter(specialty, conditions, drugs)
 
     logger.debug(
         "Async searching Qdrant collection=%r filter=%s",
@@ -315,14 +809,24 @@ async def async_search(
     )
 
     client = get_async_qdrant_client()
-    results = await client.query_points(
-        collection_name=settings.qdrant_collection,
-        query=query_vector,
-        query_filter=query_filter,
-        score_threshold=0.5,
-        limit=limit,
-        with_payload=True,
-    )
+
+    async def query_points() -> Any:
+        return await client.query_points(
+            collection_name=settings.qdrant_collection,
+            query=await async_embed_text(query),
+            query_filter=query_filter,
+            score_threshold=0.5,
+            limit=limit,
+            with_payload=True,
+        )
+
+    try:
+        results = await query_points()
+    except Exception as e:
+        if not _is_dimension_mismatch(e):
+            raise
+        invalidate_serving_spec()
+        results = await query_points()
 
     logger.info(
         "Async Qdrant returned %d points (threshold=0.5)",
@@ -331,20 +835,7 @@ async def async_search(
 
     retrieval_results = []
     for idx, point in enumerate(results.points):
-        payload = point.payload
-        chunk = DocumentChunk(
-            text=payload["text"],
-            document_id=payload["document_id"],
-            document_title=payload["document_title"],
-            section_path=payload["section_path"],
-            specialty=payload["specialty"],
-            document_type=payload["document_type"],
-            conditions=payload["conditions"],
-            drugs=payload["drugs"],
-            publication_date=payload["publication_date"],
-            chunk_index=payload["chunk_index"],
-            total_chunks=payload["total_chunks"],
-        )
+        chunk = _chunk_from_payload(point.payload)
         retrieval_results.append(
             RetrievalResult(chunk=chunk, score=point.score, source_id=idx + 1)
         )
@@ -361,8 +852,27 @@ async def async_search(
     return retrieval_results
 
 
-def format_as_xml_sources(results: list[RetrievalResult]) -> str:
-    """Format retrieval results as XML for agent consumption."""
+def _also_in_attribute(chunk: DocumentChunk) -> str:
+    """Other documents carrying this passage (collapsed near-duplicates)."""
+    titles = dict.fromkeys(
+        ref.document_title
+        for ref in chunk.references
+        if ref.document_id != chunk.document_id
+    )
+    if not titles:
+        return ""
+    return f' also_in="{"; ".join(titles)}"'
+
+
+def format_as_xml_sources(
+    results: list[RetrievalResult], sent: Collection[int] = frozenset()
+) -> str:
+    """Format retrieval results as XML for agent consumption.
+
+    Sources whose id is in `sent` were already returned earlier in the run
+    (see retrieval_context.py) and are rendered as an empty element that
+    points back at that id instead of repeating the text.
+    """
     if not results:
         return (
             "<clinical_guidelines>No relevant guidelines found.</clinical_guidelines>"
@@ -370,12 +880,16 @@ def format_as_xml_sources(results: list[RetrievalResult]) -> str:
 
     lines = ["<clinical_guidelines>"]
     for r in results:
-        lines.append(
+        opening = (
             f'  <source id="{r.source_id}" '
             f'document="{r.chunk.document_title}" '
             f'section="{r.chunk.section_path}" '
-            f'score="{r.score:.2f}">'
+            f'score="{r.score:.2f}"' + _also_in_attribute(r.chunk)
         )
+        if r.source_id in sent:
+            lines.append(opening + ' previously_returned="true" />')
+            continue
+        lines.append(opening + ">")
         lines.append(f"    {r.chunk.text}")
         lines.append("  </source>")
     lines.append("</clinical_guidelines>")
@@ -0,0 +1,134 @@
+"""Per-run retrieval state shared by the guideline search tool handlers.
+
+Within one agent run the model often repeats a search, or two different
+queries return the same chunk. Without shared state every call numbers its
+results from 1, so the same passage is sent again under a new id and one id
+means different passages in different tool results. A `RetrievalContext`
+lives for one run and
+
+- memoizes searches by (normalized query, specialty, limit);
+- gives each chunk one `source_id` for the whole run, in first-seen order;
+- renders a chunk already sent in this run as a reference to its id,
+  without the text (see `format_as_xml_sources`).
+
+In-process tools find the context through a ContextVar. The SDK calls tool
+handlers from the reader task it spawns when it connects, and that task
+copies the context variables of whoever connected — so the variable holds a
+mutable `_Slot` rather than the context itself: a pooled client connects
+once (`bind_retrieval_slot`) and each request then swaps a fresh context
+into the same slot (`retrieval_run`). The standalone MCP server, a separate
+process, keys contexts by MCP session instead (one CLI run, one session).
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.models.rag import RetrievalResult
+from src.services.rag_service import format_as_xml_sources
+
+logger = logging.getLogger(__name__)
+
+SearchFn = Callable[..., Awaitable[list[RetrievalResult]]]
+
+
+class RetrievalContext:
+    """Memoized searches and stable source ids for one agent run."""
+
+    def __init__(self) -> None:
+        self._searches: dict[tuple[str, str | None, int], list[RetrievalResult]] = {}
+        self._ids: dict[tuple[str, int], int] = {}
+        self._sent: set[int] = set()
+        self.memo_hits = 0
+
+    def _source_id(self, result: RetrievalResult) -> int:
+        key = (result.chunk.document_id, result.chunk.chunk_index)
+        return self._ids.setdefault(key, len(self._ids) + 1)
+
+    async def search(
+        self,
+        search: SearchFn,
+        *,
+        query: str,
+        specialty: str | None,
+        limit: int,
+    ) -> tuple[list[RetrievalResult], str]:
+        """Run (or replay) a search; returns the renumbered results and the
+        tool text, where chunks sent earlier in the run are references only."""
+        key = (" ".join(query.lower().split()), specialty, limit)
+        results = self._searches.get(key)
+        if results is None:
+            results = await search(query=query, specialty=specialty, limit=limit)
+            self._searches[key] = results
+        else:
+            self.memo_hits += 1
+            logger.info("Search memoized within run: %d results reused", len(results))
+
+        renumbered = [
+            result.model_copy(update={"source_id": self._source_id(result)})
+            for result in results
+        ]
+        sent_before = {r.source_id for r in renumbered} & self._sent
+        self._sent.update(r.source_id for r in renumbered)
+        return renumbered, format_as_xml_sources(renumbered, sent=sent_before)
+
+
+class _Slot:
+    context: RetrievalContext | None = None
+
+
+_slot: ContextVar[_Slot | None] = ContextVar("retrieval_slot", default=None)
+
+
+def bind_retrieval_slot() -> None:
+    """Give the current task a slot that outlives single runs.
+
+    For long-lived workers (the warm client pool): call before the client
+    connects so the SDK's reader task shares the slot, then wrap each
+    request in `retrieval_run()`.
+    """
+    if _slot.get() is None:
+        _slot.set(_Slot())
+
+
+@contextmanager
+def retrieval_run() -> Iterator[RetrievalContext]:
+    """A fresh RetrievalContext for everything run inside the block."""
+    context = RetrievalContext()
+    slot = _slot.get()
+    token = None
+    if slot is None:
+        slot = _Slot()
+        token = _slot.set(slot)
+    previous, slot.context = slot.context, context
+    try:
+        yield context
+    finally:
+        slot.context = previous
+        if token is not None:
+            _slot.reset(token)
+
+
+def current_retrieval() -> RetrievalContext | None:
+    slot = _slot.get()
+    return slot.context if slot is not None else None
+
+
+async def search_in_run(
+    search: SearchFn,
+    context: RetrievalContext | None,
+    *,
+    query: str,
+    specialty: str | None,
+    limit: int,
+) -> tuple[list[RetrievalResult], str]:
+    """Search through `context` when there is one, else a plain search."""
+    if context is not None:
+        return await context.search(
+            search, query=query, specialty=specialty, limit=limit
+        )
+    results = await search(query=query, specialty=specialty, limit=limit)
+    return results, format_as_xml_sources(results)
@@ -0,0 +1,190 @@
+"""Compressed cold storage for chat agent traces.
+
+A trace (thinking text, tool inputs, result previews — see
+chat_agent.drive_chat_turn) is usually larger than the rest of its message.
+It is stored as a compressed JSON blob in ConversationTrace, tagged with the
+codec that wrote it: zstd where available (Python 3.14's compression.zstd, or
+the zstandard package), zlib otherwise. Blobs are decoded by their tag, so
+changing codecs never strands older rows.
+
+Messages written before the side table carry their trace inline in
+ConversationMessage.trace, and reads fall back to it. The retention job
+(`archive_traces`, run by `trace_archiver`) moves those into the side table
+once they are old enough, and recompresses side-table blobs of that age at
+the denser archive level.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import logging
+import zlib
+from typing import Any
+
+from sqlalchemy import ColumnElement, Text, and_, cast, null, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.models.orm import ConversationMessage, ConversationTrace
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+logger = logging.getLogger(__name__)
+
+CODEC = "zstd" if zstd is not None else "zlib"
+
+# (write, archive) compression level per codec: cheap on the turn's write
+# path, dense once a trace is only read occasionally.
+_LEVELS = {"zstd": (3, 19), "zlib": (6, 9)}
+
+# Messages whose trace is still inline. JSON None may be stored as SQL NULL
+# or as the JSON literal null.
+INLINE_TRACE: ColumnElement[bool] = and_(
+    ConversationMessage.trace.is_not(None),
+    cast(ConversationMessage.trace, Text) != "null",
+)
+
+
+def compress_trace(
+    trace: list[dict[str, Any]], *, archive: bool = False
+) -> tuple[str, bytes]:
+    """Return (codec, blob) for a trace."""
+    raw = json.dumps(trace, separators=(",", ":")).encode()
+    level = _LEVELS[CODEC][archive]
+    if CODEC == "zstd":
+        return CODEC, zstd.compress(raw, level=level)
+    return CODEC, zlib.compress(raw, level)
+
+
+def decompress_trace(codec: str, data: bytes) -> list[dict[str, Any]]:
+    """Decode a blob written by `compress_trace` with any codec."""
+    if codec == "zlib":
+        raw = zlib.decompress(data)
+    elif codec == "zstd" and zstd is not None:
+        raw = zstd.decompress(data)
+    else:
+        raise ValueError(f"Cannot decode a trace compressed with {codec!r}")
+    return json.loads(raw)
+
+
+def trace_row(message_id: int, trace: list[dict[str, Any]]) -> ConversationTrace:
+    codec, data = compress_trace(trace)
+    return ConversationTrace(message_id=message_id, codec=codec, data=data)
+
+
+async def archive_traces(
+    session: AsyncSession, older_than: datetime.datetime, limit: int
+) -> int:
+    """Archive up to `limit` inline traces and `limit` side-table traces
+    created before `older_than`; returns how many were archived."""
+    # Timestamps are naive UTC, like the server defaults.
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    # SKIP LOCKED lets several workers archive concurrently without claiming
+    # the same rows; sqlite ignores it.
+    inline = (
+        await session.scalars(
+            select(ConversationMessage)
+            .where(ConversationMessage.created_at < older_than, INLINE_TRACE)
+            .order_by(ConversationMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+    ).all()
+    for message in inline:
+        codec, data = compress_trace(message.trace, archive=True)
+        session.add(
+            ConversationTrace(
+                message_id=message.id,
+                codec=codec,
+                data=data,
+                created_at=message.created_at,
+                archived_at=now,
+            )
+        )
+        message.trace = null()
+    stored = (
+        await session.scalars(
+            select(ConversationTrace)
+            .where(
+                ConversationTrace.created_at < older_than,
+                ConversationTrace.archived_at.is_(None),
+            )
+            .order_by(ConversationTrace.message_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+    ).all()
+    for row in stored:
+        trace = decompress_trace(row.codec, row.data)
+        row.codec, row.data = compress_trace(trace, archive=True)
+        row.archived_at = now
+    await session.commit()
+    return len(inline) + len(stored)
+
+
+class TraceArchiver:
+    """Background task running `archive_traces` on an interval."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def start(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        *,
+        older_than_days: int,
+        interval: float,
+        batch: int,
+    ) -> None:
+        self._task = asyncio.create_task(
+            self._run(session_factory, older_than_days, interval, batch),
+            name="trace-archiver",
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        older_than_days: int,
+        interval: float,
+        batch: int,
+    ) -> None:
+        while True:
+            # created_at is a naive UTC server timestamp.
+            older_than = datetime.datetime.now(datetime.UTC).replace(
+                tzinfo=None
+            ) - datetime.timedelta(days=older_than_days)
+            total = 0
+            try:
+                # A full batch means there may be more; keep going until a
+                # pass comes up short.
+                while True:
+                    async with session_factory() as session:
+                        archived = await archive_traces(session, older_than, batch)
+                    total += archived
+                    if archived < batch:
+                        break
+            except Exception:
+                logger.exception("Trace archiving failed")
+            if total:
+                logger.info("Archived %d chat traces", total)
+            await asyncio.sleep(interval)
+
+
+trace_archiver = TraceArchiver()
@@ -0,0 +1,258 @@
+"""Garbage collection and disk accounting for chat SDK transcripts.
+
+Every chat session leaves a JSONL transcript (plus, for some sessions, a
+directory of the same name) under the chat agent's project directory — see
+agents/transcripts.py. Nothing on the SDK side ever removes them: a reset
+conversation, a deleted patient or a compaction (which forks the session)
+all leave files behind. On an interval the collector:
+
+- deletes transcripts that no conversation or briefing follow-up references,
+  once they are `min_age` seconds old (younger ones may belong to a turn
+  whose session id is not persisted yet);
+- while the directory is over `quota_bytes`, evicts the least recently used
+  conversations' transcripts: their session_id is cleared first, so the next
+  turn starts a new session from the patient record instead of failing to
+  resume (the stored UI history is kept). Each eviction holds the patient's
+  chat lock, and patients with a turn in progress are skipped;
+- reports transcript counts and disk usage in `metrics()`, and logs them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.agents.transcripts import transcript_dir
+from src.models.orm import Briefing, Conversation
+from src.services.patient_locks import chat_locks
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptMetrics(BaseModel):
+    """Point-in-time view of the transcript directory, for logs."""
+
+    transcripts: int
+    bytes: int
+    quota_bytes: int
+    referenced: int
+    # Conversations whose session_id has no transcript on this host.
+    missing: int
+    # Totals since the collector started.
+    orphans_deleted: int
+    evicted: int
+    bytes_freed: int
+    errors: int
+
+
+@dataclass
+class _Transcript:
+    session_id: str
+    paths: list[Path] = field(default_factory=list)
+    size: int = 0
+    mtime: float = 0.0
+
+
+def _tree_size(directory: Path) -> tuple[int, float]:
+    size, mtime = 0, directory.stat().st_mtime
+    for path in directory.rglob("*"):
+        if path.is_file():
+            stat = path.stat()
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+def scan_transcripts(directory: Path) -> dict[str, _Transcript]:
+    """Transcripts in `directory` by session id, with their size and the
+    newest mtime among their files. Blocking file IO."""
+    found: dict[str, _Transcript] = {}
+    if not directory.is_dir():
+        return found
+    for path in directory.iterdir():
+        if path.is_dir():
+            session_id = path.name
+            size, mtime = _tree_size(path)
+        elif path.suffix == ".jsonl":
+            session_id = path.stem
+            stat = path.stat()
+            size, mtime = stat.st_size, stat.st_mtime
+        else:
+            continue
+        transcript = found.setdefault(session_id, _Transcript(session_id))
+        transcript.paths.append(path)
+        transcript.size += size
+        transcript.mtime = max(transcript.mtime, mtime)
+    return found
+
+
+def _remove(transcripts: list[_Transcript]) -> None:
+    for transcript in transcripts:
+        for path in transcript.paths:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+
+class TranscriptCollector:
+    """Background task that collects and accounts for transcripts."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task[None] | None = None
+        self._metrics = TranscriptMetrics(
+            transcripts=0,
+            bytes=0,
+            quota_bytes=0,
+            referenced=0,
+            missing=0,
+            orphans_deleted=0,
+            evicted=0,
+            bytes_freed=0,
+            errors=0,
+        )
+
+    def start(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        *,
+        interval: float,
+        min_age: float,
+        quota_bytes: int,
+    ) -> None:
+        self._task = asyncio.create_task(
+            self._run(session_factory, interval, min_age, quota_bytes),
+            name="transcript-gc",
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def metrics(self) -> TranscriptMetrics:
+        return self._metrics.model_copy()
+
+    async def _run(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        interval: float,
+        min_age: float,
+        quota_bytes: int,
+    ) -> None:
+        while True:
+            try:
+                async with session_factory() as session:
+                    await self.collect(
+                        session, min_age=min_age, quota_bytes=quota_bytes
+                    )
+            except Exception:
+                self._metrics.errors += 1
+                logger.exception("Transcript collection failed")
+            logger.info("Chat transcripts: %s", self._metrics.model_dump())
+            await asyncio.sleep(interval)
+
+    async def collect(
+        self, session: AsyncSession, *, min_age: float, quota_bytes: int
+    ) -> TranscriptMetrics:
+        """One pass: delete orphans, enforce the quota, update the metrics."""
+        transcripts = await asyncio.to_thread(scan_transcripts, transcript_dir())
+        # Session id -> patient id, for taking the patient's chat lock.
+        rows = await session.execute(
+            select(Conversation.session_id, Conversation.patient_id).where(
+                Conversation.session_id.is_not(None)
+            )
+        )
+        owners = {session_id: patient_id for session_id, patient_id in rows}
+        in_use = set(owners)
+        followups = set(
+            await session.scalars(
+                select(Briefing.followup_session_id).where(
+                    Briefing.followup_session_id.is_not(None)
+                )
+            )
+        )
+        settled = time.time() - min_age
+
+        orphans = [
+            transcript
+            for session_id, transcript in transcripts.items()
+            if session_id not in in_use
+            and session_id not in followups
+            and transcript.mtime < settled
+        ]
+        for transcript in orphans:
+            del transcripts[transcript.session_id]
+        await asyncio.to_thread(_remove, orphans)
+        freed = sum(transcript.size for transcript in orphans)
+
+        total = sum(transcript.size for transcript in transcripts.values())
+        evicted: list[_Transcript] = []
+        if quota_bytes and total > quota_bytes:
+            candidates = sorted(
+                (
+                    transcript
+                    for session_id, transcript in transcripts.items()
+                    if session_id in in_use and transcript.mtime < settled
+                ),
+                key=lambda transcript: transcript.mtime,
+            )
+            for transcript in candidates:
+                if total <= quota_bytes:
+                    break
+                patient_id = owners[transcript.session_id]
+                if chat_locks.locked(patient_id):
+                    # A turn is running or queued for the patient and will
+                    # resume this transcript; evict another one instead.
+                    continue
+                # Under the patient's chat lock, so no turn (on any worker)
+                # starts resuming the transcript between clearing the
+                # reference and deleting the files.
+                async with chat_locks.hold(patient_id, session.bind):
+                    await session.execute(
+                        update(Conversation)
+                        .where(Conversation.session_id == transcript.session_id)
+                        .values(session_id=None)
+                    )
+                    await session.commit()
+                    await asyncio.to_thread(_remove, [transcript])
+                evicted.append(transcript)
+                total -= transcript.size
+                del transcripts[transcript.session_id]
+                in_use.discard(transcript.session_id)
+            if evicted:
+                freed += sum(transcript.size for transcript in evicted)
+                logger.warning(
+                    "Transcripts over the %d byte quota: evicted %d sessions",
+                    quota_bytes,
+                    len(evicted),
+                )
+
+        metrics = self._metrics
+        metrics.transcripts = len(transcripts)
+        metrics.bytes = total
+        metrics.quota_bytes = quota_bytes
+        metrics.referenced = sum(
+            1
+            for session_id in transcripts
+            if session_id in in_use or session_id in followups
+        )
+        metrics.missing = sum(
+            1 for session_id in in_use if session_id not in transcripts
+        )
+        metrics.orphans_deleted += len(orphans)
+        metrics.evicted += len(evicted)
+        metrics.bytes_freed += freed
+        return self.metrics()
+
+
+transcript_gc = TranscriptCollector()
@@ -11,6 +11,7 @@ from src.models.orm import Patient
 from src.agents.briefing_agent import (
     _build_options,
     _proxy_env,
+    answer_followup_question,
     briefing_tools,
     generate_briefing,
     generate_briefing_via_http_mcp,
@@ -128,7 +129,9 @@ async def test_generate_briefing_success(mock_query, fake_patient):
 
     result = await generate_briefing(fake_patient)
 
-    assert len(result.flags) == 2
+    ai_flags = [f for f in result.flags if f.source == "ai"]
+    assert len(ai_flags) == 2
+    assert result.flags[:2] == ai_flags  # rule flags follow the agent's
     assert "[1]" in result.flags[0].description
     assert result.summary.one_liner
     assert len(result.suggested_actions) == 2
@@ -158,7 +161,9 @@ async def test_http_mcp_briefing_uses_external_server(mock_query, fake_patient):
 
     result = await generate_briefing_via_http_mcp(fake_patient)
 
-    assert len(result.flags) == 2
+    ai_flags = [f for f in result.flags if f.source == "ai"]
+    assert len(ai_flags) == 2
+    assert result.flags[:2] == ai_flags  # rule flags follow the agent's
     options = mock_query.call_args.kwargs["options"]
     assert options.max_turns == 4
     assert options.mcp_servers["briefing"]["type"] == "http"
@@ -267,3 +272,56 @@ def test_build_options_carries_proxy_env_and_model(monkeypatch):
     options = _build_options({"briefing": briefing_tools})
     assert options.env["ANTHROPIC_BASE_URL"] == "http://localhost:4000"
     assert options.model == "gemini-2.5-pro"
+
+
+# --- Follow-up Q&A ---
+
+
+def _answer(text: str, session_id: str):
+    msg = _make_result_message(result=text)
+    msg.session_id = session_id
+    return msg
+
+
+@patch("src.agents.briefing_agent.query")
+async def test_followup_resumes_session_with_only_the_question(
+    mock_query, fake_patient
+):
+    mock_query.return_value = _async_iter([_answer("A2", "s-1")])
+    history = [("user", "Q1"), ("assistant", "A1")]
+
+    answer, session_id = await answer_followup_question(
+        fake_patient, VALID_STRUCTURED_OUTPUT, history, "Q2", session_id="s-1"
+    )
+
+    assert (answer, session_id) == ("A2", "s-1")
+    options = mock_query.call_args.kwargs["options"]
+    assert options.resume == "s-1"
+    prompt = [m async for m in mock_query.call_args.kwargs["prompt"]]
+    assert prompt[0]["message"]["content"] == "Q2"
+
+
+@patch("src.agents.briefing_agent.query")
+async def test_followup_falls_back_to_windowed_replay(
+    mock_query, fake_patient, monkeypatch
+):
+    """A session that can't be resumed is replaced by a new one."""
+    monkeypatch.setattr("src.config.settings.followup_replay_pairs", 1)
+    missing = _make_result_message(is_error=True, result="No conversation found")
+    mock_query.side_effect = [
+        _async_iter([missing]),
+        _async_iter([_answer("A3", "s-2")]),
+    ]
+    history = [("user", "Q1"), ("assistant", "A1"), ("user", "Q2"), ("assistant", "A2")]
+
+    answer, session_id = await answer_followup_question(
+        fake_patient, VALID_STRUCTURED_OUTPUT, history, "Q3", session_id="gone"
+    )
+
+    assert (answer, session_id) == ("A3", "s-2")
+    replay = mock_query.call_args_list[1].kwargs
+    assert replay["options"].resume is None
+    (message,) = [m async for m in replay["prompt"]]
+    prompt = message["message"]["content"]
+    assert "PATIENT RECORD" in prompt and "most recent 1 exchanges" in prompt
+    assert "Physician: Q2" in prompt and "Q1" not in prompt
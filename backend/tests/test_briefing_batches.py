@@ -0,0 +1,129 @@
+"""Bulk pre-visit briefing batch tests."""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock
+
+import pytest
+from httpx import AsyncClient
+
+from src.models.orm import Patient
+from src.services.briefing_batches import schedule_from_visits
+from src.services.briefing_jobs import briefing_pool
+from tests.test_briefings import MOCK_BRIEFING
+
+
+def _patient(pid: int, *visits: dict) -> Patient:
+    return Patient(id=pid, name=f"P{pid}", visits=list(visits))
+
+
+@pytest.fixture
+async def pool(session_factory) -> AsyncIterator[None]:
+    await briefing_pool.start(session_factory, concurrency=2, max_queued=50)
+    yield
+    await briefing_pool.stop()
+
+
+@pytest.fixture(autouse=True)
+def fixed_collection_version(mocker) -> None:
+    mocker.patch(
+        "src.services.rag_service.async_collection_version",
+        new_callable=AsyncMock,
+        return_value="clinical_guidelines:42",
+    )
+
+
+@pytest.fixture
+async def second_patient(session_factory) -> Patient:
+    async with session_factory() as s:
+        patient = Patient(
+            name="Second Patient",
+            date_of_birth=datetime.date(1970, 1, 1),
+            gender="M",
+            visits=[{"date": "2024-01-15", "time": "08:30", "reason": "Follow-up"}],
+        )
+        s.add(patient)
+        await s.commit()
+        await s.refresh(patient)
+        return patient
+
+
+class TestScheduleFromVisits:
+    def test_orders_by_appointment_and_filters_range(self) -> None:
+        patients = [
+            _patient(1, {"date": "2024-03-02", "time": "14:00"}),
+            _patient(2, {"date": "2024-03-02", "time": "09:15"}),
+            _patient(3, {"date": "2024-03-05"}),
+            _patient(4, {"date": "2024-03-01"}, {"date": "2024-03-03"}),
+        ]
+        schedule = schedule_from_visits(
+            patients, datetime.date(2024, 3, 2), datetime.date(2024, 3, 3)
+        )
+        assert [(p.id, t.strftime("%d %H:%M")) for t, p in schedule] == [
+            (2, "02 09:15"),
+            (1, "02 14:00"),
+            (4, "03 00:00"),
+        ]
+
+
+async def test_batch_by_date_skips_cached_and_reports_progress(
+    client: AsyncClient, seed_patient, second_patient, pool, mocker
+) -> None:
+    generate = mocker.patch(
+        "src.services.briefing_jobs.generate_briefing",
+        new_callable=AsyncMock,
+        return_value=MOCK_BRIEFING,
+    )
+    # A still-valid briefing for the first patient.
+    first = await client.post(
+        "/api/v1/briefing-batches", json={"patient_ids": [seed_patient.id]}
+    )
+    await asyncio.wait_for(briefing_pool.drain(), timeout=5)
+    assert first.status_code == 202
+    assert generate.await_count == 1
+
+    response = await client.post(
+        "/api/v1/briefing-batches", json={"date_from": "2024-01-15"}
+    )
+    assert response.status_code == 202
+    batch = response.json()
+    # Appointment order: an untimed visit sorts as midnight, before 08:30.
+    assert [(i["patient_id"], i["cached"]) for i in batch["items"]] == [
+        (seed_patient.id, True),
+        (second_patient.id, False),
+    ]
+    assert batch["items"][1]["appointment_at"] == "2024-01-15T08:30:00"
+    assert batch["progress"]["cached"] == 1
+
+    await asyncio.wait_for(briefing_pool.drain(), timeout=5)
+    report = (await client.get(f"/api/v1/briefing-batches/{batch['id']}")).json()
+    assert report["progress"] == {
+        "total": 2,
+        "queued": 0,
+        "running": 0,
+        "succeeded": 2,
+        "failed": 0,
+        "cached": 1,
+        "done": True,
+    }
+    assert generate.await_count == 2
+    assert all(item["briefing_id"] for item in report["items"])
+
+
+async def test_unknown_patients_404(client: AsyncClient, seed_patient) -> None:
+    response = await client.post(
+        "/api/v1/briefing-batches", json={"patient_ids": [seed_patient.id, 999]}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"]["details"] == {"missing": [999]}
+
+
+async def test_requires_exactly_one_selection(client: AsyncClient) -> None:
+    response = await client.post(
+        "/api/v1/briefing-batches",
+        json={"patient_ids": [1], "date_from": "2024-01-15"},
+    )
+    assert response.status_code == 422
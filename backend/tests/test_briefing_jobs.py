@@ -0,0 +1,222 @@
+"""Async briefing job API + worker pool tests."""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock
+
+import pytest
+from httpx import AsyncClient
+
+from src.models.orm import BriefingJob
+from src.services.briefing_jobs import briefing_pool
+from src.services.briefing_service import BriefingGenerationError
+from tests.test_briefings import MOCK_BRIEFING
+
+
+@pytest.fixture
+async def pool(session_factory) -> AsyncIterator[None]:
+    await briefing_pool.start(session_factory, concurrency=1, max_queued=2)
+    yield
+    await briefing_pool.stop()
+
+
+@pytest.fixture(autouse=True)
+def fixed_collection_version(mocker) -> None:
+    mocker.patch(
+        "src.services.rag_service.async_collection_version",
+        new_callable=AsyncMock,
+        return_value="clinical_guidelines:42",
+    )
+
+
+async def _finished(client: AsyncClient, url: str) -> dict:
+    # Wait on the pool rather than polling: the in-memory test database is a
+    # single shared connection, so concurrent sessions would interleave.
+    await asyncio.wait_for(briefing_pool.drain(), timeout=5)
+    return (await client.get(url)).json()
+
+
+async def test_job_runs_and_returns_briefing(
+    client: AsyncClient, seed_patient, pool, mocker
+) -> None:
+    mocker.patch(
+        "src.services.briefing_jobs.generate_briefing",
+        new_callable=AsyncMock,
+        return_value=MOCK_BRIEFING,
+    )
+    response = await client.post(f"/api/v1/patients/{seed_patient.id}/briefing/jobs")
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert response.headers["Location"].endswith(f"/briefing/jobs/{job['id']}")
+
+    done = await _finished(client, response.headers["Location"])
+    assert done["status"] == "succeeded"
+    assert done["briefing"]["flags"][0]["title"] == "HbA1c elevated"
+    assert done["briefing"]["id"] == done["briefing_id"]
+
+
+async def test_job_failure_is_recorded(
+    client: AsyncClient, seed_patient, pool, mocker
+) -> None:
+    mocker.patch(
+        "src.services.briefing_jobs.generate_briefing",
+        new_callable=AsyncMock,
+        side_effect=BriefingGenerationError(code="AGENT_ERROR", message="boom"),
+    )
+    job = (
+        await client.post(f"/api/v1/patients/{seed_patient.id}/briefing/jobs")
+    ).json()
+    failed = await _finished(
+        client, f"/api/v1/patients/{seed_patient.id}/briefing/jobs/{job['id']}"
+    )
+    assert failed["status"] == "failed"
+    assert failed["error_code"] == "AGENT_ERROR"
+    assert failed["briefing"] is None
+
+
+async def test_priority_order_and_concurrency_cap(
+    client: AsyncClient, seed_patient, session_factory, mocker
+) -> None:
+    """With one worker, queued jobs run one at a time, most urgent first."""
+    running = 0
+    peak = 0
+    order: list[int] = []
+
+    async def slow_generate(patient):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return MOCK_BRIEFING
+
+    mocker.patch("src.services.briefing_jobs.generate_briefing", new=slow_generate)
+    original_run = briefing_pool._run
+
+    async def recording_run(job_id: int) -> None:
+        order.append(job_id)
+        await original_run(job_id)
+
+    mocker.patch.object(briefing_pool, "_run", new=recording_run)
+
+    # Queue before the pool starts, so all three are pending at once.
+    async with session_factory() as s:
+        jobs = [
+            BriefingJob(patient_id=seed_patient.id, priority=p, force=True)
+            for p in (5, 1, 9)
+        ]
+        s.add_all(jobs)
+        await s.commit()
+        ids = [j.id for j in jobs]
+
+    await briefing_pool.start(session_factory, concurrency=1, max_queued=10)
+    try:
+        url = f"/api/v1/patients/{seed_patient.id}/briefing/jobs/{ids[2]}"
+        assert (await _finished(client, url))["status"] == "succeeded"
+    finally:
+        await briefing_pool.stop()
+
+    assert order == [ids[1], ids[0], ids[2]]
+    assert peak == 1
+
+
+async def test_start_recovers_only_jobs_with_expired_leases(
+    client: AsyncClient, seed_patient, session_factory, mocker
+) -> None:
+    """A running job another live process holds a lease on is not re-run."""
+    mocker.patch(
+        "src.services.briefing_jobs.generate_briefing",
+        new_callable=AsyncMock,
+        return_value=MOCK_BRIEFING,
+    )
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    async with session_factory() as s:
+        live, dead = (
+            BriefingJob(
+                patient_id=seed_patient.id,
+                force=True,
+                status="running",
+                worker_id="other-host:1:abcd",
+                heartbeat_at=heartbeat_at,
+            )
+            for heartbeat_at in (now, now - datetime.timedelta(minutes=5))
+        )
+        s.add_all([live, dead])
+        await s.commit()
+        ids = (live.id, dead.id)
+
+    await briefing_pool.start(session_factory, concurrency=1, max_queued=10)
+    try:
+        await asyncio.wait_for(briefing_pool.drain(), timeout=5)
+    finally:
+        await briefing_pool.stop()
+
+    async with session_factory() as s:
+        live, dead = [await s.get(BriefingJob, job_id) for job_id in ids]
+    assert (live.status, live.worker_id) == ("running", "other-host:1:abcd")
+    assert dead.status == "succeeded"
+    assert dead.worker_id != "other-host:1:abcd"
+    assert dead.finished_at.tzinfo is None
+
+
+async def test_queue_full_returns_503(
+    client: AsyncClient, seed_patient, pool, mocker
+) -> None:
+    gate = asyncio.Event()
+    started = asyncio.Event()
+
+    async def blocked_generate(patient):
+        started.set()
+        await gate.wait()
+        return MOCK_BRIEFING
+
+    mocker.patch("src.services.briefing_jobs.generate_briefing", new=blocked_generate)
+    url = f"/api/v1/patients/{seed_patient.id}/briefing/jobs"
+    await client.post(url, params={"force": "true"})
+    # The first job is dequeued by the single worker and blocks there.
+    for _ in range(100):
+        if started.is_set():
+            break
+        await asyncio.sleep(0.01)
+    assert (await client.post(url)).status_code == 202
+    assert (await client.post(url)).status_code == 202
+
+    response = await client.post(url)
+    assert response.status_code == 503
+    assert response.json()["detail"]["code"] == "BRIEFING_QUEUE_FULL"
+    gate.set()
+
+
+async def test_job_events_stream_until_done(
+    client: AsyncClient, seed_patient, pool, mocker
+) -> None:
+    mocker.patch(
+        "src.services.briefing_jobs.generate_briefing",
+        new_callable=AsyncMock,
+        return_value=MOCK_BRIEFING,
+    )
+    job = (
+        await client.post(f"/api/v1/patients/{seed_patient.id}/briefing/jobs")
+    ).json()
+    await briefing_pool.drain()
+    response = await client.get(
+        f"/api/v1/patients/{seed_patient.id}/briefing/jobs/{job['id']}/events"
+    )
+    frames = [
+        json.loads(line.removeprefix("data: "))
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert frames[-1]["status"] == "succeeded"
+    assert frames[-1]["briefing"]["summary"]["one_liner"]
+
+
+async def test_unknown_job_404(client: AsyncClient, seed_patient) -> None:
+    response = await client.get(f"/api/v1/patients/{seed_patient.id}/briefing/jobs/999")
+    assert response.status_code == 404
+    assert response.json()["detail"]["code"] == "BRIEFING_JOB_NOT_FOUND"
@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
 from src.models.orm import Patient
+from src.models.schemas import BriefingResponse
+from src.services.briefing_jobs import briefing_pool
 from src.services.briefing_service import BriefingGenerationError, generate_briefing
 
 # --- Fixtures ---
@@ -103,7 +106,8 @@ async def test_generate_briefing_success(mock_query, _mock_qdrant, fake_patient)
 
     result = await generate_briefing(fake_patient)
 
-    assert len(result.flags) == 1
+    assert [f.source for f in result.flags][:1] == ["ai"]
+    assert all(f.source == "rules" for f in result.flags[1:])
     assert result.flags[0].title == "HbA1c elevated"
     assert result.flags[0].category == "labs"
     assert result.summary.one_liner == "67-year-old female with Type 2 Diabetes"
@@ -170,3 +174,131 @@ async def test_generate_briefing_delegates_to_rag(
     call_kwargs = mock_query.call_args
     options = call_kwargs.kwargs.get("options") or call_kwargs[1].get("options")
     assert options.max_turns == 4
+
+
+# --- Latency SLO (hedging and deadline) ---
+
+
+def _briefing(title: str) -> BriefingResponse:
+    output = {**VALID_STRUCTURED_OUTPUT, "flags": []}
+    output["summary"] = {**output["summary"], "one_liner": title}
+    return BriefingResponse(**output, generated_at=datetime.datetime.now(datetime.UTC))
+
+
+class _Path:
+    """A briefing path that finishes after `delay` (never, when None)."""
+
+    def __init__(self, title: str, delay: float | None, error=None) -> None:
+        self.title, self.delay, self.error = title, delay, error
+        self.started = self.cancelled = False
+
+    async def __call__(self, patient, events=None) -> BriefingResponse:
+        self.started = True
+        try:
+            await asyncio.sleep(3600 if self.delay is None else self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return _briefing(self.title)
+
+
+@pytest.fixture
+def slo(monkeypatch, mocker):
+    monkeypatch.setattr("src.config.settings.briefing_hedge_seconds", 0.05)
+    monkeypatch.setattr("src.config.settings.briefing_hedge_path", "v1")
+    monkeypatch.setattr("src.config.settings.briefing_deadline_seconds", 1.0)
+    mocker.patch(
+        "src.services.briefing_service._qdrant_available",
+        new_callable=AsyncMock,
+        return_value=True,
+    )
+
+    def install(rag: _Path, v1: _Path) -> None:
+        mocker.patch("src.agents.briefing_agent.generate_briefing", rag)
+        mocker.patch("src.services.briefing_service._generate_briefing_v1", v1)
+
+    return install
+
+
+async def test_fast_primary_never_starts_hedge(slo, fake_patient):
+    rag, v1 = _Path("rag", 0), _Path("v1", 0)
+    slo(rag, v1)
+
+    result = await generate_briefing(fake_patient)
+
+    assert result.summary.one_liner == "rag"
+    assert not v1.started
+
+
+async def test_hedge_wins_and_slow_primary_is_cancelled(slo, fake_patient):
+    rag, v1 = _Path("rag", None), _Path("v1", 0)
+    slo(rag, v1)
+
+    result = await generate_briefing(fake_patient)
+
+    assert result.summary.one_liner == "v1"
+    assert not result.degraded
+    assert rag.cancelled
+
+
+async def test_hedge_needs_a_free_pool_slot(slo, fake_patient, monkeypatch):
+    monkeypatch.setattr(briefing_pool, "_slots", asyncio.Semaphore(1))
+    rag, v1 = _Path("rag", 0.2), _Path("v1", 0)
+    slo(rag, v1)
+
+    # The caller holds the only slot, so the V1 hedge must not start.
+    async with briefing_pool.limit():
+        result = await generate_briefing(fake_patient)
+
+    assert result.summary.one_liner == "rag"
+    assert not v1.started
+
+
+async def test_failed_primary_starts_hedge_immediately(slo, fake_patient, monkeypatch):
+    monkeypatch.setattr("src.config.settings.briefing_hedge_seconds", 30)
+    error = BriefingGenerationError(code="AGENT_ERROR", message="boom")
+    rag, v1 = _Path("rag", 0, error=error), _Path("v1", 0)
+    slo(rag, v1)
+
+    result = await generate_briefing(fake_patient)
+
+    assert result.summary.one_liner == "v1"
+
+
+async def test_every_path_failing_raises_primary_error(slo, fake_patient):
+    rag = _Path(
+        "rag", 0, error=BriefingGenerationError(code="AGENT_ERROR", message="a")
+    )
+    v1 = _Path("v1", 0, error=BriefingGenerationError(code="NO_RESULT", message="b"))
+    slo(rag, v1)
+
+    with pytest.raises(BriefingGenerationError) as exc_info:
+        await generate_briefing(fake_patient)
+
+    assert exc_info.value.code == "AGENT_ERROR"
+
+
+async def test_deadline_returns_rules_only_briefing(slo, fake_patient, monkeypatch):
+    monkeypatch.setattr("src.config.settings.briefing_deadline_seconds", 0.1)
+    rag, v1 = _Path("rag", None), _Path("v1", None)
+    slo(rag, v1)
+
+    result = await generate_briefing(fake_patient)
+
+    assert result.flags and all(flag.source == "rules" for flag in result.flags)
+    assert result.degraded
+    assert rag.cancelled and v1.cancelled
+
+
+async def test_fast_hedge_path(slo, fake_patient, monkeypatch):
+    monkeypatch.setattr("src.config.settings.briefing_hedge_path", "fast")
+    rag, v1 = _Path("rag", None), _Path("v1", 0)
+    slo(rag, v1)
+
+    result = await generate_briefing(fake_patient)
+
+    assert all(flag.source == "rules" for flag in result.flags)
+    assert result.degraded
+    assert rag.cancelled and not v1.started
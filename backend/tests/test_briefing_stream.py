@@ -0,0 +1,273 @@
+"""Streamed briefing tests: partial-output events and the SSE endpoint."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock
+
+import pytest
+from claude_agent_sdk import (
+    AssistantMessage,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+from claude_agent_sdk.types import StreamEvent
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from src.agents.briefing_events import BriefingEventTranslator, PartialJSONObject
+from src.config import settings
+from src.models.orm import Briefing
+from src.services import briefing_stream
+from src.services.briefing_jobs import briefing_pool
+from src.services.briefing_service import BriefingGenerationError
+from tests.test_briefing_agent import VALID_STRUCTURED_OUTPUT
+from tests.test_briefings import MOCK_BRIEFING
+
+# --- Partial structured output ---
+
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 10_000])
+def test_partial_object_surfaces_items_as_they_close(size) -> None:
+    scanner = PartialJSONObject()
+    completed = []
+    for chunk in _chunks(json.dumps(VALID_STRUCTURED_OUTPUT), size):
+        completed.extend(scanner.feed(chunk))
+
+    assert [(member, index) for member, index, _ in completed] == [
+        ("flags", 0),
+        ("flags", 1),
+        ("summary", None),
+        ("suggested_actions", 0),
+        ("suggested_actions", 1),
+    ]
+    assert completed[1][2] == VALID_STRUCTURED_OUTPUT["flags"][1]
+
+
+def test_partial_object_ignores_brackets_inside_strings() -> None:
+    scanner = PartialJSONObject()
+    text = json.dumps({"flags": [{"title": 'a "}]" b {[', "n": 1}], "x": "}"})
+
+    completed = scanner.feed(text[:20]) + scanner.feed(text[20:])
+
+    assert completed == [("flags", 0, {"title": 'a "}]" b {[', "n": 1})]
+
+
+def _stream(event: dict) -> StreamEvent:
+    return StreamEvent(uuid="u", session_id="s", event=event)
+
+
+def test_translator_emits_validated_flags_from_structured_output_deltas() -> None:
+    invalid = {"category": "labs", "severity": "urgent", "title": "x"}
+    output = json.dumps({"flags": [invalid, VALID_STRUCTURED_OUTPUT["flags"][0]]})
+    translator = BriefingEventTranslator()
+    events = translator.translate(
+        _stream(
+            {
+                "type": "content_block_start",
+                "index": 1,
+                "content_block": {"type": "tool_use", "name": "StructuredOutput"},
+            }
+        )
+    )
+    for chunk in _chunks(output, 16):
+        events += translator.translate(
+            _stream(
+                {
+                    "type": "content_block_delta",
+                    "index": 1,
+                    "delta": {"type": "input_json_delta", "partial_json": chunk},
+                }
+            )
+        )
+
+    assert events == [
+        ("flag", {"flag": VALID_STRUCTURED_OUTPUT["flags"][0], "index": 1})
+    ]
+
+
+def test_translator_reports_tool_calls_and_sources() -> None:
+    translator = BriefingEventTranslator()
+    tool_use = AssistantMessage(
+        content=[
+            ToolUseBlock(
+                id="t1",
+                name="mcp__briefing__search_clinical_guidelines",
+                input={"query": "metformin eGFR 45"},
+            ),
+            ToolUseBlock(id="t2", name="StructuredOutput", input={}),
+        ],
+        model="m",
+    )
+    result = UserMessage(
+        content=[
+            ToolResultBlock(
+                tool_use_id="t1",
+                content=[
+                    {
+                        "type": "text",
+                        "text": '<clinical_guidelines>\n  <source id="1" '
+                        'document="ADA Standards" section="Renal" score="0.82">'
+                        "\n    text\n  </source>\n</clinical_guidelines>",
+                    }
+                ],
+            )
+        ]
+    )
+
+    assert translator.translate(tool_use) == [
+        (
+            "tool_use",
+            {
+                "tool": "search_clinical_guidelines",
+                "input": {"query": "metformin eGFR 45"},
+            },
+        )
+    ]
+    assert translator.translate(result) == [
+        (
+            "sources",
+            {
+                "tool_use_id": "t1",
+                "sources": [
+                    {
+                        "source_id": 1,
+                        "document": "ADA Standards",
+                        "section": "Renal",
+                        "score": 0.82,
+                    }
+                ],
+            },
+        )
+    ]
+
+
+# --- SSE endpoint ---
+
+
+@pytest.fixture
+async def pool(session_factory) -> AsyncIterator[None]:
+    await briefing_pool.start(session_factory, concurrency=1, max_queued=2)
+    yield
+    await briefing_pool.stop()
+
+
+@pytest.fixture(autouse=True)
+def fixed_collection_version(mocker) -> None:
+    mocker.patch(
+        "src.services.rag_service.async_collection_version",
+        new_callable=AsyncMock,
+        return_value="clinical_guidelines:42",
+    )
+
+
+def _events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        kind, data = frame.split("\n")
+        events.append((kind.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+async def _fake_generate(patient, events):
+    await events.put(("tool_use", {"tool": "search_clinical_guidelines", "input": {}}))
+    flag = MOCK_BRIEFING.flags[0].model_dump(mode="json")
+    await events.put(("flag", {"flag": flag, "index": 0}))
+    return MOCK_BRIEFING.model_copy()
+
+
+async def test_stream_delivers_progress_then_stored_briefing(
+    client: AsyncClient, seed_patient, pool, session_factory, mocker
+) -> None:
+    mocker.patch("src.services.briefing_stream.generate_briefing", _fake_generate)
+
+    response = await client.post(f"/api/v1/patients/{seed_patient.id}/briefing/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert [kind for kind, _ in events] == [
+        "pre_analysis",
+        "tool_use",
+        "flag",
+        "briefing",
+        "done",
+    ]
+    assert all(f["source"] == "rules" for f in events[0][1]["flags"])
+    briefing, done = events[3][1], events[4][1]
+    assert done == {"briefing_id": briefing["id"], "cached": False}
+    async with session_factory() as session:
+        stored = await session.scalar(select(Briefing))
+    assert stored.id == briefing["id"]
+    assert stored.fingerprint is not None
+
+
+async def test_stream_cache_hit_skips_the_agent(
+    client: AsyncClient, seed_patient, pool, mocker
+) -> None:
+    mocker.patch("src.services.briefing_stream.generate_briefing", _fake_generate)
+    url = f"/api/v1/patients/{seed_patient.id}/briefing/stream"
+    first = _events((await client.post(url)).text)
+
+    mocker.patch(
+        "src.services.briefing_stream.generate_briefing",
+        new_callable=AsyncMock,
+        side_effect=AssertionError("agent should not run"),
+    )
+    second = _events((await client.post(url)).text)
+
+    assert [kind for kind, _ in second] == ["briefing", "done"]
+    assert second[1][1] == {"briefing_id": first[-1][1]["briefing_id"], "cached": True}
+
+
+async def test_stream_reports_generation_error(
+    client: AsyncClient, seed_patient, pool, mocker
+) -> None:
+    mocker.patch(
+        "src.services.briefing_stream.generate_briefing",
+        new_callable=AsyncMock,
+        side_effect=BriefingGenerationError(code="AGENT_ERROR", message="boom"),
+    )
+
+    response = await client.post(f"/api/v1/patients/{seed_patient.id}/briefing/stream")
+
+    assert _events(response.text)[1:] == [
+        ("error", {"code": "AGENT_ERROR", "message": "boom"})
+    ]
+
+
+async def test_abandoned_stream_finishes_in_background(
+    seed_patient, pool, session_factory, mocker
+) -> None:
+    mocker.patch.object(settings, "chat_event_queue_size", 4)
+
+    async def chatty(patient, events):
+        # Far more events than the channel holds, with nobody reading them.
+        for i in range(100):
+            await events.put(("tool_use", {"index": i}))
+        return MOCK_BRIEFING.model_copy()
+
+    mocker.patch("src.services.briefing_stream.generate_briefing", chatty)
+    async with session_factory() as session:
+        stream = briefing_stream.stream_briefing(session, seed_patient)
+        assert b"pre_analysis" in await anext(stream)
+        assert b"tool_use" in await anext(stream)
+        await stream.aclose()
+
+    async with asyncio.timeout(2):
+        await asyncio.gather(*briefing_stream._detached)
+    async with session_factory() as session:
+        assert await session.scalar(select(Briefing)) is not None
+
+
+async def test_stream_patient_not_found(client: AsyncClient) -> None:
+    response = await client.post("/api/v1/patients/99999/briefing/stream")
+    assert response.status_code == 404
+    assert response.json()["detail"]["code"] == "PATIENT_NOT_FOUND"
@@ -5,6 +5,7 @@ from __future__ import annotations
 import datetime
 from unittest.mock import AsyncMock
 
+import pytest
 from httpx import AsyncClient
 from sqlalchemy import select
 
@@ -39,6 +40,15 @@ MOCK_BRIEFING = BriefingResponse(
 )
 
 
+@pytest.fixture(autouse=True)
+def fixed_collection_version(mocker) -> None:
+    mocker.patch(
+        "src.services.rag_service.async_collection_version",
+        new_callable=AsyncMock,
+        return_value="clinical_guidelines:42",
+    )
+
+
 async def test_create_briefing_success(
     client: AsyncClient, seed_patient, mocker
 ) -> None:
@@ -146,7 +156,7 @@ async def test_chat_about_briefing_success(
     mocker.patch(
         "src.services.briefing_chat_service.answer_followup_question",
         new_callable=AsyncMock,
-        return_value="Because eGFR is 45, metformin should be capped [1].",
+        return_value=("Because eGFR is 45, metformin should be capped [1].", "s-1"),
     )
 
     response = await client.post(
@@ -180,7 +190,7 @@ async def test_chat_replays_prior_turns_as_history(
     mock_agent = mocker.patch(
         "src.services.briefing_chat_service.answer_followup_question",
         new_callable=AsyncMock,
-        return_value="A1",
+        return_value=("A1", "s-1"),
     )
 
     await client.post(
@@ -197,3 +207,115 @@ async def test_chat_replays_prior_turns_as_history(
     second_history = mock_agent.call_args_list[1].args[2]
     assert ("user", "Q1") in second_history
     assert ("assistant", "A1") in second_history
+
+
+async def test_chat_resumes_the_briefing_session(
+    client: AsyncClient, seed_patient, session_factory, mocker
+) -> None:
+    """The session returned by one follow-up is resumed by the next."""
+    briefing_id = await _make_briefing(session_factory, seed_patient.id)
+    mock_agent = mocker.patch(
+        "src.services.briefing_chat_service.answer_followup_question",
+        new_callable=AsyncMock,
+        side_effect=[("A1", "s-1"), ("A2", "s-2")],
+    )
+    url = f"/api/v1/patients/{seed_patient.id}/briefing/{briefing_id}/chat"
+
+    await client.post(url, json={"question": "Q1"})
+    await client.post(url, json={"question": "Q2"})
+
+    sessions = [call.kwargs["session_id"] for call in mock_agent.call_args_list]
+    assert sessions == [None, "s-1"]
+    async with session_factory() as s:
+        assert (await s.get(Briefing, briefing_id)).followup_session_id == "s-2"
+
+
+# --- Fingerprint cache ---
+
+
+async def test_create_briefing_reuses_cached_briefing(
+    client: AsyncClient, seed_patient, mocker
+) -> None:
+    """An unchanged patient record returns the stored briefing without the agent."""
+    mock_generate = mocker.patch(
+        "src.routers.briefings.generate_briefing",
+        new_callable=AsyncMock,
+        return_value=MOCK_BRIEFING,
+    )
+    url = f"/api/v1/patients/{seed_patient.id}/briefing"
+
+    first = await client.post(url)
+    second = await client.post(url)
+
+    assert first.headers["X-Briefing-Cache"] == "miss"
+    assert second.headers["X-Briefing-Cache"] == "hit"
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["flags"] == first.json()["flags"]
+    assert mock_generate.await_count == 1
+
+
+async def test_degraded_briefing_is_not_served_from_cache(
+    client: AsyncClient, seed_patient, mocker
+) -> None:
+    """The rules-only SLO fallback is stored, but the next request retries."""
+    degraded = MOCK_BRIEFING.model_copy(update={"degraded": True})
+    mock_generate = mocker.patch(
+        "src.routers.briefings.generate_briefing",
+        new_callable=AsyncMock,
+        side_effect=[degraded, MOCK_BRIEFING],
+    )
+    url = f"/api/v1/patients/{seed_patient.id}/briefing"
+
+    first = await client.post(url)
+    second = await client.post(url)
+
+    assert first.json()["degraded"] is True
+    assert first.json()["id"] is not None
+    assert second.headers["X-Briefing-Cache"] == "miss"
+    assert second.json()["degraded"] is False
+    assert mock_generate.await_count == 2
+
+
+async def test_create_briefing_force_regenerates(
+    client: AsyncClient, seed_patient, mocker
+) -> None:
+    mock_generate = mocker.patch(
+        "src.routers.briefings.generate_briefing",
+        new_callable=AsyncMock,
+        return_value=MOCK_BRIEFING,
+    )
+    url = f"/api/v1/patients/{seed_patient.id}/briefing"
+
+    first = await client.post(url)
+    forced = await client.post(url, params={"force": "true"})
+
+    assert forced.headers["X-Briefing-Cache"] == "miss"
+    assert forced.json()["id"] != first.json()["id"]
+    assert mock_generate.await_count == 2
+
+
+async def test_fingerprint_changes_with_inputs(seed_patient, mocker) -> None:
+    from src.services.briefing_service import briefing_fingerprint
+
+    version = mocker.patch(
+        "src.services.rag_service.async_collection_version",
+        new_callable=AsyncMock,
+        return_value="clinical_guidelines:42",
+    )
+    baseline = await briefing_fingerprint(seed_patient)
+    assert await briefing_fingerprint(seed_patient) == baseline
+
+    seed_patient.medications = [*seed_patient.medications, {"name": "Lisinopril"}]
+    edited = await briefing_fingerprint(seed_patient)
+    assert edited != baseline
+
+    version.return_value = "clinical_guidelines:43"
+    assert await briefing_fingerprint(seed_patient) != edited
+
+    # Screening and age flags move with the analysis date.
+    today = datetime.date.today()
+    assert await briefing_fingerprint(
+        seed_patient, as_of=today
+    ) != await briefing_fingerprint(
+        seed_patient, as_of=today + datetime.timedelta(days=1)
+    )
@@ -19,11 +19,13 @@ from claude_agent_sdk import (
     ToolUseBlock,
     UserMessage,
 )
+from claude_agent_sdk.types import StreamEvent
 from sqlalchemy import select
 
 from src.agents.chat_agent import (
     AGENT_HOME,
     build_chat_options,
+    compact_session,
     drive_chat_turn,
     make_publish_tool,
 )
@@ -108,7 +110,7 @@ async def test_drive_chat_turn_events_session_and_trace():
     ]
     queue: asyncio.Queue = asyncio.Queue()
     options = build_chat_options(
-        queue, patient_id=1, resume_session_id=None, patient_json="{}"
+        queue, patient_id=1, resume_session_id=None, patient_record="{}"
     )
 
     session_id, text, trace = await drive_chat_turn("hello", options, queue)
@@ -188,6 +190,75 @@ async def test_empty_stream_raises_no_result():
     assert exc_info.value.code == "NO_RESULT"
 
 
+def _delta(kind: str, value: str, parent: str | None = None) -> StreamEvent:
+    key = "thinking" if kind == "thinking_delta" else "text"
+    return StreamEvent(
+        uuid="u",
+        session_id="s-1",
+        event={"type": "content_block_delta", "delta": {"type": kind, key: value}},
+        parent_tool_use_id=parent,
+    )
+
+
+def _block_stop() -> StreamEvent:
+    return StreamEvent(uuid="u", session_id="s-1", event={"type": "content_block_stop"})
+
+
+@patch("src.agents.chat_agent.ClaudeSDKClient", FakeClient)
+async def test_partial_messages_stream_deltas_before_blocks():
+    FakeClient.messages = [
+        _delta("thinking_delta", "Review"),
+        _delta("thinking_delta", "ing."),
+        _block_stop(),
+        _delta("text_delta", "Metformin is "),
+        _delta("text_delta", "fine"),
+        _delta("text_delta", "nested", parent="task-1"),
+        _block_stop(),
+        AssistantMessage(
+            content=[
+                ThinkingBlock(thinking="Reviewing.", signature="sig"),
+                TextBlock(text="Metformin is fine"),
+            ],
+            model="test-model",
+        ),
+        _result(),
+    ]
+    queue: asyncio.Queue = asyncio.Queue()
+    options = build_chat_options(queue, 1, None, "{}")
+
+    _, text, trace = await drive_chat_turn("hello", options, queue)
+
+    events = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert events == [
+        ("thinking_delta", {"text": "Review"}),
+        ("thinking_delta", {"text": "ing."}),
+        ("text_delta", {"text": "Metformin is "}),
+        # Held back until the block ends: it could be the start of a key.
+        ("text_delta", {"text": "fine"}),
+        ("thinking", {"text": "Reviewing."}),
+        ("text", {"text": "Metformin is fine"}),
+    ]
+    assert text == "Metformin is fine"
+    assert [part["type"] for part in trace] == ["thinking", "text"]
+
+
+@patch("src.agents.chat_agent.ClaudeSDKClient", FakeClient)
+async def test_text_deltas_mask_keys_split_across_fragments():
+    FakeClient.messages = [
+        _delta("text_delta", "key fc-12"),
+        _delta("text_delta", "34abcd done"),
+        _block_stop(),
+        _result(),
+    ]
+    queue: asyncio.Queue = asyncio.Queue()
+    options = build_chat_options(queue, 1, None, "{}")
+
+    await drive_chat_turn("hello", options, queue)
+
+    streamed = "".join(queue.get_nowait()[1]["text"] for _ in range(queue.qsize()))
+    assert streamed == "key fc-<redacted> done"
+
+
 # --- build_chat_options ---
 
 
@@ -199,6 +270,7 @@ def test_build_chat_options_wiring(monkeypatch: pytest.MonkeyPatch) -> None:
     options = build_chat_options(queue, 1, "s-resume", '{"name": "Maria"}')
 
     assert options.resume == "s-resume"
+    assert options.include_partial_messages is True
     assert options.max_turns == 12
     assert options.cwd == str(AGENT_HOME)
     assert options.setting_sources == ["project"]
@@ -309,3 +381,43 @@ async def test_publish_tool_rejects_invalid_payload(monkeypatch, session_factory
     assert queue.empty()
     async with session_factory() as session:
         assert (await session.scalars(select(Briefing))).all() == []
+
+
+# --- Transcript compaction ---
+
+
+async def test_compact_session_forks_then_seeds_new_session():
+    calls = []
+
+    async def run(prompt, options, *, label):
+        calls.append((prompt, options))
+        if len(calls) == 1:
+            return _result("fork-1", result="Summary: on metformin.")
+        return _result("s-2", result="Ready.")
+
+    with patch("src.agents.chat_agent._run_query_to_result", run):
+        new_id = await compact_session(
+            "s-1", "Name: Jane", [("user", "dose?"), ("assistant", "500mg")]
+        )
+
+    assert new_id == "s-2"
+    (_, summarize), (seed, start) = calls
+    assert (summarize.resume, summarize.fork_session) == ("s-1", True)
+    assert summarize.allowed_tools == []
+    assert start.resume is None
+    assert "Name: Jane" in start.system_prompt
+    assert "Summary: on metformin." in seed
+    assert "500mg" in seed
+
+
+async def test_compact_session_without_new_session_raises():
+    async def run(prompt, options, *, label):
+        return _result("", result="text")
+
+    with (
+        patch("src.agents.chat_agent._run_query_to_result", run),
+        pytest.raises(BriefingGenerationError) as exc_info,
+    ):
+        await compact_session("s-1", "record", [])
+
+    assert exc_info.value.code == "NO_RESULT"
@@ -0,0 +1,147 @@
+"""Tests for fanning live chat turns out to viewers."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.services import chat_turns
+from src.services.chat_broadcast import ChatBroadcaster, PostgresNotify
+from src.services.chat_service import _relay_turn, watch_chat
+from src.services.chat_turns import ChatTurn
+
+
+@pytest.fixture
+def broadcaster(monkeypatch) -> ChatBroadcaster:
+    broadcaster = ChatBroadcaster()
+    monkeypatch.setattr("src.services.chat_service.chat_broadcaster", broadcaster)
+    monkeypatch.setattr(chat_turns, "_turns", {})
+    return broadcaster
+
+
+def _frame(raw: bytes) -> tuple[str | None, str, dict]:
+    lines = dict(line.split(": ", 1) for line in raw.decode().strip().splitlines())
+    return lines.get("id"), lines["event"], json.loads(lines["data"])
+
+
+async def test_publish_reaches_every_subscriber_of_the_patient(broadcaster) -> None:
+    event = ("t:1", "text", {"text": "hi"})
+
+    with (
+        broadcaster.subscribe(1, capacity=10) as first,
+        broadcaster.subscribe(1, capacity=10) as second,
+        broadcaster.subscribe(2, capacity=10) as other,
+    ):
+        await broadcaster.publish(1, event)
+
+        assert await first.next() == event
+        assert await second.next() == event
+        assert await other.next(timeout=0.01) is None
+    assert broadcaster.subscribers(1) == 0
+
+
+async def test_lagging_subscriber_gets_replay_gap(broadcaster) -> None:
+    with broadcaster.subscribe(1, capacity=2) as subscription:
+        for seq in range(1, 6):
+            await broadcaster.publish(1, (f"t:{seq}", "tool_use", {}))
+
+        received = [await subscription.next() for _ in range(3)]
+
+    assert [event_id for event_id, _, _ in received] == ["t:1", "t:2", None]
+    assert received[-1][1:] == ("replay_gap", {"missed": 3})
+
+
+async def test_viewer_catches_up_then_follows_live(broadcaster) -> None:
+    turn = ChatTurn(1, "Is metformin safe?")
+    chat_turns._turns[1] = turn
+    await turn.put(("tool_use", {"id": "a"}))
+    relay = asyncio.create_task(_relay_turn(turn))
+    viewer = watch_chat(1)
+
+    caught_up = [_frame(await anext(viewer)) for _ in range(2)]
+    await turn.put(("tool_use", {"id": "b"}))
+    await turn.put(("done", {}))
+    live = [_frame(await anext(viewer)) for _ in range(2)]
+    await viewer.aclose()
+    await relay
+
+    assert caught_up == [
+        (turn.event_id(0), "turn_started", {"message": "Is metformin safe?"}),
+        (turn.event_id(1), "tool_use", {"id": "a"}),
+    ]
+    assert [kind for _, kind, _ in live] == ["tool_use", "done"]
+    assert live[0][0] == turn.event_id(2)
+    assert broadcaster.subscribers(1) == 0
+
+
+def _notify_transport(delivered: list) -> tuple[PostgresNotify, AsyncMock]:
+    transport = PostgresNotify(
+        MagicMock(), lambda patient, event: delivered.append((patient, event))
+    )
+    transport._conn = MagicMock(execute=AsyncMock())
+    return transport, transport._conn.execute
+
+
+async def test_postgres_notify_round_trip() -> None:
+    delivered = []
+    transport, execute = _notify_transport(delivered)
+    events = [
+        ("t:1", "text", {"text": "x" * 9000}),
+        ("t:2", "text", {"text": "y" * 5000}),
+        ("t:3", "text", {"text": "z" * 4000}),
+    ]
+
+    await transport.send(7, events)
+
+    execute.assert_awaited_once()  # one round trip for the batch
+    (statement, params), _ = execute.call_args
+    assert "pg_notify" in str(statement)
+    assert params["channel"] == PostgresNotify.channel
+    assert len(params["payloads"]) == 2
+    for payload in params["payloads"]:
+        assert len(payload.encode()) <= 7900
+        transport._on_notify(None, 1, params["channel"], payload)
+    assert delivered == [
+        (7, ("t:1", "replay_gap", {"missed": 1})),
+        (7, events[1]),
+        (7, events[2]),
+    ]
+
+
+async def test_postgres_notify_relistens_after_disconnect(monkeypatch) -> None:
+    delivered = []
+    transport, _ = _notify_transport(delivered)
+    transport._conn.invalidate = AsyncMock()
+    connect = AsyncMock(side_effect=[OSError("refused"), None])
+    monkeypatch.setattr(transport, "_connect", connect)
+    monkeypatch.setattr(asyncio, "sleep", AsyncMock())
+
+    transport._on_terminated(None)
+    # While disconnected, events still reach this worker's viewers.
+    await transport.send(7, [("t:1", "tool_use", {})])
+    await transport._reconnect
+
+    assert connect.await_count == 2
+    assert transport._reconnect is None
+    assert delivered == [(7, ("t:1", "tool_use", {}))]
+
+
+async def test_relay_publishes_batches_only_while_watched(broadcaster) -> None:
+    turn = ChatTurn(1, "Is metformin safe?")
+    publish = AsyncMock(wraps=broadcaster.publish)
+    broadcaster.publish = publish
+    await turn.put(("tool_use", {"id": "a"}))
+    relay = asyncio.create_task(_relay_turn(turn))
+    await asyncio.sleep(0)
+
+    with broadcaster.subscribe(1, capacity=10) as subscription:
+        await turn.put(("tool_use", {"id": "b"}))
+        await turn.put(("done", {}))
+        await relay
+        received = [await subscription.next() for _ in range(3)]
+
+    publish.assert_awaited_once()
+    assert [kind for _, kind, _ in received] == ["turn_started", "tool_use", "done"]
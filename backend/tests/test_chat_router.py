@@ -5,6 +5,7 @@ from __future__ import annotations
 from sqlalchemy import select
 
 from src.models.orm import Briefing, Conversation, ConversationMessage
+from src.services.trace_store import trace_row
 from tests.test_briefing_agent import VALID_STRUCTURED_OUTPUT
 
 
@@ -37,6 +38,11 @@ async def test_chat_unknown_patient_404(client):
     assert response.json()["detail"]["code"] == "PATIENT_NOT_FOUND"
 
 
+async def test_watch_unknown_patient_404(client):
+    response = await client.get("/api/v1/patients/999/chat/watch")
+    assert response.status_code == 404
+
+
 async def test_history_round_trip(client, seed_patient, session_factory):
     async with session_factory() as session:
         conversation = Conversation(patient_id=seed_patient.id, session_id="s-1")
@@ -76,6 +82,7 @@ async def test_history_empty(client, seed_patient):
     assert response.json() == {
         "conversation_id": None,
         "messages": [],
+        "next_cursor": None,
         "latest_briefing": None,
     }
 
@@ -91,3 +98,100 @@ async def test_reset_deletes_conversation(client, seed_patient, session_factory)
     async with session_factory() as session:
         remaining = (await session.scalars(select(Conversation))).all()
     assert remaining == []
+
+
+async def _seed_turns(session_factory, patient_id: int, turns: int) -> list[int]:
+    """`turns` user/assistant pairs; returns the assistant message ids."""
+    async with session_factory() as session:
+        conversation = Conversation(patient_id=patient_id, session_id="s-1")
+        session.add(conversation)
+        await session.flush()
+        assistants = []
+        for i in range(turns):
+            session.add(
+                ConversationMessage(
+                    conversation_id=conversation.id, role="user", content=f"q{i}"
+                )
+            )
+            answer = ConversationMessage(
+                conversation_id=conversation.id, role="assistant", content=f"a{i}"
+            )
+            session.add(answer)
+            await session.flush()
+            session.add(trace_row(answer.id, [{"type": "text", "text": f"a{i}"}]))
+            assistants.append(answer.id)
+        await session.commit()
+    return assistants
+
+
+async def test_history_pages_newest_first_without_traces(
+    client, seed_patient, session_factory
+):
+    await _seed_turns(session_factory, seed_patient.id, 3)
+    url = f"/api/v1/patients/{seed_patient.id}/chat"
+
+    first = (await client.get(url, params={"limit": 4})).json()
+    older = (
+        await client.get(url, params={"limit": 4, "before": first["next_cursor"]})
+    ).json()
+
+    assert [m["content"] for m in first["messages"]] == ["q1", "a1", "q2", "a2"]
+    assert [m["content"] for m in older["messages"]] == ["q0", "a0"]
+    assert older["next_cursor"] is None
+    assert all(m["trace"] is None for m in first["messages"])
+    assert [m["has_trace"] for m in first["messages"]] == [False, True] * 2
+
+
+async def test_history_include_traces(client, seed_patient, session_factory):
+    await _seed_turns(session_factory, seed_patient.id, 1)
+
+    response = await client.get(
+        f"/api/v1/patients/{seed_patient.id}/chat", params={"include_traces": True}
+    )
+
+    user, assistant = response.json()["messages"]
+    assert user["trace"] is None
+    assert assistant["trace"] == [{"type": "text", "text": "a0"}]
+
+
+async def test_message_trace_endpoint(client, seed_patient, session_factory):
+    (message_id,) = await _seed_turns(session_factory, seed_patient.id, 1)
+    base = f"/api/v1/patients/{seed_patient.id}/chat/messages"
+
+    response = await client.get(f"{base}/{message_id}/trace")
+    missing = await client.get(f"{base}/99999/trace")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "message_id": message_id,
+        "trace": [{"type": "text", "text": "a0"}],
+    }
+    assert "immutable" in response.headers["cache-control"]
+    assert missing.status_code == 404
+    assert missing.json()["detail"]["code"] == "MESSAGE_NOT_FOUND"
+
+
+async def test_history_etag_revalidates(client, seed_patient, session_factory):
+    await _seed_turns(session_factory, seed_patient.id, 1)
+    url = f"/api/v1/patients/{seed_patient.id}/chat"
+
+    etag = (await client.get(url)).headers["etag"]
+    unchanged = await client.get(url, headers={"If-None-Match": etag})
+    other_page = await client.get(
+        url, params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    async with session_factory() as session:
+        conversation = await session.scalar(select(Conversation))
+        session.add(
+            ConversationMessage(
+                conversation_id=conversation.id, role="user", content="new"
+            )
+        )
+        await session.commit()
+    changed = await client.get(url, headers={"If-None-Match": etag})
+
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert other_page.status_code == 200
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
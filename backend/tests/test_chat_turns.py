@@ -0,0 +1,243 @@
+"""Tests for detached chat turns and Last-Event-ID resume — agent mocked."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from src.agents.transcripts import TranscriptStats
+from src.models.orm import (
+    Conversation,
+    ConversationMessage,
+    ConversationTrace,
+    Patient,
+)
+from src.services import chat_turns
+from src.services.chat_service import follow_chat_turn, stream_chat_turn
+from src.services.chat_turns import ChatTurn
+from src.services.patient_locks import chat_locks
+from src.services.trace_store import decompress_trace
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(monkeypatch):
+    monkeypatch.setattr(chat_turns, "_turns", {})
+    monkeypatch.setattr(chat_locks, "_entries", {})
+
+
+@pytest.fixture
+def agent(mocker):
+    """A fake turn: two text events, then waits for `release` to finish."""
+    release = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def drive(message, options, queue):
+        await queue.put(("text", {"text": "first"}))
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        await queue.put(("text", {"text": "second"}))
+        return "s-1", "first second", [{"type": "text", "text": "first second"}]
+
+    mocker.patch("src.services.chat_service.drive_chat_turn", drive)
+    return release, cancelled
+
+
+def _frame(raw: bytes) -> tuple[str | None, str]:
+    lines = dict(line.split(": ", 1) for line in raw.decode().strip().splitlines())
+    return lines.get("id"), lines["event"]
+
+
+async def _patient(session_factory, patient_id: int) -> Patient:
+    async with session_factory() as session:
+        return await session.get(Patient, patient_id)
+
+
+async def test_follow_replays_from_position_then_goes_live() -> None:
+    turn = ChatTurn(1)
+    await turn.put(("tool_use", {"id": "a"}))
+    await turn.put(("tool_use", {"id": "b"}))
+
+    async def collect(after):
+        return [kind for _, kind, _ in [e async for e in turn.follow(after)]]
+
+    follower = asyncio.create_task(collect(turn.position(turn.event_id(1))))
+    await asyncio.sleep(0)
+    await turn.put(("done", {}))
+
+    assert await follower == ["tool_use", "done"]
+    assert turn.finished
+    assert turn.position("someotherturn:1") == 0
+
+
+async def test_follow_reports_events_lost_from_the_buffer(monkeypatch) -> None:
+    monkeypatch.setattr("src.config.settings.chat_replay_buffer_events", 2)
+    monkeypatch.setattr("src.config.settings.chat_event_queue_size", 2)
+    turn = ChatTurn(1)
+    for tool_id in "abc":
+        await turn.put(("tool_use", {"id": tool_id}))
+    await turn.put(("done", {}))
+
+    events = [(seq, kind) async for seq, kind, _ in turn.follow(0)]
+
+    assert events == [(0, "replay_gap"), (3, "tool_use"), (4, "done")]
+
+
+async def test_turn_survives_disconnect_and_resumes(
+    agent, seed_patient, session_factory
+) -> None:
+    release, cancelled = agent
+    patient = await _patient(session_factory, seed_patient.id)
+
+    async with session_factory() as session:
+        stream = stream_chat_turn(session, patient, "hello")
+        first_id, kind = _frame(await anext(stream))
+        assert kind == "text"
+        await stream.aclose()  # the client went away mid-turn
+
+    turn = chat_turns.current_turn(seed_patient.id)
+    assert turn is not None and not turn.task.done()
+    release.set()
+    frames = [_frame(raw) async for raw in follow_chat_turn(turn, first_id)]
+
+    assert [kind for _, kind in frames] == ["text", "done"]
+    assert frames[0][0] == turn.event_id(2)
+    assert not cancelled.is_set()
+    async with session_factory() as session:
+        messages = (await session.scalars(select(ConversationMessage))).all()
+        stored = await session.get(ConversationTrace, messages[-1].id)
+    assert [message.role for message in messages] == ["user", "assistant"]
+    assert messages[-1].trace is None
+    assert decompress_trace(stored.codec, stored.data) == [
+        {"type": "text", "text": "first second"}
+    ]
+
+
+async def test_unfollowed_turn_cancelled_after_grace(
+    agent, seed_patient, session_factory, monkeypatch
+) -> None:
+    _, cancelled = agent
+    monkeypatch.setattr("src.config.settings.chat_resume_grace_seconds", 0.01)
+    patient = await _patient(session_factory, seed_patient.id)
+
+    async with session_factory() as session:
+        stream = stream_chat_turn(session, patient, "hello")
+        await anext(stream)
+        await stream.aclose()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0.02)
+    assert chat_turns.current_turn(seed_patient.id) is None
+    # The patient lock was released with the cancelled turn.
+    assert not chat_locks.locked(seed_patient.id)
+
+
+async def test_resume_endpoint(client, agent, seed_patient, session_factory) -> None:
+    release, _ = agent
+    url = f"/api/v1/patients/{seed_patient.id}/chat/stream"
+    assert (await client.get(url)).status_code == 404
+
+    patient = await _patient(session_factory, seed_patient.id)
+    async with session_factory() as session:
+        stream = stream_chat_turn(session, patient, "hello")
+        first_id, _ = _frame(await anext(stream))
+        await stream.aclose()
+    release.set()
+
+    response = await client.get(url, headers={"Last-Event-ID": first_id})
+
+    assert response.status_code == 200
+    frames = [f for f in response.text.split("\n\n") if f]
+    assert [_frame(f.encode())[1] for f in frames] == ["text", "done"]
+
+
+async def test_oversized_transcript_compacted_before_unlock(
+    agent, seed_patient, session_factory, monkeypatch, mocker
+) -> None:
+    release, _ = agent
+    monkeypatch.setattr("src.config.settings.chat_compact_transcript_bytes", 1000)
+    mocker.patch(
+        "src.services.chat_service.transcript_stats",
+        return_value=TranscriptStats(size_bytes=5000, context_tokens=None),
+    )
+    compact = mocker.patch(
+        "src.services.chat_service.compact_session", return_value="s-2"
+    )
+    patient = await _patient(session_factory, seed_patient.id)
+    release.set()
+
+    async with session_factory() as session:
+        frames = [_frame(raw) async for raw in stream_chat_turn(session, patient, "hi")]
+    await chat_turns.current_turn(seed_patient.id).task
+
+    assert frames[-1][1] == "done"
+    session_id, _, recent = compact.await_args.args
+    assert session_id == "s-1"
+    assert recent == [("user", "hi"), ("assistant", "first second")]
+    async with session_factory() as session:
+        conversation = await session.scalar(select(Conversation))
+        messages = (await session.scalars(select(ConversationMessage))).all()
+    assert conversation.session_id == "s-2"
+    assert len(messages) == 2  # the UI history is untouched
+    assert not chat_locks.locked(seed_patient.id)
+
+
+async def test_second_turn_queues_with_position(
+    agent, seed_patient, session_factory
+) -> None:
+    release, _ = agent
+    patient = await _patient(session_factory, seed_patient.id)
+
+    async with session_factory() as first_session, session_factory() as session:
+        first = stream_chat_turn(first_session, patient, "one")
+        await anext(first)
+        second = stream_chat_turn(session, patient, "two")
+        queued = await anext(second)
+        release.set()
+        rest = [_frame(raw)[1] async for raw in second]
+        await first.aclose()
+
+    assert _frame(queued) == (None, "queued")
+    assert b'"position": 1' in queued
+    assert rest[-1] == "done" and "queued" not in rest
+
+
+async def test_queued_turn_dropped_on_disconnect(
+    agent, seed_patient, session_factory
+) -> None:
+    release, _ = agent
+    patient = await _patient(session_factory, seed_patient.id)
+
+    async with session_factory() as first_session, session_factory() as session:
+        first = stream_chat_turn(first_session, patient, "one")
+        await anext(first)
+        second = stream_chat_turn(session, patient, "two")
+        await anext(second)
+        await second.aclose()  # the client went away while queued
+        assert chat_locks.waiting(seed_patient.id) == 0
+        release.set()
+        async for _ in first:
+            pass
+
+    async with session_factory() as session:
+        contents = (await session.scalars(select(ConversationMessage.content))).all()
+    assert "two" not in contents
+    assert not chat_locks.locked(seed_patient.id)
+
+
+async def test_full_queue_is_429(client, seed_patient, monkeypatch) -> None:
+    monkeypatch.setattr("src.config.settings.chat_queue_depth", 0)
+    held = await chat_locks.acquire(seed_patient.id, None)
+
+    response = await client.post(
+        f"/api/v1/patients/{seed_patient.id}/chat", json={"message": "hi"}
+    )
+    await held.release()
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "30"
+    assert response.json()["detail"]["code"] == "CHAT_QUEUE_FULL"
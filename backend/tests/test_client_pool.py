@@ -0,0 +1,222 @@
+"""Tests for the warm ClaudeSDKClient pool — fake clients, no CLI."""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+from typing import ClassVar
+
+import pytest
+from claude_agent_sdk import CLIConnectionError, ResultMessage
+
+from src.agents import briefing_agent
+from src.agents.client_pool import AgentClientPool
+from src.models.orm import Patient
+from src.services.briefing_service import BriefingGenerationError
+from tests.test_briefing_agent import VALID_STRUCTURED_OUTPUT
+
+
+def _result(*, is_error: bool = False, structured_output=None) -> ResultMessage:
+    return ResultMessage(
+        subtype="error" if is_error else "success",
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=is_error,
+        num_turns=1,
+        session_id="s",
+        result="boom" if is_error else "ok",
+        structured_output=structured_output,
+    )
+
+
+class FakeClient:
+    """Records calls; replies to each prompt with one ResultMessage."""
+
+    instances: ClassVar[list[FakeClient]] = []
+
+    def __init__(self, options) -> None:
+        self.options = options
+        self.prompts: list[str] = []
+        self.connected = False
+        self.disconnected = False
+        self.healthy = True
+        self.fail_next: Exception | None = None
+        self.reply = _result()
+        self.hang = False
+        FakeClient.instances.append(self)
+
+    async def connect(self) -> None:
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        self.disconnected = True
+
+    async def get_mcp_status(self) -> dict:
+        status = "connected" if self.healthy else "failed"
+        return {"mcpServers": [{"name": "briefing", "status": status}]}
+
+    async def query(self, prompt: str) -> None:
+        self.prompts.append(prompt)
+        if self.fail_next is not None and prompt != "/clear":
+            error, self.fail_next = self.fail_next, None
+            raise error
+
+    async def receive_response(self):
+        if self.hang and self.prompts[-1] != "/clear":
+            await asyncio.Event().wait()
+        yield _result() if self.prompts[-1] == "/clear" else self.reply
+
+
+async def _started(pool: AgentClientPool) -> AgentClientPool:
+    FakeClient.instances = []
+    await pool.start(size=1, max_uses=3)
+    await asyncio.sleep(0)  # let the worker pre-connect its client
+    return pool
+
+
+@pytest.fixture
+async def pool():
+    pool = await _started(
+        AgentClientPool("test", lambda: object(), client_factory=FakeClient)
+    )
+    yield pool
+    await pool.stop()
+
+
+@pytest.fixture
+async def briefing_pool(monkeypatch):
+    """The real briefing options, on fake clients."""
+    pool = await _started(
+        AgentClientPool(
+            "briefing",
+            lambda: briefing_agent._build_options(
+                {"briefing": briefing_agent.briefing_tools}
+            ),
+            client_factory=FakeClient,
+        )
+    )
+    monkeypatch.setattr(briefing_agent, "briefing_clients", pool)
+    yield pool
+    await pool.stop()
+
+
+@pytest.fixture
+def patient() -> Patient:
+    return Patient(
+        id=1,
+        name="Maria Garcia",
+        date_of_birth=datetime.date(1957, 3, 15),
+        gender="F",
+        conditions=["Type 2 Diabetes"],
+        medications=[],
+        labs=[],
+        allergies=[],
+        visits=[],
+    )
+
+
+async def _run(pool: AgentClientPool, prompt: str) -> list:
+    return [message async for message in pool.run(prompt)]
+
+
+async def test_client_is_reused_and_cleared_between_requests(pool):
+    first = await _run(pool, "one")
+    second = await _run(pool, "two")
+
+    assert [m.result for m in first + second] == ["ok", "ok"]
+    assert len(FakeClient.instances) == 1
+    assert FakeClient.instances[0].prompts == ["one", "/clear", "two", "/clear"]
+
+
+async def test_client_recycled_after_max_uses(pool):
+    for i in range(4):
+        await _run(pool, f"p{i}")
+
+    first, second = FakeClient.instances
+    assert first.prompts == ["p0", "/clear", "p1", "/clear", "p2"]
+    assert first.disconnected
+    assert second.prompts[0] == "p3"
+
+
+async def test_query_error_propagates_and_recycles(pool):
+    await _run(pool, "warm")
+    FakeClient.instances[0].fail_next = CLIConnectionError("pipe closed")
+
+    with pytest.raises(CLIConnectionError):
+        await _run(pool, "broken")
+    await _run(pool, "after")
+
+    assert FakeClient.instances[0].disconnected
+    assert FakeClient.instances[1].prompts[0] == "after"
+
+
+async def test_error_result_recycles_client(pool):
+    await _run(pool, "warm")
+    FakeClient.instances[0].reply = _result(is_error=True)
+
+    messages = await _run(pool, "fails")
+
+    assert messages[-1].is_error
+    assert FakeClient.instances[0].disconnected
+    assert "/clear" not in FakeClient.instances[0].prompts[2:]
+
+
+async def test_abandoned_request_recycles_client(pool):
+    await _run(pool, "warm")
+    FakeClient.instances[0].hang = True
+
+    consumer = asyncio.create_task(_run(pool, "slow"))
+    await asyncio.sleep(0.01)
+    consumer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+    await asyncio.sleep(0.01)
+
+    assert FakeClient.instances[0].disconnected
+    assert await _run(pool, "next")
+    assert FakeClient.instances[1].prompts[0] == "next"
+
+
+async def test_unhealthy_client_replaced_before_use(pool):
+    await _run(pool, "warm")
+    FakeClient.instances[0].healthy = False
+
+    await _run(pool, "next")
+
+    stale, fresh = FakeClient.instances
+    assert stale.disconnected and "next" not in stale.prompts
+    assert fresh.prompts[0] == "next"
+
+
+async def test_connect_failure_reaches_caller():
+    class Unreachable(FakeClient):
+        async def connect(self) -> None:
+            raise CLIConnectionError("no cli")
+
+    pool = AgentClientPool("down", lambda: object(), client_factory=Unreachable)
+    await pool.start(size=1, max_uses=3)
+    try:
+        with pytest.raises(CLIConnectionError):
+            await _run(pool, "hello")
+    finally:
+        await pool.stop()
+
+
+async def test_generate_briefing_runs_on_started_pool(briefing_pool, patient):
+    client = FakeClient.instances[0]
+    client.reply = _result(structured_output=VALID_STRUCTURED_OUTPUT)
+
+    briefing = await briefing_agent.generate_briefing(patient)
+
+    assert len([f for f in briefing.flags if f.source == "ai"]) == 2
+    assert "briefing" in client.options.mcp_servers
+    assert "PATIENT: Maria Garcia | F" in client.prompts[0]
+
+
+async def test_pooled_cli_error_maps_to_briefing_error(briefing_pool, patient):
+    FakeClient.instances[0].fail_next = CLIConnectionError("pipe closed")
+
+    with pytest.raises(BriefingGenerationError) as exc_info:
+        await briefing_agent.generate_briefing(patient)
+
+    assert exc_info.value.code == "CLI_CONNECTION_ERROR"
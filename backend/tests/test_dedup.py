@@ -0,0 +1,56 @@
+"""Unit tests for MinHash/LSH near-duplicate detection."""
+
+from __future__ import annotations
+
+from src.services.dedup import (
+    BANDS,
+    NUM_PERM,
+    estimate_jaccard,
+    find_batch_duplicates,
+    is_near_duplicate,
+    lsh_bands,
+    minhash,
+)
+
+PARAGRAPH = (
+    "Metformin is contraindicated when eGFR falls below 30 mL/min. Reduce the "
+    "dose to a maximum of 1000 mg daily when eGFR is between 30 and 45, and "
+    "reassess renal function every three to six months while on therapy."
+)
+
+
+class TestMinhash:
+    def test_signature_shape_is_stable(self) -> None:
+        signature = minhash(PARAGRAPH)
+        assert len(signature) == NUM_PERM
+        assert signature == minhash(PARAGRAPH)
+        assert len(lsh_bands(signature)) == BANDS
+
+    def test_section_prefix_ignored(self) -> None:
+        a = minhash(f"[Diabetes > Metformin] {PARAGRAPH}")
+        b = minhash(f"[CKD > Drug Dosing] {PARAGRAPH}")
+        assert a == b
+
+    def test_small_edit_is_near_duplicate(self) -> None:
+        edited = PARAGRAPH.replace("three to six months", "three to six months.")
+        edited += " Hold before iodinated contrast."
+        assert is_near_duplicate(minhash(PARAGRAPH), minhash(edited))
+
+    def test_different_text_is_not(self) -> None:
+        other = (
+            "Lisinopril should be titrated every two weeks toward a blood "
+            "pressure target below 130/80 in patients with diabetes."
+        )
+        assert estimate_jaccard(minhash(PARAGRAPH), minhash(other)) < 0.2
+
+
+class TestFindBatchDuplicates:
+    def test_earliest_occurrence_is_canonical(self) -> None:
+        other = "Check serum potassium within one week of starting spironolactone."
+        signatures = [
+            minhash(other),
+            minhash(f"[A] {PARAGRAPH}"),
+            minhash(f"[B] {PARAGRAPH}"),
+            minhash(f"[C] {PARAGRAPH}"),
+        ]
+        assert find_batch_duplicates(signatures) == {2: 1, 3: 1}
@@ -155,3 +155,20 @@ class TestChunkSections:
         assert c.conditions == ["CHF"]
         assert c.drugs == ["metoprolol"]
         assert c.publication_date == date(2025, 6, 1)
+
+    def test_drugs_and_conditions_tagged_per_chunk(self) -> None:
+        md = (
+            "# Interactions\n"
+            "## Statins\nAtorvastatin with clarithromycin raises myopathy risk.\n"
+            "## Metformin\nWithhold metformin in CKD before contrast."
+        )
+        chunks = chunk_sections(parse_markdown(md), document_id="test")
+        by_path = {c.section_path: c for c in chunks}
+
+        statins = by_path["Interactions > Statins"]
+        assert statins.drugs == ["atorvastatin", "clarithromycin"]
+        assert statins.conditions == ["myopathy"]
+
+        metformin = by_path["Interactions > Metformin"]
+        assert metformin.drugs == ["metformin"]
+        assert metformin.conditions == ["chronic_kidney_disease"]
@@ -0,0 +1,199 @@
+"""Tests for the embedding-model migration job (in-memory Qdrant)."""
+
+from __future__ import annotations
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException
+
+from src.config import settings
+from src.models.rag import EmbeddingSpec
+from src.services import embedding_migration, rag_service
+from tests.test_rag_service import _fake_embedding, _make_chunk
+
+NEW_SPEC = EmbeddingSpec(model="gemini-embedding-001", dimensions=4)
+
+
+@pytest.fixture
+def qdrant(monkeypatch: pytest.MonkeyPatch) -> QdrantClient:
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(rag_service, "_qdrant_client", client)
+    monkeypatch.setattr(rag_service, "get_qdrant_client", lambda: client)
+    rag_service.invalidate_serving_spec()
+    yield client
+    rag_service.invalidate_serving_spec()
+
+
+def _seed(count: int) -> None:
+    rag_service.ensure_collection()
+    chunks = [_make_chunk(text=f"Chunk {i}", chunk_index=i) for i in range(count)]
+    rag_service.upsert_chunks(chunks, [_fake_embedding() for _ in chunks])
+
+
+def _embed(texts: list[str], spec: EmbeddingSpec) -> list[list[float]]:
+    assert spec == NEW_SPEC
+    return [[0.5] * spec.dimensions for _ in texts]
+
+
+class TestSpecNaming:
+    def test_round_trip(self) -> None:
+        name = rag_service.collection_for_spec(NEW_SPEC)
+        assert name == f"{settings.qdrant_collection}__gemini-embedding-001__4"
+        assert rag_service.spec_from_collection_name(name) == NEW_SPEC
+
+    def test_plain_collection_has_no_spec(self) -> None:
+        assert rag_service.spec_from_collection_name("clinical_guidelines") is None
+
+
+class TestServingSpec:
+    def test_unreachable_qdrant_falls_back_to_settings(
+        self, qdrant: QdrantClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def refuse() -> None:
+            raise ResponseHandlingException(ConnectionRefusedError())
+
+        monkeypatch.setattr(qdrant, "get_aliases", refuse)
+        assert rag_service.serving_spec() == rag_service.configured_spec()
+
+    def test_programming_errors_propagate(
+        self, qdrant: QdrantClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def broken() -> None:
+            raise AttributeError("aliases")
+
+        monkeypatch.setattr(qdrant, "get_aliases", broken)
+        with pytest.raises(AttributeError):
+            rag_service.serving_spec()
+
+
+class TestMigrate:
+    def test_copies_and_cuts_over(self, qdrant: QdrantClient) -> None:
+        _seed(5)
+        assert rag_service.serving_spec() == rag_service.configured_spec()
+
+        progress = embedding_migration.migrate(
+            NEW_SPEC, batch_size=2, max_requests_per_second=0, embed=_embed
+        )
+
+        assert progress.embedded == 5
+        assert progress.cut_over
+        target = rag_service.collection_for_spec(NEW_SPEC)
+        assert qdrant.count(target).count == 5
+        # The logical name now resolves to the new collection and its model.
+        assert rag_service.serving_spec() == NEW_SPEC
+        assert qdrant.count(settings.qdrant_collection).count == 5
+        point = qdrant.scroll(settings.qdrant_collection, limit=1, with_vectors=True)[
+            0
+        ][0]
+        assert len(point.vector) == 4
+
+    def test_resume_and_catch_up_only_embed_changes(self, qdrant: QdrantClient) -> None:
+        _seed(3)
+        target = rag_service.collection_for_spec(NEW_SPEC)
+        rag_service.create_collection(target, NEW_SPEC.dimensions)
+        progress = embedding_migration.MigrationProgress(
+            source=settings.qdrant_collection, target=target
+        )
+        embedding_migration.copy_points(
+            settings.qdrant_collection, target, NEW_SPEC, progress, embed=_embed
+        )
+
+        # Ingestion edits one chunk and removes another mid-migration.
+        rag_service.upsert_chunks(
+            [_make_chunk(text="Chunk 1 revised", chunk_index=1)], [_fake_embedding()]
+        )
+        rag_service.delete_document_chunks("doc-1", from_index=2)
+        second = embedding_migration.MigrationProgress(
+            source=settings.qdrant_collection, target=target
+        )
+        embedding_migration.copy_points(
+            settings.qdrant_collection, target, NEW_SPEC, second, embed=_embed
+        )
+
+        assert (second.embedded, second.deleted) == (1, 1)
+        assert qdrant.count(target).count == 2
+
+    def test_second_migration_swaps_alias(self, qdrant: QdrantClient) -> None:
+        _seed(2)
+        embedding_migration.migrate(NEW_SPEC, max_requests_per_second=0, embed=_embed)
+        newer = EmbeddingSpec(model="gemini-embedding-001", dimensions=8)
+
+        embedding_migration.migrate(
+            newer,
+            max_requests_per_second=0,
+            drop_source=True,
+            embed=lambda texts, spec: [[0.5] * 8 for _ in texts],
+        )
+
+        assert rag_service.serving_spec() == newer
+        names = {c.name for c in qdrant.get_collections().collections}
+        assert rag_service.collection_for_spec(NEW_SPEC) not in names
+
+    def test_final_pass_after_cut_over(
+        self, qdrant: QdrantClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        _seed(3)
+        embedding_migration.migrate(NEW_SPEC, max_requests_per_second=0, embed=_embed)
+        source = rag_service.collection_for_spec(NEW_SPEC)
+        newer = EmbeddingSpec(model="gemini-embedding-001", dimensions=8)
+        flip = embedding_migration.cut_over
+
+        def racing_cut_over(target: str) -> None:
+            # A writer that resolved the old collection lands after the
+            # last catch-up pass...
+            rag_service.upsert_chunks(
+                [_make_chunk(text="Late write", chunk_index=0)], [[0.5] * 4]
+            )
+            flip(target)
+            # ...and one that writes to the new collection right after.
+            rag_service.upsert_chunks(
+                [_make_chunk(text="After the flip", chunk_index=1)], [[0.5] * 8]
+            )
+
+        monkeypatch.setattr(embedding_migration, "cut_over", racing_cut_over)
+        embedding_migration.migrate(
+            newer,
+            max_requests_per_second=0,
+            embed=lambda texts, spec: [[0.5] * 8 for _ in texts],
+        )
+
+        texts = {
+            record.payload["chunk_index"]: record.payload["text"]
+            for record in qdrant.scroll(settings.qdrant_collection, limit=10)[0]
+        }
+        assert texts == {0: "Late write", 1: "After the flip", 2: "Chunk 2"}
+        assert qdrant.count(source).count == 3
+
+    def test_search_follows_cut_over_on_dimension_mismatch(
+        self, qdrant: QdrantClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        _seed(2)
+        assert rag_service.serving_spec() == rag_service.configured_spec()
+        embedding_migration.migrate(NEW_SPEC, max_requests_per_second=0, embed=_embed)
+        # Another process still has the pre-migration model cached.
+        rag_service._cache_serving_spec(rag_service.configured_spec())
+        monkeypatch.setattr(
+            rag_service,
+            "_vertex_embed_via_api_key",
+            lambda texts, task_type, spec: [[0.5] * spec.dimensions for _ in texts],
+        )
+        query_points = qdrant.query_points
+
+        def server_query_points(**kwargs: object) -> object:
+            # Local mode does not validate query vectors; the server does.
+            if len(kwargs["query"]) != NEW_SPEC.dimensions:
+                raise ValueError("Wrong input: Vector dimension error: expected dim")
+            return query_points(**kwargs)
+
+        monkeypatch.setattr(qdrant, "query_points", server_query_points)
+
+        results = rag_service.search("chunk")
+
+        assert len(results) == 2
+        assert rag_service.serving_spec() == NEW_SPEC
+
+    def test_refuses_to_migrate_onto_itself(self, qdrant: QdrantClient) -> None:
+        _seed(1)
+        embedding_migration.migrate(NEW_SPEC, max_requests_per_second=0, embed=_embed)
+        with pytest.raises(ValueError):
+            embedding_migration.migrate(NEW_SPEC, embed=_embed)
@@ -0,0 +1,139 @@
+"""Tests for the coalescing, backpressured event channel."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.services.event_channel import HEARTBEAT, EventChannel
+
+
+def _channel(**overrides) -> EventChannel:
+    options = {"capacity": 8, "replay": 64, "flush_window": 0.05, "heartbeat": 0}
+    return EventChannel(**(options | overrides))
+
+
+async def _drain(channel: EventChannel, after: int = 0) -> list[tuple[str, dict]]:
+    return [(kind, data) async for _, kind, data in channel.follow(after)]
+
+
+async def test_adjacent_fragments_coalesce_until_another_kind() -> None:
+    channel = _channel()
+    await channel.put(("thinking", {"text": "hmm"}))
+    await channel.put(("thinking", {"text": "right"}))
+    await channel.put(("text", {"text": "one"}))
+    await channel.put(("text", {"text": "two"}))
+    await channel.put(("tool_use", {"id": "t1"}))
+    await channel.put(("text", {"text": "three"}))
+    await channel.put(("done", {}))
+
+    assert await _drain(channel) == [
+        ("thinking", {"text": "hmm\n\nright"}),
+        ("text", {"text": "one\n\ntwo"}),
+        ("tool_use", {"id": "t1"}),
+        ("text", {"text": "three"}),
+        ("done", {}),
+    ]
+    metrics = channel.metrics()
+    assert (metrics.events, metrics.fragments_coalesced) == (5, 2)
+
+
+async def test_flush_window_bounds_staging_delay() -> None:
+    channel = _channel(flush_window=0.01)
+    follower = channel.follow()
+
+    await channel.put(("text", {"text": "hello"}))
+
+    async with asyncio.timeout(1):
+        _, kind, data = await anext(follower)
+    assert (kind, data) == ("text", {"text": "hello"})
+    await follower.aclose()
+
+
+async def test_slow_follower_applies_backpressure() -> None:
+    channel = _channel(capacity=2)
+    follower = channel.follow()
+    await channel.put(("tool_use", {"id": "1"}))
+    await anext(follower)  # attached, still holding event 1
+    await channel.put(("tool_use", {"id": "2"}))
+
+    producer = asyncio.create_task(channel.put(("tool_use", {"id": "3"})))
+    await asyncio.sleep(0.01)
+    assert not producer.done()
+    assert channel.metrics().depth == 2
+
+    await anext(follower)
+    async with asyncio.timeout(1):
+        await producer
+    assert channel.metrics().producer_waits == 1
+    await follower.aclose()
+
+
+async def test_no_backpressure_without_followers() -> None:
+    channel = _channel(capacity=2, replay=2)
+
+    async with asyncio.timeout(1):
+        for i in range(5):
+            await channel.put(("tool_use", {"id": str(i)}))
+
+    assert channel.depth == 0
+
+
+async def test_idle_follower_gets_heartbeats() -> None:
+    channel = _channel(heartbeat=0.01)
+    follower = channel.follow()
+
+    async with asyncio.timeout(1):
+        assert await anext(follower) is HEARTBEAT
+    await follower.aclose()
+    assert channel.metrics().followers == 0
+
+
+@pytest.mark.parametrize("after", [0, 1])
+async def test_nothing_after_terminal_event(after) -> None:
+    channel = _channel()
+    await channel.put(("tool_use", {"id": "t1"}))
+    await channel.put(("error", {"code": "X"}))
+    await channel.put(("text", {"text": "late"}))
+
+    events = await _drain(channel, after)
+
+    assert events[-1] == ("error", {"code": "X"})
+    assert len(events) == 2 - after
+
+
+async def test_deltas_coalesce_without_separator() -> None:
+    channel = _channel()
+    for fragment in ("Met", "formin ", "is fine"):
+        await channel.put(("text_delta", {"text": fragment}))
+    await channel.put(("text", {"text": "Metformin is fine"}))
+    await channel.put(("done", {}))
+
+    assert await _drain(channel) == [
+        ("text_delta", {"text": "Metformin is fine"}),
+        ("text", {"text": "Metformin is fine"}),
+        ("done", {}),
+    ]
+
+
+async def test_tail_is_passive_and_batched() -> None:
+    channel = _channel(capacity=2, replay=3)
+    tail = channel.tail()
+    await channel.put(("tool_use", {"id": "1"}))
+    first = await anext(tail)  # attached, still holding event 1
+
+    async with asyncio.timeout(1):
+        for i in range(2, 7):
+            await channel.put(("tool_use", {"id": str(i)}))
+    await channel.put(("done", {}))
+    rest = [event async for batch in tail for event in batch]
+
+    assert first == [(1, "tool_use", {"id": "1"})]
+    assert rest == [
+        (0, "replay_gap", {"missed": 3}),
+        (5, "tool_use", {"id": "5"}),
+        (6, "tool_use", {"id": "6"}),
+        (7, "done", {}),
+    ]
+    assert channel.metrics().producer_waits == 0
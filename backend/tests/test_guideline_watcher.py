@@ -0,0 +1,131 @@
+"""Unit tests for guideline_watcher: debounced incremental reindexing."""
+
+from __future__ import annotations
+
+import asyncio
+import struct
+from pathlib import Path
+
+from src.services.guideline_watcher import GuidelineWatcher, parse_inotify_events
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.reindexed: list[str] = []
+        self.removed: list[str] = []
+
+    def reindex(self, path: Path) -> int:
+        self.reindexed.append(path.name)
+        return 1
+
+    def remove(self, path: Path) -> None:
+        self.removed.append(path.name)
+
+
+def _watcher(directory: Path, recorder: _Recorder, **kwargs) -> GuidelineWatcher:
+    return GuidelineWatcher(
+        directory,
+        reindex=recorder.reindex,
+        remove=recorder.remove,
+        use_inotify=False,
+        **kwargs,
+    )
+
+
+async def test_burst_of_writes_reindexes_once(tmp_path: Path) -> None:
+    doc = tmp_path / "diabetes.md"
+    doc.write_text("# A\nv1")
+    recorder = _Recorder()
+    watcher = _watcher(tmp_path, recorder, debounce_seconds=0.2)
+
+    for i in range(3):
+        doc.write_text(f"# A\nv{i + 2} " + "x" * i)
+        watcher._poll_changes()
+
+    assert watcher.metrics().queue_depth == 1
+    assert await watcher.process_due() == 0  # still inside the debounce window
+    await asyncio.sleep(0.25)
+    assert await watcher.process_due() == 1
+    assert recorder.reindexed == ["diabetes.md"]
+    metrics = watcher.metrics()
+    assert metrics.queue_depth == 0
+    assert metrics.documents_reindexed == 1
+    assert metrics.last_reindex_lag_seconds is not None
+
+
+async def test_only_changed_documents_reindexed(tmp_path: Path) -> None:
+    (tmp_path / "a.md").write_text("# A")
+    (tmp_path / "b.md").write_text("# B")
+    (tmp_path / "notes.txt").write_text("ignored")
+    recorder = _Recorder()
+    watcher = _watcher(tmp_path, recorder, debounce_seconds=0)
+
+    (tmp_path / "b.md").write_text("# B changed")
+    (tmp_path / "notes.txt").write_text("still ignored")
+    watcher._poll_changes()
+    await watcher.process_due()
+
+    assert recorder.reindexed == ["b.md"]
+
+
+async def test_deleted_file_is_removed(tmp_path: Path) -> None:
+    doc = tmp_path / "ckd.md"
+    doc.write_text("# CKD")
+    recorder = _Recorder()
+    watcher = _watcher(tmp_path, recorder, debounce_seconds=0)
+
+    doc.unlink()
+    watcher._poll_changes()
+    await watcher.process_due()
+
+    assert recorder.removed == ["ckd.md"]
+    assert watcher.metrics().documents_removed == 1
+
+
+async def test_failed_reindex_counts_error_and_continues(tmp_path: Path) -> None:
+    (tmp_path / "a.md").write_text("# A")
+    (tmp_path / "b.md").write_text("# B")
+
+    def flaky(path: Path) -> int:
+        if path.name == "a.md":
+            raise RuntimeError("embedding API down")
+        return 1
+
+    watcher = GuidelineWatcher(
+        tmp_path,
+        reindex=flaky,
+        remove=lambda p: None,
+        use_inotify=False,
+        debounce_seconds=0,
+    )
+    watcher.mark_all()
+
+    assert await watcher.process_due() == 2
+    metrics = watcher.metrics()
+    assert metrics.errors == 1
+    assert metrics.documents_reindexed == 1
+
+
+async def test_run_picks_up_changes_until_stopped(tmp_path: Path) -> None:
+    recorder = _Recorder()
+    watcher = _watcher(tmp_path, recorder, debounce_seconds=0.05, poll_interval=0.02)
+    stop = asyncio.Event()
+    task = asyncio.create_task(watcher.run(stop))
+
+    (tmp_path / "new.md").write_text("# New")
+    for _ in range(50):
+        if recorder.reindexed:
+            break
+        await asyncio.sleep(0.02)
+    stop.set()
+    await task
+
+    assert recorder.reindexed == ["new.md"]
+
+
+def test_parse_inotify_events() -> None:
+    name = b"hypertension.md\0\0\0\0\0"
+    buffer = struct.pack("iIII", 1, 0x8, 0, len(name)) + name
+    buffer += struct.pack("iIII", 1, 0x200, 0, 0)
+
+    assert parse_inotify_events(buffer) == [(0x8, "hypertension.md"), (0x200, "")]
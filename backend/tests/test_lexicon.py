@@ -0,0 +1,54 @@
+"""Unit tests for the lexicon matcher used to tag chunks."""
+
+from __future__ import annotations
+
+from src.services.lexicon import LexiconMatcher, tag_text
+
+
+class TestLexiconMatcher:
+    def test_overlapping_terms_all_reported(self) -> None:
+        matcher = LexiconMatcher({"he": ["she", "hers"], "his": []})
+        labels = [label for _, _, label in matcher.find("ushers his")]
+        # "she" and "hers" overlap inside "ushers" but neither is a whole
+        # word; only "his" stands alone.
+        assert labels == ["his"]
+
+    def test_failure_links_find_suffix_matches(self) -> None:
+        matcher = LexiconMatcher({"ab": ["abc d"], "bc_d": []})
+        # "bc d" is reached via a failure link from inside "abc d", but it is
+        # not a whole word there.
+        assert matcher.find("x abc d y") == [(2, 7, "ab")]
+        assert matcher.find("q bc d") == [(2, 6, "bc_d")]
+
+    def test_whole_word_only(self) -> None:
+        matcher = LexiconMatcher({"statin": []})
+        assert matcher.labels("atorvastatin dosing") == []
+        assert matcher.labels("a statin, daily") == ["statin"]
+
+    def test_case_insensitive_with_aliases(self) -> None:
+        matcher = LexiconMatcher({"apixaban": ["eliquis"]})
+        assert matcher.find("Started ELIQUIS 5mg") == [(8, 15, "apixaban")]
+
+
+class TestTagText:
+    def test_maps_aliases_to_canonical_ids(self) -> None:
+        conditions, drugs = tag_text(
+            "HFrEF patients with AFib on Lasix and Eliquis; avoid NSAIDs."
+        )
+        assert conditions == ["atrial_fibrillation", "heart_failure"]
+        assert drugs == ["apixaban", "furosemide", "nsaids"]
+
+    def test_no_mentions(self) -> None:
+        assert tag_text("Schedule an annual eye exam.") == ([], [])
+
+    def test_diabetes_types_stay_distinct(self) -> None:
+        assert tag_text("Type 1 diabetes: basal-bolus insulin.")[0] == [
+            "type_1_diabetes"
+        ]
+        assert tag_text("Screen for gestational diabetes at 24 weeks.")[0] == [
+            "gestational_diabetes"
+        ]
+        assert tag_text("T2DM with CKD")[0] == [
+            "chronic_kidney_disease",
+            "type_2_diabetes",
+        ]
@@ -0,0 +1,98 @@
+"""Tests for the compact patient context compiler."""
+
+from __future__ import annotations
+
+import datetime
+
+from src.models.orm import Patient
+from src.services.patient_context import compile_patient_context
+
+
+def _lab(value, date, name="HbA1c") -> dict:
+    return {
+        "name": name,
+        "value": value,
+        "unit": "%",
+        "date": date,
+        "reference_range": {"min": 4.0, "max": 5.6},
+    }
+
+
+def _patient(**overrides) -> Patient:
+    fields = {
+        "id": 1,
+        "name": "Maria Garcia",
+        "date_of_birth": datetime.date(1957, 3, 15),
+        "gender": "F",
+        "conditions": ["Type 2 Diabetes", "CKD Stage 3"],
+        "medications": [
+            {"name": "Metformin", "dosage": "1000mg", "frequency": "twice daily"}
+        ],
+        "labs": [
+            _lab(7.2, "2024-01-15"),
+            _lab(6.4, "2023-01-10"),
+            {
+                "name": "eGFR",
+                "value": 45,
+                "unit": "mL/min/1.73m2",
+                "date": "2024-01-15",
+                "reference_range": {"min": 60, "max": 120},
+            },
+        ],
+        "allergies": ["Penicillin"],
+        "visits": [{"date": "2024-01-15", "reason": "Diabetes follow-up"}],
+    }
+    return Patient(**(fields | overrides))
+
+
+def test_labs_are_one_row_per_analyte_with_trend() -> None:
+    text = compile_patient_context(_patient()).text
+
+    assert "MEDICATIONS (name|dosage|frequency):\nMetformin|1000mg|twice daily" in text
+    assert (
+        "HbA1c|7.2|%|4 to 5.6|2024-01-15|"
+        "rising from 6.4 (2023-01-10), worsening, 2 results"
+    ) in text
+    assert "eGFR|45|mL/min/1.73m2|60 to 120|2024-01-15|-" in text
+    assert "6.4|%" not in text
+
+
+def test_visits_trimmed_to_window(monkeypatch) -> None:
+    monkeypatch.setattr("src.config.settings.prompt_visit_window_days", 365)
+    monkeypatch.setattr("src.config.settings.prompt_max_visits", 2)
+    visits = [
+        {"date": "2024-01-15", "reason": "Follow-up"},
+        {"date": "2021-05-01", "reason": "Old visit"},
+        {"date": "2023-10-20", "reason": "CKD monitoring"},
+        {"date": "2023-07-12", "reason": "BP check"},
+    ]
+
+    text = compile_patient_context(_patient(visits=visits)).text
+
+    assert text.endswith(
+        "VISITS (2 older omitted) (date|reason):\n"
+        "2024-01-15|Follow-up\n2023-10-20|CKD monitoring"
+    )
+
+
+def test_unusual_fields_are_kept_and_output_is_deterministic() -> None:
+    patient = _patient(
+        medications=[
+            {"name": "Warfarin", "dosage": "5mg"},
+            {"name": "Insulin", "dosage": "10 units", "notes": "per sliding | scale"},
+        ],
+        labs=[{"name": "Urine culture", "value": "positive", "date": "2024-01-10"}],
+    )
+
+    first = compile_patient_context(patient)
+
+    assert "MEDICATIONS (name|dosage|notes):\nWarfarin|5mg|-" in first.text
+    assert "Insulin|10 units|per sliding / scale" in first.text
+    assert "Urine culture|positive|-|-|2024-01-10|-" in first.text
+    assert compile_patient_context(patient) == first
+
+
+def test_reports_tokens_saved() -> None:
+    context = compile_patient_context(_patient())
+
+    assert 0 < context.tokens_after < context.tokens_before
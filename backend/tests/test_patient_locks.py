@@ -0,0 +1,119 @@
+"""Tests for the per-patient lock: in-process path and advisory-lock calls."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.services.patient_locks import PatientLocks, PatientQueueFullError
+
+
+@pytest.fixture
+def locks() -> PatientLocks:
+    return PatientLocks(namespace=7)
+
+
+def _postgres() -> tuple[MagicMock, AsyncMock]:
+    conn = AsyncMock()
+    bind = MagicMock(dialect=SimpleNamespace(name="postgresql"))
+    bind.connect = AsyncMock(return_value=conn)
+    return bind, conn
+
+
+async def test_serializes_one_patient_and_evicts_when_idle(locks) -> None:
+    order: list[str] = []
+
+    async def turn(name: str) -> None:
+        async with locks.hold(1, None):
+            order.append(f"{name} in")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} out")
+
+    await asyncio.gather(turn("a"), turn("b"))
+
+    assert order == ["a in", "a out", "b in", "b out"]
+    assert not locks.locked(1)
+    assert locks._entries == {}
+
+
+async def test_other_patients_are_not_blocked(locks) -> None:
+    held = await locks.acquire(1, None)
+
+    async with locks.hold(2, None):
+        assert locks.locked(1) and locks.locked(2)
+
+    await held.release()
+    await held.release()  # idempotent
+    assert locks._entries == {}
+
+
+async def test_released_from_another_task(locks) -> None:
+    held = await locks.acquire(1, None)
+
+    await asyncio.create_task(held.release())
+
+    async with asyncio.timeout(1):
+        async with locks.hold(1, None):
+            pass
+
+
+async def test_cancelled_waiter_leaves_no_entry(locks) -> None:
+    held = await locks.acquire(1, None)
+    waiter = asyncio.create_task(locks.acquire(1, None))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await held.release()
+
+    assert locks._entries == {}
+
+
+async def test_queue_reports_positions_and_refuses_past_depth(locks) -> None:
+    held = await locks.acquire(1, None)
+    positions: dict[str, list[int]] = {"b": [], "c": []}
+    b = asyncio.create_task(locks.acquire(1, None, on_position=positions["b"].append))
+    c = asyncio.create_task(locks.acquire(1, None, on_position=positions["c"].append))
+    await asyncio.sleep(0)
+
+    assert locks.waiting(1) == 2
+    with pytest.raises(PatientQueueFullError):
+        await locks.acquire(1, None, max_waiting=2)
+
+    b.cancel()
+    await asyncio.gather(b, return_exceptions=True)
+    assert positions == {"b": [1], "c": [2, 1]}
+    await held.release()
+    await (await c).release()
+    assert locks._entries == {}
+
+
+async def test_postgres_takes_and_releases_advisory_lock(locks) -> None:
+    bind, conn = _postgres()
+
+    async with locks.hold(42, bind):
+        conn.execution_options.assert_awaited_once_with(isolation_level="AUTOCOMMIT")
+        (statement, params), _ = conn.execute.call_args
+        assert "pg_advisory_lock" in str(statement)
+        assert params == {"namespace": 7, "key": 42}
+        conn.close.assert_not_awaited()
+
+    (statement, params), _ = conn.execute.call_args
+    assert "pg_advisory_unlock" in str(statement)
+    conn.close.assert_awaited_once()
+    assert locks._entries == {}
+
+
+async def test_postgres_failure_drops_connection_and_local_lock(locks) -> None:
+    bind, conn = _postgres()
+    conn.execute.side_effect = ConnectionError("server gone")
+
+    with pytest.raises(ConnectionError):
+        await locks.acquire(42, bind)
+
+    conn.invalidate.assert_awaited_once()
+    assert locks._entries == {}
@@ -0,0 +1,240 @@
+"""Tests for the deterministic pre-analysis rules and the fast briefing."""
+
+from __future__ import annotations
+
+import datetime
+
+import pytest
+from httpx import AsyncClient
+
+from src.models.orm import Patient
+from src.services.pre_analysis import (
+    analyze_patient,
+    fast_briefing,
+    format_for_prompt,
+)
+
+AS_OF = datetime.date(2024, 2, 1)
+
+
+def _lab(name, value, date="2024-01-15", low=4.0, high=5.6, unit="%") -> dict:
+    return {
+        "name": name,
+        "value": value,
+        "unit": unit,
+        "date": date,
+        "reference_range": {"min": low, "max": high},
+    }
+
+
+def _patient(**overrides) -> Patient:
+    fields = {
+        "id": 1,
+        "name": "Maria Garcia",
+        "date_of_birth": datetime.date(1990, 3, 15),
+        "gender": "F",
+        "conditions": [],
+        "medications": [],
+        "labs": [],
+        "allergies": [],
+        "visits": [],
+    }
+    return Patient(**(fields | overrides))
+
+
+def _titles(patient: Patient, category: str) -> list[str]:
+    return [
+        flag.title
+        for flag in analyze_patient(patient, AS_OF).flags
+        if flag.category == category
+    ]
+
+
+@pytest.mark.parametrize(
+    ("value", "severity"),
+    [(5.0, None), (5.9, "info"), (7.2, "warning"), (9.0, "critical")],
+)
+def test_lab_severity_bands(value, severity) -> None:
+    analysis = analyze_patient(_patient(labs=[_lab("HbA1c", value)]), AS_OF)
+
+    labs = [flag for flag in analysis.flags if flag.category == "labs"]
+    assert [flag.severity for flag in labs] == ([severity] if severity else [])
+    assert all(flag.source == "rules" for flag in analysis.flags)
+
+
+def test_panic_value_is_critical_even_just_outside_range() -> None:
+    potassium = _lab("Potassium", 6.1, low=3.5, high=5.0, unit="mEq/L")
+
+    flags = analyze_patient(_patient(labs=[potassium]), AS_OF).flags
+
+    assert [f.severity for f in flags if f.category == "labs"] == ["critical"]
+
+
+def test_trend_uses_only_the_latest_value_for_flags() -> None:
+    labs = [
+        _lab("HbA1c", 6.4, date="2023-01-10"),
+        _lab("HbA1c", 7.2, date="2024-01-15"),
+    ]
+
+    analysis = analyze_patient(_patient(labs=labs), AS_OF)
+
+    (trend,) = analysis.trends
+    assert (trend.first_value, trend.last_value) == (6.4, 7.2)
+    assert (trend.direction, trend.status) == ("rising", "worsening")
+    assert any("7.2" in flag.description for flag in analysis.flags)
+    assert not any("6.4%" in flag.description for flag in analysis.flags)
+
+
+def test_screening_gaps_by_age_and_gender() -> None:
+    older = _patient(date_of_birth=datetime.date(1957, 3, 15))
+
+    assert "Colorectal cancer screening due" in _titles(older, "screenings")
+    assert "Colorectal cancer screening due" not in _titles(_patient(), "screenings")
+    assert not any(
+        "mammogram" in title
+        for title in _titles(
+            _patient(gender="M", date_of_birth=older.date_of_birth), "screenings"
+        )
+    )
+
+
+def test_recent_screening_closes_the_gap() -> None:
+    screened = _patient(
+        date_of_birth=datetime.date(1957, 3, 15),
+        visits=[{"date": "2023-06-01", "reason": "Colonoscopy"}],
+    )
+
+    assert "Colorectal cancer screening due" not in _titles(screened, "screenings")
+
+
+@pytest.mark.parametrize(
+    ("egfr", "title"),
+    [
+        (60, None),
+        (45, "Metformin dose above renal limit"),
+        (25, "Metformin contraindicated at current eGFR"),
+    ],
+)
+def test_metformin_renal_dosing(egfr, title) -> None:
+    patient = _patient(
+        medications=[
+            {"name": "Metformin", "dosage": "1000mg", "frequency": "twice daily"}
+        ],
+        labs=[_lab("eGFR", egfr, low=60, high=120, unit="mL/min/1.73m2")],
+    )
+
+    assert _titles(patient, "medications") == ([title] if title else [])
+
+
+@pytest.mark.parametrize(
+    ("dosage", "frequency", "title"),
+    [
+        ("500mg", "twice daily", None),
+        ("1 tablet", "twice daily", "Verify metformin dose"),
+        ("500mg", "with meals", "Verify metformin dose"),
+    ],
+)
+def test_metformin_dose_at_renal_limit(dosage, frequency, title) -> None:
+    patient = _patient(
+        medications=[{"name": "Metformin", "dosage": dosage, "frequency": frequency}],
+        labs=[_lab("eGFR", 40, low=60, high=120, unit="mL/min/1.73m2")],
+    )
+
+    assert _titles(patient, "medications") == ([title] if title else [])
+
+
+def test_malformed_records_do_not_break_screenings() -> None:
+    patient = _patient(
+        date_of_birth=datetime.date(1957, 3, 15),
+        labs=[{"name": "Colonoscopy"}, {"date": "2023-06-01"}],
+        visits=[
+            {"reason": "Colonoscopy"},
+            {"date": "June 2023", "reason": "Colonoscopy"},
+            {"date": "2023-06-01", "reason": None},
+        ],
+    )
+
+    assert "Colorectal cancer screening due" in _titles(patient, "screenings")
+
+
+def test_allergy_conflict_is_critical() -> None:
+    patient = _patient(
+        allergies=["Penicillin"],
+        medications=[
+            {"name": "Amoxicillin", "dosage": "500mg", "frequency": "three times daily"}
+        ],
+    )
+
+    (flag,) = [
+        f for f in analyze_patient(patient, AS_OF).flags if f.category == "medications"
+    ]
+    assert flag.severity == "critical"
+    assert flag.title == "Amoxicillin conflicts with allergy"
+
+
+def test_blank_allergy_matches_nothing() -> None:
+    patient = _patient(
+        allergies=["", "  "],
+        medications=[{"name": "Metformin", "dosage": "500mg"}],
+    )
+
+    flags = analyze_patient(patient, AS_OF).flags
+    assert not [f for f in flags if f.category == "medications"]
+
+
+def test_flags_sorted_most_severe_first_and_rendered_for_prompt() -> None:
+    patient = _patient(labs=[_lab("HbA1c", 5.9), _lab("HbA1c", 9.0, date="2024-01-20")])
+
+    analysis = analyze_patient(patient, AS_OF)
+    severities = [flag.severity for flag in analysis.flags]
+
+    assert severities == sorted(severities, key=["critical", "warning", "info"].index)
+    prompt = format_for_prompt(analysis)
+    assert prompt.startswith("PRE-ANALYSIS")
+    assert "[labs/critical]" in prompt
+    assert "[trend/worsening] HbA1c rising" in prompt
+
+
+def test_fast_briefing_is_complete_without_agent() -> None:
+    patient = _patient(
+        conditions=["Type 2 Diabetes"],
+        labs=[_lab("HbA1c", 7.2)],
+        visits=[{"date": "2024-01-15", "reason": "Diabetes follow-up"}],
+    )
+
+    briefing = fast_briefing(patient, AS_OF)
+
+    assert briefing.summary.one_liner == "33-year-old female with Type 2 Diabetes"
+    assert "last visit 2024-01-15" in briefing.summary.relevant_history
+    assert briefing.flags
+    assert [a.priority for a in briefing.suggested_actions] == list(
+        range(1, len(briefing.suggested_actions) + 1)
+    )
+    assert len(briefing.suggested_actions) <= 5
+
+
+def test_fast_briefing_skips_undated_visits() -> None:
+    patient = _patient(
+        visits=[{"reason": "Walk-in"}, {"date": "2023-11-02", "reason": "Annual"}]
+    )
+
+    briefing = fast_briefing(patient, AS_OF)
+
+    assert "last visit 2023-11-02 (Annual)" in briefing.summary.relevant_history
+
+
+async def test_fast_briefing_endpoint(client: AsyncClient, seed_patient) -> None:
+    response = await client.get(f"/api/v1/patients/{seed_patient.id}/briefing/fast")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["flags"] and all(f["source"] == "rules" for f in data["flags"])
+    assert "trends" in data
+    assert data["summary"]["key_conditions"] == ["Type 2 Diabetes"]
+
+
+async def test_fast_briefing_patient_not_found(client: AsyncClient) -> None:
+    response = await client.get("/api/v1/patients/99999/briefing/fast")
+
+    assert response.status_code == 404
+    assert response.json()["detail"]["code"] == "PATIENT_NOT_FOUND"
@@ -56,8 +56,11 @@ def in_memory_qdrant(monkeypatch: pytest.MonkeyPatch) -> QdrantClient:
 def mock_embed(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
     """Mock _vertex_embed_via_api_key so no real API calls are made."""
     monkeypatch.setattr("src.config.settings.google_api_key", "test-key")
+    monkeypatch.setattr(
+        rag_service, "serving_spec", lambda **_: rag_service.configured_spec()
+    )
     mock_fn = MagicMock(
-        side_effect=lambda texts, task_type: [_fake_embedding() for _ in texts]
+        side_effect=lambda texts, task_type, spec: [_fake_embedding() for _ in texts]
     )
     monkeypatch.setattr(rag_service, "_vertex_embed_via_api_key", mock_fn)
     return mock_fn
@@ -74,7 +77,9 @@ class TestEmbedText:
 
     def test_calls_with_query_task_type(self, mock_embed: MagicMock) -> None:
         rag_service.embed_text("test query")
-        mock_embed.assert_called_once_with(["test query"], "RETRIEVAL_QUERY")
+        mock_embed.assert_called_once_with(
+            ["test query"], "RETRIEVAL_QUERY", rag_service.configured_spec()
+        )
 
 
 class TestEmbedBatch:
@@ -85,7 +90,26 @@ class TestEmbedBatch:
 
     def test_calls_with_document_task_type(self, mock_embed: MagicMock) -> None:
         rag_service.embed_batch(["a", "b"])
-        mock_embed.assert_called_once_with(["a", "b"], "RETRIEVAL_DOCUMENT")
+        mock_embed.assert_called_once_with(
+            ["a", "b"], "RETRIEVAL_DOCUMENT", rag_service.configured_spec()
+        )
+
+
+class TestVertexPredictUrl:
+    def test_defaults_to_regional_endpoint(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr("src.config.settings.vertex_api_endpoint", "")
+        monkeypatch.setattr("src.config.settings.gcp_location", "us-central1")
+        url = rag_service._vertex_predict_url()
+        assert url.startswith("https://us-central1-aiplatform.googleapis.com/v1/")
+        assert url.endswith(":predict")
+
+    def test_endpoint_override(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            "src.config.settings.vertex_api_endpoint", "http://127.0.0.1:8099/"
+        )
+        assert rag_service._vertex_predict_url().startswith("http://127.0.0.1:8099/v1/")
 
 
 # --- Collection Management Tests ---
@@ -144,6 +168,40 @@ class TestUpsertChunks:
         assert payload["conditions"] == ["diabetes"]
 
 
+class TestDeleteDocumentChunks:
+    def _upsert(self, document_id: str, count: int) -> None:
+        chunks = [
+            _make_chunk(document_id=document_id, chunk_index=i, total_chunks=count)
+            for i in range(count)
+        ]
+        rag_service.upsert_chunks(chunks, [_fake_embedding() for _ in chunks])
+
+    def test_trims_tail_after_shrink(self, in_memory_qdrant: QdrantClient) -> None:
+        rag_service.ensure_collection()
+        self._upsert("doc-1", 4)
+        self._upsert("doc-2", 2)
+
+        rag_service.delete_document_chunks("doc-1", from_index=2)
+
+        points, _ = in_memory_qdrant.scroll(
+            collection_name="clinical_guidelines", limit=10, with_payload=True
+        )
+        remaining = sorted(
+            (p.payload["document_id"], p.payload["chunk_index"]) for p in points
+        )
+        assert remaining == [("doc-1", 0), ("doc-1", 1), ("doc-2", 0), ("doc-2", 1)]
+
+    def test_removes_whole_document(self, in_memory_qdrant: QdrantClient) -> None:
+        rag_service.ensure_collection()
+        self._upsert("doc-1", 3)
+        self._upsert("doc-2", 1)
+
+        rag_service.delete_document_chunks("doc-1")
+
+        info = in_memory_qdrant.get_collection("clinical_guidelines")
+        assert info.points_count == 1
+
+
 # --- Search Tests ---
 
 
@@ -181,6 +239,20 @@ class TestSearch:
         specialties = {r.chunk.specialty for r in results}
         assert "cardiology" not in specialties
 
+    def test_drug_filter_matches_any_tag(
+        self, in_memory_qdrant: QdrantClient, mock_embed: MagicMock
+    ) -> None:
+        rag_service.ensure_collection()
+        metformin = _make_chunk(text="Metformin", document_id="d1")
+        statin = _make_chunk(text="Statin", document_id="d2")
+        statin.drugs = ["atorvastatin"]
+        rag_service.upsert_chunks(
+            [metformin, statin], [_fake_embedding(), _fake_embedding()]
+        )
+
+        results = rag_service.search("dosing", drugs=["atorvastatin", "simvastatin"])
+        assert [r.chunk.document_id for r in results] == ["d2"]
+
 
 # --- XML Formatting Tests ---
 
@@ -213,3 +285,126 @@ class TestFormatAsXmlSources:
         assert xml.count("<source ") == 3
         assert 'id="1"' in xml
         assert 'id="3"' in xml
+
+
+# --- Near-duplicate Collapsing Tests ---
+
+SHARED = (
+    "Metformin is contraindicated when eGFR falls below 30 mL/min. Reduce the "
+    "dose to a maximum of 1000 mg daily when eGFR is between 30 and 45."
+)
+
+
+class TestIndexDocument:
+    def _chunks(
+        self, document_id: str, texts: list[str], specialty: str = "endocrinology"
+    ) -> list[DocumentChunk]:
+        return [
+            _make_chunk(
+                text=f"[{document_id}] {text}",
+                document_id=document_id,
+                chunk_index=i,
+                total_chunks=len(texts),
+                specialty=specialty,
+            )
+            for i, text in enumerate(texts)
+        ]
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        return [_fake_embedding() for _ in texts]
+
+    def _points(self, client: QdrantClient) -> dict[tuple[str, int], dict]:
+        points, _ = client.scroll(
+            collection_name="clinical_guidelines", limit=100, with_payload=True
+        )
+        return {
+            (p.payload["document_id"], p.payload["chunk_index"]): p.payload
+            for p in points
+        }
+
+    def test_collapses_into_existing_point(
+        self, in_memory_qdrant: QdrantClient
+    ) -> None:
+        rag_service.ensure_collection()
+        embed = MagicMock(side_effect=self._embed)
+        rag_service.index_document(
+            self._chunks("diabetes", [SHARED, "HbA1c target below 7%."]), embed
+        )
+        result = rag_service.index_document(
+            self._chunks("ckd", ["UACR above 30 mg/g.", SHARED]), embed
+        )
+
+        assert (result.upserted, result.collapsed) == (1, 1)
+        # The duplicate was never embedded.
+        assert embed.call_args.args[0] == ["[ckd] UACR above 30 mg/g."]
+        points = self._points(in_memory_qdrant)
+        assert ("ckd", 1) not in points
+        assert points[("diabetes", 0)]["references"][0]["document_id"] == "ckd"
+        assert points[("diabetes", 0)]["reference_ids"] == ["ckd"]
+
+    def test_reindex_keeps_other_documents_references(
+        self, in_memory_qdrant: QdrantClient
+    ) -> None:
+        rag_service.ensure_collection()
+        rag_service.index_document(self._chunks("diabetes", [SHARED]), self._embed)
+        rag_service.index_document(self._chunks("ckd", [SHARED]), self._embed)
+
+        # Re-ingesting the unchanged canonical document keeps ckd's reference,
+        # and re-ingesting ckd does not duplicate it.
+        rag_service.index_document(self._chunks("diabetes", [SHARED]), self._embed)
+        rag_service.index_document(self._chunks("ckd", [SHARED]), self._embed)
+
+        points = self._points(in_memory_qdrant)
+        assert list(points) == [("diabetes", 0)]
+        assert [r["document_id"] for r in points[("diabetes", 0)]["references"]] == [
+            "ckd"
+        ]
+
+    def test_deleting_canonical_reports_orphans(
+        self, in_memory_qdrant: QdrantClient
+    ) -> None:
+        rag_service.ensure_collection()
+        rag_service.index_document(self._chunks("diabetes", [SHARED]), self._embed)
+        rag_service.index_document(self._chunks("ckd", [SHARED]), self._embed)
+
+        assert rag_service.delete_document_chunks("diabetes") == {"ckd"}
+
+    def test_collapses_only_within_a_specialty(
+        self, in_memory_qdrant: QdrantClient, mock_embed: MagicMock
+    ) -> None:
+        rag_service.ensure_collection()
+        rag_service.index_document(self._chunks("diabetes", [SHARED]), self._embed)
+        result = rag_service.index_document(
+            self._chunks("ckd", [SHARED], specialty="nephrology"), self._embed
+        )
+
+        assert (result.upserted, result.collapsed) == (1, 0)
+        results = rag_service.search("metformin renal dosing", specialty="nephrology")
+        assert [r.chunk.document_id for r in results] == ["ckd"]
+
+    def test_removing_collapsed_document_drops_its_references(
+        self, in_memory_qdrant: QdrantClient
+    ) -> None:
+        rag_service.ensure_collection()
+        rag_service.index_document(self._chunks("diabetes", [SHARED]), self._embed)
+        rag_service.index_document(self._chunks("ckd", [SHARED]), self._embed)
+
+        assert rag_service.remove_document("ckd") == set()
+
+        points = self._points(in_memory_qdrant)
+        assert list(points) == [("diabetes", 0)]
+        assert points[("diabetes", 0)]["references"] == []
+        assert points[("diabetes", 0)]["reference_ids"] == []
+
+    def test_search_surfaces_references(
+        self, in_memory_qdrant: QdrantClient, mock_embed: MagicMock
+    ) -> None:
+        rag_service.ensure_collection()
+        rag_service.index_document(self._chunks("diabetes", [SHARED]), self._embed)
+        rag_service.index_document(self._chunks("ckd", [SHARED]), self._embed)
+
+        results = rag_service.search("metformin renal dosing")
+        assert len(results) == 1
+        assert [r.document_id for r in results[0].chunk.references] == ["ckd"]
+        xml = rag_service.format_as_xml_sources(results)
+        assert 'also_in="Test Document"' in xml
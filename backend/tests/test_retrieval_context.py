@@ -0,0 +1,145 @@
+"""Tests for per-run search memoization and stable source ids."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from typing import ClassVar
+from unittest.mock import AsyncMock, PropertyMock, patch
+
+from fastmcp import Client, Context
+
+from mcp_server.server import mcp
+from src.agents.client_pool import AgentClientPool
+from src.agents.tools import search_clinical_guidelines
+from src.models.rag import DocumentChunk, RetrievalResult
+from src.services.retrieval_context import (
+    RetrievalContext,
+    current_retrieval,
+    retrieval_run,
+)
+from tests.test_client_pool import FakeClient
+
+
+def _result(chunk_index: int, source_id: int = 1) -> RetrievalResult:
+    chunk = DocumentChunk(
+        text=f"passage {chunk_index}",
+        document_id="doc-1",
+        document_title="ADA Standards",
+        section_path="Renal",
+        specialty="endocrinology",
+        document_type="clinical_guideline",
+        conditions=[],
+        drugs=[],
+        publication_date=date(2025, 1, 1),
+        chunk_index=chunk_index,
+        total_chunks=3,
+    )
+    return RetrievalResult(chunk=chunk, score=0.8, source_id=source_id)
+
+
+async def test_identical_queries_are_memoized() -> None:
+    search = AsyncMock(return_value=[_result(0)])
+    context = RetrievalContext()
+
+    await context.search(search, query="Metformin  eGFR", specialty=None, limit=5)
+    await context.search(search, query="metformin egfr", specialty=None, limit=5)
+    await context.search(search, query="metformin egfr", specialty="renal", limit=5)
+
+    assert search.await_count == 2
+    assert context.memo_hits == 1
+
+
+async def test_source_ids_are_stable_and_repeats_are_references() -> None:
+    search = AsyncMock(
+        side_effect=[
+            [_result(0, source_id=1), _result(1, source_id=2)],
+            [_result(2, source_id=1), _result(1, source_id=2)],
+        ]
+    )
+    context = RetrievalContext()
+
+    first, _ = await context.search(search, query="a", specialty=None, limit=5)
+    second, text = await context.search(search, query="b", specialty=None, limit=5)
+
+    assert [r.source_id for r in first] == [1, 2]
+    assert [r.source_id for r in second] == [3, 2]
+    assert '<source id="3"' in text and "passage 2" in text
+    assert 'id="2" document="ADA Standards"' in text
+    assert 'previously_returned="true" />' in text
+    assert "passage 1" not in text
+
+
+@patch("src.agents.tools.async_search", new_callable=AsyncMock)
+async def test_tool_shares_context_within_a_run_only(mock_search) -> None:
+    mock_search.return_value = [_result(0)]
+    handler = search_clinical_guidelines.handler
+
+    with retrieval_run():
+        await handler({"query": "metformin"})
+        repeat = await handler({"query": "metformin"})
+    fresh = await handler({"query": "metformin"})
+
+    assert mock_search.await_count == 2
+    assert "previously_returned" in repeat["content"][0]["text"]
+    assert "passage 0" in fresh["content"][0]["text"]
+
+
+@patch("mcp_server.server.async_search", new_callable=AsyncMock)
+async def test_mcp_server_keys_context_by_session(mock_search) -> None:
+    # Over HTTP the id is the Mcp-Session-Id header; the in-memory transport
+    # has no stable one, so pin it.
+    mock_search.return_value = [_result(0)]
+    args = {"query": "metformin renal dosing"}
+    session_id = PropertyMock(return_value="s-1")
+
+    with patch.object(Context, "session_id", session_id):
+        async with Client(mcp) as client:
+            await client.call_tool("search_clinical_guidelines", args)
+            repeat = await client.call_tool("search_clinical_guidelines", args)
+            session_id.return_value = "s-2"
+            other = await client.call_tool("search_clinical_guidelines", args)
+
+    assert "previously_returned" in repeat.content[0].text
+    assert "passage 0" in other.content[0].text
+    assert mock_search.await_count == 2
+
+
+async def test_pooled_requests_get_separate_contexts() -> None:
+    """Tool handlers run on a task spawned at connect; each request must
+    still see its own context there."""
+
+    class ReaderClient(FakeClient):
+        seen: ClassVar[list[RetrievalContext | None]] = []
+
+        async def connect(self) -> None:
+            await super().connect()
+            self.inbox: asyncio.Queue[None] = asyncio.Queue()
+            self.reader = asyncio.create_task(self._read())
+
+        async def _read(self) -> None:
+            while True:
+                await self.inbox.get()
+                ReaderClient.seen.append(current_retrieval())
+
+        async def query(self, prompt: str) -> None:
+            await super().query(prompt)
+            if prompt != "/clear":
+                self.inbox.put_nowait(None)
+                await asyncio.sleep(0)
+
+        async def disconnect(self) -> None:
+            self.reader.cancel()
+            await super().disconnect()
+
+    pool = AgentClientPool("test", lambda: object(), client_factory=ReaderClient)
+    await pool.start(size=1, max_uses=5)
+    try:
+        for prompt in ("one", "two"):
+            [m async for m in pool.run(prompt)]
+    finally:
+        await pool.stop()
+
+    first, second = ReaderClient.seen
+    assert first is not None and second is not None
+    assert first is not second
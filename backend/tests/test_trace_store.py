@@ -0,0 +1,81 @@
+"""Tests for compressed trace storage and the retention job."""
+
+from __future__ import annotations
+
+import datetime
+
+import pytest
+
+from src.models.orm import Conversation, ConversationMessage, ConversationTrace
+from src.services.chat_service import get_message_trace
+from src.services.trace_store import (
+    CODEC,
+    archive_traces,
+    compress_trace,
+    decompress_trace,
+    trace_row,
+)
+
+TRACE = [
+    {"type": "thinking", "text": "Check renal function first."},
+    {"type": "tool_use", "name": "search", "input": {"q": "metformin egfr"}},
+    {"type": "text", "text": "Metformin is fine above eGFR 30."},
+]
+
+NOW = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+OLD = NOW - datetime.timedelta(days=90)
+
+
+def test_round_trip_tagged_with_codec() -> None:
+    codec, data = compress_trace(TRACE * 20)
+
+    assert codec == CODEC
+    assert len(data) < len(str(TRACE * 20))
+    assert decompress_trace(codec, data) == TRACE * 20
+
+
+def test_unknown_codec_is_an_error() -> None:
+    with pytest.raises(ValueError, match="lz4"):
+        decompress_trace("lz4", b"")
+
+
+async def test_archive_moves_old_inline_and_recompresses_old_blobs(
+    session_factory, seed_patient
+) -> None:
+    async with session_factory() as session:
+        conversation = Conversation(patient_id=seed_patient.id)
+        session.add(conversation)
+        await session.flush()
+        legacy, recent, stored = (
+            ConversationMessage(
+                conversation_id=conversation.id,
+                role="assistant",
+                content="a",
+                trace=trace,
+                created_at=created_at,
+            )
+            for trace, created_at in ((TRACE, OLD), (TRACE, NOW), (None, OLD))
+        )
+        session.add_all([legacy, recent, stored])
+        await session.flush()
+        blob = trace_row(stored.id, TRACE)
+        blob.created_at = OLD
+        session.add(blob)
+        await session.commit()
+
+        archived = await archive_traces(session, NOW - datetime.timedelta(days=30), 10)
+
+        assert archived == 2
+        await session.refresh(legacy)
+        await session.refresh(recent)
+        assert legacy.trace is None
+        assert recent.trace == TRACE  # too new to archive
+        for message in (legacy, stored):
+            row = await session.get(ConversationTrace, message.id)
+            assert row.archived_at is not None
+            assert row.archived_at.tzinfo is None
+            response = await get_message_trace(session, seed_patient.id, message.id)
+            assert response.trace == TRACE
+
+        # Nothing left to do on the next pass.
+        assert await archive_traces(session, NOW, 10) == 0
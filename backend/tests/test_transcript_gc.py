@@ -0,0 +1,110 @@
+"""Tests for transcript garbage collection and disk accounting."""
+
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+from sqlalchemy import select
+
+from src.agents.transcripts import transcript_dir
+from src.models.orm import Conversation, Patient
+from src.services.patient_locks import chat_locks
+from src.services.transcript_gc import TranscriptCollector
+
+HOUR = 3600
+
+
+@pytest.fixture(autouse=True)
+def config_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CLAUDE_CONFIG_DIR", str(tmp_path))
+    transcript_dir().mkdir(parents=True)
+    return tmp_path
+
+
+def _transcript(session_id: str, size: int, age: float) -> None:
+    path = transcript_dir() / f"{session_id}.jsonl"
+    path.write_bytes(b"x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+async def _conversations(session, seed_patient, *session_ids: str | None) -> None:
+    for i, session_id in enumerate(session_ids):
+        patient_id = seed_patient.id
+        if i:
+            patient = Patient(
+                name=f"P{i}",
+                date_of_birth=seed_patient.date_of_birth,
+                gender="F",
+            )
+            session.add(patient)
+            await session.flush()
+            patient_id = patient.id
+        session.add(Conversation(patient_id=patient_id, session_id=session_id))
+    await session.commit()
+
+
+async def test_deletes_settled_orphans_only(session_factory, seed_patient) -> None:
+    _transcript("live", 100, 2 * HOUR)
+    _transcript("orphan", 50, 2 * HOUR)
+    _transcript("in-flight", 10, 60)
+    (transcript_dir() / "forked").mkdir()
+    (transcript_dir() / "forked" / "tool.txt").write_bytes(b"y" * 5)
+    os.utime(transcript_dir() / "forked" / "tool.txt", (0, 0))
+    os.utime(transcript_dir() / "forked", (0, 0))
+    collector = TranscriptCollector()
+
+    async with session_factory() as session:
+        await _conversations(session, seed_patient, "live", "gone")
+        metrics = await collector.collect(session, min_age=HOUR, quota_bytes=0)
+
+    assert sorted(p.name for p in transcript_dir().iterdir()) == [
+        "in-flight.jsonl",
+        "live.jsonl",
+    ]
+    assert (metrics.transcripts, metrics.bytes, metrics.referenced) == (2, 110, 1)
+    assert (metrics.orphans_deleted, metrics.bytes_freed, metrics.missing) == (
+        2,
+        55,
+        1,
+    )
+
+
+async def test_quota_evicts_least_recently_used(session_factory, seed_patient) -> None:
+    _transcript("oldest", 100, 3 * HOUR)
+    _transcript("older", 100, 2 * HOUR)
+    _transcript("recent", 100, 60)
+    collector = TranscriptCollector()
+
+    async with session_factory() as session:
+        await _conversations(session, seed_patient, "oldest", "older", "recent")
+        metrics = await collector.collect(session, min_age=HOUR, quota_bytes=50)
+        session_ids = (await session.scalars(select(Conversation.session_id))).all()
+
+    # Only settled transcripts are evicted: "recent" stays even though the
+    # directory is still over the quota, rather than be cut off mid-turn.
+    assert [p.name for p in transcript_dir().iterdir()] == ["recent.jsonl"]
+    assert sorted(session_ids, key=str) == [None, None, "recent"]
+    assert (metrics.evicted, metrics.bytes, metrics.missing) == (2, 100, 0)
+
+
+async def test_quota_skips_patients_mid_turn(session_factory, seed_patient) -> None:
+    _transcript("oldest", 100, 3 * HOUR)
+    _transcript("older", 100, 2 * HOUR)
+    collector = TranscriptCollector()
+    held = await chat_locks.acquire(seed_patient.id, None)
+
+    try:
+        async with session_factory() as session:
+            await _conversations(session, seed_patient, "oldest", "older")
+            metrics = await collector.collect(session, min_age=HOUR, quota_bytes=150)
+            session_ids = (await session.scalars(select(Conversation.session_id))).all()
+    finally:
+        await held.release()
+
+    # "oldest" belongs to seed_patient, whose chat lock is held by a turn.
+    assert [p.name for p in transcript_dir().iterdir()] == ["oldest.jsonl"]
+    assert sorted(session_ids, key=str) == [None, "oldest"]
+    assert (metrics.evicted, metrics.bytes) == (1, 100)
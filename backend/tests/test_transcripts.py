@@ -0,0 +1,67 @@
+"""Tests for locating and measuring chat session transcripts."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from src.agents.transcripts import (
+    project_key,
+    transcript_dir,
+    transcript_path,
+    transcript_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def config_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CLAUDE_CONFIG_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _write(session_id: str, entries: list[dict]) -> int:
+    path = transcript_path(session_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+    return path.stat().st_size
+
+
+def test_transcript_dir_is_under_config_dir(config_dir) -> None:
+    assert transcript_dir().parent == config_dir / "projects"
+
+
+def test_project_key_matches_cli_naming() -> None:
+    assert project_key("/home/me/agent_home.v2") == "-home-me-agent-home-v2"
+    long_key = project_key("/srv/" + "a" * 250)
+    assert len(long_key) == 207
+    assert long_key.endswith("a-z5vs61")
+
+
+def test_stats_read_latest_assistant_usage() -> None:
+    usage = {
+        "input_tokens": 10,
+        "cache_read_input_tokens": 900,
+        "cache_creation_input_tokens": 90,
+        "output_tokens": 50,
+    }
+    size = _write(
+        "s-1",
+        [
+            {"type": "assistant", "message": {"usage": {"input_tokens": 1}}},
+            {"type": "assistant", "message": {"usage": usage}},
+            {"type": "user", "message": {"content": "thanks"}},
+        ],
+    )
+
+    stats = transcript_stats("s-1")
+
+    assert stats is not None
+    assert (stats.size_bytes, stats.context_tokens) == (size, 1000)
+
+
+def test_stats_without_usage_or_file() -> None:
+    _write("s-1", [{"type": "user", "message": {"content": "hi"}}])
+
+    assert transcript_stats("s-1").context_tokens is None
+    assert transcript_stats("missing") is None
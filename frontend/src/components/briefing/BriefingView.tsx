@@ -67,6 +67,11 @@ export function BriefingView({
             {formatRelativeTime(briefing.generated_at)}
           </p>
           <Badge variant="outline">{runtimeLabel}</Badge>
+          {briefing.degraded && (
+            <Badge variant="secondary" title="The agent ran out of time; regenerate to retry">
+              Rules only
+            </Badge>
+          )}
         </div>
         <m.div whileHover={{ scale: 1.05 }} whileTap={{ scale: 0.95 }}>
           <Button variant="outline" size="sm" onClick={onRegenerate} disabled={isRegenerating}>
@@ -1,6 +1,7 @@
 import { useEffect, useRef } from "react";
 import { MessageBubble } from "./MessageBubble";
 import { ChatInput } from "./ChatInput";
+import { Button } from "@/components/ui/button";
 import { Skeleton } from "@/components/ui/skeleton";
 import type { ChatMessage } from "@/types";
 
@@ -8,6 +9,9 @@ interface ChatPanelProps {
   messages: ChatMessage[];
   isStreaming: boolean;
   isLoading: boolean;
+  hasOlder: boolean;
+  isLoadingOlder: boolean;
+  onLoadOlder: () => void;
   onSend: (text: string) => void;
   onReset: () => void;
 }
@@ -16,15 +20,20 @@ export function ChatPanel({
   messages,
   isStreaming,
   isLoading,
+  hasOlder,
+  isLoadingOlder,
+  onLoadOlder,
   onSend,
   onReset,
 }: ChatPanelProps) {
   const scrollRef = useRef<HTMLDivElement>(null);
+  const newest = messages[messages.length - 1];
 
-  // Keep the newest message in view as the stream appends content.
+  // Keep the newest message in view as the stream appends content (but not
+  // when older messages are loaded above it).
   useEffect(() => {
     scrollRef.current?.scrollTo({ top: scrollRef.current.scrollHeight });
-  }, [messages]);
+  }, [newest?.id, newest?.content, newest?.parts]);
 
   return (
     <div className="flex h-full flex-col">
@@ -44,6 +53,18 @@ export function ChatPanel({
             </p>
           </div>
         )}
+        {hasOlder && (
+          <div className="flex justify-center">
+            <Button
+              variant="ghost"
+              size="sm"
+              onClick={onLoadOlder}
+              disabled={isLoadingOlder}
+            >
+              {isLoadingOlder ? "Loading…" : "Load older messages"}
+            </Button>
+          </div>
+        )}
         {messages.map((message) => (
           <MessageBubble key={message.id} message={message} />
         ))}
@@ -1,5 +1,5 @@
 import { useCallback, useEffect, useRef, useState } from "react";
-import { useQuery, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useQueries, useQueryClient } from "@tanstack/react-query";
 import { api } from "@/services/api";
 import type { ChatEvent, ChatMessage, PatientBriefing, TracePart } from "@/types";
 
@@ -8,19 +8,43 @@ import type { ChatEvent, ChatMessage, PatientBriefing, TracePart } from "@/types
  *
  * Server state (persisted history + latest briefing) comes from react-query;
  * the in-flight turn lives in local state and is folded into `messages` until
- * the post-turn refetch takes over as the source of truth.
+ * the post-turn refetch takes over as the source of truth. History loads a
+ * page at a time (newest first, `loadOlder` for the rest); each message's
+ * trace is fetched from its own endpoint and filled in when it arrives.
  *
  * Assistant turns are a list of ordered `parts` (thinking, tool calls, text)
  * mirroring the backend's SSE events; the same shape comes back persisted as
  * `trace` on history messages, so live and replayed turns render identically.
+ * `thinking_delta` / `text_delta` events grow a part token by token; the
+ * complete block that follows replaces it.
  */
 export function useChat(patientId: number | undefined) {
   const queryClient = useQueryClient();
-  const historyQuery = useQuery({
+  const historyQuery = useInfiniteQuery({
     queryKey: ["chat", patientId],
-    queryFn: () => api.getChat(patientId!),
+    queryFn: ({ pageParam }) => api.getChat(patientId!, pageParam),
+    initialPageParam: undefined as number | undefined,
+    getNextPageParam: (page) => page.next_cursor ?? undefined,
     enabled: patientId != null,
   });
+  const pages = historyQuery.data?.pages ?? [];
+  // Pages arrive newest first; render oldest first.
+  const history = [...pages].reverse().flatMap((page) => page.messages);
+
+  // A stored trace never changes, so each is fetched once.
+  const traceQueries = useQueries({
+    queries: history
+      .filter((message) => message.has_trace && message.trace == null)
+      .map((message) => ({
+        queryKey: ["chat-trace", patientId, message.id],
+        queryFn: () => api.getMessageTrace(patientId!, message.id),
+        staleTime: Infinity,
+      })),
+  });
+  const traces = new Map<number, TracePart[] | null>();
+  for (const { data } of traceQueries) {
+    if (data) traces.set(data.message_id, data.trace);
+  }
 
   const [liveMessages, setLiveMessages] = useState<ChatMessage[]>([]);
   const [liveBriefing, setLiveBriefing] = useState<PatientBriefing | null>(null);
@@ -35,17 +59,15 @@ export function useChat(patientId: number | undefined) {
     setIsStreaming(false);
   }, [patientId]);
 
-  const historyMessages: ChatMessage[] = (historyQuery.data?.messages ?? []).map(
-    (message, index) => ({
-      id: `history-${index}`,
-      role: message.role,
-      content: message.content,
-      status: "done",
-      parts: message.trace ?? undefined,
-    }),
-  );
+  const historyMessages: ChatMessage[] = history.map((message) => ({
+    id: `history-${message.id}`,
+    role: message.role,
+    content: message.content,
+    status: "done",
+    parts: message.trace ?? traces.get(message.id) ?? undefined,
+  }));
   const messages = [...historyMessages, ...liveMessages];
-  const briefing = liveBriefing ?? historyQuery.data?.latest_briefing ?? null;
+  const briefing = liveBriefing ?? pages[0]?.latest_briefing ?? null;
 
   const send = useCallback(
     async (text: string) => {
@@ -72,7 +94,11 @@ export function useChat(patientId: number | undefined) {
           prev.map((m) => (m.id === assistantId ? fn(m) : m)),
         );
 
-      const appendPart = (part: TracePart) =>
+      // Type of the last part while it is still growing from deltas.
+      let open: "thinking" | "text" | null = null;
+
+      const appendPart = (part: TracePart) => {
+        open = null;
         patchAssistant((m) => ({
           ...m,
           // A new part means the previous thinking part finished streaming.
@@ -83,14 +109,53 @@ export function useChat(patientId: number | undefined) {
             part,
           ],
         }));
+      };
+
+      const appendDelta = (type: "thinking" | "text", text: string) => {
+        if (open !== type) {
+          appendPart(
+            type === "thinking" ? { type, text, streaming: true } : { type, text },
+          );
+          open = type;
+          return;
+        }
+        patchAssistant((m) => {
+          const parts = m.parts ?? [];
+          const last = parts[parts.length - 1];
+          if (last === undefined || last.type === "tool_use") return m;
+          return {
+            ...m,
+            parts: [...parts.slice(0, -1), { ...last, text: last.text + text }],
+          };
+        });
+      };
+
+      // A complete block supersedes the deltas streamed for it.
+      const completePart = (part: TracePart) => {
+        if (open !== part.type) {
+          appendPart(part);
+          return;
+        }
+        open = null;
+        patchAssistant((m) => ({
+          ...m,
+          parts: [...(m.parts ?? []).slice(0, -1), part],
+        }));
+      };
 
       const handleEvent = (event: ChatEvent) => {
         switch (event.kind) {
+          case "thinking_delta":
+            appendDelta("thinking", event.text);
+            break;
+          case "text_delta":
+            appendDelta("text", event.text);
+            break;
           case "thinking":
-            appendPart({ type: "thinking", text: event.text, streaming: true });
+            completePart({ type: "thinking", text: event.text, streaming: true });
             break;
           case "text":
-            appendPart({ type: "text", text: event.text });
+            completePart({ type: "text", text: event.text });
             patchAssistant((m) => ({
               ...m,
               content: m.content ? `${m.content}\n\n${event.text}` : event.text,
@@ -182,6 +247,9 @@ export function useChat(patientId: number | undefined) {
     briefing,
     isStreaming,
     isLoading: historyQuery.isLoading,
+    hasOlder: historyQuery.hasNextPage,
+    isLoadingOlder: historyQuery.isFetchingNextPage,
+    loadOlder: historyQuery.fetchNextPage,
     send,
     reset,
   };
@@ -72,6 +72,9 @@ export function PatientsPage() {
           messages={chat.messages}
           isStreaming={chat.isStreaming}
           isLoading={chat.isLoading}
+          hasOlder={chat.hasOlder}
+          isLoadingOlder={chat.isLoadingOlder}
+          onLoadOlder={() => chat.loadOlder()}
           onSend={chat.send}
           onReset={chat.reset}
         />
@@ -27,6 +27,21 @@ describe("parseSSEChunk", () => {
     ]);
   });
 
+  it("parses text and thinking deltas", () => {
+    const chunk =
+      'event: thinking_delta\ndata: {"text": "hm"}\n\n' +
+      'event: text_delta\ndata: {"text": "Hel"}\n\n' +
+      'event: text_delta\ndata: {"text": "lo"}\n\n';
+
+    const { events } = parseSSEChunk("", chunk);
+
+    expect(events).toEqual([
+      { kind: "thinking_delta", text: "hm" },
+      { kind: "text_delta", text: "Hel" },
+      { kind: "text_delta", text: "lo" },
+    ]);
+  });
+
   it("keeps a partial frame in rest and completes it with the next chunk", () => {
     // Split mid-line, in the middle of the JSON payload.
     const first = parseSSEChunk("", 'event: text\ndata: {"te');
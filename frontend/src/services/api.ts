@@ -3,6 +3,7 @@ import type {
   BriefingRuntime,
   ChatEvent,
   ChatHistoryResponse,
+  ChatTraceResponse,
   Patient,
   PatientBriefing,
 } from "@/types";
@@ -72,6 +73,12 @@ export function parseSSEChunk(
     const data = dataLines.length > 0 ? JSON.parse(dataLines.join("\n")) : {};
 
     switch (eventName) {
+      case "thinking_delta":
+        events.push({ kind: "thinking_delta", text: data.text });
+        break;
+      case "text_delta":
+        events.push({ kind: "text_delta", text: data.text });
+        break;
       case "thinking":
         events.push({ kind: "thinking", text: data.text });
         break;
@@ -128,8 +135,17 @@ export const api = {
     }).finally(() => clearTimeout(timeout));
   },
 
-  getChat: (patientId: number) =>
-    fetchJson<ChatHistoryResponse>(`/api/v1/patients/${patientId}/chat`),
+  // One page of history, newest first; a page's next_cursor passed as
+  // `before` loads the page before it. Traces are fetched per message.
+  getChat: (patientId: number, before?: number) =>
+    fetchJson<ChatHistoryResponse>(
+      `/api/v1/patients/${patientId}/chat${before != null ? `?before=${before}` : ""}`,
+    ),
+
+  getMessageTrace: (patientId: number, messageId: number) =>
+    fetchJson<ChatTraceResponse>(
+      `/api/v1/patients/${patientId}/chat/messages/${messageId}/trace`,
+    ),
 
   // Raw fetch: the 204 response has no body, so fetchJson's .json() would throw.
   resetChat: async (patientId: number): Promise<void> => {
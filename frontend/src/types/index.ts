@@ -40,7 +40,7 @@ export interface Flag {
   severity: 'critical' | 'warning' | 'info';
   title: string;
   description: string;
-  source: 'ai';
+  source: 'ai' | 'rules';
   suggested_action: string | null;
 }
 
@@ -63,6 +63,8 @@ export interface PatientBriefing {
   generated_at: string;
   /** Persisted briefing id (present when the backend stored it). */
   id?: number | null;
+  /** Rules-only fallback served when the agent missed the latency SLO. */
+  degraded?: boolean;
 }
 
 export type BriefingRuntime = 'sdk' | 'managed';
@@ -107,6 +109,8 @@ export interface ChatMessage {
  * (see backend/src/routers/chat.py): one variant per `event:` name.
  */
 export type ChatEvent =
+  | { kind: 'thinking_delta'; text: string }
+  | { kind: 'text_delta'; text: string }
   | { kind: 'thinking'; text: string }
   | { kind: 'text'; text: string }
   | { kind: 'tool_use'; id: string; tool: string; input: Record<string, unknown> }
@@ -116,18 +120,26 @@ export type ChatEvent =
   | { kind: 'error'; code: string; message: string };
 
 export interface ChatHistoryMessage {
+  id: number;
   role: ChatRole;
   content: string;
   trace: TracePart[] | null;
+  has_trace: boolean;
   created_at: string;
 }
 
 export interface ChatHistoryResponse {
   conversation_id: number | null;
   messages: ChatHistoryMessage[];
+  next_cursor: number | null;
   latest_briefing: PatientBriefing | null;
 }
 
+export interface ChatTraceResponse {
+  message_id: number;
+  trace: TracePart[] | null;
+}
+
 export interface ApiErrorDetail {
   code: string;
   message: string;
@@ -0,0 +1,91 @@
+"""Pre-generate briefings for a clinic schedule via the running API server.
+
+Submits a briefing batch (POST /api/v1/briefing-batches) and polls its
+progress until every job has finished. Generation runs on the server's worker
+pool, so parallelism is bounded by BRIEFING_WORKER_CONCURRENCY there;
+patients with a still-valid stored briefing are skipped as cached.
+
+Usage:
+    cd backend
+    uv run python ../scripts/batch_briefings.py --date 2024-01-15
+    uv run python ../scripts/batch_briefings.py --from 2024-01-15 --to 2024-01-19
+    uv run python ../scripts/batch_briefings.py --patients 1,3,4 --force
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+
+def _submit(api: str, args: argparse.Namespace) -> dict:
+    body: dict = {"force": args.force, "priority": args.priority}
+    if args.patients:
+        body["patient_ids"] = [int(p) for p in args.patients.split(",")]
+    else:
+        body["date_from"] = args.date or args.date_from
+        body["date_to"] = args.date or args.date_to or body["date_from"]
+    resp = httpx.post(f"{api}/api/v1/briefing-batches", json=body, timeout=60)
+    if resp.status_code >= 400:
+        print(f"Error {resp.status_code}: {resp.text}")
+        sys.exit(1)
+    return resp.json()
+
+
+def _render(console: Console, batch: dict) -> None:
+    table = Table(title=f"Briefing batch {batch['id']}")
+    table.add_column("appointment")
+    table.add_column("patient")
+    table.add_column("status")
+    table.add_column("briefing", justify="right")
+    for item in batch["items"]:
+        status = item["status"] + (" (cached)" if item["cached"] else "")
+        if item["error_code"]:
+            status += f" {item['error_code']}"
+        table.add_row(
+            item["appointment_at"] or "-",
+            f"{item['patient_name']} (#{item['patient_id']})",
+            status,
+            str(item["briefing_id"] or "-"),
+        )
+    console.print(table)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate briefings for a clinic schedule")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--patients", type=str, help="Comma-separated patient ids")
+    group.add_argument("--date", type=str, help="Single visit date (YYYY-MM-DD)")
+    group.add_argument("--from", dest="date_from", type=str, help="First visit date of a range")
+    parser.add_argument("--to", dest="date_to", type=str, help="Last visit date (with --from)")
+    parser.add_argument("--force", action="store_true", help="Regenerate even when a cached briefing is valid")
+    parser.add_argument("--priority", type=int, default=7, help="Job priority, 1 (most urgent) to 10")
+    parser.add_argument("--api", type=str, default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between progress polls")
+    args = parser.parse_args()
+
+    console = Console()
+    batch = _submit(args.api, args)
+    started = time.monotonic()
+    while True:
+        p = batch["progress"]
+        console.print(
+            f"[{time.monotonic() - started:6.0f}s] {p['succeeded'] + p['failed']}/{p['total']} done "
+            f"(running {p['running']}, queued {p['queued']}, cached {p['cached']}, failed {p['failed']})"
+        )
+        if p["done"]:
+            break
+        time.sleep(args.poll_interval)
+        batch = httpx.get(f"{args.api}/api/v1/briefing-batches/{batch['id']}", timeout=30).json()
+
+    _render(console, batch)
+    sys.exit(1 if batch["progress"]["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
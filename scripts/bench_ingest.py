@@ -0,0 +1,260 @@
+"""Ingestion throughput benchmark: parse -> chunk -> embed -> upsert at scale.
+
+Runs the real `document_processor` and `rag_service` code paths over a
+synthetic corpus (see generate_guidelines.py) against a local fake Vertex
+embedding server and a local Qdrant, and reports per-stage throughput, the
+process memory high-water mark after each stage, and a scaling table across
+corpus sizes. Documents stream through the pipeline `--doc-batch` at a time,
+so memory stays bounded at any corpus size.
+
+Each scale runs in a fresh subprocess so its peak RSS is its own. The fake
+embedding server runs in the parent process, so its JSON work does not count
+against the measured pipeline.
+
+Usage:
+    docker compose up -d qdrant
+    cd backend
+    uv run python ../scripts/bench_ingest.py --scales 100,1000,10000
+    uv run python ../scripts/bench_ingest.py --scales 1000 --qdrant-url :memory: \\
+        --embed-latency-ms 80 --json-out bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add backend/src to path so imports work when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from generate_guidelines import generate_corpus
+from rich.console import Console
+from rich.table import Table
+
+STAGES = ("parse", "chunk", "embed", "upsert")
+
+
+# --- Fake embedding server ---
+
+
+def _fake_vector(text: str, dims: int) -> list[float]:
+    """Deterministic pseudo-embedding: same text -> same vector."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest())
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dims)]
+
+
+def start_fake_embedding_server(dims: int, latency_ms: float) -> ThreadingHTTPServer:
+    """Serve the Vertex `:predict` response shape on an ephemeral port."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            predictions = [
+                {"embeddings": {"values": _fake_vector(inst["content"], dims)}}
+                for inst in body["instances"]
+            ]
+            payload = json.dumps({"predictions": predictions}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- Single-scale run (child process) ---
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scale(args: argparse.Namespace) -> dict:
+    """Run every stage once over `args.scale` documents; return the report."""
+    from qdrant_client import QdrantClient
+
+    from src.config import settings
+    from src.services import rag_service
+    from src.services.document_processor import chunk_sections, parse_markdown
+
+    settings.vertex_api_endpoint = args.embedding_url
+    settings.google_api_key = settings.google_api_key or "bench"
+    settings.gcp_project_id = settings.gcp_project_id or "bench"
+    settings.embedding_dimensions = args.dims
+    settings.qdrant_collection = f"bench_ingest_{args.scale}"
+    if args.qdrant_url == ":memory:":
+        rag_service._qdrant_client = QdrantClient(":memory:")
+    else:
+        settings.qdrant_url = args.qdrant_url
+
+    report: dict = {"documents": args.scale, "stages": {}}
+    totals = {stage: {"items": 0, "seconds": 0.0} for stage in STAGES}
+
+    def record(stage: str, started: float, items: int) -> None:
+        # Stages run once per document batch; the report sums the batches.
+        total = totals[stage]
+        total["items"] += items
+        total["seconds"] += time.perf_counter() - started
+        report["stages"][stage] = {
+            "items": total["items"],
+            "seconds": round(total["seconds"], 3),
+            "items_per_second": (
+                round(total["items"] / total["seconds"], 1)
+                if total["seconds"]
+                else None
+            ),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
+
+    def ingest(batch: list[tuple[str, str]]) -> None:
+        started = time.perf_counter()
+        parsed = [(stem, parse_markdown(text)) for stem, text in batch]
+        record("parse", started, len(parsed))
+
+        started = time.perf_counter()
+        chunks = [
+            chunk
+            for stem, sections in parsed
+            for chunk in chunk_sections(
+                sections, document_id=stem, document_title=stem
+            )
+        ]
+        record("chunk", started, len(chunks))
+
+        started = time.perf_counter()
+        vectors: list[list[float]] = []
+        for i in range(0, len(chunks), args.embed_batch):
+            vectors += rag_service.embed_batch(
+                [c.text for c in chunks[i : i + args.embed_batch]]
+            )
+        record("embed", started, len(vectors))
+
+        started = time.perf_counter()
+        for i in range(0, len(chunks), args.upsert_batch):
+            rag_service.upsert_chunks(
+                chunks[i : i + args.upsert_batch], vectors[i : i + args.upsert_batch]
+            )
+        record("upsert", started, len(chunks))
+
+    # Stream the corpus through the pipeline `doc_batch` documents at a time,
+    # so memory stays bounded at any scale and peak RSS measures ingest.
+    rag_service.ensure_collection()
+    corpus_chars = 0
+    try:
+        batch: list[tuple[str, str]] = []
+        for stem, text in generate_corpus(args.scale, args.seed):
+            corpus_chars += len(text)
+            batch.append((stem, text))
+            if len(batch) == args.doc_batch:
+                ingest(batch)
+                batch = []
+        if batch:
+            ingest(batch)
+    finally:
+        if not args.keep:
+            rag_service.get_qdrant_client().delete_collection(settings.qdrant_collection)
+    report["corpus_mb"] = round(corpus_chars / 1e6, 2)
+    return report
+
+
+# --- Orchestration (parent process) ---
+
+
+def _render(reports: list[dict]) -> None:
+    console = Console()
+    table = Table(title="Ingestion throughput (items/s) and peak RSS (MB)")
+    table.add_column("docs", justify="right")
+    table.add_column("chunks", justify="right")
+    for stage in STAGES:
+        table.add_column(f"{stage}/s", justify="right")
+    table.add_column("peak MB", justify="right")
+    for report in reports:
+        stages = report["stages"]
+        table.add_row(
+            str(report["documents"]),
+            str(stages["chunk"]["items"]),
+            *(f"{stages[s]['items_per_second']:,}" for s in STAGES),
+            f"{max(s['peak_rss_mb'] for s in stages.values()):,}",
+        )
+    console.print(table)
+    # Scaling: per-stage throughput relative to the smallest scale. ~1.0
+    # means linear; a falling ratio means the stage degrades with size.
+    base = reports[0]["stages"]
+    for report in reports[1:]:
+        ratios = ", ".join(
+            f"{s}={report['stages'][s]['items_per_second'] / base[s]['items_per_second']:.2f}x"
+            for s in STAGES
+        )
+        console.print(f"  {report['documents']} docs vs {reports[0]['documents']}: {ratios}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark guideline ingestion throughput")
+    parser.add_argument("--scales", type=str, default="100,1000,10000", help="Comma-separated document counts")
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)  # child mode
+    parser.add_argument("--embedding-url", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--qdrant-url", type=str, default="http://localhost:6333", help="Qdrant URL, or :memory: for local mode")
+    parser.add_argument("--dims", type=int, default=768, help="Fake embedding dimensions")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Simulated latency per embedding request")
+    parser.add_argument("--embed-batch", type=int, default=64, help="Texts per embedding request")
+    parser.add_argument("--upsert-batch", type=int, default=256, help="Points per Qdrant upsert")
+    parser.add_argument("--doc-batch", type=int, default=100, help="Documents held in memory at once")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus RNG seed")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench collections afterwards")
+    parser.add_argument("--json-out", type=Path, help="Write raw reports as JSON")
+    args = parser.parse_args()
+
+    if args.scale is not None:
+        print(json.dumps(run_scale(args)))
+        return
+
+    server = start_fake_embedding_server(args.dims, args.embed_latency_ms)
+    embedding_url = f"http://127.0.0.1:{server.server_address[1]}"
+    reports = []
+    for scale in (int(s) for s in args.scales.split(",")):
+        print(f"Running {scale} documents...", file=sys.stderr)
+        child_args = [
+            sys.executable, __file__, "--scale", str(scale),
+            "--embedding-url", embedding_url,
+            "--qdrant-url", args.qdrant_url,
+            "--dims", str(args.dims),
+            "--embed-batch", str(args.embed_batch),
+            "--upsert-batch", str(args.upsert_batch),
+            "--doc-batch", str(args.doc_batch),
+            "--seed", str(args.seed),
+        ] + (["--keep"] if args.keep else [])
+        try:
+            result = subprocess.run(child_args, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as exc:
+            print(exc.stderr, file=sys.stderr)
+            sys.exit(exc.returncode)
+        reports.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    server.shutdown()
+
+    _render(reports)
+    if args.json_out:
+        args.json_out.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Generate a synthetic corpus of clinical-guideline markdown for load testing.
+
+Documents mimic the shape of `data/guidelines/`: a title, 3-6 H2 sections,
+H3 subsections with prose paragraphs and bullet lists, dosing thresholds, and
+drug/condition mentions drawn from the ingest lexicon — so parsing, chunking
+and lexicon tagging do representative work. Output is deterministic per seed.
+NOT clinical content; for benchmarking only.
+
+Usage:
+    cd backend
+    uv run python ../scripts/generate_guidelines.py --count 10000 --out /tmp/synthetic
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+
+# Add backend/src to path so imports work when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from src.services.lexicon import CONDITION_LEXICON, DRUG_LEXICON
+
+DRUGS = sorted(DRUG_LEXICON)
+CONDITIONS = sorted(c.replace("_", " ") for c in CONDITION_LEXICON)
+LABS = ["eGFR", "HbA1c", "serum potassium", "LDL cholesterol", "UACR", "creatinine"]
+SECTION_TITLES = [
+    "Diagnosis",
+    "Treatment Targets",
+    "Pharmacologic Therapy",
+    "Monitoring",
+    "Medication Adjustments",
+    "Drug Interactions",
+    "Special Populations",
+    "Referral Criteria",
+]
+SENTENCES = [
+    "{drug} is recommended as first-line therapy for {condition} unless contraindicated.",
+    "Reduce the {drug} dose when {lab} falls below {value}.",
+    "Check {lab} within {weeks} weeks of starting {drug}.",
+    "Patients with {condition} should have {lab} measured every {months} months.",
+    "Combining {drug} with {drug2} increases the risk of adverse events in {condition}.",
+    "Discontinue {drug} if {lab} exceeds {value} on repeat testing.",
+    "Titrate {drug} every {weeks} weeks toward the target for {condition}.",
+    "Consider specialist referral when {condition} progresses despite {drug}.",
+]
+
+
+def _fill(rng: random.Random, template: str) -> str:
+    drug, drug2 = rng.sample(DRUGS, 2)
+    return template.format(
+        drug=drug.replace("_", " ").capitalize(),
+        drug2=drug2.replace("_", " "),
+        condition=rng.choice(CONDITIONS),
+        lab=rng.choice(LABS),
+        value=rng.choice([30, 45, 60, 5.5, 7.0, 100]),
+        weeks=rng.choice([1, 2, 4, 12]),
+        months=rng.choice([3, 6, 12]),
+    )
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_fill(rng, rng.choice(SENTENCES)) for _ in range(rng.randint(2, 6)))
+
+
+def _bullets(rng: random.Random) -> str:
+    return "\n".join(
+        f"- {_fill(rng, rng.choice(SENTENCES))}" for _ in range(rng.randint(3, 7))
+    )
+
+
+def generate_document(rng: random.Random, index: int) -> tuple[str, str]:
+    """Return (filename stem, markdown text) for one synthetic guideline."""
+    condition = rng.choice(CONDITIONS)
+    title = f"{condition.title()} Management Guideline {index}"
+    lines = [f"# {title}", "", _paragraph(rng), ""]
+    for section in rng.sample(SECTION_TITLES, rng.randint(3, 6)):
+        lines += [f"## {section}", "", _paragraph(rng), ""]
+        for _ in range(rng.randint(0, 3)):
+            drug = rng.choice(DRUGS).replace("_", " ").capitalize()
+            lines += [f"### {drug}", "", _paragraph(rng), "", _bullets(rng), ""]
+    stem = f"synthetic-{index:06d}-{condition.replace(' ', '-')}"
+    return stem, "\n".join(lines)
+
+
+def generate_corpus(count: int, seed: int = 0) -> Iterator[tuple[str, str]]:
+    """Yield `count` documents lazily, so callers never hold the whole corpus."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield generate_document(rng, index)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic guideline markdown")
+    parser.add_argument("--count", type=int, required=True, help="Number of documents")
+    parser.add_argument("--out", type=Path, required=True, help="Output directory")
+    parser.add_argument("--seed", type=int, default=0, help="RNG seed (output is deterministic)")
+    args = parser.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    total_bytes = 0
+    for stem, text in generate_corpus(args.count, args.seed):
+        (args.out / f"{stem}.md").write_text(text, encoding="utf-8")
+        total_bytes += len(text)
+    print(f"Wrote {args.count} documents ({total_bytes / 1e6:.1f} MB) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
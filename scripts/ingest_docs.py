@@ -10,67 +10,78 @@ from __future__ import annotations
 
 import argparse
 import sys
+from collections.abc import Iterable
 from pathlib import Path
 
 # Add backend/src to path so imports work when run from backend/
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
 
 from src.services.document_processor import parse_and_chunk_file
-from src.services.rag_service import embed_batch, ensure_collection, upsert_chunks
-
-# Metadata mapping: filename stem -> metadata overrides
+from src.services.rag_service import (
+    ensure_collection,
+    index_document,
+    remove_document,
+)
+
+# Metadata mapping: filename stem -> document-level metadata overrides.
+# Drugs and conditions are NOT listed here: chunk_sections tags each chunk with
+# the ones its own text mentions (src/services/lexicon.py), so payload filters
+# narrow to the passages that actually discuss a drug.
 GUIDELINE_METADATA: dict[str, dict] = {
-    "diabetes-management": {
-        "specialty": "endocrinology",
-        "conditions": ["type_2_diabetes"],
-        "drugs": ["metformin", "insulin"],
-    },
-    "hypertension-guidelines": {
-        "specialty": "cardiology",
-        "conditions": ["hypertension"],
-        "drugs": ["lisinopril", "amlodipine"],
-    },
-    "ckd-management": {
-        "specialty": "nephrology",
-        "conditions": ["chronic_kidney_disease"],
-        "drugs": ["lisinopril", "metformin"],
-    },
-    "drug-interactions": {
-        "specialty": "general",
-        "conditions": [],
-        "drugs": ["metformin", "lisinopril", "atorvastatin", "amlodipine"],
-    },
-    "chf-afib-management": {
-        "specialty": "cardiology",
-        "conditions": ["heart_failure", "atrial_fibrillation"],
-        "drugs": ["metoprolol", "furosemide", "apixaban"],
-    },
+    "diabetes-management": {"specialty": "endocrinology"},
+    "hypertension-guidelines": {"specialty": "cardiology"},
+    "ckd-management": {"specialty": "nephrology"},
+    "drug-interactions": {"specialty": "general"},
+    "chf-afib-management": {"specialty": "cardiology"},
 }
 
 
 def ingest_file(path: Path, collection: str | None = None) -> int:
-    """Ingest a single markdown file. Returns number of chunks upserted."""
+    """Ingest a single markdown file. Returns number of chunks indexed.
+
+    Safe to re-run on an edited file: point ids are deterministic per
+    (document_id, chunk_index), so the upsert overwrites in place and any
+    chunks past the new end of the document are deleted afterwards.
+
+    Near-duplicates of already-indexed chunks are collapsed into the existing
+    point (see src/services/dedup.py) rather than embedded again. Sibling
+    documents orphaned by this reindex are re-ingested afterwards.
+    """
     meta = GUIDELINE_METADATA.get(path.stem, {})
     chunks = parse_and_chunk_file(
         path,
         specialty=meta.get("specialty", "general"),
-        conditions=meta.get("conditions"),
-        drugs=meta.get("drugs"),
     )
     if not chunks:
         print(f"  Skipped {path.name} (no chunks)")
+        _reingest_orphans(path.parent, remove_document(path.stem))
         return 0
 
     print(f"  Chunked {path.name} -> {len(chunks)} chunks")
+    result = index_document(chunks)
+    print(
+        f"  Indexed {result.upserted} chunks "
+        f"({result.collapsed} near-duplicates collapsed)"
+    )
+    _reingest_orphans(path.parent, result.orphaned)
+    return len(chunks)
 
-    texts = [c.text for c in chunks]
-    print(f"  Embedding {len(texts)} chunks...")
-    vectors = embed_batch(texts)
 
-    print(f"  Upserting to Qdrant...")
-    upsert_chunks(chunks, vectors)
+def remove_file(path: Path) -> None:
+    """Remove a deleted guideline's chunks and references from the collection."""
+    # parse_and_chunk_file defaults document_id to the filename stem.
+    _reingest_orphans(path.parent, remove_document(path.stem))
 
-    return len(chunks)
+
+def _reingest_orphans(directory: Path, document_ids: Iterable[str]) -> None:
+    """Re-ingest documents whose collapsed chunks lost their canonical point."""
+    for document_id in sorted(document_ids):
+        sibling = directory / f"{document_id}.md"
+        if sibling.exists():
+            print(f"  Re-ingesting {sibling.name} (canonical chunk removed)")
+            ingest_file(sibling)
+        else:
+            _reingest_orphans(directory, remove_document(document_id))
 
 
 def main() -> None:
@@ -0,0 +1,64 @@
+"""Re-embed the guideline collection for a new embedding model, then cut over.
+
+The live collection keeps serving (with the model it was built with) while the
+stored chunk text is re-embedded into a new collection; the logical collection
+name is flipped to it once it has caught up. See
+src/services/embedding_migration.py.
+
+Usage:
+    cd backend
+    uv run python ../scripts/migrate_embeddings.py --model gemini-embedding-001 --dimensions 768
+    uv run python ../scripts/migrate_embeddings.py --model text-embedding-005 --dimensions 256 \\
+        --batch-size 32 --max-rps 2 --drop-source
+
+Re-running after an interruption resumes: already-copied points are skipped.
+Update EMBEDDING_MODEL / EMBEDDING_DIMENSIONS in .env afterwards so new
+collections match; queries follow the alias either way.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add backend/src to path so imports work when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from src.config import settings
+from src.models.rag import EmbeddingSpec
+from src.services.embedding_migration import migrate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate the guideline index to a new embedding model")
+    parser.add_argument("--model", type=str, default=settings.embedding_model, help="Target embedding model")
+    parser.add_argument("--dimensions", type=int, default=settings.embedding_dimensions, help="Target output dimensionality")
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per embedding request")
+    parser.add_argument("--max-rps", type=float, default=5.0, help="Max embedding requests per second (0 = unthrottled)")
+    parser.add_argument("--catch-up-passes", type=int, default=2, help="Re-sync passes before cut-over")
+    parser.add_argument("--drop-source", action="store_true", help="Delete the previous collection after cut-over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    spec = EmbeddingSpec(model=args.model, dimensions=args.dimensions)
+    try:
+        progress = migrate(
+            spec,
+            batch_size=args.batch_size,
+            max_requests_per_second=args.max_rps,
+            catch_up_passes=args.catch_up_passes,
+            drop_source=args.drop_source,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(
+        f"Done: {progress.embedded} chunks re-embedded into '{progress.target}' "
+        f"({progress.embed_requests} requests); '{settings.qdrant_collection}' now serves it."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Long-running ingest daemon: keep Qdrant in sync with the guideline directory.
+
+Watches a directory of markdown guidelines and reindexes only the documents
+that changed, through the same `ingest_file` the one-shot CLI uses. Deleted
+files have their chunks removed from the collection.
+
+Usage:
+    cd backend
+    uv run python ../scripts/watch_guidelines.py --directory ../data/guidelines/
+    uv run python ../scripts/watch_guidelines.py --directory ../data/guidelines/ \\
+        --initial-sync --metrics-port 9100
+
+Metrics (queue depth, reindex lag, counters) are logged every
+--metrics-interval seconds and, with --metrics-port, served as JSON over HTTP
+(any path) for scraping.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from pathlib import Path
+
+# Add backend/src to path so imports work when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from ingest_docs import ingest_file, remove_file
+from src.services.guideline_watcher import GuidelineWatcher
+from src.services.rag_service import ensure_collection
+
+logger = logging.getLogger("watch_guidelines")
+
+
+async def _serve_metrics(watcher: GuidelineWatcher, port: int) -> asyncio.Server:
+    """Minimal HTTP/1.0 responder: every request gets the metrics snapshot."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await reader.readline()
+        body = watcher.metrics().model_dump_json().encode()
+        writer.write(
+            b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", port)
+
+
+async def _log_metrics(watcher: GuidelineWatcher, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("metrics %s", watcher.metrics().model_dump_json())
+
+
+async def run(args: argparse.Namespace) -> None:
+    watcher = GuidelineWatcher(
+        args.directory,
+        reindex=ingest_file,
+        remove=remove_file,
+        debounce_seconds=args.debounce,
+        poll_interval=args.poll_interval,
+        use_inotify=not args.polling,
+    )
+    if args.initial_sync:
+        watcher.mark_all()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = (
+        await _serve_metrics(watcher, args.metrics_port) if args.metrics_port else None
+    )
+    reporter = asyncio.create_task(_log_metrics(watcher, args.metrics_interval))
+    try:
+        await watcher.run(stop)
+    finally:
+        reporter.cancel()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        watcher.close()
+    logger.info("Stopped; final metrics %s", watcher.metrics().model_dump_json())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Watch and incrementally reindex guidelines")
+    parser.add_argument("--directory", type=Path, required=True, help="Directory of markdown files to watch")
+    parser.add_argument("--debounce", type=float, default=2.0, help="Seconds a file must be quiet before reindexing")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Polling backend scan interval (seconds)")
+    parser.add_argument("--polling", action="store_true", help="Force the polling backend instead of inotify")
+    parser.add_argument("--initial-sync", action="store_true", help="Reindex every file once at startup")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve metrics JSON on this port (0 = off)")
+    parser.add_argument("--metrics-interval", type=float, default=60.0, help="Seconds between metrics log lines")
+    args = parser.parse_args()
+
+    if not args.directory.is_dir():
+        print(f"Error: Directory not found: {args.directory}")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s - %(message)s")
+    print("Ensuring Qdrant collection exists...")
+    ensure_collection()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()